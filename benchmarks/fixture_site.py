@@ -0,0 +1,109 @@
+"""
+__________________________________________________
+Local, deterministic fixture site for exercising BasePageClass
+__________________________________________________
+Run standalone with `python -m benchmarks.fixture_site` or start it in a background
+thread with `start_fixture_site()`.
+"""
+import threading
+import time
+
+from flask import Flask
+from flask import jsonify
+from flask import redirect
+from flask import render_template
+from flask import request
+from flask import url_for
+from werkzeug.serving import make_server
+
+LOCALES = [("en", "English"), ("hi", "Hindi"), ("ta", "Tamil"), ("te", "Telugu"), ("bn", "Bengali")]
+COUNTRIES = ["India", "Nepal", "Bhutan", "Sri Lanka", "Bangladesh", "Maldives"]
+FORM_FIELDS = [
+    "first_name", "last_name", "email", "phone", "address_line_1", "address_line_2",
+    "city", "state", "postal_code", "college", "graduation_year", "referral_code",
+]
+PAGES = ["table", "delayed", "links", "select", "form", "xhr"]
+
+
+def create_app():
+    app = Flask(__name__)
+
+    @app.route("/")
+    def index():
+        return render_template("index.html", pages=PAGES)
+
+    @app.route("/table")
+    def table():
+        return render_template("table.html", rows=request.args.get("rows", 200, type=int))
+
+    @app.route("/delayed")
+    def delayed():
+        return render_template("delayed.html", delay_ms=request.args.get("ms", 800, type=int))
+
+    @app.route("/links")
+    def links():
+        return render_template("links.html", footer_links=request.args.get("footer", 60, type=int))
+
+    @app.route("/target")
+    def target():
+        return render_template("target.html", source=request.args.get("source", "direct"))
+
+    @app.route("/redirect")
+    def redirect_to_target():
+        return redirect(url_for("target", source="redirect"))
+
+    @app.route("/missing")
+    def missing():
+        return "Not found", 404
+
+    @app.route("/login/")
+    def login():
+        return render_template("target.html", source="login")
+
+    @app.route("/select")
+    def select():
+        return render_template("select.html", locales=LOCALES, countries=COUNTRIES)
+
+    @app.route("/form", methods=["GET", "POST"])
+    def form():
+        return render_template("form.html", fields=FORM_FIELDS)
+
+    @app.route("/xhr")
+    def xhr():
+        return render_template("xhr.html", delay_ms=request.args.get("ms", 500, type=int))
+
+    @app.route("/api/slow")
+    def slow_api():
+        delay_ms = request.args.get("ms", 500, type=int)
+        time.sleep(delay_ms / 1000.0)
+        return jsonify(message=f"Loaded after {delay_ms}ms")
+
+    return app
+
+
+class FixtureSite:
+    """The fixture app served from a background thread on a free local port."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.server = make_server(host, port, create_app(), threaded=True)
+        self.base_url = f"http://{host}:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fixture-site", daemon=True)
+
+    def url(self, path):
+        return self.base_url + path
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+def start_fixture_site(host="127.0.0.1", port=0):
+    return FixtureSite(host, port).start()
+
+
+if __name__ == "__main__":
+    create_app().run(port=5000, threaded=True)
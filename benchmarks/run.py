@@ -0,0 +1,209 @@
+"""
+__________________________________________________
+Benchmarks for the BasePageClass primitives against the local fixture site
+__________________________________________________
+Usage:
+    python -m benchmarks.run                      # run and compare with benchmarks/baseline.json
+    python -m benchmarks.run --save               # run and store the results as the new baseline
+    python -m benchmarks.run --only click --rounds 20
+
+Every primitive is run `--rounds` times in headless Chrome; median and p95 latency and
+the number of WebDriver commands per call are reported. In comparison mode a primitive
+regresses when its median grows by more than `--threshold` (and by at least
+`--min-delta-ms`) or when it issues more commands than the baseline; the exit code is 1
+if anything regressed.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import pytest
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.common.by import By
+
+from config import BASE_DIR
+from config import BrowserEnum
+from pages import BasePageClass
+from utils.command_profiler import CommandProfiler
+from utils.driver_cache import DEFAULT_CACHE_DIR
+from utils.driver_cache import resolve_driver_binary
+from benchmarks.fixture_site import FORM_FIELDS
+from benchmarks.fixture_site import start_fixture_site
+
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "benchmarks", "baseline.json")
+
+TABLE_ROWS = (By.CSS_SELECTOR, "tr.data-row")
+TABLE_NAMES = (By.CSS_SELECTOR, "td.name")
+TABLE_EMAILS = (By.CSS_SELECTOR, "a.email")
+DELAYED_ROW = (By.CSS_SELECTOR, "div.delayed-row")
+SAME_PAGE_LINK = (By.CSS_SELECTOR, "a.same-page-link")
+NEW_TAB_LINK = (By.CSS_SELECTOR, "a.new-tab-link")
+NEW_WINDOW_LINK = (By.CSS_SELECTOR, "a.new-window-link")
+HOME_LINK = (By.ID, "home-link")
+FOOTER_LINKS = (By.CSS_SELECTOR, "a.footer-link")
+LOCALE_SELECT = (By.ID, "locale-select")
+FIRST_NAME_INPUT = (By.ID, "first_name")
+SUBMIT_BUTTON = (By.ID, "submit")
+FIRST_NAME_ERROR = (By.ID, "first_name-error")
+XHR_RESULT = (By.ID, "result")
+REGISTRATION_FORM = {
+    **{(By.ID, field): f"{field} value" for field in FORM_FIELDS},
+    (By.ID, "country"): "in",
+}
+
+# name, fixture path, primitive under test
+BENCHMARKS = [
+    ("go_to_page", "/", lambda page, site: page.go_to_page(site.url("/table"))),
+    ("get_text_of_elements", "/table", lambda page, site: page.get_text_of_elements(TABLE_NAMES)),
+    ("get_attribute_of_elements", "/table", lambda page, site: page.get_attribute_of_elements(TABLE_EMAILS, "href")),
+    ("snapshot_elements", "/table",
+     lambda page, site: page.snapshot_elements(TABLE_ROWS, ("text", "visible", "rect"), ("data-index",))),
+    ("get_length_of_element", "/table", lambda page, site: page.get_length_of_element(TABLE_ROWS)),
+    ("select_random_index", "/table", lambda page, site: page.select_random_index(TABLE_ROWS)),
+    ("get_page_elements", "/table", lambda page, site: page.get_page_elements(TABLE_ROWS)),
+    ("check_page_element", "/delayed?ms=300", lambda page, site: page.check_page_element(DELAYED_ROW)),
+    ("scroll_into_view", "/table", lambda page, site: page.scroll_into_view(TABLE_ROWS, index=150)),
+    ("click_on_element", "/links", lambda page, site: page.click_on_element(HOME_LINK)),
+    ("click_on_single_element", "/links", lambda page, site: page.click_on_single_element(HOME_LINK)),
+    ("check_element_is_clickable", "/links", lambda page, site: page.check_element_is_clickable(HOME_LINK)),
+    ("enter_field_input", "/form", lambda page, site: page.enter_field_input(FIRST_NAME_INPUT, "Asha")),
+    ("send_enter_keys_to_element", "/form", lambda page, site: page.send_enter_keys_to_element(SUBMIT_BUTTON)),
+    ("check_fields_blank_error_message", "/form",
+     lambda page, site: page.click_on_element(SUBMIT_BUTTON)
+     and page.check_fields_blank_error_message(FIRST_NAME_ERROR, "First Name is required")),
+    ("select_value_from_list", "/select", lambda page, site: page.select_value_from_list(LOCALE_SELECT, 2)),
+    ("fill_form", "/form", lambda page, site: page.fill_form(REGISTRATION_FORM)),
+    ("wait_for_page_quiet", "/xhr?ms=300", lambda page, site: page.wait_for_page_quiet()),
+    ("check_same_page_link_works", "/links",
+     lambda page, site: page.check_same_page_link_works(SAME_PAGE_LINK, "source=same-page")),
+    ("check_new_page_link_works", "/links",
+     lambda page, site: page.check_new_page_link_works(NEW_TAB_LINK, "source=new-tab")),
+    ("check_new_window_link_works", "/links",
+     lambda page, site: page.check_new_window_link_works(NEW_WINDOW_LINK, "source=new-window", index=0)),
+    ("verify_links", "/links", lambda page, site: page.verify_links(FOOTER_LINKS)),
+]
+
+
+def create_headless_chrome(driver_cache):
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("window-size=1920x1480")
+    driver_path = resolve_driver_binary(BrowserEnum.CHROME.value[0], cache_dir=driver_cache)
+    driver = webdriver.Chrome(service=ChromeService(driver_path), options=options)
+    driver.implicitly_wait(0)
+    return driver
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def reset_browser(driver, url):
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.get(url)
+
+
+def run_benchmarks(driver, site, rounds, warmup, only=None):
+    profiler = CommandProfiler()
+    profiler.install()
+    results = {}
+    for name, path, primitive in BENCHMARKS:
+        if only and only not in name:
+            continue
+        timings = []
+        commands = []
+        for round_number in range(warmup + rounds):
+            reset_browser(driver, site.url(path))
+            page = BasePageClass(driver)
+            profiler.start_test()
+            start = time.perf_counter()
+            primitive(page, site)
+            elapsed = time.perf_counter() - start
+            if round_number >= warmup:
+                timings.append(elapsed * 1000.0)
+                commands.append(profiler.test_stats()["commands"])
+        results[name] = {
+            "median_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(percentile(timings, 0.95), 2),
+            "commands": max(commands),
+        }
+        print(f"{name:36} median {results[name]['median_ms']:9.1f}ms  p95 {results[name]['p95_ms']:9.1f}ms  "
+              f"{results[name]['commands']:4d} commands")
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Return the list of regression messages of `results` against `baseline`."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        delta = current["median_ms"] - previous["median_ms"]
+        if delta > min_delta_ms and current["median_ms"] > previous["median_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: median {previous['median_ms']:.1f}ms -> {current['median_ms']:.1f}ms"
+            )
+        if current["commands"] > previous["commands"]:
+            regressions.append(
+                f"{name}: WebDriver commands {previous['commands']} -> {current['commands']}"
+            )
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--only", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative median slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=20.0, help="Ignore slowdowns below this")
+    parser.add_argument("--driver-cache", default=DEFAULT_CACHE_DIR)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pytest.current_client = "benchmark"
+    site = start_fixture_site()
+    driver = create_headless_chrome(args.driver_cache)
+    try:
+        results = run_benchmarks(driver, site, args.rounds, args.warmup, args.only)
+    finally:
+        driver.quit()
+        site.stop()
+
+    if args.save:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump({"rounds": args.rounds, "results": results}, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to create one")
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
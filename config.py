@@ -3,6 +3,8 @@ from enum import Enum
 from enum import unique
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+# --browser-url value that starts a local stand-in grid (utils/stand_in_grid.py)
+STAND_IN = "stand-in"
 
 
 class BaseEnumClass(Enum):
@@ -35,6 +37,21 @@ class BrowserEnum(BaseEnumClass):
     EDGE = ("edge",)
     FIREFOX = ("firefox",)
     SAFARI = ("safari",)
+    FAKE = ("fake",)
+
+
+@unique
+class BrowserProfileEnum(BaseEnumClass):
+    FULL = ("full",)
+    LEAN = ("lean",)
+    TEXT_ONLY = ("text-only",)
+
+
+@unique
+class PageLoadStrategyEnum(BaseEnumClass):
+    NORMAL = ("normal",)
+    EAGER = ("eager",)
+    NONE = ("none",)
 
 
 @unique
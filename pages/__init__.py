@@ -7,26 +7,25 @@ import logging
 import time
 import urllib.parse
 import allure
-import pytest
-import string
-import random
 from random import randint
-import requests
 from selenium.webdriver import ActionChains
+from selenium.common.exceptions import ElementNotInteractableException
+from selenium.common.exceptions import JavascriptException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.select import Select
 
+from pages import scripts
+from pages.common import PageCommon
+from utils import link_checker
 
-class BasePageClass:
-    EXIT_PATH_URL = ""
-    _timeout = 50
+
+class BasePageClass(PageCommon):
     _COMPANY_LOGO_LOCATOR = (By.CSS_SELECTOR, "img.header-logo")
     _ALL_CDN_SCRIPT_LOGOS_LOCATOR = (By.CSS_SELECTOR, "script[src]")
-    _FOCUS_TAG_LOCATOR = (By.CSS_SELECTOR, "body")
-    _LOCATOR = (By.CSS_SELECTOR, 'div[class*="row"]')
     _LOGIN_BUTTON_LOCATOR = (By.CSS_SELECTOR, 'a[href^="/login/"]')
     _LEADING_MODAL_CLOSE_BUTTON_LOCATOR = (By.CSS_SELECTOR, "button.leadinModal-close")
     _SOUNDS_GOOD_BUTN_LOCATOR = (
@@ -40,31 +39,45 @@ class BasePageClass:
     _SELECT_LANGUAGE_OPTION = (By.ID, "locale-select")
     _SELECT_LANGUAGE_DROPDOWN = (By.CSS_SELECTOR, "#locale-select option")
     _WINDOW_SELECT_LOCATOR = (By.TAG_NAME, 'body')
-
-    def __init__(self, *args):
-        self.selenium = args[0]
-        self.client = pytest.current_client
+    # Source of monotonic()/sleep(); the fake browser swaps in a VirtualClock
+    clock = time
 
     def check_page_url(self, check_url, path=None):
-        logging.debug("URl is = ", check_url)
+        logging.debug("URl is = %s", check_url)
         url = urllib.parse.urljoin(check_url, path)
         return self.check_for_new_url(url)
 
     @allure.step("Go to link is {link}")
     def go_to_page(self, link):
         """Instructs webdriver make a GET request to the page URL.
-        This method is blocking until the entire page loads.
+        Returns once the readiness condition of the session's wait policy holds.
         """
-        return self.selenium.get(link)
+        self.invalidate_element_cache()
+        result = self.selenium.get(link)
+        self.wait_until_ready()
+        return result
+
+    def wait_until_ready(self):
+        """Wait for the readiness condition of the wait policy after a navigation"""
+        ready_state = self.wait_policy.readiness_check()
+        ready = True
+        if ready_state is not None:
+            ready = self.wait_for_navigation(ready_state=ready_state)
+        if self.wait_policy.readiness == "quiet":
+            ready = self.wait_for_page_quiet() and ready
+        return ready
 
     def refresh(self):
+        self.invalidate_element_cache()
         self.selenium.refresh()
 
     def maximize(self):
         self.selenium.maximize_window()
 
     def go_to(self, path):
+        self.invalidate_element_cache()
         self.selenium.get(path)
+        self.wait_until_ready()
 
     def get_current_url(
             self,
@@ -77,21 +90,13 @@ class BasePageClass:
         """Generic function for clicking elements. (Range index version)"""
         click_result = False
         try:
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.presence_of_element_located(locator)
-            )
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.element_to_be_clickable(locator)
+            self.wait_for_page_quiet(legacy_sleep=0.5)
+            # The index is picked from the elements actually clicked, also after a stale retry
+            self.interact_with_element(
+                locator, lambda elements: elements[self._pick_index(elements, index)].click(), state="clickable"
             )
-            button_link = self.selenium.find_elements(*locator)
-            if index is None:
-                if len(button_link) > 1:
-                    index = randint(0, len(button_link) - 1)
-                else:
-                    index = 0
-            self.wait_it_out(0.5)
-            self.get_text_of_elements()
-            button_link[index].click()
+            # A click may navigate or re-render the page
+            self.invalidate_element_cache()
             click_result = True
             return click_result
         finally:
@@ -101,112 +106,263 @@ class BasePageClass:
         """Generic function for clicking elements. (Range index version)"""
         click_result = False
         try:
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.presence_of_element_located(locator)
-            )
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.element_to_be_clickable(locator)
-            )
-            button_link = self.selenium.find_element(*locator)
-            self.wait_it_out(0.5)
-            self.get_text_of_elements()
-            button_link.click()
+            self.wait_for_page_quiet(legacy_sleep=0.5)
+            self.interact_with_element(locator, lambda elements: elements[0].click(), state="clickable")
+            self.invalidate_element_cache()
             click_result = True
             return click_result
         finally:
             pass
 
-    def check_for_new_url(
-            self, expected_url_string=EXIT_PATH_URL, interval=0.5, max_limit=_timeout
-    ):
-        """Generic Method to check until a new url is loaded, at given interval (in seconds)"""
-        check_result = False
-        cycle = 0.0
-        max_limit = float(max_limit)
+    def get_cached_elements(self, locator, state="present", timeout=None):
+        """Resolve `locator` once per page and reuse the WebElements afterwards.
+        On a cache miss, wait until the first match is "present", "visible" or "clickable"."""
+        elements = self._cached_elements(locator)
+        if elements:
+            return elements
+        found = []
+
+        def elements_ready():
+            found[:] = self.selenium.find_elements(*locator)
+            if not found:
+                return False
+            if state == "visible":
+                return found[0].is_displayed()
+            if state == "clickable":
+                return found[0].is_displayed() and found[0].is_enabled()
+            return True
+
+        if not self._poll_until(elements_ready, "%s elements %s" % (state, locator), timeout):
+            raise TimeoutException("Element not %s: %s" % (state, locator))
+        return self._cache_elements(locator, found)
+
+    def interact_with_element(self, locator, action, state="present", timeout=None):
+        """Run `action(elements)` against the cached matches of `locator`.
+        If the cached references went stale (re-render, navigation), resolve them again and retry once."""
         try:
-            while check_result is False and expected_url_string is not None:
-                self.wait_it_out(interval)
-                cycle += interval
-                current_page_url = str(self.selenium.current_url)
-                if expected_url_string in current_page_url:
-                    check_result = True
-                    self.wait_it_out(1)
-                    return check_result
-                if cycle > max_limit:
-                    logging.debug("\n We want URL : ", expected_url_string)
-                    logging.debug("\n We are now at URL : ", current_page_url)
-                    return check_result
-        finally:
-            logging.debug(check_result)
+            return action(self.get_cached_elements(locator, state, timeout))
+        except (StaleElementReferenceException, ElementNotInteractableException):
+            self._count_stale(locator)
+            return action(self.get_cached_elements(locator, state, timeout))
 
-    def get_text_of_elements(self, locator=_FOCUS_TAG_LOCATOR):
-        """Returns list of text of element/s"""
-        WebDriverWait(self.selenium, self._timeout).until(
-            EC.presence_of_element_located(locator)
+    def check_for_new_url(
+            self, expected_url_string=PageCommon.EXIT_PATH_URL, interval=PageCommon._MAX_POLL_INTERVAL, max_limit=None
+    ):
+        """Generic Method to check until a new url is loaded, polling at most every `interval` seconds"""
+        if expected_url_string is None:
+            return False
+        check_result = self.wait_for_navigation(
+            url_contains=expected_url_string,
+            ready_state="interactive",
+            timeout=max_limit,
+            max_interval=interval,
         )
-        WebDriverWait(self.selenium, self._timeout).until(
-            EC.visibility_of_element_located(locator)
+        if not check_result:
+            logging.debug("We want URL : %s", expected_url_string)
+            logging.debug("We are now at URL : %s", self.selenium.current_url)
+        return check_result
+
+    def wait_for_navigation(
+            self,
+            url_contains=None,
+            ready_state=None,
+            window_count=None,
+            timeout=None,
+            max_interval=PageCommon._MAX_POLL_INTERVAL,
+    ):
+        """Wait until the URL contains `url_contains`, document.readyState has reached
+        `ready_state` ("interactive" or "complete") and at least `window_count` windows
+        are open. Conditions left as None are not checked.
+        Returns True as soon as all of them hold, False once `timeout` runs out."""
+
+        def navigation_done():
+            if window_count is not None and len(self.selenium.window_handles) < window_count:
+                return False
+            if url_contains is not None and url_contains not in str(self.selenium.current_url):
+                return False
+            if ready_state is not None:
+                state = self.selenium.execute_script("return document.readyState;")
+                if state not in self._READY_STATES[ready_state]:
+                    return False
+            return True
+
+        label = self._navigation_label(url_contains, ready_state, window_count)
+        return self._poll_until(navigation_done, label, timeout, max_interval)
+
+    def wait_for_page_quiet(self, legacy_sleep=0.0, quiet_ms=None, timeout=None):
+        """Wait until the page has had no DOM mutation, pending fetch/XHR or running
+        animation for `quiet_ms` milliseconds (the --quiet-window option by default).
+        `legacy_sleep` is the fixed sleep this wait replaces; it is used for the
+        time-saved counters, as the fallback when scripts cannot run and to bound the
+        wait to _QUIET_TIMEOUT_FACTOR times that sleep (_QUIET_TIMEOUT without one)."""
+        quiet_ms = self._quiet_window(quiet_ms)
+        if timeout is None:
+            timeout = self.quiet_timeout(legacy_sleep)
+        unsupported = []
+
+        def page_quiet():
+            try:
+                return self.selenium.execute_script(scripts.QUIET_MONITOR, quiet_ms)["quiet"]
+            except JavascriptException as e:
+                unsupported.append(e)
+                return True
+
+        start = self.clock.monotonic()
+        quiet = self._poll_until(
+            page_quiet, "page quiet for %sms" % quiet_ms, timeout, max_interval=self._quiet_poll_interval(quiet_ms)
         )
-        self.wait_it_out(0.5)
-        element = self.selenium.find_elements(*locator)
-        if element is not None:
-            element_texts = [elem.text for elem in element]
+        if unsupported:
+            logging.debug("Quiet monitor unavailable, sleeping instead: %s", unsupported[0])
+            self.wait_it_out(legacy_sleep)
+        self._record_quiet_wait(quiet, legacy_sleep, self.clock.monotonic() - start)
+        return quiet
+
+    def _poll_until(self, condition, label, timeout=None, max_interval=PageCommon._MAX_POLL_INTERVAL):
+        """Poll `condition` with exponential backoff until it is truthy or the deadline passes.
+        WebDriver errors raised mid-transition (stale element, missing element or window) count
+        as "not yet"; any other error is raised at once."""
+        timeout, interval = self._poll_start(timeout, max_interval)
+        start = self.clock.monotonic()
+        deadline = start + timeout
+        while True:
+            try:
+                result = bool(condition())
+            except self._TRANSIENT_ERRORS:
+                result = False
+            remaining = deadline - self.clock.monotonic()
+            if result or remaining <= 0:
+                break
+            self.wait_it_out(min(interval, remaining))
+            interval = self._next_interval(interval, max_interval)
+        self._record_wait(label, self.clock.monotonic() - start, result)
+        return result
+
+    def get_text_of_elements(self, locator=PageCommon._FOCUS_TAG_LOCATOR):
+        """Returns list of text of element/s"""
+        snapshot = self.wait_for_elements(locator, fields=("text",), visible=True)
+        return [elem["text"] for elem in snapshot]
+
+    def snapshot_elements(self, locator=PageCommon._FOCUS_TAG_LOCATOR, fields=("text",), attributes=()):
+        """Read `fields` ("text", "visible", "rect") and `attributes` of every element
+        matching `locator` in one execute_script round trip.
+        Returns one dict per element, e.g. {"text": ..., "attributes": {"href": ...}}."""
+        try:
+            return self.selenium.execute_script(
+                scripts.SNAPSHOT_ELEMENTS, locator[0], locator[1], list(fields), list(attributes)
+            )
+        except WebDriverException as e:
+            logging.debug("Snapshot script failed, reading elements one by one: %s", e)
+        return self._snapshot_elements_per_element(locator, fields, attributes)
+
+    def _snapshot_elements_per_element(self, locator, fields, attributes):
+        snapshot = []
+        for elem in self.selenium.find_elements(*locator):
+            entry = {}
+            if "text" in fields:
+                entry["text"] = elem.text
+            if "visible" in fields:
+                entry["visible"] = elem.is_displayed()
+            if "rect" in fields:
+                entry["rect"] = elem.rect
+            if attributes:
+                entry["attributes"] = {name: elem.get_attribute(name) for name in attributes}
+            snapshot.append(entry)
+        return snapshot
+
+    def wait_for_elements(
+            self, locator=PageCommon._FOCUS_TAG_LOCATOR, fields=(), attributes=(), visible=False, timeout=None
+    ):
+        """Wait until `locator` matches (and, with `visible`, its first match is displayed),
+        then return its snapshot. Raises TimeoutException when `timeout` runs out."""
+        fields = tuple(fields) + (("visible",) if visible and "visible" not in fields else ())
+        snapshot = []
 
-            return element_texts
+        def elements_ready():
+            snapshot[:] = self.snapshot_elements(locator, fields, attributes)
+            return snapshot and (not visible or snapshot[0]["visible"])
 
-    def convert_list_to_string(self, list):
-        return "".join(list)
+        if not self._poll_until(elements_ready, "elements %s" % (locator,), timeout):
+            raise TimeoutException("Element not ready: %s" % (locator,))
+        return snapshot
 
     @classmethod
     def wait_it_out(cls, seconds=1.0):
-        time.sleep(seconds)
+        cls.clock.sleep(seconds)
         return True
 
     def enter_field_input(
-            self, input_locator=_FOCUS_TAG_LOCATOR, values="No Input", index=None
+            self, input_locator=PageCommon._FOCUS_TAG_LOCATOR, values="No Input", index=None
     ):
         """Generic Input function to enter passed values into field element"""
         fill_result = False
         try:
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.presence_of_element_located(input_locator)
-            )  # Present?
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.visibility_of_element_located(input_locator)
-            )  # Visible?
-            name_field = self.selenium.find_elements(*input_locator)
-            if index is None:
-                if len(name_field) > 1:
-                    index = randint(0, len(name_field) - 1)
-                else:
-                    index = 0
-            self.wait_it_out(0.9)
-            name_field[index].send_keys(Keys.CONTROL + "a")
-            name_field[index].send_keys(Keys.BACKSPACE)
-            name_field[index].send_keys(str(values))
+            self.wait_for_page_quiet(legacy_sleep=0.9)
+
+            def type_value(elements):
+                field = elements[self._pick_index(elements, index)]
+                field.send_keys(Keys.CONTROL + "a")
+                field.send_keys(Keys.BACKSPACE)
+                field.send_keys(str(values))
+
+            self.interact_with_element(input_locator, type_value, state="visible")
             fill_result = True
             return fill_result
         except AssertionError as e:
-            logging.debug("\n Got exception, which is apparently : ")
-            logging.debug("\n", e)
+            logging.debug("Got exception, which is apparently : %s", e)
         finally:
             logging.debug(fill_result)
         return fill_result
 
+    def fill_form(self, fields, type_natively=(), timeout=None):
+        """Fill many form fields in one script call and verify their final values.
+        `fields` maps locators to values; a locator may carry an element index as a third
+        item, e.g. (By.NAME, "phone", 1). Text fields take strings or numbers, selects an
+        option value or label (or an int option index, as select_value_from_list does) and
+        checkboxes and radios a boolean. Fields listed in `type_natively` get real
+        keystrokes first, for pages that only react to key events; the script then only
+        verifies them. The whole timeout is only waited while none of the fields is on the
+        page; a field still missing _MISSING_FIELD_TIMEOUT seconds after the others showed
+        up is reported as not found.
+        Returns {locator: {"ok": bool, "value": ..., "error": str or None}}."""
+        payload = self._form_payload(fields, type_natively)
+        probe = self._form_probe(payload)
+        results = None
+        partial_since = None
+
+        def form_settled():
+            nonlocal results, partial_since
+            # Nothing is changed until every field is on the page
+            results = self.selenium.execute_script(scripts.FILL_FORM, probe, True)
+            settled, partial_since = self._form_settled(results, len(probe), partial_since, self.clock.monotonic())
+            return settled
+
+        self._poll_until(form_settled, "form fields %s" % list(fields), timeout)
+        if probe is payload and isinstance(results, list):
+            return self._form_result(fields, results)
+        missing = self._missing_fields(results)
+        for position, field in enumerate(payload):
+            if field["verify_only"] and position not in missing:
+                self.interact_with_element(
+                    (field["by"], field["value"]),
+                    lambda elements: elements[field["index"]].send_keys(
+                        Keys.CONTROL + "a" + Keys.NULL + Keys.BACKSPACE + str(field["text"])
+                    ),
+                    state="visible",
+                    timeout=timeout,
+                )
+        return self._form_result(fields, self.selenium.execute_script(scripts.FILL_FORM, payload, False))
+
     def check_new_page(
             self, np_link_locator=None, required_string=None, index=None
     ):
         """Check if the Linked Page opens up in a New Tab"""
         check_result = False
         try:
-            time.sleep(0.5)
             self.click_on_element(np_link_locator, index)
-            self.selenium.switch_to.window(self.selenium.window_handles[1])
+            if not self.switch_to_new_window(timeout=self._NEW_WINDOW_TIMEOUT):
+                return check_result
             self.maximize()
-            if self.check_for_new_url(required_string, interval=1):
-                check_result = True
-            else:
-                check_result = False
+            check_result = bool(self.check_for_new_url(required_string))
             return check_result
         finally:
             print(check_result)
@@ -215,45 +371,35 @@ class BasePageClass:
         error = self.get_text_of_elements(locator)
         print(error)
         print(error_string)
-        logging.debug("error_text", error)
+        logging.debug("error_text %s", error)
         logging.debug(self.convert_list_to_string(error))
         res1 = self.convert_list_to_string(error) == error_string
         return res1
 
     def get_attribute_of_elements(
-            self, locator=_FOCUS_TAG_LOCATOR, attribute_name="class"
+            self, locator=PageCommon._FOCUS_TAG_LOCATOR, attribute_name="class"
     ):
         """Specialized function for getting attribute of elements."""
-        WebDriverWait(self.selenium, self._timeout).until(
-            EC.presence_of_element_located(locator)
-        )
-        elements = self.selenium.find_elements(*locator)
-        element_attributes = [elem.get_attribute(attribute_name) for elem in elements]
-        return element_attributes
+        snapshot = self.wait_for_elements(locator, attributes=(attribute_name,))
+        return [elem["attributes"][attribute_name] for elem in snapshot]
 
     def send_enter_keys_to_element(self, locator=None, index=None):
         """Specialized function for clicking elements. (Range index Enter version)"""
         click_result = False
         try:
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.presence_of_element_located(locator)
-            )
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.visibility_of_element_located(locator)
+            self.interact_with_element(
+                locator, lambda elements: elements[self._pick_index(elements, index)].send_keys(Keys.ENTER),
+                state="visible",
             )
-            button_link = self.selenium.find_elements(*locator)
-            if index is None:
-                if len(button_link) > 1:
-                    index = randint(0, len(button_link) - 1)
-                else:
-                    index = 0
-            button_link[index].send_keys(Keys.ENTER)
+            # Enter may submit a form
+            self.invalidate_element_cache()
             click_result = True
             return click_result
         finally:
             logging.debug(click_result)
 
     def click_on_browser_back_button(self):
+        self.invalidate_element_cache()
         self.selenium.back()
 
     def check_same_page_link_works(
@@ -265,11 +411,10 @@ class BasePageClass:
         """Check if the Linked Page opens up in the Same Tab"""
         check_result = False
         try:
-            self.wait_it_out(3)
+            self.wait_for_navigation(ready_state="complete")
             self.click_on_element(sp_link_locator, index)
             self.selenium.switch_to.window(self.selenium.current_window_handle)
-            self.wait_it_out(5)
-            check_result = bool(self.check_for_new_url(required_string, interval=2))
+            check_result = bool(self.check_for_new_url(required_string))
             self.click_on_browser_back_button()
             return check_result
         finally:
@@ -281,78 +426,58 @@ class BasePageClass:
         """Check if the Linked Page opens up in a New Tab"""
         check_result = False
         try:
-            self.wait_it_out(0.5)
             self.click_on_element(np_link_locator, index)
-            self.selenium.switch_to.window(self.selenium.window_handles[1])
+            if not self.switch_to_new_window(timeout=self._NEW_WINDOW_TIMEOUT):
+                return check_result
             self.maximize()
-            if self.check_for_new_url(required_string, interval=2):
-                check_result = True
-                self.selenium.close()
-                self.selenium.switch_to.window(self.selenium.window_handles[0])
+            check_result = bool(self.check_for_new_url(required_string))
+            self.close_current_page()
+            return check_result
         finally:
-            pass
+            logging.debug(check_result)
 
     def check_element_is_clickable(self, locator=None, index=None):
-        try:
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.presence_of_element_located(locator)
-            )
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.element_to_be_clickable(locator)
-            )
-            button_link = self.selenium.find_elements(*locator)
+        def clickable(elements):
             if index is None:
-                if len(button_link) > 1:
-                    return True
-                else:
-                    return False
-            self.wait_it_out(0.5)
-            click_result = True
-            return click_result
-        finally:
-            pass
+                return len(elements) > 1
+            return index < len(elements) and elements[index].is_displayed() and elements[index].is_enabled()
+
+        return self.interact_with_element(locator, clickable, state="clickable")
 
     def scroll_into_view(self, locator, index=0, scroll_val=150):
+        # check_page_element has already waited for the page to go quiet
         self.check_page_element(locator, timeout=25)
-        self.wait_it_out(1)
-        elem = self.selenium.find_elements(*locator)
         if index is None:
             index = self.select_random_index(locator)
-        self.selenium.execute_script(
-            "return arguments[0].scrollIntoView();", elem[index]
+        self.interact_with_element(
+            locator,
+            lambda elements: self.selenium.execute_script(
+                "return arguments[0].scrollIntoView();", elements[index]
+            ),
         )
         self.selenium.execute_script("window.scrollBy(0, -" + str(scroll_val) + ");")
 
-    def select_random_index(self, card_locator=_FOCUS_TAG_LOCATOR):
-        card_list = self.get_page_elements(card_locator)
-        self.wait_it_out(1)
-        card_count = len(card_list)
+    def select_random_index(self, card_locator=PageCommon._FOCUS_TAG_LOCATOR):
+        card_count = len(self.wait_for_elements(card_locator))
         if card_count > 1:
             index = randint(0, card_count - 1)
         else:
             index = 0
         return index
 
-    def get_page_elements(self, locator=_FOCUS_TAG_LOCATOR):
-        WebDriverWait(self.selenium, self._timeout).until(
-            EC.presence_of_element_located(locator)
-        )
-        self.wait_it_out(2)
-        web_elements = self.selenium.find_elements(*locator)
-        return web_elements
+    def get_page_elements(self, locator=PageCommon._FOCUS_TAG_LOCATOR):
+        self.wait_for_page_quiet(legacy_sleep=2)
+        self.invalidate_element_cache(locator)
+        return self.get_cached_elements(locator)
 
-    def switch_to_new_window(self, wait_quantum=1, timeout=10):
+    def switch_to_new_window(
+            self, wait_quantum=PageCommon._MAX_POLL_INTERVAL, timeout=PageCommon._NEW_WINDOW_TIMEOUT
+    ):
+        """Wait (at most `timeout` seconds) for a second window and switch to it"""
         check_result = False
-        window_count = 0
-        window_wait = 0
         try:
-            while window_count < 2 or window_wait == timeout:
-                self.wait_it_out(wait_quantum)
-                window_wait += wait_quantum
-                window_count = len(self.selenium.window_handles)
-            if window_wait >= timeout:
-                check_result = False
-            else:
+            if self.wait_for_navigation(window_count=2, timeout=timeout, max_interval=wait_quantum):
+                self.invalidate_element_cache()
                 self.selenium.switch_to.window(self.selenium.window_handles[1])
                 check_result = True
         except AssertionError as exp:
@@ -364,6 +489,7 @@ class BasePageClass:
         check_result = False
         try:
             before_count = len(self.selenium.window_handles)
+            self.invalidate_element_cache()
             self.selenium.close()
             self.wait_it_out(3)
             self.selenium.switch_to.window(self.selenium.window_handles[0])
@@ -374,20 +500,13 @@ class BasePageClass:
             print("\n\nException : ", exp)
             return check_result
 
-    def check_page_element(self, locator=_LOCATOR, timeout=None):
+    def check_page_element(self, locator=PageCommon._LOCATOR, timeout=None):
         """Check to see if given WebElement is in place, present and visible"""
         check_result = False
         try:
-            if timeout is None:
-                timeout = self._timeout
-            WebDriverWait(self.selenium, timeout).until(
-                EC.presence_of_element_located(locator)
-            )
-            WebDriverWait(self.selenium, timeout).until(
-                EC.visibility_of_element_located(locator)
-            )
-            self.wait_it_out(3)
-            element = self.selenium.find_element(*locator)
+            self.get_cached_elements(locator, state="visible", timeout=timeout)
+            self.wait_for_page_quiet(legacy_sleep=3)
+            element = self.interact_with_element(locator, lambda elements: elements[0])
             if element is not None:
                 if element.tag_name is not None:
                     if element.text is not None:
@@ -400,12 +519,7 @@ class BasePageClass:
     def get_length_of_element(self, locator=None):
         """Generic function to get the count of occurrence of an element"""
         try:
-            WebDriverWait(self.selenium, self._timeout).until(
-                EC.presence_of_element_located(locator)
-            )
-            button_link = self.selenium.find_elements(*locator)
-            length_of_element = len(button_link)
-            return length_of_element
+            return len(self.wait_for_elements(locator))
         except Exception as e:
             print(e)
 
@@ -420,10 +534,12 @@ class BasePageClass:
     def close_one_given_window(self, number):
         handles = list(self.selenium.window_handles)
         self.wait_it_out(1)
+        self.invalidate_element_cache()
         self.selenium.switch_to.window(handles[int(number)])
         self.selenium.close()
 
     def close_current_page(self):
+        self.invalidate_element_cache()
         self.selenium.close()
         return self.selenium.switch_to.window(self.selenium.window_handles[0])
 
@@ -433,25 +549,16 @@ class BasePageClass:
         """Check if the Linked Page opens up in a New window"""
         check_result = False
         try:
-            # assert self.is_current_page
-            time.sleep(0.5)
             if index is None:
                 index = self.select_random_index(nw_link_locator)
-            time.sleep(3)
             self.click_on_element(nw_link_locator, index)
-            self.selenium.switch_to.window(self.selenium.window_handles[1])
-            time.sleep(2)
-            # print(self.selenium.current_url)
-            if self.check_for_new_url(required_string, interval=2):
-                self.wait_it_out(1)
-                check_result = True
-            else:
-                check_result = False
-            self.selenium.close()
-            self.selenium.switch_to.window(self.selenium.window_handles[0])
+            if not self.switch_to_new_window(timeout=self._NEW_WINDOW_TIMEOUT):
+                return check_result
+            check_result = bool(self.check_for_new_url(required_string))
+            self.close_current_page()
             return check_result
         except AssertionError as exception_case:
-            logging.debug("\nException : ", exception_case)
+            logging.debug("Exception : %s", exception_case)
 
     def click_on_action_button(self):  # Open action modal
         self.wait_it_out(5)
@@ -467,33 +574,66 @@ class BasePageClass:
         return True
 
     def get_the_status_code_for_current_link(self, current_link):
-        print("Status code for the link is = ", requests.get(current_link).status_code)
-        return requests.get(current_link)
+        response = link_checker.get_session().get(current_link)
+        print("Status code for the link is = ", response.status_code)
+        return response
+
+    def verify_links(self, locator=PageCommon._LINK_LOCATOR, concurrency=None, per_host_rate=None, timeout=None):
+        """Check every link matching `locator` in bulk without leaving the page.
+        The hrefs are read in one script call and requested concurrently over HTTP with the
+        browser's cookies, each sent only where the browser would send it; only links that need
+        JavaScript are clicked in the browser.
+        Returns one result dict per distinct target (see utils.link_checker.check_link)."""
+        concurrency, per_host_rate, timeout = self._link_check_settings(concurrency, per_host_rate, timeout)
+        links = self.snapshot_elements(locator, fields=(), attributes=("href", "onclick"))
+        cookies = self.selenium.get_cookies()
+        http_urls, browser_indices = self._split_links(links, self.selenium.current_url)
+        results = link_checker.check_links(http_urls, concurrency, per_host_rate, cookies, timeout)
+        return self._link_results(
+            results, [self._verify_link_in_browser(locator, index, cookies, timeout) for index in browser_indices]
+        )
+
+    def _verify_link_in_browser(self, locator, index, cookies, timeout):
+        """Click a JavaScript link, note where it leads (same tab or new window), come back
+        and check that target over HTTP."""
+        start_url = self.selenium.current_url
+        start_windows = len(self.selenium.window_handles)
+        self.click_on_element(locator, index)
+
+        def navigated():
+            return len(self.selenium.window_handles) > start_windows or self.selenium.current_url != start_url
+
+        if not self._poll_until(navigated, "link %s[%s] navigates" % (locator, index), self._JS_LINK_TIMEOUT):
+            return self._link_not_navigating(locator, index, start_url)
+        if len(self.selenium.window_handles) > start_windows:
+            self.switch_to_new_window(timeout=self._NEW_WINDOW_TIMEOUT)
+            target = self.selenium.current_url
+            self.close_current_page()
+        else:
+            target = self.selenium.current_url
+            self.click_on_browser_back_button()
+        result = link_checker.check_links([target], cookies=cookies, timeout=timeout)[0]
+        result["checked_by"] = "browser"
+        return result
 
     def select_value_from_list(self, locator=None, index=None):
         """Generic function for selecting value. (Range index version)"""
         click_result = False
-        WebDriverWait(self.selenium, self._timeout).until(
-            EC.presence_of_element_located(locator)
-        )
-        WebDriverWait(self.selenium, self._timeout).until(
-            EC.element_to_be_clickable(locator)
-        )
-        button_link = self.selenium.find_elements(*locator)
-        if index is None:
-            if len(button_link) > 1:
-                index = randint(0, len(button_link) - 1)
-            else:
-                index = 0
-        self.wait_it_out(0.5)
-        self.get_text_of_elements()
-        element = Select(self.selenium.find_element(*locator))
-        time.sleep(0.8)
-        element.select_by_index(index)
+        button_link = self.get_cached_elements(locator, state="clickable")
+        index = self._pick_index(button_link, index)
+
+        def select_option(elements):
+            select = Select(elements[0])
+            # The options may still be loading; the poll below waits for the one to select
+            if index >= len(select.options):
+                return False
+            select.select_by_index(index)
+            return True
+
+        if not self._poll_until(
+                lambda: self.interact_with_element(locator, select_option, state="clickable"),
+                "option %s of %s" % (index, locator),
+        ):
+            raise TimeoutException("Option %s not available: %s" % (index, locator))
         click_result = True
         return click_result
-
-    @staticmethod
-    def generate_string(i):
-        return ''.join(random.choices(string.ascii_uppercase +
-                                     string.digits, k=i))
\ No newline at end of file
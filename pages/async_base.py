@@ -0,0 +1,516 @@
+"""
+__________________________________________________
+Async Base Page: BasePageClass for asyncio tests
+__________________________________________________
+Every BasePageClass method has an awaitable counterpart of the same name, built on
+utils.async_webdriver, so one process can drive many browser sessions concurrently.
+Waits poll with asyncio.sleep and never block the event loop. The element cache,
+readiness counters, wait policy and locators are those of pages.common.PageCommon,
+shared with BasePageClass. click_on_action_button is left out (hovering needs the W3C
+actions API) and get_the_status_code_for_current_link is the synchronous one of BasePageClass.
+"""
+import asyncio
+import inspect
+import logging
+import time
+import urllib.parse
+from random import randint
+
+from selenium.common.exceptions import ElementNotInteractableException
+from selenium.common.exceptions import JavascriptException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+from pages import BasePageClass
+from pages import scripts
+from pages.common import PageCommon
+from utils import link_checker
+
+
+async def _result(value):
+    return await value if inspect.isawaitable(value) else value
+
+
+class AsyncBasePageClass(PageCommon):
+    get_the_status_code_for_current_link = BasePageClass.get_the_status_code_for_current_link
+
+    async def check_page_url(self, check_url, path=None):
+        logging.debug("URl is = %s", check_url)
+        url = urllib.parse.urljoin(check_url, path)
+        return await self.check_for_new_url(url)
+
+    async def go_to_page(self, link):
+        """Instructs webdriver make a GET request to the page URL.
+        Returns once the readiness condition of the session's wait policy holds.
+        """
+        self.invalidate_element_cache()
+        result = await self.selenium.get(link)
+        await self.wait_until_ready()
+        return result
+
+    async def wait_until_ready(self):
+        """Wait for the readiness condition of the wait policy after a navigation"""
+        ready_state = self.wait_policy.readiness_check()
+        ready = True
+        if ready_state is not None:
+            ready = await self.wait_for_navigation(ready_state=ready_state)
+        if self.wait_policy.readiness == "quiet":
+            ready = await self.wait_for_page_quiet() and ready
+        return ready
+
+    async def refresh(self):
+        self.invalidate_element_cache()
+        await self.selenium.refresh()
+
+    async def maximize(self):
+        await self.selenium.maximize_window()
+
+    async def go_to(self, path):
+        self.invalidate_element_cache()
+        await self.selenium.get(path)
+        await self.wait_until_ready()
+
+    async def get_current_url(self):
+        url = await self.selenium.current_url()
+        logging.debug(url)
+        return url
+
+    async def click_on_element(self, locator=None, index=None):
+        """Generic function for clicking elements. (Range index version)"""
+        await self.wait_for_page_quiet(legacy_sleep=0.5)
+        await self.interact_with_element(
+            locator, lambda elements: elements[self._pick_index(elements, index)].click(), state="clickable"
+        )
+        # A click may navigate or re-render the page
+        self.invalidate_element_cache()
+        return True
+
+    async def click_on_single_element(self, locator=None):
+        """Generic function for clicking elements. (Range index version)"""
+        await self.wait_for_page_quiet(legacy_sleep=0.5)
+        await self.interact_with_element(locator, lambda elements: elements[0].click(), state="clickable")
+        self.invalidate_element_cache()
+        return True
+
+    async def get_cached_elements(self, locator, state="present", timeout=None):
+        """Resolve `locator` once per page and reuse the elements afterwards.
+        On a cache miss, wait until the first match is "present", "visible" or "clickable"."""
+        elements = self._cached_elements(locator)
+        if elements:
+            return elements
+        found = []
+
+        async def elements_ready():
+            found[:] = await self.selenium.find_elements(*locator)
+            if not found:
+                return False
+            if state == "visible":
+                return await found[0].is_displayed()
+            if state == "clickable":
+                return await found[0].is_displayed() and await found[0].is_enabled()
+            return True
+
+        if not await self._poll_until(elements_ready, "%s elements %s" % (state, locator), timeout):
+            raise TimeoutException("Element not %s: %s" % (state, locator))
+        return self._cache_elements(locator, found)
+
+    async def interact_with_element(self, locator, action, state="present", timeout=None):
+        """Run `action(elements)` (a function or coroutine function) against the cached matches
+        of `locator`. If the cached references went stale, resolve them again and retry once."""
+        try:
+            return await _result(action(await self.get_cached_elements(locator, state, timeout)))
+        except (StaleElementReferenceException, ElementNotInteractableException):
+            self._count_stale(locator)
+            return await _result(action(await self.get_cached_elements(locator, state, timeout)))
+
+    async def check_for_new_url(
+            self, expected_url_string=PageCommon.EXIT_PATH_URL, interval=PageCommon._MAX_POLL_INTERVAL, max_limit=None
+    ):
+        """Generic Method to check until a new url is loaded, polling at most every `interval` seconds"""
+        if expected_url_string is None:
+            return False
+        check_result = await self.wait_for_navigation(
+            url_contains=expected_url_string,
+            ready_state="interactive",
+            timeout=max_limit,
+            max_interval=interval,
+        )
+        if not check_result:
+            logging.debug("We want URL : %s", expected_url_string)
+            logging.debug("We are now at URL : %s", await self.selenium.current_url())
+        return check_result
+
+    async def wait_for_navigation(
+            self,
+            url_contains=None,
+            ready_state=None,
+            window_count=None,
+            timeout=None,
+            max_interval=PageCommon._MAX_POLL_INTERVAL,
+    ):
+        """Wait until the URL contains `url_contains`, document.readyState has reached
+        `ready_state` and at least `window_count` windows are open (see BasePageClass)."""
+
+        async def navigation_done():
+            if window_count is not None and len(await self.selenium.window_handles()) < window_count:
+                return False
+            if url_contains is not None and url_contains not in str(await self.selenium.current_url()):
+                return False
+            if ready_state is not None:
+                state = await self.selenium.execute_script("return document.readyState;")
+                if state not in self._READY_STATES[ready_state]:
+                    return False
+            return True
+
+        label = self._navigation_label(url_contains, ready_state, window_count)
+        return await self._poll_until(navigation_done, label, timeout, max_interval)
+
+    async def wait_for_page_quiet(self, legacy_sleep=0.0, quiet_ms=None, timeout=None):
+        """Wait until the page has had no DOM mutation, pending fetch/XHR or running
+        animation for `quiet_ms` milliseconds (see BasePageClass.wait_for_page_quiet)."""
+        quiet_ms = self._quiet_window(quiet_ms)
+        if timeout is None:
+            timeout = self.quiet_timeout(legacy_sleep)
+        unsupported = []
+
+        async def page_quiet():
+            try:
+                return (await self.selenium.execute_script(scripts.QUIET_MONITOR, quiet_ms))["quiet"]
+            except JavascriptException as e:
+                unsupported.append(e)
+                return True
+
+        start = time.monotonic()
+        quiet = await self._poll_until(
+            page_quiet, "page quiet for %sms" % quiet_ms, timeout, max_interval=self._quiet_poll_interval(quiet_ms)
+        )
+        if unsupported:
+            logging.debug("Quiet monitor unavailable, sleeping instead: %s", unsupported[0])
+            await self.wait_it_out(legacy_sleep)
+        self._record_quiet_wait(quiet, legacy_sleep, time.monotonic() - start)
+        return quiet
+
+    async def _poll_until(self, condition, label, timeout=None, max_interval=PageCommon._MAX_POLL_INTERVAL):
+        """Await `condition()` with exponential backoff until it is truthy or the deadline passes.
+        The transient WebDriver errors of BasePageClass count as "not yet", others are raised."""
+        timeout, interval = self._poll_start(timeout, max_interval)
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            try:
+                result = bool(await condition())
+            except self._TRANSIENT_ERRORS:
+                result = False
+            remaining = deadline - time.monotonic()
+            if result or remaining <= 0:
+                break
+            await asyncio.sleep(min(interval, remaining))
+            interval = self._next_interval(interval, max_interval)
+        self._record_wait(label, time.monotonic() - start, result)
+        return result
+
+    async def get_text_of_elements(self, locator=PageCommon._FOCUS_TAG_LOCATOR):
+        """Returns list of text of element/s"""
+        snapshot = await self.wait_for_elements(locator, fields=("text",), visible=True)
+        return [elem["text"] for elem in snapshot]
+
+    async def snapshot_elements(self, locator=PageCommon._FOCUS_TAG_LOCATOR, fields=("text",), attributes=()):
+        """Read `fields` ("text", "visible", "rect") and `attributes` of every element
+        matching `locator` in one execute_script round trip."""
+        try:
+            return await self.selenium.execute_script(
+                scripts.SNAPSHOT_ELEMENTS, locator[0], locator[1], list(fields), list(attributes)
+            )
+        except WebDriverException as e:
+            logging.debug("Snapshot script failed, reading elements one by one: %s", e)
+        snapshot = []
+        for elem in await self.selenium.find_elements(*locator):
+            entry = {}
+            if "text" in fields:
+                entry["text"] = await elem.text()
+            if "visible" in fields:
+                entry["visible"] = await elem.is_displayed()
+            if "rect" in fields:
+                entry["rect"] = await elem.rect()
+            if attributes:
+                entry["attributes"] = {name: await elem.get_attribute(name) for name in attributes}
+            snapshot.append(entry)
+        return snapshot
+
+    async def wait_for_elements(
+            self, locator=PageCommon._FOCUS_TAG_LOCATOR, fields=(), attributes=(), visible=False, timeout=None
+    ):
+        """Wait until `locator` matches (and, with `visible`, its first match is displayed),
+        then return its snapshot. Raises TimeoutException when `timeout` runs out."""
+        fields = tuple(fields) + (("visible",) if visible and "visible" not in fields else ())
+        snapshot = []
+
+        async def elements_ready():
+            snapshot[:] = await self.snapshot_elements(locator, fields, attributes)
+            return snapshot and (not visible or snapshot[0]["visible"])
+
+        if not await self._poll_until(elements_ready, "elements %s" % (locator,), timeout):
+            raise TimeoutException("Element not ready: %s" % (locator,))
+        return snapshot
+
+    @classmethod
+    async def wait_it_out(cls, seconds=1.0):
+        await asyncio.sleep(seconds)
+        return True
+
+    async def enter_field_input(self, input_locator=PageCommon._FOCUS_TAG_LOCATOR, values="No Input", index=None):
+        """Generic Input function to enter passed values into field element"""
+        await self.wait_for_page_quiet(legacy_sleep=0.9)
+
+        async def type_value(elements):
+            field = elements[self._pick_index(elements, index)]
+            await field.send_keys(Keys.CONTROL + "a")
+            await field.send_keys(Keys.BACKSPACE)
+            await field.send_keys(str(values))
+
+        await self.interact_with_element(input_locator, type_value, state="visible")
+        return True
+
+    async def fill_form(self, fields, type_natively=(), timeout=None):
+        """Fill many form fields in one script call and verify their final values
+        (see BasePageClass.fill_form). Returns {locator: {"ok", "value", "error"}}."""
+        payload = self._form_payload(fields, type_natively)
+        probe = self._form_probe(payload)
+        results = None
+        partial_since = None
+
+        async def form_settled():
+            nonlocal results, partial_since
+            # Nothing is changed until every field is on the page
+            results = await self.selenium.execute_script(scripts.FILL_FORM, probe, True)
+            settled, partial_since = self._form_settled(results, len(probe), partial_since, time.monotonic())
+            return settled
+
+        await self._poll_until(form_settled, "form fields %s" % list(fields), timeout)
+        if probe is payload and isinstance(results, list):
+            return self._form_result(fields, results)
+        missing = self._missing_fields(results)
+        for position, field in enumerate(payload):
+            if field["verify_only"] and position not in missing:
+                await self.interact_with_element(
+                    (field["by"], field["value"]),
+                    lambda elements: elements[field["index"]].send_keys(
+                        Keys.CONTROL + "a" + Keys.NULL + Keys.BACKSPACE + str(field["text"])
+                    ),
+                    state="visible",
+                    timeout=timeout,
+                )
+        return self._form_result(fields, await self.selenium.execute_script(scripts.FILL_FORM, payload, False))
+
+    async def check_new_page(self, np_link_locator=None, required_string=None, index=None):
+        """Check if the Linked Page opens up in a New Tab"""
+        await self.click_on_element(np_link_locator, index)
+        if not await self.switch_to_new_window(timeout=self._NEW_WINDOW_TIMEOUT):
+            return False
+        await self.maximize()
+        return bool(await self.check_for_new_url(required_string))
+
+    async def check_fields_blank_error_message(self, locator, error_string):
+        error = await self.get_text_of_elements(locator)
+        logging.debug("error_text %s", error)
+        return self.convert_list_to_string(error) == error_string
+
+    async def get_attribute_of_elements(self, locator=PageCommon._FOCUS_TAG_LOCATOR, attribute_name="class"):
+        """Specialized function for getting attribute of elements."""
+        snapshot = await self.wait_for_elements(locator, attributes=(attribute_name,))
+        return [elem["attributes"][attribute_name] for elem in snapshot]
+
+    async def send_enter_keys_to_element(self, locator=None, index=None):
+        """Specialized function for clicking elements. (Range index Enter version)"""
+        await self.interact_with_element(
+            locator, lambda elements: elements[self._pick_index(elements, index)].send_keys(Keys.ENTER),
+            state="visible",
+        )
+        # Enter may submit a form
+        self.invalidate_element_cache()
+        return True
+
+    async def click_on_browser_back_button(self):
+        self.invalidate_element_cache()
+        await self.selenium.back()
+
+    async def check_same_page_link_works(
+            self, sp_link_locator=None, required_string="https://masaischool.com", index=None
+    ):
+        """Check if the Linked Page opens up in the Same Tab"""
+        await self.wait_for_navigation(ready_state="complete")
+        await self.click_on_element(sp_link_locator, index)
+        await self.selenium.switch_to_window(await self.selenium.current_window_handle())
+        check_result = bool(await self.check_for_new_url(required_string))
+        await self.click_on_browser_back_button()
+        logging.debug(check_result)
+        return check_result
+
+    async def check_new_page_link_works(self, np_link_locator=None, required_string=None, index=None):
+        """Check if the Linked Page opens up in a New Tab"""
+        await self.click_on_element(np_link_locator, index)
+        if not await self.switch_to_new_window(timeout=self._NEW_WINDOW_TIMEOUT):
+            return False
+        await self.maximize()
+        check_result = bool(await self.check_for_new_url(required_string))
+        await self.close_current_page()
+        logging.debug(check_result)
+        return check_result
+
+    async def check_element_is_clickable(self, locator=None, index=None):
+        async def clickable(elements):
+            if index is None:
+                return len(elements) > 1
+            if index >= len(elements):
+                return False
+            return await elements[index].is_displayed() and await elements[index].is_enabled()
+
+        return await self.interact_with_element(locator, clickable, state="clickable")
+
+    async def scroll_into_view(self, locator, index=0, scroll_val=150):
+        # check_page_element has already waited for the page to go quiet
+        await self.check_page_element(locator, timeout=25)
+        if index is None:
+            index = await self.select_random_index(locator)
+        await self.interact_with_element(
+            locator,
+            lambda elements: self.selenium.execute_script("return arguments[0].scrollIntoView();", elements[index]),
+        )
+        await self.selenium.execute_script("window.scrollBy(0, -" + str(scroll_val) + ");")
+
+    async def select_random_index(self, card_locator=PageCommon._FOCUS_TAG_LOCATOR):
+        card_count = len(await self.wait_for_elements(card_locator))
+        return randint(0, card_count - 1) if card_count > 1 else 0
+
+    async def get_page_elements(self, locator=PageCommon._FOCUS_TAG_LOCATOR):
+        await self.wait_for_page_quiet(legacy_sleep=2)
+        self.invalidate_element_cache(locator)
+        return await self.get_cached_elements(locator)
+
+    async def switch_to_new_window(
+            self, wait_quantum=PageCommon._MAX_POLL_INTERVAL, timeout=PageCommon._NEW_WINDOW_TIMEOUT
+    ):
+        """Wait (at most `timeout` seconds) for a second window and switch to it"""
+        if not await self.wait_for_navigation(window_count=2, timeout=timeout, max_interval=wait_quantum):
+            return False
+        self.invalidate_element_cache()
+        await self.selenium.switch_to_window((await self.selenium.window_handles())[1])
+        return True
+
+    async def switch_to_old_window(self):
+        before_count = len(await self.selenium.window_handles())
+        self.invalidate_element_cache()
+        await self.selenium.close()
+        await self.wait_it_out(3)
+        await self.selenium.switch_to_window((await self.selenium.window_handles())[0])
+        return before_count > len(await self.selenium.window_handles())
+
+    async def check_page_element(self, locator=PageCommon._LOCATOR, timeout=None):
+        """Check to see if given WebElement is in place, present and visible"""
+        try:
+            await self.get_cached_elements(locator, state="visible", timeout=timeout)
+            await self.wait_for_page_quiet(legacy_sleep=3)
+            element = await self.interact_with_element(locator, lambda elements: elements[0])
+            return await element.tag_name() is not None and await element.text() is not None
+        except WebDriverException as e:
+            logging.debug("Element %s not in place: %s", locator, e)
+            return False
+
+    async def get_length_of_element(self, locator=None):
+        """Generic function to get the count of occurrence of an element"""
+        try:
+            return len(await self.wait_for_elements(locator))
+        except Exception as e:
+            logging.debug(e)
+
+    async def scroll_to_down(self):
+        await (await self.selenium.find_element(By.TAG_NAME, "body")).send_keys(Keys.CONTROL + Keys.END)
+
+    async def scroll_to_top(self):
+        await (await self.selenium.find_element(By.TAG_NAME, "body")).send_keys(Keys.CONTROL + Keys.HOME)
+
+    async def close_one_given_window(self, number):
+        handles = list(await self.selenium.window_handles())
+        await self.wait_it_out(1)
+        self.invalidate_element_cache()
+        await self.selenium.switch_to_window(handles[int(number)])
+        await self.selenium.close()
+
+    async def close_current_page(self):
+        self.invalidate_element_cache()
+        await self.selenium.close()
+        await self.selenium.switch_to_window((await self.selenium.window_handles())[0])
+
+    async def check_new_window_link_works(self, nw_link_locator=None, required_string="masaischool", index=None):
+        """Check if the Linked Page opens up in a New window"""
+        if index is None:
+            index = await self.select_random_index(nw_link_locator)
+        await self.click_on_element(nw_link_locator, index)
+        if not await self.switch_to_new_window(timeout=self._NEW_WINDOW_TIMEOUT):
+            return False
+        check_result = bool(await self.check_for_new_url(required_string))
+        await self.close_current_page()
+        return check_result
+
+    async def verify_links(
+            self, locator=PageCommon._LINK_LOCATOR, concurrency=None, per_host_rate=None, timeout=None
+    ):
+        """Check every link matching `locator` in bulk without leaving the page
+        (see BasePageClass.verify_links). The HTTP checks run in a thread."""
+        concurrency, per_host_rate, timeout = self._link_check_settings(concurrency, per_host_rate, timeout)
+        links = await self.snapshot_elements(locator, fields=(), attributes=("href", "onclick"))
+        cookies = await self.selenium.get_cookies()
+        http_urls, browser_indices = self._split_links(links, await self.selenium.current_url())
+        results = await asyncio.to_thread(
+            link_checker.check_links, http_urls, concurrency, per_host_rate, cookies, timeout
+        )
+        return self._link_results(
+            results, [await self._verify_link_in_browser(locator, index, cookies, timeout) for index in browser_indices]
+        )
+
+    async def _verify_link_in_browser(self, locator, index, cookies, timeout):
+        """Click a JavaScript link, note where it leads, come back and check that target over HTTP."""
+        start_url = await self.selenium.current_url()
+        start_windows = len(await self.selenium.window_handles())
+        await self.click_on_element(locator, index)
+
+        async def navigated():
+            if len(await self.selenium.window_handles()) > start_windows:
+                return True
+            return await self.selenium.current_url() != start_url
+
+        if not await self._poll_until(navigated, "link %s[%s] navigates" % (locator, index), self._JS_LINK_TIMEOUT):
+            return self._link_not_navigating(locator, index, start_url)
+        if len(await self.selenium.window_handles()) > start_windows:
+            await self.switch_to_new_window(timeout=self._NEW_WINDOW_TIMEOUT)
+            target = await self.selenium.current_url()
+            await self.close_current_page()
+        else:
+            target = await self.selenium.current_url()
+            await self.click_on_browser_back_button()
+        result = (await asyncio.to_thread(link_checker.check_links, [target], cookies=cookies, timeout=timeout))[0]
+        result["checked_by"] = "browser"
+        return result
+
+    async def select_value_from_list(self, locator=None, index=None):
+        """Generic function for selecting value. (Range index version)"""
+        button_link = await self.get_cached_elements(locator, state="clickable")
+        index = self._pick_index(button_link, index)
+
+        async def select_option(elements):
+            options = await elements[0].find_elements(By.TAG_NAME, "option")
+            # The options may still be loading; the poll below waits for the one to select
+            if index >= len(options):
+                return False
+            await options[index].click()
+            return True
+
+        if not await self._poll_until(
+                lambda: self.interact_with_element(locator, select_option, state="clickable"),
+                "option %s of %s" % (index, locator),
+        ):
+            raise TimeoutException("Option %s not available: %s" % (index, locator))
+        return True
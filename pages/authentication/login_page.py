@@ -0,0 +1,52 @@
+import logging
+import os
+import urllib.parse
+
+import allure
+from selenium.webdriver.common.by import By
+
+from pages import BasePageClass
+
+
+class LoginPage(BasePageClass):
+    EXIT_PATH_URL = "/login/"
+    _EMAIL_INPUT_LOCATOR = (By.CSS_SELECTOR, 'input[type="email"], input[name="email"]')
+    _PASSWORD_INPUT_LOCATOR = (By.CSS_SELECTOR, 'input[type="password"]')
+    _SUBMIT_BUTTON_LOCATOR = (By.CSS_SELECTOR, 'button[type="submit"]')
+    # Only rendered for a signed-in user
+    _LOGGED_IN_LOCATOR = (By.CSS_SELECTOR, 'a[href*="logout"], button[class*="logout"], [class*="avatar"]')
+    _LOGIN_TIMEOUT = 30
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        # Read from the .env-<client>-<env> file loaded by the setup fixture
+        self.base_url = os.environ.get("BASE_URL", "https://masaischool.com")
+        self.email = os.environ.get("LOGIN_EMAIL")
+        self.password = os.environ.get("LOGIN_PASSWORD")
+
+    @allure.step("Log in through the login page")
+    def login(self, email=None, password=None):
+        """Log in through the UI and wait until the site shows the user as logged in"""
+        email = email or self.email
+        password = password or self.password
+        if not email or not password:
+            raise Exception(
+                f"LOGIN_EMAIL and LOGIN_PASSWORD must be set in .env-{self.client}-<env> or the environment"
+            )
+        self.go_to_page(urllib.parse.urljoin(self.base_url, self.EXIT_PATH_URL))
+        self.enter_field_input(self._EMAIL_INPUT_LOCATOR, email, index=0)
+        self.enter_field_input(self._PASSWORD_INPUT_LOCATOR, password, index=0)
+        self.click_on_single_element(self._SUBMIT_BUTTON_LOCATOR)
+        logged_in = self._poll_until(
+            lambda: self.EXIT_PATH_URL not in self.selenium.current_url and self.is_logged_in(),
+            "login accepted",
+            self._LOGIN_TIMEOUT,
+        )
+        logging.debug("Logged in as %s: %s", email, logged_in)
+        return logged_in
+
+    def is_logged_in(self):
+        """The page shows a signed-in user; a missing login link alone could also be an error page"""
+        return bool(self.snapshot_elements(self._LOGGED_IN_LOCATOR, fields=())) and not self.snapshot_elements(
+            self._LOGIN_BUTTON_LOCATOR, fields=()
+        )
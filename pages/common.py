@@ -0,0 +1,230 @@
+"""
+__________________________________________________
+What BasePageClass and AsyncBasePageClass share
+__________________________________________________
+The locators, wait settings and counters, and the logic that does not talk to the browser:
+the wait policy math, the bookkeeping of waits and of the element cache, and the payloads
+and results of the bulk scripts. The two page classes only differ in how they call the
+browser (blocking or awaited).
+"""
+import logging
+import random
+import string
+from random import randint
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchWindowException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
+
+from utils import link_checker
+from utils.wait_policy import DEFAULT_QUIET_WINDOW_MS
+from utils.wait_policy import DEFAULT_TIMEOUT
+from utils.wait_policy import policy_of
+
+
+class PageCommon:
+    EXIT_PATH_URL = ""
+    _timeout = DEFAULT_TIMEOUT
+    _FOCUS_TAG_LOCATOR = (By.CSS_SELECTOR, "body")
+    _LINK_LOCATOR = (By.CSS_SELECTOR, "a[href]")
+    _LOCATOR = (By.CSS_SELECTOR, 'div[class*="row"]')
+    _NEW_WINDOW_TIMEOUT = 10
+    _POLL_INTERVAL = 0.05
+    _MAX_POLL_INTERVAL = 0.5
+    _POLL_BACKOFF = 1.5
+    _QUIET_WINDOW_MS = DEFAULT_QUIET_WINDOW_MS
+    _QUIET_TIMEOUT = 5
+    # A quiet wait that replaces a fixed sleep gives up after this multiple of that sleep
+    _QUIET_TIMEOUT_FACTOR = 2
+    _JS_LINK_TIMEOUT = 5
+    # Once part of a form is on the page, fill_form gives its missing fields this long to show up
+    _MISSING_FIELD_TIMEOUT = 2
+    # Raised while a page re-renders, navigates or closes a window; polls retry them, not other errors
+    _TRANSIENT_ERRORS = (StaleElementReferenceException, NoSuchElementException, NoSuchWindowException)
+    # document.readyState values that satisfy wait_for_navigation(ready_state=...)
+    _READY_STATES = {"interactive": ("interactive", "complete"), "complete": ("complete",)}
+    # Shared by every page object of the run, sync or async; see wait_for_page_quiet
+    readiness_stats = {"waits": 0, "timeouts": 0, "fixed_sleep_seconds": 0.0, "waited_seconds": 0.0}
+    element_cache_stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def __init__(self, *args):
+        self.selenium = args[0]
+        self.client = pytest.current_client
+        self.wait_policy = policy_of(self.selenium)
+        self.last_wait_seconds = 0.0
+        self.wait_timings = []
+        self._element_cache = {}
+
+    @staticmethod
+    def _pick_index(elements, index):
+        """`index`, or a random one of `elements` when it is None"""
+        if index is None:
+            return randint(0, len(elements) - 1) if len(elements) > 1 else 0
+        return index
+
+    # ---- element cache
+
+    def _cached_elements(self, locator):
+        """The cached matches of `locator`, counted as a hit or a miss; None on a miss"""
+        elements = self._element_cache.get(locator)
+        if elements:
+            self.element_cache_stats["hits"] += 1
+            return elements
+        self.element_cache_stats["misses"] += 1
+        return None
+
+    def _cache_elements(self, locator, elements):
+        self._element_cache[locator] = list(elements)
+        return self._element_cache[locator]
+
+    def _count_stale(self, locator):
+        self.element_cache_stats["stale"] += 1
+        self.invalidate_element_cache(locator)
+
+    def invalidate_element_cache(self, locator=None):
+        """Forget the cached elements of `locator`, or of every locator after navigation."""
+        if locator is None:
+            self._element_cache.clear()
+        else:
+            self._element_cache.pop(locator, None)
+
+    # ---- wait policy
+
+    @classmethod
+    def quiet_timeout(cls, legacy_sleep):
+        """How long a quiet wait replacing a fixed sleep of `legacy_sleep` seconds may take"""
+        if not legacy_sleep:
+            return cls._QUIET_TIMEOUT
+        return min(cls._QUIET_TIMEOUT, cls._QUIET_TIMEOUT_FACTOR * legacy_sleep)
+
+    def _quiet_window(self, quiet_ms):
+        """`quiet_ms`, or the --quiet-window option when it is None"""
+        return getattr(pytest, "quiet_window", self._QUIET_WINDOW_MS) if quiet_ms is None else quiet_ms
+
+    @staticmethod
+    def _quiet_poll_interval(quiet_ms):
+        return max(quiet_ms / 2000.0, 0.05)
+
+    def _poll_start(self, timeout, max_interval):
+        """(timeout, first interval) of a poll under the session's wait policy"""
+        timeout = self.wait_policy.timeout if timeout is None else float(timeout)
+        return timeout, min(self.wait_policy.poll_interval, max_interval)
+
+    def _next_interval(self, interval, max_interval):
+        return min(interval * self._POLL_BACKOFF, max_interval)
+
+    def _record_wait(self, label, seconds, result):
+        self.last_wait_seconds = seconds
+        self.wait_timings.append((label, seconds, result))
+        logging.debug("Waited %.3fs for %s (matched=%s)", seconds, label, result)
+
+    def _record_quiet_wait(self, quiet, legacy_sleep, seconds):
+        stats = self.readiness_stats
+        stats["waits"] += 1
+        if not quiet:
+            stats["timeouts"] += 1
+        stats["fixed_sleep_seconds"] += legacy_sleep
+        stats["waited_seconds"] += seconds
+
+    @staticmethod
+    def _navigation_label(url_contains, ready_state, window_count):
+        return "url=%s ready_state=%s window_count=%s" % (url_contains, ready_state, window_count)
+
+    # ---- bulk scripts
+
+    @staticmethod
+    def _form_payload(fields, type_natively):
+        """The FILL_FORM script's field list; fields typed natively are only verified by it"""
+        payload = []
+        for locator, value in fields.items():
+            payload.append({
+                "by": locator[0], "value": locator[1], "index": locator[2] if len(locator) > 2 else 0,
+                "text": value, "verify_only": locator in type_natively,
+            })
+        return payload
+
+    @staticmethod
+    def _form_probe(payload):
+        """What fill_form polls with: the payload itself, or, when fields have to be typed
+        first, a copy that changes nothing and only tells whether every field is there"""
+        if not any(field["verify_only"] for field in payload):
+            return payload
+        return [dict(field, verify_only=True) for field in payload]
+
+    def _form_settled(self, results, field_count, partial_since, now):
+        """(stop polling?, partial_since) for one FILL_FORM poll that ran at `now`: stop once
+        every field is there, or _MISSING_FIELD_TIMEOUT seconds after the first poll that
+        found only some of them (`partial_since`), so a wrong locator fails fast"""
+        if isinstance(results, list):
+            return True, partial_since
+        if len(results["missing"]) == field_count:
+            return False, None
+        if partial_since is None:
+            partial_since = now
+        return now - partial_since >= self._MISSING_FIELD_TIMEOUT, partial_since
+
+    @staticmethod
+    def _missing_fields(results):
+        return set(results["missing"]) if isinstance(results, dict) else set()
+
+    @staticmethod
+    def _form_result(fields, results):
+        fill_result = dict(zip(fields, results))
+        for locator, result in fill_result.items():
+            if not result["ok"]:
+                logging.debug("Could not fill %s: %s", locator, result["error"])
+        return fill_result
+
+    @staticmethod
+    def _link_check_settings(concurrency, per_host_rate, timeout):
+        """(concurrency, per-host rate, timeout) of verify_links, defaulting to the run's options"""
+        return (
+            concurrency or getattr(pytest, "link_concurrency", link_checker.DEFAULT_CONCURRENCY),
+            per_host_rate or getattr(pytest, "link_host_rate", link_checker.DEFAULT_HOST_RATE),
+            timeout or link_checker.DEFAULT_TIMEOUT,
+        )
+
+    @staticmethod
+    def _split_links(links, page_url):
+        """(hrefs to check over HTTP, indices of the links that have to be clicked)"""
+        http_urls = []
+        browser_indices = []
+        for index, link in enumerate(links):
+            href = link["attributes"]["href"]
+            if link_checker.needs_browser(href, link["attributes"]["onclick"], page_url):
+                browser_indices.append(index)
+            else:
+                http_urls.append(href)
+        return http_urls, browser_indices
+
+    @staticmethod
+    def _link_results(http_results, browser_results):
+        for result in http_results:
+            result["checked_by"] = "http"
+        results = list(http_results) + list(browser_results)
+        broken = [result["url"] for result in results if not result["ok"]]
+        logging.debug("Verified %d links, broken: %s", len(results), broken)
+        return results
+
+    @staticmethod
+    def _link_not_navigating(locator, index, start_url):
+        return {
+            "url": "%s[%s]" % (locator, index), "status": None, "final_url": start_url, "redirects": [],
+            "seconds": 0.0, "error": "Link did not navigate", "ok": False, "checked_by": "browser",
+        }
+
+    # ---- helpers
+
+    def convert_list_to_string(self, list):
+        return "".join(list)
+
+    @staticmethod
+    def generate_string(i):
+        """Uppercase/digit string of length `i` from the run's seeded test data pool"""
+        data_pool = getattr(pytest, "data_pool", None)
+        if data_pool is not None:
+            return data_pool.string(i)
+        return ''.join(random.choices(string.ascii_uppercase +
+                                     string.digits, k=i))
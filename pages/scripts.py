@@ -0,0 +1,279 @@
+"""
+__________________________________________________
+JavaScript snippets executed in the page by BasePageClass
+__________________________________________________
+"""
+
+# Resolves a Selenium (By, value) locator inside the page.
+# Usage: locateElements(by, value) -> Array of elements
+LOCATE_ELEMENTS = """
+function locateElements(by, value) {
+    var root = document;
+    var found = [];
+    var i;
+    if (by === "css selector") {
+        return Array.prototype.slice.call(root.querySelectorAll(value));
+    }
+    if (by === "xpath") {
+        var result = document.evaluate(value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (i = 0; i < result.snapshotLength; i++) {
+            found.push(result.snapshotItem(i));
+        }
+        return found;
+    }
+    if (by === "id") {
+        return Array.prototype.slice.call(root.querySelectorAll('[id="' + value.replace(/"/g, '\\\\"') + '"]'));
+    }
+    if (by === "name") {
+        return Array.prototype.slice.call(root.getElementsByName(value));
+    }
+    if (by === "tag name") {
+        return Array.prototype.slice.call(root.getElementsByTagName(value));
+    }
+    if (by === "class name") {
+        return Array.prototype.slice.call(root.getElementsByClassName(value));
+    }
+    if (by === "link text" || by === "partial link text") {
+        var links = root.getElementsByTagName("a");
+        for (i = 0; i < links.length; i++) {
+            var text = (links[i].innerText || links[i].textContent || "").trim();
+            if (by === "link text" ? text === value : text.indexOf(value) !== -1) {
+                found.push(links[i]);
+            }
+        }
+        return found;
+    }
+    throw new Error("Unsupported locator strategy: " + by);
+}
+"""
+
+# Reads the requested fields and attributes of every element matching a locator.
+# Arguments: by, value, fields (subset of "text", "visible", "rect"), attribute names.
+SNAPSHOT_ELEMENTS = LOCATE_ELEMENTS + """
+function isVisible(el) {
+    if (!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)) {
+        return false;
+    }
+    var style = window.getComputedStyle(el);
+    return style.visibility !== "hidden" && style.opacity !== "0";
+}
+function readAttribute(el, name) {
+    if (name === "class") {
+        return el.getAttribute("class");
+    }
+    var prop = el[name];
+    if (typeof prop === "boolean") {
+        return prop ? "true" : null;
+    }
+    if (prop !== undefined && prop !== null && typeof prop !== "object" && typeof prop !== "function") {
+        return String(prop);
+    }
+    return el.getAttribute(name);
+}
+var fields = arguments[2] || [];
+var attributes = arguments[3] || [];
+return locateElements(arguments[0], arguments[1]).map(function (el) {
+    var visible = isVisible(el);
+    var snapshot = {};
+    if (fields.indexOf("text") !== -1) {
+        snapshot.text = visible ? (el.innerText || "").trim() : "";
+    }
+    if (fields.indexOf("visible") !== -1) {
+        snapshot.visible = visible;
+    }
+    if (fields.indexOf("rect") !== -1) {
+        var rect = el.getBoundingClientRect();
+        snapshot.rect = {x: rect.x, y: rect.y, width: rect.width, height: rect.height};
+    }
+    if (attributes.length) {
+        snapshot.attributes = {};
+        attributes.forEach(function (name) {
+            snapshot.attributes[name] = readAttribute(el, name);
+        });
+    }
+    return snapshot;
+});
+"""
+
+# Installs (once per document) a monitor of DOM mutations, in-flight fetch/XHR
+# requests and running animations, then reports whether the page has been
+# quiet for at least arguments[0] milliseconds.
+QUIET_MONITOR = """
+var quietMs = arguments[0];
+var monitor = window.__levelupQuietMonitor;
+if (!monitor) {
+    monitor = window.__levelupQuietMonitor = {lastActivity: 0, pending: 0};
+    var touch = function () {
+        monitor.lastActivity = Date.now();
+    };
+    var settled = function () {
+        monitor.pending--;
+        touch();
+    };
+    var loadedAt = performance.timeOrigin || performance.timing.navigationStart;
+    performance.getEntriesByType("resource").concat(performance.getEntriesByType("navigation")).forEach(function (entry) {
+        monitor.lastActivity = Math.max(monitor.lastActivity, loadedAt + entry.responseEnd);
+    });
+    new MutationObserver(touch).observe(document.documentElement || document, {
+        childList: true, subtree: true, attributes: true, characterData: true
+    });
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            monitor.pending++;
+            touch();
+            return originalFetch.apply(this, arguments).then(function (response) {
+                settled();
+                return response;
+            }, function (error) {
+                settled();
+                throw error;
+            });
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        monitor.pending++;
+        touch();
+        this.addEventListener("loadend", settled);
+        return originalSend.apply(this, arguments);
+    };
+}
+var animations = 0;
+if (document.getAnimations) {
+    document.getAnimations().forEach(function (animation) {
+        var timing = animation.effect && animation.effect.getTiming ? animation.effect.getTiming() : {};
+        if (animation.playState === "running" && timing.iterations !== Infinity) {
+            animations++;
+        }
+    });
+}
+var idle = Date.now() - monitor.lastActivity;
+return {
+    quiet: document.readyState !== "loading" && monitor.pending <= 0 && animations === 0 && idle >= quietMs,
+    idle_ms: idle,
+    pending: monitor.pending,
+    animations: animations
+};
+"""
+
+# Copies of localStorage and sessionStorage as plain objects.
+READ_STORAGE = """
+var copy = function (storage) {
+    var items = {};
+    for (var i = 0; i < storage.length; i++) {
+        items[storage.key(i)] = storage.getItem(storage.key(i));
+    }
+    return items;
+};
+return {local: copy(window.localStorage), session: copy(window.sessionStorage)};
+"""
+
+# Writes arguments[0] into localStorage and arguments[1] into sessionStorage.
+WRITE_STORAGE = """
+var fill = function (storage, items) {
+    Object.keys(items || {}).forEach(function (key) {
+        storage.setItem(key, items[key]);
+    });
+};
+fill(window.localStorage, arguments[0]);
+fill(window.sessionStorage, arguments[1]);
+"""
+
+# Sets many form fields in one call, the way a user edit would look to the page's scripts.
+# Arguments: a list of {by, value, index, text, verify_only} and whether every field must
+# be present before anything is changed.
+# Text inputs get their value through the native value setter (so framework value
+# trackers notice the change) followed by focus, input, change and blur events. A select
+# takes a number as an option index and a string as an option value or label;
+# checkboxes and radios take a boolean. Every field's final value is read back.
+# Returns {missing: [positions]} when fields are missing and arguments[1] is true,
+# otherwise one {ok, value, error} per field.
+FILL_FORM = LOCATE_ELEMENTS + """
+var fields = arguments[0];
+var requireAll = arguments[1];
+var targets = fields.map(function (field) {
+    var found = locateElements(field.by, field.value);
+    return found[field.index || 0] || null;
+});
+var missing = [];
+targets.forEach(function (el, position) {
+    if (el === null) {
+        missing.push(position);
+    }
+});
+if (requireAll && missing.length) {
+    return {missing: missing};
+}
+function fire(el, type, bubbles) {
+    el.dispatchEvent(new Event(type, {bubbles: bubbles}));
+}
+function nativeSetter(el, name) {
+    var proto = Object.getPrototypeOf(el);
+    while (proto) {
+        var descriptor = Object.getOwnPropertyDescriptor(proto, name);
+        if (descriptor && descriptor.set) {
+            return descriptor.set;
+        }
+        proto = Object.getPrototypeOf(proto);
+    }
+    return null;
+}
+function isCheckable(el) {
+    return el.tagName === "INPUT" && (el.type === "checkbox" || el.type === "radio");
+}
+function currentValue(el) {
+    if (isCheckable(el)) {
+        return el.checked;
+    }
+    return el.value;
+}
+function optionIndex(el, wanted) {
+    if (typeof wanted === "number") {
+        return wanted < el.options.length ? wanted : -1;
+    }
+    for (var i = 0; i < el.options.length; i++) {
+        var option = el.options[i];
+        if (option.value === String(wanted) || (option.text || "").trim() === String(wanted)) {
+            return i;
+        }
+    }
+    return -1;
+}
+return fields.map(function (field, position) {
+    var el = targets[position];
+    if (el === null) {
+        return {ok: false, value: null, error: "not found"};
+    }
+    var wanted = field.text;
+    if (!field.verify_only) {
+        if (el.disabled || el.readOnly) {
+            return {ok: false, value: currentValue(el), error: "not editable"};
+        }
+        fire(el, "focus", false);
+        fire(el, "focusin", true);
+        if (el.tagName === "SELECT") {
+            var index = optionIndex(el, wanted);
+            if (index === -1) {
+                return {ok: false, value: el.value, error: "no option " + wanted};
+            }
+            nativeSetter(el, "selectedIndex").call(el, index);
+        } else if (isCheckable(el)) {
+            nativeSetter(el, "checked").call(el, Boolean(wanted));
+        } else {
+            nativeSetter(el, "value").call(el, String(wanted));
+        }
+        fire(el, "input", true);
+        fire(el, "change", true);
+        fire(el, "blur", false);
+        fire(el, "focusout", true);
+    }
+    var value = currentValue(el);
+    var expected = isCheckable(el) ? Boolean(wanted) : String(wanted);
+    if (el.tagName === "SELECT") {
+        var option = el.options[optionIndex(el, wanted)];
+        expected = option ? option.value : expected;
+    }
+    return {ok: value === expected, value: value, error: value === expected ? null : "value is " + value};
+});
+"""
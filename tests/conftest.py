@@ -5,38 +5,61 @@ Capture screenshot for failed test cases
 Attach screenshot to the allure report
 python add_option function which help the user to choose the browser at the run time
 """
+import time
+
+CONFTEST_IMPORT_START = time.perf_counter()
+
 import logging
 import os
+import random
+import uuid
+import warnings
+
+import pytest
 
 from config import (
     BASE_DIR,
+    STAND_IN,
     BrowserEnum,
+    BrowserProfileEnum,
     ClientEnum,
     EnvironmentEnum,
     LoggingLevelEnum,
+    PageLoadStrategyEnum,
 )
 
-
-import time
-from datetime import datetime
-
-import allure
-import pytest
-
-from allure_commons.types import AttachmentType
-from dotenv import find_dotenv
-from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.firefox.service import Service as FirefoxService
-from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.webdriver.safari.service import Service as SafariService
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.firefox import GeckoDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
+# Selenium, the page objects and the plugins built on them are imported where they are used, so only
+# processes that run tests load them (not --collect-only, not the xdist controller)
+from utils import worker_stats
+from utils.driver_cache import DEFAULT_CACHE_DIR
+from utils.driver_cache import resolve_driver_binary
+from utils import command_profiler
+from utils import duration_scheduler
+from utils import startup_timing
+from utils import replay_proxy
+from utils import reruns
+from utils import async_tests
+from utils import worker_sizing
+from utils.test_data import DataPool
+from utils.test_data import prune_seeds
+from utils.wait_policy import DEFAULT_QUIET_WINDOW_MS
+from utils.wait_policy import DEFAULT_TIMEOUT
+from utils.wait_policy import READINESS_CONDITIONS
+from utils.wait_policy import WaitPolicy
+
+CONFTEST_IMPORT_SECONDS = time.perf_counter() - CONFTEST_IMPORT_START
 
 driver = None
+driver_pool = None
+screenshot_writer = None
+flight_recorder = None
+auth_session = None
+remote_browsers = None
+stand_in_grid = None
+# Published by the processes that run tests; the controller and --collect-only get them empty
+TEST_PROCESS_STATS = (
+    "readiness", "element_cache", "auth_state", "webdriver_commands", "browser_profiles", "async_tests", "step_timing"
+)
 
 
 def pytest_addoption(parser):
@@ -48,6 +71,51 @@ def pytest_addoption(parser):
         help=f"Choose from: {','.join([e.value[0] for e in BrowserEnum])}.",
     )
 
+    # Accept a W3C endpoint (Selenium Grid) browsers run on, or "stand-in" for a local stand-in grid
+    parser.addoption(
+        "--browser-url",
+        action="store",
+        default=None,
+        help=f"Remote WebDriver URL, or {STAND_IN} to start a local stand-in grid",
+    )
+
+    # Accept how long a remote session request may wait for a free grid slot
+    parser.addoption(
+        "--remote-session-timeout", action="store", type=float, default=300,
+        help="Seconds to keep retrying a session the grid refuses"
+    )
+
+    # Accept the keep-alive connections each worker keeps to the grid (0 = one per browser it holds, plus one)
+    parser.addoption(
+        "--remote-pool-size", action="store", type=int, default=0, help="Keep-alive connections per worker"
+    )
+
+    # Accept the session slots and command latency of the stand-in grid
+    parser.addoption(
+        "--stand-in-sessions", action="store", type=int, default=8, help="Session slots of the stand-in grid"
+    )
+    parser.addoption(
+        "--stand-in-latency-ms", action="store", type=float, default=0, help="Delay per command on the stand-in grid"
+    )
+
+    # Accept the system memory use (in %) above which workers hold back their next test (0 = never)
+    parser.addoption(
+        "--memory-pressure", action="store", type=float, default=90, help="Memory use that pauses new tests"
+    )
+
+    # Accept how many browser sessions each worker's async tests may hold at once
+    parser.addoption(
+        "--async-sessions", action="store", type=int, default=4, help="Concurrent sessions per worker for async tests"
+    )
+
+    # Accept which resources the browser loads (tests can override with the browser_profile marker)
+    parser.addoption(
+        "--browser-profile",
+        action="store",
+        default=BrowserProfileEnum.FULL.value[0],
+        help=f"Choose from: {','.join([e.value[0] for e in BrowserProfileEnum])}",
+    )
+
     # Accept which client to run for.
     parser.addoption(
         "--client",
@@ -77,12 +145,449 @@ def pytest_addoption(parser):
         "--headless", action="store", default="false", help=f"Choose from: true, false"
     )
 
+    # Accept how long (in ms) the page must stay idle before an action goes ahead
+    parser.addoption(
+        "--quiet-window",
+        action="store",
+        type=int,
+        default=DEFAULT_QUIET_WINDOW_MS,
+        help="Milliseconds without DOM mutations, pending requests or animations that count as ready",
+    )
+
+    # Accept when driver.get() hands back control: after load, after DOMContentLoaded or at once
+    parser.addoption(
+        "--page-load-strategy",
+        action="store",
+        default=PageLoadStrategyEnum.NORMAL.value[0],
+        help=f"Choose from: {','.join([e.value[0] for e in PageLoadStrategyEnum])}",
+    )
+
+    # Accept what go_to_page waits for after a navigation (default: what the page-load strategy gives)
+    parser.addoption(
+        "--readiness",
+        action="store",
+        default=None,
+        help=f"Choose from: {','.join(READINESS_CONDITIONS)}",
+    )
+
+    # Accept the implicit wait in seconds (0 keeps every wait explicit)
+    parser.addoption(
+        "--implicit-wait", action="store", type=float, default=0, help="Seconds element lookups may block"
+    )
+
+    # Accept the timeout in seconds of explicit waits
+    parser.addoption(
+        "--wait-timeout",
+        action="store",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="Seconds before an explicit wait gives up",
+    )
+
+    # Accept whether to keep a standby browser warm for crash recovery and recycling
+    parser.addoption(
+        "--standby-browser", action="store", default="true", help="Choose from: true, false"
+    )
+
+    # Accept after how many tests a browser is replaced (0 = never)
+    parser.addoption(
+        "--recycle-after", action="store", type=int, default=0, help="Replace the browser after this many tests"
+    )
+
+    # Accept the browser memory limit (in MB) that triggers a replacement (0 = no limit)
+    parser.addoption(
+        "--recycle-rss-mb", action="store", type=int, default=0, help="Replace the browser above this RSS"
+    )
+
+    # Accept where WebDriver binaries are cached for every worker on this machine
+    parser.addoption(
+        "--driver-cache", action="store", default=DEFAULT_CACHE_DIR, help="Shared WebDriver binary cache directory"
+    )
+
+    # Accept if drivers must come from the cache only (air-gapped machines)
+    parser.addoption(
+        "--offline-drivers", action="store", default="false", help="Choose from: true, false"
+    )
+
+    # Accept the width failure screenshots are downscaled to (0 = keep original size)
+    parser.addoption(
+        "--screenshot-max-width", action="store", type=int, default=0, help="Downscale screenshots to this width"
+    )
+
+    # Accept the JPEG quality failure screenshots are recompressed with (0 = keep PNG)
+    parser.addoption(
+        "--screenshot-jpeg-quality", action="store", type=int, default=0, help="Store screenshots as JPEG"
+    )
+
+    # Accept how many WebDriver commands and page steps are kept for failure reports (0 = off)
+    parser.addoption(
+        "--flight-recorder-size", action="store", type=int, default=200,
+        help="Commands, steps and console entries kept in memory and dumped when a test fails"
+    )
+
+    # Accept where to write the WebDriver command trace (Chrome trace-event format)
+    parser.addoption(
+        "--webdriver-trace", action="store", default=None, help="Write a Chrome trace of all WebDriver commands"
+    )
+
+    # Accept if every page object step should be timed
+    parser.addoption(
+        "--step-timing", action="store", default="false", help="Choose from: true, false"
+    )
+
+    # Accept how many links verify_links may check at the same time
+    parser.addoption(
+        "--link-concurrency", action="store", type=int, default=8, help="Concurrent HTTP link checks"
+    )
+
+    # Accept how many link checks per second may hit the same host
+    parser.addoption(
+        "--link-host-rate", action="store", type=float, default=10.0, help="Link checks per second per host"
+    )
+
+    # Accept where logged-in browser state is shared between workers and runs
+    parser.addoption(
+        "--auth-state-dir", action="store", default=os.path.join(BASE_DIR, ".auth-state"),
+        help="Directory for the cookie/storage snapshots of a logged-in session"
+    )
+
+    # Accept after how many seconds a stored login is no longer trusted
+    parser.addoption(
+        "--auth-max-age", action="store", type=int, default=3600, help="Seconds a stored login stays valid"
+    )
+
+    # Accept how many times a failed test is rerun on a fresh browser after the main pass
+    parser.addoption(
+        "--reruns", action="store", type=int, default=0, help="Rerun attempts per failed test (0 = no reruns)"
+    )
+
+    # Accept how long (in seconds) each worker may spend rerunning failed tests
+    parser.addoption(
+        "--rerun-budget", action="store", type=float, default=600, help="Seconds per worker for reruns (0 = no limit)"
+    )
+
+    # Accept the flake rate over recent runs above which a test is quarantined (0 = never)
+    parser.addoption(
+        "--quarantine-flake-rate", action="store", type=float, default=0.5,
+        help="Run tests this flaky as non-strict xfail"
+    )
+
+    # Accept if xdist should hand out tests longest-first using recorded durations
+    parser.addoption(
+        "--schedule-by-duration", action="store", default="true", help="Choose from: true, false"
+    )
+
+    # Accept if the browser's HTTP traffic is recorded to or replayed from an archive
+    parser.addoption(
+        "--replay",
+        action="store",
+        default=replay_proxy.OFF,
+        help=f"Choose from: {','.join(replay_proxy.MODES)}",
+    )
+
+    # Accept which replayable marker groups go through the archive (all = every marked test)
+    parser.addoption(
+        "--replay-groups", action="store", default=replay_proxy.ALL_GROUPS, help="Comma separated marker groups"
+    )
+
+    # Accept where the record/replay archives are kept
+    parser.addoption(
+        "--replay-dir", action="store", default=os.path.join(BASE_DIR, "recordings"),
+        help="Directory of the per client/env HAR archives"
+    )
+
+    # Accept query parameters left out when matching recorded requests (* = the whole query)
+    parser.addoption(
+        "--replay-ignore-query", action="store", default="", help="Comma separated query parameters"
+    )
+
+    # Accept body fields left out when matching recorded requests (* = the whole body)
+    parser.addoption(
+        "--replay-ignore-body", action="store", default="", help="Comma separated JSON or form fields"
+    )
+
+    # Accept the seed test data is generated from (default: a new one per run, shown in the header)
+    parser.addoption(
+        "--data-seed", action="store", type=int, default=None, help="Reproduce the test data of an earlier run"
+    )
+
+    # Accept where generated test data batches are kept
+    parser.addoption(
+        "--data-dir", action="store", default=os.path.join(BASE_DIR, ".test-data"),
+        help="Directory of the generated test data pool"
+    )
+
+    # Accept a directory of HTML fixtures for --browser=fake (default: the benchmark fixture site)
+    parser.addoption(
+        "--fake-site", action="store", default=None, help="Directory the fake browser serves pages from"
+    )
+
+
+def runs_tests(config):
+    """False for --collect-only and for the xdist controller, whose workers run the tests"""
+    if config.getoption("collectonly"):
+        return False
+    if hasattr(config, "workerinput"):
+        return True
+    return config.getoption("dist", "no") == "no" or not config.getoption("tx", None)
+
+
+def pytest_configure(config):
+    global remote_browsers, stand_in_grid
+    # Workers get the controller's seed, so one number reproduces the data of every worker
+    workerinput = getattr(config, "workerinput", {})
+    config.data_seed = workerinput.get("data_seed", config.getoption("data_seed"))
+    if config.data_seed is None:
+        config.data_seed = random.randrange(10 ** 6)
+    if not workerinput:
+        # Before any worker starts: only the batches of the last few seeds are kept
+        prune_seeds(config.getoption("data_dir"), config.data_seed)
+    # Once per process: a rerun sets the session fixtures up again, but must not hand out the same data twice
+    pytest.data_pool = DataPool(config.getoption("data_dir"), config.data_seed, os.environ.get("PYTEST_XDIST_WORKER"))
+    # ... and the controller's grid, so one stand-in grid serves every worker
+    config.browser_url = workerinput.get("browser_url", config.getoption("browser_url"))
+    # ... and the controller's run id, which names the parts of the --webdriver-trace file
+    config.run_id = workerinput.get("run_id") or uuid.uuid4().hex[:12]
+
+    stats = worker_stats.WorkerStatsPlugin(config)
+    config.pluginmanager.register(stats, worker_stats.WorkerStatsPlugin.name)
+    for key in TEST_PROCESS_STATS:
+        stats.add_source(key, dict)
+
+    if config.browser_url and not config.getoption("collectonly"):
+        from utils import remote_driver
+
+        if config.browser_url == STAND_IN:
+            stand_in_grid, config.browser_url = remote_driver.start_stand_in_grid(
+                config.getoption("stand_in_sessions"), config.getoption("stand_in_latency_ms")
+            )
+        sessions = remote_driver.sessions_per_worker(config.getoption("standby_browser") == "true")
+        remote_browsers = remote_driver.RemoteBrowserFactory(
+            config.browser_url,
+            config.getoption("remote_pool_size") or sessions + 1,
+            session_timeout=config.getoption("remote_session_timeout"),
+        )
+        stats.add_source("remote_browsers", remote_browsers.summary)
+
+    startup = startup_timing.StartupTimingPlugin(config, CONFTEST_IMPORT_SECONDS)
+    config.pluginmanager.register(startup, startup_timing.StartupTimingPlugin.name)
+    stats.add_source("startup", startup.summary)
+
+    if config.getoption("replay") in (replay_proxy.RECORD, replay_proxy.REPLAY):
+        replay = replay_proxy.ReplayPlugin(config)
+        config.pluginmanager.register(replay, replay_proxy.ReplayPlugin.name)
+        stats.add_source("replay", replay.summary)
+
+    rerun_stage = reruns.RerunPlugin(
+        config,
+        lambda: driver_pool.swap("rerun of a failed test") if driver_pool is not None and driver_pool.started else None,
+    )
+    config.pluginmanager.register(rerun_stage, reruns.RerunPlugin.name)
+
+    sizing = worker_sizing.WorkerSizingPlugin(
+        config, lambda: driver_pool.browser_processes() if driver_pool is not None else []
+    )
+    config.pluginmanager.register(sizing, worker_sizing.WorkerSizingPlugin.name)
+    stats.add_source("worker_sizing", sizing.summary)
+
+    if config.getoption("schedule_by_duration") == "true":
+        scheduler = duration_scheduler.DurationSchedulerPlugin(config)
+        config.pluginmanager.register(scheduler, duration_scheduler.DurationSchedulerPlugin.name)
+
+    if runs_tests(config):
+        configure_test_plugins(config, stats)
+
+
+def configure_test_plugins(config, stats):
+    """The plugins that drive or watch the browser: screenshots, command profiling, the flight
+    recorder, browser profiles, async tests and step timing"""
+    global screenshot_writer, flight_recorder
+    with warnings.catch_warnings():
+        # Third-party modules warn while importing (urllib3[secure] via selenium) and pytest.ini
+        # turns warnings into errors; that setting is meant for our own code, not for imports
+        warnings.simplefilter("ignore", DeprecationWarning)
+        from pages import BasePageClass
+        from utils import browser_profiles
+        from utils import step_timing
+        from utils.flight_recorder import FlightRecorderPlugin
+        from utils.screenshots import ScreenshotWriter
+
+    screenshot_writer = ScreenshotWriter(
+        os.path.join(BASE_DIR, "screenshots"),
+        max_width=config.getoption("screenshot_max_width"),
+        jpeg_quality=config.getoption("screenshot_jpeg_quality"),
+    )
+
+    stats.add_source("readiness", lambda: dict(BasePageClass.readiness_stats))
+    stats.add_source("element_cache", lambda: dict(BasePageClass.element_cache_stats))
+    stats.add_source("auth_state", lambda: dict(auth_session.stats) if auth_session is not None else {})
+
+    profiler = command_profiler.CommandProfilerPlugin(config, config.getoption("webdriver_trace"), config.run_id)
+    config.pluginmanager.register(profiler, command_profiler.CommandProfilerPlugin.name)
+    stats.add_source("webdriver_commands", profiler.summary)
+
+    if config.getoption("flight_recorder_size") > 0:
+        flight_recorder = FlightRecorderPlugin(
+            config,
+            BasePageClass,
+            profiler.profiler,
+            os.path.join(BASE_DIR, "reports", "flight-recorder"),
+            lambda: driver_pool.driver if driver_pool is not None and driver_pool.started else None,
+            capacity=config.getoption("flight_recorder_size"),
+        )
+        config.pluginmanager.register(flight_recorder, FlightRecorderPlugin.name)
+
+    profiles = browser_profiles.BrowserProfilePlugin(config, lambda: driver_pool.driver if driver_pool else None)
+    config.pluginmanager.register(profiles, browser_profiles.BrowserProfilePlugin.name)
+    stats.add_source("browser_profiles", profiles.summary)
+
+    # Failed async tests get their screenshot from the plugin instead of test_failed_check
+    concurrent_tests = async_tests.AsyncTestPlugin(
+        config, create_async_browsers, take_screenshot, replaced_fixtures=["test_failed_check"]
+    )
+    config.pluginmanager.register(concurrent_tests, async_tests.AsyncTestPlugin.name)
+    stats.add_source("async_tests", concurrent_tests.summary)
+
+    if config.getoption("step_timing") == "true":
+        timing = step_timing.StepTimingPlugin(config, BasePageClass, os.path.join(BASE_DIR, "reports"))
+        config.pluginmanager.register(timing, step_timing.StepTimingPlugin.name)
+        stats.add_source("step_timing", timing.recorder.summary)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_auto_num_workers(config):
+    # -n logical and PYTEST_XDIST_AUTO_NUM_WORKERS keep xdist's own count
+    if config.option.numprocesses != "auto" or os.environ.get("PYTEST_XDIST_AUTO_NUM_WORKERS"):
+        return None
+    config.worker_sizing = worker_sizing.plan_for(config)
+    return config.worker_sizing["workers"]
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    node.workerinput["data_seed"] = node.config.data_seed
+    node.workerinput["browser_url"] = node.config.browser_url
+    node.workerinput["run_id"] = node.config.run_id
+
+
+def pytest_report_header(config):
+    header = [f"test data seed: {config.data_seed} (rerun with --data-seed={config.data_seed})"]
+    if remote_browsers is not None:
+        from utils import remote_driver
+
+        header.append(remote_driver.capacity_header(
+            remote_browsers,
+            workers=len(config.getoption("tx", None) or []) or 1,
+            sessions=remote_driver.sessions_per_worker(config.getoption("standby_browser") == "true"),
+        ))
+    return header
+
+
+def pytest_sessionfinish(session):
+    trace_path = session.config.getoption("webdriver_trace")
+    if trace_path and not session.config.getoption("collectonly") and not runs_tests(session.config):
+        # The workers wrote their parts of the trace; the controller puts them together
+        command_profiler.write_trace(trace_path, [], session.config.run_id)
+
+
+def pytest_unconfigure(config):
+    global screenshot_writer, remote_browsers, stand_in_grid
+    if screenshot_writer is not None:
+        screenshot_writer.close()
+        screenshot_writer = None
+    if remote_browsers is not None:
+        remote_browsers.close()
+        remote_browsers = None
+    if stand_in_grid is not None:
+        from utils import remote_driver
+
+        remote_driver.stop_stand_in_grid(stand_in_grid)
+        stand_in_grid = None
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    stats = worker_stats.get_plugin(config)
+    readiness = stats.get("readiness")
+    if readiness.get("waits"):
+        terminalreporter.write_sep("-", "readiness waits")
+        terminalreporter.write_line(
+            f"{readiness['waits']} waits took {readiness['waited_seconds']:.1f}s "
+            f"instead of {readiness['fixed_sleep_seconds']:.1f}s of fixed sleeps "
+            f"(saved {readiness['fixed_sleep_seconds'] - readiness['waited_seconds']:.1f}s)"
+        )
+        if readiness.get("timeouts"):
+            terminalreporter.write_line(f"{readiness['timeouts']} waits gave up before the page was quiet")
+    element_cache = stats.get("element_cache")
+    lookups = element_cache.get("hits", 0) + element_cache.get("misses", 0)
+    if lookups:
+        terminalreporter.write_sep("-", "element cache")
+        terminalreporter.write_line(
+            f"{element_cache['hits']} hits, {element_cache['misses']} misses "
+            f"({100.0 * element_cache['hits'] / lookups:.0f}% hit rate), "
+            f"{element_cache['stale']} stale references re-resolved"
+        )
+    auth_state = stats.get("auth_state")
+    if auth_state.get("logins") or auth_state.get("injections"):
+        terminalreporter.write_sep("-", "auth state")
+        terminalreporter.write_line(
+            f"{auth_state['logins']} UI logins, {auth_state['injections']} sessions restored from the "
+            f"stored state, {auth_state['rejected']} stored states rejected"
+        )
+    command_profiler.write_terminal_summary(terminalreporter, stats.get("webdriver_commands"))
+    if stats.get("browser_profiles"):
+        from utils import browser_profiles
+
+        browser_profiles.write_terminal_summary(terminalreporter, stats.get("browser_profiles"))
+    if config.pluginmanager.get_plugin(replay_proxy.ReplayPlugin.name) is not None:
+        replay_proxy.write_terminal_summary(terminalreporter, stats.get("replay"))
+    startup_timing.write_terminal_summary(terminalreporter, stats.get("startup"))
+    if remote_browsers is not None:
+        from utils import remote_driver
+
+        remote_driver.write_terminal_summary(terminalreporter, config.browser_url, stats.get("remote_browsers"))
+    reruns.write_terminal_summary(
+        terminalreporter, config.pluginmanager.get_plugin(reruns.RerunPlugin.name).summary()
+    )
+    async_tests.write_terminal_summary(terminalreporter, stats.get("async_tests"))
+    worker_sizing.write_terminal_summary(
+        terminalreporter, getattr(config, "worker_sizing", None), stats.get("worker_sizing")
+    )
+    scheduler = config.pluginmanager.get_plugin(duration_scheduler.DurationSchedulerPlugin.name)
+    if scheduler is not None:
+        duration_scheduler.write_terminal_summary(terminalreporter, scheduler.summary())
+    if config.getoption("step_timing") == "true" and stats.get("step_timing"):
+        from utils import step_timing
+
+        step_timing.write_terminal_summary(terminalreporter, stats.get("step_timing"))
+
 def validate_cli_inputs(request):
     if not BrowserEnum.has_value(request.config.getoption("browser")):
         raise Exception(
             f"Browser name can only accept following values {', '.join([e.value[0] for e in BrowserEnum])}"
         )
 
+    if not BrowserProfileEnum.has_value(request.config.getoption("browser_profile")):
+        raise Exception(
+            f"Browser profile can only accept following values {','.join([e.value[0] for e in BrowserProfileEnum])}"
+        )
+
+    if not PageLoadStrategyEnum.has_value(request.config.getoption("page_load_strategy")):
+        raise Exception(
+            f"Page load strategy can only accept following values {','.join([e.value[0] for e in PageLoadStrategyEnum])}"
+        )
+
+    if request.config.browser_url and request.config.getoption("browser") not in (
+            BrowserEnum.CHROME.value[0], BrowserEnum.FIREFOX.value[0], BrowserEnum.EDGE.value[0]
+    ):
+        raise Exception("Browser url can only be used with the chrome, firefox or edge browser")
+
+    readiness = request.config.getoption("readiness")
+    if readiness is not None and readiness not in READINESS_CONDITIONS:
+        raise Exception(f"Readiness can only accept following values {','.join(READINESS_CONDITIONS)}")
+
+    if request.config.getoption("replay") not in replay_proxy.MODES:
+        raise Exception(f"Replay can only accept following values {','.join(replay_proxy.MODES)}")
+
     if not ClientEnum.has_value(request.config.getoption("client")):
         raise Exception(
             f"Client can only accept following values {','.join([e.value[0] for e in ClientEnum])}"
@@ -105,57 +610,64 @@ def setupLogger(request, client_name, env_name):
 
 
 def load_env_file(client_name, env_name):
+    from dotenv import find_dotenv
+    from dotenv import load_dotenv
+
     load_dotenv(find_dotenv(filename=f".env-{client_name}-{env_name}"))
-    logging.debug("Expected .env=", f".env-{client_name}-{env_name}")
+    logging.debug("Expected .env=%s", f".env-{client_name}-{env_name}")
 
 
-@pytest.fixture(scope="session", autouse=True)
-def setup(request):
-    current_env = request.config.getoption("env")
-    pytest.current_client = request.config.getoption("client")
+def create_driver(request, driver_path):
+    """Launch one browser configured from the command line options"""
+    from pages import BasePageClass
+
     browser_name = request.config.getoption("browser")
     verbose = request.config.getoption("logging") == LoggingLevelEnum.DEBUG.value[0]
-    # set_grouping(parser, request)
 
-    # Setting language globally
-    # pytest.language = request.config.getoption("language")
-    # Initialize the config
-    validate_cli_inputs(request)
-    load_env_file(pytest.current_client, current_env)
-    setupLogger(request, pytest.current_client, current_env)
+    if browser_name == BrowserEnum.FAKE.value[0]:
+        from utils import fake_webdriver
 
-    browser_options = Options()
-    browser_options.add_argument("--no-sandbox")
-    browser_options.add_argument("--disable-dev-shm-usage")
-    browser_options.add_experimental_option("useAutomationExtension", False)
-    browser_options.add_argument("window-size=1920x1480")
-    browser_options.add_argument("--use-fake-device-for-media-stream")
-    browser_options.add_argument("--use-fake-ui-for-media-stream")
-    # browser_options.add_argument("--use-file-for-fake-video-capture=/home/tanvijoshi/advisor-automation-pytest/video.y4m")
-    browser_options.add_experimental_option("prefs",
-                                            {"profile.default_content_setting_values.media_stream_mic": 1,
-                                             "profile.default_content_setting_values.media_stream_camera": 1,
-                                             "profile.default_content_setting_values.notifications": 1
-                                             })
+        driver = fake_webdriver.FakeDriver(create_fake_site(request), clock=BasePageClass.clock)
+        driver.maximize_window()
+        return create_wait_policy(request).apply(driver)
 
-    if request.config.getoption("headless") == "true":
-        browser_options.add_argument("--headless")
+    # Browser specific modules are only imported once the browser is known
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        from selenium import webdriver
+
+    # A grid routes on the browserName of the options, which Chrome's options would set to chrome
+    browser_options = create_browser_options(
+        request, edge=remote_browsers is not None and browser_name == BrowserEnum.EDGE.value[0]
+    )
+    replay = request.config.pluginmanager.get_plugin(replay_proxy.ReplayPlugin.name)
 
     # Setup the browsers
-    if browser_name == BrowserEnum.CHROME.value[0]:
+    if remote_browsers is not None:
+        driver = remote_browsers.create(
+            create_firefox_options(request, replay)
+            if browser_name == BrowserEnum.FIREFOX.value[0] else browser_options
+        )
+    elif browser_name == BrowserEnum.CHROME.value[0]:
+        from selenium.webdriver.chrome.service import Service as ChromeService
+
         driver = webdriver.Chrome(
-            service=ChromeService(ChromeDriverManager().install()),
+            service=ChromeService(driver_path),
             options=browser_options,
         )
     elif browser_name == BrowserEnum.FIREFOX.value[0]:
+        from selenium.webdriver.firefox.service import Service as FirefoxService
+
         driver = webdriver.Firefox(
-            service=FirefoxService(GeckoDriverManager().install()),
+            service=FirefoxService(driver_path),
             verbose=verbose,
-            options=browser_options,
+            options=create_firefox_options(request, replay),
         )
     elif browser_name == BrowserEnum.EDGE.value[0]:
+        from selenium.webdriver.edge.service import Service as EdgeService
+
         driver = webdriver.Edge(
-            service=EdgeService(EdgeChromiumDriverManager().install()),
+            service=EdgeService(driver_path),
             verbose=verbose,
             options=browser_options,
         )
@@ -166,17 +678,263 @@ def setup(request):
     else:
         raise Exception("This browser is not supported.")
 
+    driver.maximize_window()
+    return create_wait_policy(request).apply(driver)
+
+
+def create_browser_options(request, edge=False):
+    """Chrome (or Edge) options from the command line options"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.edge.options import Options as EdgeOptions
+    from utils import browser_profiles
+
+    page_load_strategy = request.config.getoption("page_load_strategy")
+    browser_options = EdgeOptions() if edge else Options()
+    browser_options.page_load_strategy = page_load_strategy
+    browser_options.add_argument("--no-sandbox")
+    browser_options.add_argument("--disable-dev-shm-usage")
+    browser_options.add_experimental_option("useAutomationExtension", False)
+    browser_options.add_argument("window-size=1920x1480")
+    browser_options.add_argument("--use-fake-device-for-media-stream")
+    browser_options.add_argument("--use-fake-ui-for-media-stream")
+    # browser_options.add_argument("--use-file-for-fake-video-capture=/home/tanvijoshi/advisor-automation-pytest/video.y4m")
+    profile_name = request.config.getoption("browser_profile")
+    # Blocked requests are only counted when some test runs with blocking
+    track_blocked = browser_profiles.logs_performance(
+        request.config.getoption("browser"), profile_name, request.session.items
+    )
+    profile_prefs = browser_profiles.configure_chrome_options(browser_options, profile_name, track_blocked)
+    browser_options.add_experimental_option("prefs",
+                                            {"profile.default_content_setting_values.media_stream_mic": 1,
+                                             "profile.default_content_setting_values.media_stream_camera": 1,
+                                             "profile.default_content_setting_values.notifications": 1,
+                                             **profile_prefs
+                                             })
+
+    if request.config.getoption("headless") == "true":
+        browser_options.add_argument("--headless")
+
+    replay = request.config.pluginmanager.get_plugin(replay_proxy.ReplayPlugin.name)
+    if replay is not None:
+        replay_proxy.configure_chrome_options(browser_options, replay.address)
+    return browser_options
+
+
+def create_firefox_options(request, replay):
+    """Firefox takes its own options: the profile preferences and headless mode"""
+    from selenium.webdriver.firefox.options import Options as FirefoxOptions
+    from utils import browser_profiles
+
+    firefox_options = FirefoxOptions()
+    firefox_options.headless = request.config.getoption("headless") == "true"
+    firefox_options.page_load_strategy = request.config.getoption("page_load_strategy")
+    browser_profiles.configure_firefox_options(firefox_options, request.config.getoption("browser_profile"))
+    if replay is not None:
+        replay_proxy.configure_firefox_options(firefox_options, replay.address)
+    return firefox_options
+
+
+def create_wait_policy(request):
+    """The wait model of a browser session, from the command line options"""
+    from pages import BasePageClass
+
+    return WaitPolicy(
+        page_load_strategy=request.config.getoption("page_load_strategy"),
+        readiness=request.config.getoption("readiness"),
+        implicit_wait=request.config.getoption("implicit_wait"),
+        timeout=request.config.getoption("wait_timeout"),
+        poll_interval=BasePageClass._POLL_INTERVAL,
+        max_poll_interval=BasePageClass._MAX_POLL_INTERVAL,
+    )
+
+
+def create_async_browsers(request):
+    """The browser sessions of this worker's async tests and a callback that stops their endpoint:
+    the grid of --browser-url, an in-process stand-in grid for the fake browser, or a local driver"""
+    from utils.async_webdriver import AsyncBrowserPool
+
+    browser_name = request.config.getoption("browser")
+    max_sessions = request.config.getoption("async_sessions")
+    if request.config.browser_url:
+        url, stop = request.config.browser_url, lambda: None
+        replay = request.config.pluginmanager.get_plugin(replay_proxy.ReplayPlugin.name)
+        if browser_name == BrowserEnum.FIREFOX.value[0]:
+            options = create_firefox_options(request, replay)
+        else:
+            options = create_browser_options(request, edge=browser_name == BrowserEnum.EDGE.value[0])
+        capabilities = options.to_capabilities()
+    elif browser_name == BrowserEnum.FAKE.value[0]:
+        from utils import stand_in_grid
+
+        grid = stand_in_grid.StandInGrid(
+            stand_in_grid.site_factory(request.config.getoption("fake_site")),
+            max_sessions=max_sessions,
+            latency=request.config.getoption("stand_in_latency_ms") / 1000.0,
+        )
+        server, url = stand_in_grid.serve_in_thread(grid)
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+
+        capabilities = {"browserName": browser_name, "pageLoadStrategy": request.config.getoption("page_load_strategy")}
+    elif browser_name in (BrowserEnum.CHROME.value[0], BrowserEnum.EDGE.value[0]):
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from selenium.webdriver.edge.service import Service as EdgeService
+
+        edge = browser_name == BrowserEnum.EDGE.value[0]
+        driver_path = resolve_driver_binary(
+            browser_name,
+            cache_dir=request.config.getoption("driver_cache"),
+            offline=request.config.getoption("offline_drivers") == "true",
+        )
+        # One driver process serves every session of the worker
+        service = EdgeService(driver_path) if edge else ChromeService(driver_path)
+        service.start()
+        url, stop = service.service_url, service.stop
+        capabilities = create_browser_options(request, edge=edge).to_capabilities()
+    else:
+        raise Exception("Async tests on this browser need a --browser-url")
+    browsers = AsyncBrowserPool(
+        url,
+        capabilities,
+        max_sessions,
+        wait_policy=create_wait_policy(request),
+        session_timeout=request.config.getoption("remote_session_timeout"),
+    )
+    return browsers, stop
+
+
+def create_fake_site(request):
+    """Pages for the fake browser: a fixture directory, or the benchmark fixture app in-process"""
+    site_dir = request.config.getoption("fake_site")
+    from utils import fake_webdriver
+
+    if site_dir:
+        return fake_webdriver.directory_site(site_dir)
+    from benchmarks.fixture_site import create_app
+    return fake_webdriver.flask_site(create_app())
+
+
+def collected_classes(session):
+    """Distinct test classes of the session, worked out once and reused on every browser swap"""
+    classes = getattr(session, "_driver_classes", None)
+    if classes is None:
+        classes = {}
+        for item in session.items:
+            cls = item.getparent(pytest.Class)
+            if cls is not None:
+                classes.setdefault(cls.nodeid, cls.obj)
+        session._driver_classes = classes = list(classes.values())
+    return classes
+
+
+def inject_driver(session, driver):
+    """Expose the active driver as the `driver` attribute of every test class"""
+    for cls in collected_classes(session):
+        cls.driver = driver
+
+
+@pytest.fixture(scope="session", autouse=True)
+def setup(request):
+    global driver_pool, auth_session
+    from pages import BasePageClass
+    from pages.authentication.login_page import LoginPage
+    from utils.auth_state import AuthSession
+    from utils.auth_state import AuthStateStore
+    from utils.driver_pool import ActiveDriver
+    from utils.driver_pool import DriverPool
+
+    current_env = request.config.getoption("env")
+    pytest.current_client = request.config.getoption("client")
+    pytest.quiet_window = request.config.getoption("quiet_window")
+    pytest.link_concurrency = request.config.getoption("link_concurrency")
+    pytest.link_host_rate = request.config.getoption("link_host_rate")
+    # set_grouping(parser, request)
+
+    # Setting language globally
+    # pytest.language = request.config.getoption("language")
+    # Initialize the config
+    validate_cli_inputs(request)
+    load_env_file(pytest.current_client, current_env)
+    setupLogger(request, pytest.current_client, current_env)
+    if request.config.getoption("browser") == BrowserEnum.FAKE.value[0]:
+        from utils.fake_webdriver import VirtualClock
+
+        # No real page behind the fake browser, so sleeps and polling only move a virtual clock
+        BasePageClass.clock = VirtualClock()
+
+    replay = request.config.pluginmanager.get_plugin(replay_proxy.ReplayPlugin.name)
+    if replay is not None and request.config.getoption("browser") != BrowserEnum.FAKE.value[0]:
+        # The proxy has to be up before the first browser is pointed at it
+        replay.start(pytest.current_client, current_env)
+
+    # Resolved once per worker; the cache itself makes it once per machine. Remote browsers need none.
+    driver_path = None if remote_browsers is not None else resolve_driver_binary(
+        request.config.getoption("browser"),
+        cache_dir=request.config.getoption("driver_cache"),
+        offline=request.config.getoption("offline_drivers") == "true",
+    )
+
     #for session level driver initiation
     session = request.node
-    for item in session.items:
-        cls = item.getparent(pytest.Class)
-        setattr(cls.obj, "driver", driver)
-
-    driver.maximize_window()
-    driver.implicitly_wait(5), """Wait for 5 sec to load whole page"""
+    driver_pool = DriverPool(
+        lambda: create_driver(request, driver_path),
+        standby=request.config.getoption("standby_browser") == "true",
+        recycle_after=request.config.getoption("recycle_after"),
+        max_rss_mb=request.config.getoption("recycle_rss_mb"),
+        on_swap=lambda new_driver: inject_driver(session, new_driver),
+        # A grid starts both sessions in parallel; local browsers would only compete for the CPU
+        parallel_start=remote_browsers is not None,
+        # Async tests bring sessions of their own; the browsers start with the first other test
+        lazy=True,
+    )
+    if not async_tests.is_async_test(request._pyfuncitem):
+        driver_pool.start()
+    auth_session = AuthSession(
+        AuthStateStore(request.config.getoption("auth_state_dir"), pytest.current_client, current_env),
+        login=lambda driver: LoginPage(driver).login(),
+        is_logged_in=lambda driver: LoginPage(driver).is_logged_in(),
+        max_age=request.config.getoption("auth_max_age"),
+    )
     # request.cls.driver = driver # can be used when scope=class
-    yield driver
-    driver.quit()
+    # Follows the pool's swaps, unlike the driver that happened to be active now
+    yield ActiveDriver(driver_pool)
+    driver_pool.close()
+    driver_pool = None
+
+
+@pytest.fixture(scope="session")
+def test_data(setup):
+    """This worker's partition of the seeded test data pool (users, emails, phones, strings)"""
+    return pytest.data_pool
+
+
+@pytest.fixture(scope="class")
+def authenticated(setup):
+    """Logged-in browser for a test class: restored from the shared auth state when the
+    site accepts it, logged in through the UI (once, under a file lock) when it does not.
+    Use with @pytest.mark.usefixtures("authenticated")."""
+    return auth_session.ensure(driver_pool.driver)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    # Async tests run outside these hooks, so this is the first sync test after them
+    if driver_pool is not None and not driver_pool.started:
+        driver_pool.start()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item, nextitem):
+    yield
+    # Hand the browser back to the pool once the test's own fixtures are finalized.
+    # Tests of one class share browser state, so full resets only happen between classes.
+    if driver_pool is not None and nextitem is not None:
+        same_class = item.getparent(pytest.Class) is nextitem.getparent(pytest.Class)
+        driver_pool.release(reset=not same_class)
 
 
 # Set up a hook to be able to check if a test has failed
@@ -197,21 +955,13 @@ def test_failed_check(request):
     if request.node.rep_setup.failed:
         print("Setting up a test failed!", request.node.nodeid)
     elif request.node.rep_setup.passed:
-        if request.node.rep_call.failed:
-            driver = request.node.funcargs["setup"]
-            take_screenshot(driver, request.node.nodeid)
+        # A failure that will be rerun still gets its artifacts
+        if request.node.rep_call.failed or request.node.rep_call.outcome == "rerun":
+            take_screenshot(driver_pool.driver, request.node.nodeid)
+            if flight_recorder is not None:
+                flight_recorder.dump(driver_pool.driver, request.node.nodeid)
             print("Executing a test failed.", request.node.nodeid)
 
 
 def take_screenshot(driver, nodeid):
-    time.sleep(1)
-    file_name = f'{nodeid}{datetime.today().strftime("%Y-%m-%d%H:%M")}'.replace(
-        "/", "_"
-    ).replace("::", "_")
-    file_name = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
-    driver.save_screenshot(os.path.join(BASE_DIR, "screenshots", file_name) + ".png")
-    allure.attach(
-        driver.get_screenshot_as_png(),
-        name="Screenshot",
-        attachment_type=AttachmentType.PNG,
-    )
\ No newline at end of file
+    return screenshot_writer.capture(driver, nodeid, os.environ.get("PYTEST_XDIST_WORKER"))
@@ -0,0 +1,51 @@
+"""
+Tests of the framework itself: the page layer on the fake browser, test data, auth state,
+scheduling, reruns, link checking and worker sizing. None of them needs a real browser,
+so the session browser and the failure screenshots of tests/conftest.py are switched off here.
+"""
+import warnings
+
+import pytest
+
+with warnings.catch_warnings():
+    # Same as tests/conftest.py: selenium's imports warn and pytest.ini makes warnings errors
+    warnings.simplefilter("ignore", DeprecationWarning)
+    from pages import BasePageClass
+    from utils import fake_webdriver
+
+FIXTURE_URL = "http://fixture.test/"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def setup():
+    """No session browser; page-layer tests start a fake one of their own"""
+    yield None
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_failed_check():
+    yield
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = fake_webdriver.VirtualClock()
+    monkeypatch.setattr(BasePageClass, "clock", clock)
+    return clock
+
+
+@pytest.fixture
+def fake_driver(clock):
+    """Fake browser serving the benchmark fixture site at FIXTURE_URL"""
+    from benchmarks.fixture_site import create_app
+
+    return fake_webdriver.FakeDriver(fake_webdriver.flask_site(create_app()), base_url=FIXTURE_URL, clock=clock)
+
+
+@pytest.fixture
+def page(fake_driver, monkeypatch):
+    """BasePageClass on the fake browser, with counters of its own"""
+    monkeypatch.setattr(pytest, "current_client", "LEVELUP", raising=False)
+    monkeypatch.setattr(BasePageClass, "readiness_stats", dict.fromkeys(BasePageClass.readiness_stats, 0))
+    monkeypatch.setattr(BasePageClass, "element_cache_stats", dict.fromkeys(BasePageClass.element_cache_stats, 0))
+    return BasePageClass(fake_driver)
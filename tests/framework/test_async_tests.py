@@ -0,0 +1,140 @@
+"""
+AsyncTestPlugin end to end: a small suite of async tests runs in a pytest subprocess with
+the project's conftest and the fake browser, without and with xdist.
+"""
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SUITE = '''
+import asyncio
+
+import pytest
+from selenium.webdriver.common.by import By
+
+TABLE = "http://fixture.test/table?rows=3"
+NAMES = (By.CSS_SELECTOR, "td.name")
+
+
+@pytest.fixture(scope="class")
+def rows():
+    return 3
+
+
+class TestTable:
+    @pytest.mark.parametrize("row", [0, 1, 2])
+    async def test_name(self, async_page, rows, row):
+        await async_page.go_to_page(TABLE)
+        # Keeps every test of the batch on its session at once
+        await asyncio.sleep(0.2)
+        names = await async_page.get_text_of_elements(NAMES)
+        assert len(names) == rows
+        assert names[row] == "Name %s" % row
+
+    async def test_driver(self, async_driver):
+        await async_driver.get(TABLE)
+        assert "table" in await async_driver.current_url()
+
+    async def test_fails(self, async_page):
+        await async_page.go_to_page(TABLE)
+        assert await async_page.get_text_of_elements(NAMES) == []
+
+    @pytest.mark.skip(reason="not today")
+    async def test_skipped(self, async_page):
+        pass
+
+    def test_sync(self):
+        self.driver.get(TABLE)
+        assert self.driver.find_elements(*NAMES)
+
+
+async def test_module_level(async_page):
+    await async_page.go_to_page(TABLE)
+'''
+
+
+ASYNC_FIRST = '''
+import sys
+
+
+def driver_pool():
+    return sys.modules["tests.conftest"].driver_pool
+
+
+async def test_async_first(async_page):
+    # The session setup ran for this test, but no regular browser was started for it
+    assert not driver_pool().started
+
+
+class TestSync:
+    def test_sync_after(self):
+        assert driver_pool().started
+        self.driver.get("http://fixture.test/table?rows=1")
+'''
+
+AUTOUSE = '''
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def per_test():
+    yield
+
+
+async def test_async(async_page):
+    pass
+'''
+
+
+def run_suite(directory, *args, source=SUITE):
+    (directory / "test_suite.py").write_text(source)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO, os.environ.get("PYTHONPATH")])))
+    env.pop("PYTEST_XDIST_WORKER", None)
+    command = [
+        sys.executable, "-m", "pytest", "-p", "tests.conftest", "-c", os.path.join(REPO, "pytest.ini"),
+        "--rootdir", str(directory), "-p", "no:cacheprovider", "--browser=fake", "-rfEs", str(directory), *args,
+    ]
+    result = subprocess.run(command, cwd=str(directory), env=env, capture_output=True, text=True, timeout=300)
+    return result.returncode, result.stdout + result.stderr
+
+
+def outcomes(output):
+    counts = re.findall(r"(\d+) (passed|failed|skipped|error)", output.splitlines()[-1])
+    return {outcome: int(count) for count, outcome in counts}
+
+
+@pytest.mark.parametrize("args", [(), ("-n", "2")], ids=["plain", "xdist"])
+def test_async_suite(tmp_path, args):
+    code, output = run_suite(tmp_path, *args)
+    assert code == 1, output
+    assert outcomes(output) == {"passed": 6, "failed": 1, "skipped": 1}, output
+    assert "FAILED test_suite.py::TestTable::test_fails" in output
+    assert re.search(r"SKIPPED \[1\] test_suite.py:\d+: not today", output), output
+    # Also on a worker, a test sees the async tests queued after it
+    batches = re.search(r"^7 async tests in (\d+) batches", output, re.M)
+    assert batches and int(batches.group(1)) < 7, output
+
+
+def test_consecutive_async_tests_share_a_batch(tmp_path):
+    _, output = run_suite(tmp_path, "--async-sessions=3")
+    # The class's async tests before test_sync, then the module-level test
+    assert "7 async tests in 2 batches" in output, output
+    assert re.search(r"sessions started for 6 tests, at most 3 in use at once", output), output
+
+
+def test_async_only_worker_starts_no_regular_browser(tmp_path):
+    code, output = run_suite(tmp_path, "-k", "async_first", source=ASYNC_FIRST)
+    assert code == 0, output
+    code, output = run_suite(tmp_path, source=ASYNC_FIRST)
+    assert outcomes(output) == {"passed": 2}, output
+
+
+def test_skipped_autouse_fixture_is_reported(tmp_path):
+    _, output = run_suite(tmp_path, source=AUTOUSE)
+    assert outcomes(output) == {"error": 1}, output
+    assert "Function-scoped autouse fixture 'per_test' is not supported by async tests" in output
@@ -0,0 +1,38 @@
+import pytest
+
+from utils.auth_state import is_expired
+
+SAVED_AT = 1000.0
+
+
+def state(*cookies):
+    return {"saved_at": SAVED_AT, "cookies": list(cookies)}
+
+
+def cookie(name, expiry=None, http_only=True):
+    cookie = {"name": name, "value": "x", "httpOnly": http_only}
+    if expiry is not None:
+        cookie["expiry"] = expiry
+    return cookie
+
+
+class TestIsExpired:
+    @pytest.mark.parametrize("age, expired", [(0, False), (3600, False), (3601, True)])
+    def test_max_age(self, age, expired):
+        assert is_expired(state(), max_age=3600, now=SAVED_AT + age) is expired
+
+    def test_no_max_age(self):
+        assert not is_expired(state(), max_age=0, now=SAVED_AT + 10 ** 6)
+
+    def test_expired_http_only_cookie(self):
+        assert is_expired(state(cookie("session", expiry=SAVED_AT + 60)), now=SAVED_AT + 60)
+        assert not is_expired(state(cookie("session", expiry=SAVED_AT + 61)), now=SAVED_AT + 60)
+        assert not is_expired(state(cookie("session")), now=SAVED_AT + 60)
+
+    def test_other_cookies_do_not_count(self):
+        assert not is_expired(state(cookie("_ga", expiry=SAVED_AT, http_only=False)), now=SAVED_AT + 60)
+
+    def test_named_auth_cookies(self):
+        saved = state(cookie("csrftoken", expiry=SAVED_AT, http_only=False), cookie("tracking", expiry=SAVED_AT))
+        assert is_expired(saved, now=SAVED_AT + 60, auth_cookies=["csrftoken"])
+        assert not is_expired(saved, now=SAVED_AT + 60, auth_cookies=["sessionid"])
@@ -0,0 +1,196 @@
+import json
+import logging
+import types
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
+from utils import browser_profiles
+
+SET_BLOCKED = "Network.setBlockedURLs"
+
+
+def loading_failed(resource_type, reason="inspector"):
+    return {"message": json.dumps({"message": {
+        "method": "Network.loadingFailed", "params": {"type": resource_type, "blockedReason": reason},
+    }})}
+
+
+class ChromiumDriver:
+    """Records the DevTools commands and serves the performance log once, like Chrome"""
+
+    def __init__(self):
+        self.cdp_commands = []
+        self.performance_log = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.cdp_commands.append((command, params))
+
+    def get_log(self, log_type):
+        entries, self.performance_log = self.performance_log, []
+        return entries
+
+
+class Config:
+    def __init__(self, browser="chrome", browser_profile="full"):
+        self.options = {"browser": browser, "browser_profile": browser_profile}
+
+    def getoption(self, name):
+        return self.options[name]
+
+
+class Item:
+    def __init__(self, profile=None):
+        self.marker = pytest.mark.browser_profile(profile).mark if profile else None
+        self.session = types.SimpleNamespace(items=[self])
+        self.user_properties = []
+
+    def get_closest_marker(self, name):
+        return self.marker
+
+
+def run_test(plugin, item, requests=()):
+    """Run the plugin's call hook around a test body that makes `requests`"""
+    hook = plugin.pytest_runtest_call(item)
+    next(hook)
+    driver = plugin.get_driver()
+    if driver is not None:
+        driver.performance_log.extend(requests)
+    with pytest.raises(StopIteration):
+        next(hook)
+
+
+class TestOptions:
+    def test_profile_of_a_test(self):
+        assert browser_profiles.profile_for(Item("text-only"), "lean") == "text-only"
+        assert browser_profiles.profile_for(Item(), "lean") == "lean"
+
+    @pytest.mark.parametrize("browser, default, marked, expected", [
+        ("chrome", "full", False, False),
+        ("chrome", "full", True, True),
+        ("edge", "lean", False, True),
+        ("firefox", "lean", True, False),
+    ])
+    def test_performance_log_only_when_something_is_blocked(self, browser, default, marked, expected):
+        items = [Item(), Item("lean") if marked else Item()]
+        assert browser_profiles.logs_performance(browser, default, items) is expected
+
+    def test_chrome_options(self):
+        options = Options()
+        prefs = browser_profiles.configure_chrome_options(options, "text-only")
+        assert "--blink-settings=imagesEnabled=false" in options.arguments
+        assert "--disable-extensions" in options.arguments
+        assert options.to_capabilities()["goog:loggingPrefs"] == {"performance": "ALL"}
+        assert prefs == {"profile.managed_default_content_settings.images": 2}
+
+    def test_full_profile_adds_nothing(self):
+        options = Options()
+        assert browser_profiles.configure_chrome_options(options, "full", track_blocked=False) == {}
+        assert options.arguments == []
+        assert "goog:loggingPrefs" not in options.to_capabilities()
+
+    def test_firefox_preferences(self):
+        options = FirefoxOptions()
+        browser_profiles.configure_firefox_options(options, "lean")
+        assert options.preferences["gfx.downloadable_fonts.enabled"] is False
+        assert "permissions.default.image" not in options.preferences
+
+
+class TestBlockedRequests:
+    def test_only_requests_refused_by_devtools_are_counted(self):
+        driver = ChromiumDriver()
+        driver.performance_log = [
+            loading_failed("Image"), loading_failed("Image"), loading_failed("Font"),
+            loading_failed("Script", reason="mixed-content"),
+            {"message": json.dumps({"message": {"method": "Network.requestWillBeSent", "params": {}}})},
+        ]
+        blocked = browser_profiles.read_blocked_requests(driver)
+        assert blocked == {"Image": 2, "Font": 1}
+        assert browser_profiles.estimated_bytes(blocked) == 2 * 40_000 + 35_000
+        # The log was drained
+        assert browser_profiles.read_blocked_requests(driver) == {}
+
+    def test_browser_without_a_performance_log(self):
+        class Driver:
+            def get_log(self, log_type):
+                raise WebDriverException("log type 'performance' not found")
+
+        assert browser_profiles.read_blocked_requests(Driver()) == {}
+
+
+class TestPlugin:
+    def test_profile_is_applied_once_per_browser(self):
+        driver = ChromiumDriver()
+        plugin = browser_profiles.BrowserProfilePlugin(Config(browser_profile="lean"), lambda: driver)
+        run_test(plugin, Item())
+        run_test(plugin, Item())
+        blocked_urls = [params["urls"] for command, params in driver.cdp_commands if command == SET_BLOCKED]
+        assert blocked_urls == [browser_profiles.PROFILES["lean"]["blocked_urls"]]
+
+        # A browser swapped in by the pool starts without blocking
+        swapped = ChromiumDriver()
+        plugin.get_driver = lambda: swapped
+        run_test(plugin, Item())
+        assert ("Network.enable", {}) in swapped.cdp_commands
+
+    def test_marker_switches_the_profile_and_back(self):
+        driver = ChromiumDriver()
+        plugin = browser_profiles.BrowserProfilePlugin(Config(), lambda: driver)
+        run_test(plugin, Item("text-only"))
+        run_test(plugin, Item())
+        blocked_urls = [params["urls"] for command, params in driver.cdp_commands if command == SET_BLOCKED]
+        assert blocked_urls == [browser_profiles.PROFILES["text-only"]["blocked_urls"], []]
+
+    def test_blocked_requests_are_recorded_per_test_and_profile(self):
+        driver = ChromiumDriver()
+        plugin = browser_profiles.BrowserProfilePlugin(Config(browser_profile="lean"), lambda: driver)
+        item = Item()
+        run_test(plugin, item, [loading_failed("Font"), loading_failed("Script")])
+        assert item.user_properties == [
+            ("browser_profile", "lean"), ("blocked_requests", 2), ("blocked_bytes_estimate", 95_000)
+        ]
+        assert plugin.summary() == {
+            "lean": {"tests": 1, "blocked": 2, "estimated_bytes": 95_000, "by_type": {"Font": 1, "Script": 1}}
+        }
+
+    def test_log_is_drained_after_unblocked_tests(self):
+        driver = ChromiumDriver()
+        plugin = browser_profiles.BrowserProfilePlugin(Config(), lambda: driver)
+        full, lean = Item(), Item("lean")
+        full.session.items = lean.session.items = [full, lean]
+        run_test(plugin, full, [loading_failed("Image")])
+        assert driver.performance_log == [] and full.user_properties == []
+        run_test(plugin, lean)
+        assert plugin.summary()["lean"]["blocked"] == 0
+
+    def test_browser_without_devtools_warns_once(self, caplog):
+        driver = types.SimpleNamespace(performance_log=[])
+        plugin = browser_profiles.BrowserProfilePlugin(Config(browser="firefox"), lambda: driver)
+        with caplog.at_level(logging.WARNING):
+            run_test(plugin, Item("lean"))
+            run_test(plugin, Item("lean"))
+        assert len([record for record in caplog.records if "cannot switch profiles" in record.message]) == 1
+        assert plugin.summary() == {}
+
+
+def test_terminal_summary():
+    lines = []
+
+    class Reporter:
+        def write_sep(self, sep, title):
+            lines.append(title)
+
+        def write_line(self, line):
+            lines.append(line)
+
+    browser_profiles.write_terminal_summary(
+        Reporter(), {"full": {"tests": 3, "blocked": 0, "estimated_bytes": 0, "by_type": {}}}
+    )
+    assert lines == []
+    browser_profiles.write_terminal_summary(
+        Reporter(), {"lean": {"tests": 2, "blocked": 30, "estimated_bytes": 1_200_000, "by_type": {"Font": 30}}}
+    )
+    assert lines[0] == "browser profiles"
+    assert "30 requests blocked" in lines[1] and "~1.2 MB estimated saved" in lines[1] and "Font: 30" in lines[1]
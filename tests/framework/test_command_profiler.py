@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from utils import command_profiler
+
+
+def event(name):
+    return {"name": name, "ph": "X", "pid": 1, "tid": 1, "ts": 0, "dur": 1}
+
+
+def names(trace_path):
+    with open(trace_path) as trace_file:
+        return [entry["name"] for entry in json.load(trace_file)["traceEvents"]]
+
+
+class TestTrace:
+    def test_controller_folds_the_parts_of_its_workers(self, tmp_path):
+        trace_path = str(tmp_path / "trace.json")
+        command_profiler.write_trace(trace_path, [event("gw0 command")], "run1", "gw0")
+        command_profiler.write_trace(trace_path, [event("gw1 command")], "run1", "gw1")
+        command_profiler.write_trace(trace_path, [], "run1")
+        assert names(trace_path) == ["process_name", "process_name", "gw0 command", "process_name", "gw1 command"]
+        # The parts are gone once folded in
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["trace.json"]
+
+    def test_parts_of_another_run_are_left_out(self, tmp_path):
+        trace_path = str(tmp_path / "trace.json")
+        # An interrupted xdist run never got to fold its parts
+        command_profiler.write_trace(trace_path, [event("stale")], "old", "gw0")
+        command_profiler.write_trace(trace_path, [event("main command")], "new")
+        assert names(trace_path) == ["process_name", "main command"]
+        assert (tmp_path / "trace-old-gw0.json").exists()
+
+    def test_worker_writes_only_its_part(self, tmp_path):
+        trace_path = str(tmp_path / "traces" / "trace")
+        command_profiler.write_trace(trace_path, [event("command")], "run1", "gw3")
+        assert [path.name for path in (tmp_path / "traces").iterdir()] == ["trace-run1-gw3.json"]
+
+
+@pytest.mark.parametrize("seconds, label", [
+    (0.0005, "<=1ms"),
+    (0.001, "<=1ms"),
+    (0.0011, "<=2ms"),
+    (4.9, "<=5000ms"),
+    (6.0, ">5000ms"),
+])
+def test_histogram_label(seconds, label):
+    assert command_profiler.histogram_label(seconds) == label
+
+
+@pytest.mark.parametrize("budget, stats, violations", [
+    ({"max_commands": 10}, {"commands": 10, "seconds": 1.0, "slowest": 0.1}, 0),
+    ({"max_commands": 10}, {"commands": 11, "seconds": 1.0, "slowest": 0.1}, 1),
+    ({"max_seconds": 0.5, "max_command_seconds": 0.05}, {"commands": 1, "seconds": 1.0, "slowest": 0.1}, 2),
+])
+def test_budget_violations(budget, stats, violations):
+    marker = pytest.mark.webdriver_budget(**budget).mark
+    assert len(command_profiler.budget_violations(marker, stats)) == violations
@@ -0,0 +1,105 @@
+import subprocess
+import threading
+import time
+import types
+
+import pytest
+
+from utils import driver_cache
+
+
+@pytest.fixture
+def downloads(tmp_path, monkeypatch):
+    """Stand-in webdriver_manager: every download writes a new binary and is counted"""
+    calls = []
+
+    def download(browser_name):
+        calls.append(browser_name)
+        # Long enough for the other workers to pile up on the lock
+        time.sleep(0.1)
+        path = tmp_path / "downloads" / str(len(calls)) / "chromedriver"
+        path.parent.mkdir(parents=True)
+        path.write_text("driver %s" % len(calls))
+        return str(path)
+
+    monkeypatch.setattr(driver_cache, "download_driver", download)
+    monkeypatch.setattr(driver_cache, "detect_browser_major_version", lambda browser_name: "120")
+    return calls
+
+
+class TestResolve:
+    def test_downloaded_once_then_read_from_the_cache(self, downloads, tmp_path):
+        cache_dir = str(tmp_path / "cache")
+        path = driver_cache.resolve_driver_binary("chrome", cache_dir)
+        assert path == str(tmp_path / "cache" / "chrome" / "120" / "chromedriver")
+        assert driver_cache.resolve_driver_binary("chrome", cache_dir, offline=True) == path
+        assert downloads == ["chrome"]
+
+    def test_workers_starting_together_download_once(self, downloads, tmp_path):
+        cache_dir = str(tmp_path / "cache")
+        paths = []
+        threads = [
+            threading.Thread(target=lambda: paths.append(driver_cache.resolve_driver_binary("chrome", cache_dir)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert downloads == ["chrome"]
+        assert len(set(paths)) == 1 and len(paths) == 4
+
+    def test_offline_without_a_cached_driver(self, downloads, tmp_path):
+        with pytest.raises(driver_cache.DriverCacheError, match="No cached chrome driver for browser version 120"):
+            driver_cache.resolve_driver_binary("chrome", str(tmp_path / "cache"), offline=True)
+        assert downloads == []
+
+    def test_new_browser_version_gets_its_own_driver(self, downloads, tmp_path, monkeypatch):
+        cache_dir = str(tmp_path / "cache")
+        old = driver_cache.resolve_driver_binary("chrome", cache_dir)
+        monkeypatch.setattr(driver_cache, "detect_browser_major_version", lambda browser_name: "121")
+        assert driver_cache.resolve_driver_binary("chrome", cache_dir) != old
+        assert len(downloads) == 2
+
+    def test_unknown_browser_version_uses_the_newest_cached_driver(self, downloads, tmp_path, monkeypatch):
+        cache_dir = str(tmp_path / "cache")
+        driver_cache.resolve_driver_binary("chrome", cache_dir)
+        monkeypatch.setattr(driver_cache, "detect_browser_major_version", lambda browser_name: "121")
+        newest = driver_cache.resolve_driver_binary("chrome", cache_dir)
+        monkeypatch.setattr(driver_cache, "detect_browser_major_version", lambda browser_name: None)
+        assert driver_cache.resolve_driver_binary("chrome", cache_dir, offline=True) == newest
+
+    def test_cached_binary_deleted_behind_our_back(self, downloads, tmp_path):
+        cache_dir = str(tmp_path / "cache")
+        path = driver_cache.resolve_driver_binary("chrome", cache_dir)
+        (tmp_path / "cache" / "chrome" / "120" / "chromedriver").unlink()
+        assert driver_cache.resolve_driver_binary("chrome", cache_dir) == path
+        assert len(downloads) == 2
+
+    def test_broken_manifest_is_rebuilt(self, downloads, tmp_path):
+        (tmp_path / "cache").mkdir()
+        (tmp_path / "cache" / driver_cache.MANIFEST_NAME).write_text("{not json")
+        assert driver_cache.resolve_driver_binary("chrome", str(tmp_path / "cache"))
+        assert driver_cache._read_manifest(str(tmp_path / "cache"))["chrome"]["120"].endswith("chromedriver")
+
+    def test_browsers_without_a_driver_binary(self, downloads, tmp_path):
+        assert driver_cache.resolve_driver_binary("fake", str(tmp_path / "cache")) is None
+        assert downloads == []
+
+
+class TestBrowserVersion:
+    def test_first_command_that_answers(self, monkeypatch):
+        def run(command, **kwargs):
+            if command[0] == "google-chrome":
+                raise FileNotFoundError(command[0])
+            return types.SimpleNamespace(stdout="Google Chrome 120.0.6099.109 \n")
+
+        monkeypatch.setattr(driver_cache.subprocess, "run", run)
+        assert driver_cache.detect_browser_major_version("chrome") == "120"
+
+    def test_no_browser_installed(self, monkeypatch):
+        def run(command, **kwargs):
+            raise subprocess.TimeoutExpired(command, 10)
+
+        monkeypatch.setattr(driver_cache.subprocess, "run", run)
+        assert driver_cache.detect_browser_major_version("firefox") is None
@@ -0,0 +1,174 @@
+import threading
+
+import pytest
+
+from utils import driver_pool
+from utils import fake_webdriver
+
+PAGE = "<html><head><title>Pool</title></head><body><a href='/other' target='_blank'>Open</a></body></html>"
+
+
+class Factory:
+    """Launches fake browsers; `gate` holds back every launch after the first `free` ones"""
+
+    def __init__(self, tmp_path, free=None):
+        (tmp_path / "index.html").write_text(PAGE)
+        (tmp_path / "other").write_text(PAGE)
+        self.site = fake_webdriver.directory_site(tmp_path)
+        self.free = free
+        self.gate = threading.Event()
+        self.drivers = []
+        self.fail_next = False
+
+    def __call__(self):
+        if self.free is not None and len(self.drivers) >= self.free:
+            assert self.gate.wait(timeout=10)
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError("browser crashed on start")
+        driver = fake_webdriver.FakeDriver(self.site)
+        driver.quitted = threading.Event()
+        original_quit = driver.quit
+
+        def quit():
+            original_quit()
+            driver.quitted.set()
+
+        driver.quit = quit
+        self.drivers.append(driver)
+        return driver
+
+
+@pytest.fixture
+def factory(tmp_path):
+    return Factory(tmp_path)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(factory, **options):
+        pool = driver_pool.DriverPool(factory, **options)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.factory.gate.set()
+        pool.close()
+
+
+class TestSwap:
+    def test_standby_takes_over(self, factory, make_pool):
+        swapped = []
+        pool = make_pool(factory, on_swap=swapped.append)
+        first = pool.driver
+        pool._standby.result()
+
+        new = pool.swap("test")
+        assert new is factory.drivers[1] and pool.driver is new
+        assert swapped == [first, new] and pool.swaps == ["test"]
+        assert first.quitted.wait(timeout=5)
+        # The next standby is already on its way
+        assert pool._standby.result() is factory.drivers[2]
+
+    def test_old_browser_quits_while_the_next_standby_starts(self, tmp_path, make_pool):
+        factory = Factory(tmp_path, free=2)
+        pool = make_pool(factory)
+        first = pool.driver
+        pool._standby.result()
+
+        pool.swap("test")
+        # The third launch is held at the gate; the quit must not wait for it
+        assert first.quitted.wait(timeout=5)
+        assert not pool._standby.done()
+        factory.gate.set()
+        assert pool._standby.result() is factory.drivers[2]
+
+    def test_failed_standby_is_replaced(self, factory, make_pool):
+        factory.fail_next = True
+        pool = make_pool(factory, parallel_start=True)
+        assert pool.swap("test") is factory.drivers[1]
+
+    def test_without_standby(self, factory, make_pool):
+        pool = make_pool(factory, standby=False)
+        assert pool._standby is None
+        assert pool.swap("test") is factory.drivers[1]
+        assert pool._standby is None
+
+    def test_lazy_pool_starts_on_first_use(self, factory, make_pool):
+        pool = make_pool(factory, lazy=True)
+        assert not pool.started and factory.drivers == []
+        assert pool.browser_processes() == []
+        assert pool.driver is factory.drivers[0]
+        assert pool.started
+
+    def test_unused_lazy_pool_closes_cleanly(self, factory, make_pool):
+        make_pool(factory, lazy=True).close()
+        assert factory.drivers == []
+
+    def test_close_quits_everything(self, factory, make_pool):
+        pool = make_pool(factory)
+        pool.swap("test")
+        pool.close()
+        assert all(driver.quitted.is_set() for driver in factory.drivers)
+
+
+class TestRelease:
+    def test_dead_browser_is_swapped_at_once(self, factory, make_pool):
+        pool = make_pool(factory)
+        pool.driver.quit()
+        assert pool.release(reset=False) is factory.drivers[1]
+        assert pool.swaps == ["browser stopped responding"]
+
+    def test_recycled_after_n_tests(self, factory, make_pool):
+        pool = make_pool(factory, recycle_after=2)
+        first = pool.driver
+        assert pool.release(reset=True) is first
+        # Only recycled between classes
+        assert pool.release(reset=False) is first
+        assert pool.release(reset=True) is not first
+        assert pool.swaps == ["served 3 tests"]
+
+    def test_reset_leaves_one_blank_window(self, factory, make_pool):
+        pool = make_pool(factory)
+        driver = pool.driver
+        driver.get("/")
+        driver.add_cookie({"name": "session", "value": "1"})
+        driver.find_element("link text", "Open").click()
+        assert len(driver.window_handles) == 2
+
+        assert pool.release(reset=True) is driver
+        assert driver.window_handles == [driver.current_window_handle]
+        assert driver.current_url == "about:blank"
+        driver.get("/")
+        assert driver.get_cookies() == []
+
+    def test_several_origins_swap_browsers_without_devtools(self, factory, make_pool):
+        pool = make_pool(factory)
+        driver = pool.driver
+        driver.get("http://one.test/")
+        pool.release(reset=False)
+        driver.get("http://two.test/")
+        assert pool.release(reset=True) is not driver
+        assert pool.swaps == ["tests left the base origin (2 origins)"]
+
+    def test_rss_is_zero_without_psutil(self, factory, make_pool, monkeypatch):
+        monkeypatch.setattr(driver_pool, "psutil", None)
+        pool = make_pool(factory, max_rss_mb=1)
+        assert pool.browser_rss_mb() == 0.0
+        assert pool.browser_processes() == []
+        assert pool.release(reset=True) is pool.driver
+
+
+def test_active_driver_follows_swaps(factory, make_pool):
+    pool = make_pool(factory)
+    active = driver_pool.ActiveDriver(pool)
+    active.get("/")
+    assert factory.drivers[0].title == "Pool"
+    pool.swap("test")
+    assert active.current_url == "about:blank"
+    assert active.session_id is pool.driver.session_id
+    active.base_url = "http://other.test/"
+    assert pool.driver.base_url == "http://other.test/"
@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.duration_scheduler import LongestFirstScheduling
+from utils.duration_scheduler import dispatch_order
+from utils.duration_scheduler import predict_makespan
+
+COLLECTION = ["t.py::a", "t.py::b", "t.py::c", "t.py::d", "t.py::e"]
+DURATIONS = {"t.py::a": 1.0, "t.py::b": 5.0, "t.py::c": 2.0, "t.py::d": 3.0}
+# d is mandatory; a and c are ordered against each other
+TIERS = {"t.py::d": 0}
+GROUPS = {"t.py::a": "session", "t.py::c": "session"}
+
+
+class FakeNode:
+    def __init__(self, worker_id):
+        self.gateway = SimpleNamespace(id=worker_id)
+        self.shutting_down = False
+        self.sent = []
+
+    def send_runtest_some(self, indices):
+        self.sent.extend(indices)
+
+    def shutdown(self):
+        self.shutting_down = True
+
+
+def test_dispatch_order():
+    # Priority tier first, then the longest unit; e has no history and is predicted at the median
+    assert dispatch_order(COLLECTION, TIERS, GROUPS, DURATIONS) == [([3], 3.0), ([1], 5.0), ([0, 2], 3.0), ([4], 2.5)]
+
+
+def test_predict_makespan():
+    units = dispatch_order(COLLECTION, TIERS, GROUPS, DURATIONS)
+    assert predict_makespan(units, 2) == 7.5
+    assert predict_makespan(units, 1) == pytest.approx(13.5)
+
+
+class TestLongestFirstScheduling:
+    @pytest.fixture
+    def plugin(self):
+        return SimpleNamespace(
+            durations=DURATIONS,
+            load_collection_info=lambda worker_id: (TIERS, GROUPS),
+            predicted_makespan=None,
+            workers=1,
+        )
+
+    @pytest.fixture
+    def collect_reports(self):
+        return []
+
+    @pytest.fixture
+    def scheduler(self, plugin, collect_reports):
+        config = SimpleNamespace(
+            getvalue=lambda name: ["2*popen"],
+            getoption=lambda name: None,
+            hook=SimpleNamespace(pytest_collectreport=lambda report: collect_reports.append(report)),
+        )
+        return LongestFirstScheduling(config, plugin=plugin)
+
+    def start(self, scheduler, nodes):
+        for node in nodes:
+            scheduler.add_node(node)
+        for node in nodes:
+            scheduler.add_node_collection(node, COLLECTION)
+        scheduler.schedule()
+
+    def test_units_go_out_longest_first(self, scheduler, plugin):
+        nodes = [FakeNode("gw0"), FakeNode("gw1")]
+        self.start(scheduler, nodes)
+        assert plugin.predicted_makespan == 7.5
+        assert plugin.workers == 2
+        # Two tests queued per worker; an ordered unit is never split
+        assert nodes[0].sent == [3, 1]
+        assert nodes[1].sent == [0, 2]
+        scheduler.mark_test_complete(nodes[0], 3)
+        assert nodes[0].sent == [3, 1, 4]
+        assert nodes[0].shutting_down
+        assert scheduler.pending == []
+
+    def test_different_collections_abort(self, scheduler, collect_reports):
+        nodes = [FakeNode("gw0"), FakeNode("gw1")]
+        for node in nodes:
+            scheduler.add_node(node)
+        scheduler.add_node_collection(nodes[0], COLLECTION)
+        scheduler.add_node_collection(nodes[1], COLLECTION[:-1])
+        scheduler.schedule()
+        assert scheduler.collection is None
+        assert [report.failed for report in collect_reports] == [True]
+        assert nodes[0].sent == nodes[1].sent == []
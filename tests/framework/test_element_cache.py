@@ -0,0 +1,49 @@
+import pytest
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+
+from pages import BasePageClass
+from tests.framework.conftest import FIXTURE_URL
+
+ROWS = (By.CSS_SELECTOR, ".data-row")
+NAMES = (By.CSS_SELECTOR, "td.name")
+MISSING = (By.CSS_SELECTOR, ".no-such-element")
+SAME_PAGE_LINKS = (By.CSS_SELECTOR, ".same-page-link")
+
+
+class TestElementCache:
+    def test_hit_after_miss(self, page):
+        page.go_to_page(FIXTURE_URL + "table?rows=3")
+        first = page.get_cached_elements(ROWS)
+        assert page.get_cached_elements(ROWS) is first
+        assert len(first) == 3
+        assert BasePageClass.element_cache_stats == {"hits": 1, "misses": 1, "stale": 0}
+
+    def test_navigation_invalidates(self, page):
+        page.go_to_page(FIXTURE_URL + "table?rows=3")
+        page.get_cached_elements(ROWS)
+        page.go_to_page(FIXTURE_URL + "table?rows=5")
+        assert len(page.get_cached_elements(ROWS)) == 5
+        assert BasePageClass.element_cache_stats["misses"] == 2
+
+    def test_stale_elements_are_resolved_again(self, page, fake_driver):
+        page.go_to_page(FIXTURE_URL + "table?rows=3")
+        page.get_cached_elements(NAMES)
+        # Reloaded behind the page object's back, so its cache still holds the old elements
+        fake_driver.refresh()
+        texts = page.interact_with_element(NAMES, lambda elements: [element.text for element in elements])
+        assert texts == ["Name 0", "Name 1", "Name 2"]
+        assert BasePageClass.element_cache_stats["stale"] == 1
+
+    def test_missing_element_times_out_on_the_policy_timeout(self, page, clock):
+        page.go_to_page(FIXTURE_URL + "table?rows=3")
+        start = clock.now
+        with pytest.raises(TimeoutException, match="Element not visible"):
+            page.get_cached_elements(MISSING, state="visible")
+        assert clock.now - start == pytest.approx(page.wait_policy.timeout)
+        assert MISSING not in page._element_cache
+
+    def test_a_click_forgets_the_page(self, page):
+        page.go_to_page(FIXTURE_URL + "links")
+        page.click_on_single_element(SAME_PAGE_LINKS)
+        assert page._element_cache == {}
@@ -0,0 +1,121 @@
+import pytest
+from selenium.common.exceptions import InvalidSelectorException
+from selenium.common.exceptions import JavascriptException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
+
+from utils import fake_webdriver
+
+PAGE = """
+<html><head><title>Fixture</title><style>.gone { display: none; }</style></head>
+<body>
+  <ul id="menu">
+    <li class="item first" data-id="a1">Alpha</li>
+    <li class="item" data-id="b2">Beta</li>
+    <li class="item gone" data-id="c3">Gamma</li>
+  </ul>
+  <form>
+    <input name="q" type="text">
+    <input name="token" type="hidden" value="secret">
+    <input name="agree" type="checkbox" checked>
+    <button id="go" disabled>Go</button>
+  </form>
+  <p style="display: none"><a href="/hidden">Hidden link</a></p>
+  <a href="/next" class="nav">Next page</a>
+</body></html>
+"""
+
+
+@pytest.fixture
+def driver(tmp_path):
+    (tmp_path / "index.html").write_text(PAGE)
+    driver = fake_webdriver.FakeDriver(fake_webdriver.directory_site(tmp_path))
+    driver.get("/")
+    return driver
+
+
+def texts(elements):
+    return [element.text for element in elements]
+
+
+class TestCssSelectors:
+    @pytest.mark.parametrize("selector, expected", [
+        ("li", ["Alpha", "Beta", ""]),
+        ("#menu > li.first", ["Alpha"]),
+        ('li[data-id="b2"]', ["Beta"]),
+        ("li[data-id^='c']", [""]),
+        ("li[class~=first]", ["Alpha"]),
+        ("li:not(.first)", ["Beta", ""]),
+        ("li:last-child", [""]),
+        ("li:nth-child(2)", ["Beta"]),
+        ("li.first + li", ["Beta"]),
+        ("li.first ~ li", ["Beta", ""]),
+        ("ul li, a.nav", ["Alpha", "Beta", "", "Next page"]),
+    ])
+    def test_matches(self, driver, selector, expected):
+        assert texts(driver.find_elements(By.CSS_SELECTOR, selector)) == expected
+
+    def test_state_pseudo_classes(self, driver):
+        assert [e.get_attribute("name") for e in driver.find_elements(By.CSS_SELECTOR, "input:checked")] == ["agree"]
+        assert driver.find_element(By.CSS_SELECTOR, "button:disabled").get_attribute("id") == "go"
+        assert not driver.find_elements(By.CSS_SELECTOR, "button:enabled")
+
+    def test_unsupported_selector_is_rejected(self, driver):
+        with pytest.raises(InvalidSelectorException):
+            driver.find_elements(By.CSS_SELECTOR, "li::before")
+
+
+class TestXpath:
+    @pytest.mark.parametrize("xpath, expected", [
+        ("//li", ["Alpha", "Beta", ""]),
+        ("/html/body/ul/li[2]", ["Beta"]),
+        ("//li[last()]", [""]),
+        ("//li[@data-id='a1']", ["Alpha"]),
+        ("//li[contains(@class, 'first') or @data-id='b2']", ["Alpha", "Beta"]),
+        ("//li[starts-with(@data-id, 'b')]", ["Beta"]),
+        ("//li[text()='Alpha' or text()='Beta']", ["Alpha", "Beta"]),
+        ("//a[normalize-space()='Next page']", ["Next page"]),
+    ])
+    def test_matches(self, driver, xpath, expected):
+        assert texts(driver.find_elements(By.XPATH, xpath)) == expected
+
+    def test_relative_to_element(self, driver):
+        menu = driver.find_element(By.ID, "menu")
+        assert driver.find_element(By.XPATH, "//li[@data-id='b2']/..") == menu
+        assert texts(menu.find_elements(By.XPATH, ".//li[@data-id!='a1']")) == ["Beta", ""]
+
+    def test_unsupported_function_is_rejected(self, driver):
+        with pytest.raises(InvalidSelectorException):
+            driver.find_elements(By.XPATH, "//li[not(@data-id='a1')]")
+
+
+class TestDocument:
+    def test_other_locators(self, driver):
+        assert texts(driver.find_elements(By.CLASS_NAME, "first")) == ["Alpha"]
+        assert driver.find_element(By.NAME, "q").tag_name == "input"
+        assert driver.find_element(By.LINK_TEXT, "Next page").get_attribute("href").endswith("/next")
+        assert texts(driver.find_elements(By.PARTIAL_LINK_TEXT, "Next")) == ["Next page"]
+        # Link text is the rendered text, which a hidden link does not have
+        assert not driver.find_elements(By.PARTIAL_LINK_TEXT, "Hidden")
+
+    def test_hidden_elements_are_not_displayed(self, driver):
+        assert not driver.find_element(By.CSS_SELECTOR, "li.gone").is_displayed()
+        assert not driver.find_element(By.NAME, "token").is_displayed()
+        assert not driver.find_element(By.CSS_SELECTOR, "p a").is_displayed()
+        assert driver.find_element(By.CSS_SELECTOR, "a.nav").is_displayed()
+
+    def test_elements_of_an_old_document_are_stale(self, driver):
+        item = driver.find_element(By.CSS_SELECTOR, "li.first")
+        driver.refresh()
+        with pytest.raises(StaleElementReferenceException):
+            item.click()
+
+    def test_unknown_script_is_rejected(self, driver):
+        with pytest.raises(JavascriptException):
+            driver.execute_script("return window.innerWidth;")
+
+    def test_fixture_site_table(self, fake_driver):
+        fake_driver.get("/table?rows=5")
+        rows = fake_driver.find_elements(By.CSS_SELECTOR, ".data-row")
+        assert [row.get_attribute("data-index") for row in rows] == ["0", "1", "2", "3", "4"]
+        assert fake_driver.find_element(By.CSS_SELECTOR, ".data-row:nth-of-type(2) td.name").text == "Name 1"
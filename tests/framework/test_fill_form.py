@@ -0,0 +1,69 @@
+import pytest
+from selenium.webdriver.common.by import By
+
+from benchmarks.fixture_site import FORM_FIELDS
+from tests.framework.conftest import FIXTURE_URL
+
+FORM = {
+    **{(By.ID, field): f"{field} value" for field in FORM_FIELDS},
+    (By.ID, "country"): "United States",
+}
+MISSING = (By.ID, "middle_name")
+
+
+def value_of(fake_driver, element_id):
+    return fake_driver.find_element(By.ID, element_id).get_attribute("value")
+
+
+class TestFillForm:
+    @pytest.fixture(autouse=True)
+    def form_page(self, page):
+        page.go_to_page(FIXTURE_URL + "form")
+
+    def test_every_field_in_one_script_call(self, page, fake_driver, monkeypatch):
+        scripts = []
+        execute_script = fake_driver.execute_script
+        monkeypatch.setattr(fake_driver, "execute_script", lambda *args: scripts.append(args) or execute_script(*args))
+        result = page.fill_form(FORM)
+        assert len(scripts) == 1
+        assert all(field["ok"] for field in result.values())
+        assert value_of(fake_driver, "city") == "city value"
+        # Options are picked by label or value
+        assert result[(By.ID, "country")]["value"] == "us"
+
+    def test_unknown_option(self, page):
+        result = page.fill_form({(By.ID, "country"): "Atlantis"})
+        assert result[(By.ID, "country")] == {"ok": False, "value": "", "error": "no option Atlantis"}
+
+    def test_missing_field_fails_fast(self, page, fake_driver, clock):
+        start = clock.now
+        result = page.fill_form({**FORM, MISSING: "x"})
+        assert clock.now - start < page.wait_policy.timeout / 10
+        assert clock.now - start >= page._MISSING_FIELD_TIMEOUT
+        assert result[MISSING] == {"ok": False, "value": None, "error": "not found"}
+        # The fields that are there are still filled
+        assert result[(By.ID, "email")]["ok"] and value_of(fake_driver, "email") == "email value"
+
+    def test_waits_while_the_form_is_not_there_yet(self, page, clock):
+        page.go_to_page(FIXTURE_URL + "table?rows=1")
+        start = clock.now
+        result = page.fill_form({MISSING: "x"}, timeout=3)
+        assert clock.now - start == pytest.approx(3)
+        assert result[MISSING]["error"] == "not found"
+
+    def test_typed_natively_then_verified(self, page, fake_driver):
+        result = page.fill_form(FORM, type_natively=[(By.ID, "phone")])
+        assert result[(By.ID, "phone")] == {"ok": True, "value": "phone value", "error": None}
+        assert all(field["ok"] for field in result.values())
+
+    def test_missing_field_next_to_typed_ones_fails_fast(self, page, fake_driver, clock):
+        start = clock.now
+        fields = {(By.ID, "phone"): "123", MISSING: "x"}
+        result = page.fill_form(fields, type_natively=list(fields))
+        assert clock.now - start < page.wait_policy.timeout / 10
+        assert result[(By.ID, "phone")]["ok"] and result[MISSING]["error"] == "not found"
+
+    def test_element_index(self, page, fake_driver):
+        result = page.fill_form({(By.CSS_SELECTOR, "input[type=text]", 2): "third"})
+        assert result[(By.CSS_SELECTOR, "input[type=text]", 2)]["ok"]
+        assert value_of(fake_driver, FORM_FIELDS[2]) == "third"
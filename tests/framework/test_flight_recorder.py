@@ -0,0 +1,175 @@
+import json
+import time
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from utils import flight_recorder
+from utils.flight_recorder import FlightRecorder
+from utils.flight_recorder import RingBuffer
+
+
+class ConsoleDriver:
+    """Hands out its console log once per get_log("browser"), like Chromium"""
+
+    def __init__(self):
+        self.console = []
+        self.reads = 0
+        self.current_url = "http://fixture.test/"
+        self.page_source = "<html><body>Failed here</body></html>"
+
+    def log(self, message, at=None):
+        self.console.append({"level": "SEVERE", "message": message, "timestamp": (at or time.time()) * 1000})
+
+    def get_log(self, log_type):
+        self.reads += 1
+        entries, self.console = self.console, []
+        return entries
+
+
+class TestRingBuffer:
+    def test_keeps_the_last_entries_in_order(self):
+        ring = RingBuffer(3)
+        for entry in range(5):
+            ring.append(entry)
+        assert ring.items() == [2, 3, 4] and len(ring) == 3
+        ring.clear()
+        assert ring.items() == [] and len(ring) == 0
+
+    def test_partly_filled(self):
+        ring = RingBuffer(3)
+        ring.append("a")
+        assert ring.items() == ["a"] and len(ring) == 1
+
+    def test_zero_capacity_keeps_nothing(self):
+        ring = RingBuffer(0)
+        ring.append("a")
+        assert ring.items() == []
+
+
+def test_short_repr():
+    class Broken:
+        def __repr__(self):
+            raise WebDriverException("stale element")
+
+    assert flight_recorder.short_repr("x" * 300) == repr("x" * 300)[:flight_recorder.MAX_REPR] + "..."
+    assert flight_recorder.short_repr(Broken()) == "<Broken: WebDriverException>"
+
+
+class TestRecorder:
+    def test_steps_and_errors(self):
+        recorder = FlightRecorder(capacity=10)
+
+        class Page:
+            def click(self, locator, index=None):
+                return locator
+
+            def fail(self):
+                raise ValueError("no such button")
+
+        flight_recorder.record_page_class(Page, recorder)
+        Page().click(("id", "go"), index=2)
+        with pytest.raises(ValueError):
+            Page().fail()
+        steps = recorder.snapshot(ConsoleDriver())["steps"]
+        assert [(step["step"], step["args"], step["kwargs"], step["error"]) for step in steps] == [
+            ("Page.click", ["('id', 'go')"], {"index": "2"}, None),
+            ("Page.fail", [], {}, "ValueError('no such button')"),
+        ]
+
+    def test_allure_steps(self):
+        recorder = FlightRecorder(capacity=10)
+        recorder.start_step("1", "Log in", {})
+        recorder.stop_step("1", ValueError, ValueError("locked"), None)
+        # A step that was never started is ignored
+        recorder.stop_step("2", None, None, None)
+        assert [(step["step"], step["error"]) for step in recorder.snapshot(ConsoleDriver())["steps"]] == [
+            ("step: Log in", "ValueError('locked')")
+        ]
+
+    def test_commands(self):
+        recorder = FlightRecorder(capacity=2)
+        for command in ("get", "findElement", "clickElement"):
+            recorder.on_command((command, time.perf_counter(), 0.01, 10, None))
+        commands = recorder.snapshot(ConsoleDriver())["commands"]
+        assert [(command["command"], command["ms"], command["thread"]) for command in commands] == [
+            ("findElement", 10.0, "helper"), ("clickElement", 10.0, "helper")
+        ]
+
+
+class TestConsole:
+    def test_drained_after_every_test_and_kept_rolling(self):
+        recorder = FlightRecorder(capacity=3)
+        driver = ConsoleDriver()
+        for message in ("one", "two", "three", "four"):
+            driver.log(message)
+            recorder.drain_console(driver)
+        assert driver.console == []
+        assert [entry["message"] for entry in recorder.console.items()] == ["two", "three", "four"]
+
+    def test_dump_shows_the_entries_of_the_failed_test(self):
+        recorder = FlightRecorder(capacity=10)
+        driver = ConsoleDriver()
+        driver.log("earlier test", at=time.time() - 60)
+        recorder.drain_console(driver)
+        recorder.start_test()
+        driver.log("this test")
+        assert [entry["message"] for entry in recorder.read_console(driver)] == ["this test"]
+
+    def test_browser_without_a_console_log_is_asked_once(self):
+        class FirefoxDriver(ConsoleDriver):
+            def get_log(self, log_type):
+                self.reads += 1
+                raise WebDriverException("HTTP method not allowed")
+
+        recorder = FlightRecorder(capacity=10)
+        driver = FirefoxDriver()
+        recorder.drain_console(driver)
+        assert recorder.read_console(driver) == []
+        assert driver.reads == 1
+
+
+def test_dump(tmp_path):
+    recorder = FlightRecorder(capacity=10)
+    driver = ConsoleDriver()
+    recorder.start_test()
+    driver.log("Uncaught TypeError")
+    path = recorder.dump(driver, "tests/test_a.py::test_b", str(tmp_path), "gw0")
+    record = json.loads(open(path).read())
+    assert record["test"] == "tests/test_a.py::test_b" and record["url"] == "http://fixture.test/"
+    assert [entry["message"] for entry in record["console"]] == ["Uncaught TypeError"]
+    assert open(path[:-len(".json")] + ".html").read() == driver.page_source
+
+
+class TestPlugin:
+    @pytest.fixture
+    def plugin(self, tmp_path):
+        class Page:
+            def open(self):
+                pass
+
+        class Profiler:
+            listeners = []
+
+        self.driver = ConsoleDriver()
+        plugin = flight_recorder.FlightRecorderPlugin(None, Page, Profiler, str(tmp_path), lambda: self.driver)
+        yield plugin
+        plugin.pytest_unconfigure(None)
+
+    def test_console_is_drained_after_the_test(self, plugin):
+        plugin.pytest_runtest_setup(None)
+        hook = plugin.pytest_runtest_call(None)
+        next(hook)
+        self.driver.log("during the test")
+        with pytest.raises(StopIteration):
+            next(hook)
+        assert self.driver.console == []
+        assert [entry["message"] for entry in plugin.recorder.console.items()] == ["during the test"]
+
+    def test_no_browser_yet(self, plugin):
+        self.driver = None
+        hook = plugin.pytest_runtest_call(None)
+        next(hook)
+        with pytest.raises(StopIteration):
+            next(hook)
+        assert plugin.recorder.console.items() == []
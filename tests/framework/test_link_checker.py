@@ -0,0 +1,120 @@
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from utils import link_checker
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        if self.path == "/get-only":
+            self.answer(405)
+        else:
+            self.do_GET()
+
+    def do_GET(self):
+        self.server.requests.append((self.command, self.path))
+        self.server.cookies.append((self.headers["Host"].split(":")[0], self.path, self.headers.get("Cookie")))
+        if self.path == "/old":
+            self.answer(301, {"Location": "/ok"})
+        elif self.path in ("/ok", "/get-only"):
+            self.answer(200)
+        else:
+            self.answer(404)
+
+    def answer(self, status, headers=None):
+        body = b"" if self.command == "HEAD" else b"body"
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = []
+    server.cookies = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def base_url(server):
+    server.requests.clear()
+    server.cookies.clear()
+    return "http://127.0.0.1:%s" % server.server_port
+
+
+@pytest.mark.parametrize("href, onclick, expected", [
+    (None, None, True),
+    ("", None, True),
+    ("javascript:void(0)", None, True),
+    ("#top", None, True),
+    ("https://example.com/page#top", None, True),
+    ("https://example.com/other#top", None, False),
+    ("https://example.com/other", "track()", True),
+    ("https://example.com/other", None, False),
+])
+def test_needs_browser(href, onclick, expected):
+    assert link_checker.needs_browser(href, onclick, page_url="https://example.com/page") is expected
+
+
+class TestCheckLinks:
+    def test_statuses_and_redirects(self, base_url):
+        ok, old, missing = link_checker.check_links([base_url + "/ok", base_url + "/old", base_url + "/missing"])
+        assert (ok["status"], ok["ok"], ok["redirects"]) == (200, True, [])
+        assert (old["status"], old["final_url"], old["redirects"]) == (200, base_url + "/ok", ["/ok"])
+        assert (missing["status"], missing["ok"]) == (404, False)
+
+    def test_head_refused_falls_back_to_get(self, base_url, server):
+        result = link_checker.check_link(base_url + "/get-only")
+        assert result["ok"]
+        assert server.requests == [("GET", "/get-only")]
+
+    def test_duplicates_are_checked_once_in_first_seen_order(self, base_url, server):
+        urls = [base_url + "/missing", base_url + "/ok", base_url + "/missing"]
+        results = link_checker.check_links(urls, per_host_rate=0)
+        assert [result["url"] for result in results] == urls[:2]
+        assert sorted(server.requests) == [("HEAD", "/missing"), ("HEAD", "/ok")]
+
+    def test_connection_error(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        url = "http://127.0.0.1:%s/ok" % server.server_port
+        server.server_close()
+        result = link_checker.check_link(url, timeout=2)
+        assert not result["ok"]
+        assert result["status"] is None
+        assert result["error"].startswith("ConnectionError")
+
+    def test_cookies_only_go_where_the_browser_sends_them(self, base_url, server):
+        port = server.server_port
+        cookies = [
+            {"name": "session", "value": "s3cret", "domain": "127.0.0.1", "path": "/", "httpOnly": True},
+            {"name": "scoped", "value": "1", "domain": "127.0.0.1", "path": "/ok", "secure": False},
+            {"name": "https_only", "value": "1", "domain": "127.0.0.1", "path": "/", "secure": True},
+            {"name": "other_site", "value": "1", "domain": ".example.com", "path": "/"},
+        ]
+        urls = [base_url + "/ok", base_url + "/missing", "http://localhost:%s/ok" % port]
+        link_checker.check_links(urls, per_host_rate=0, cookies=cookies)
+        assert sorted(server.cookies) == [
+            ("127.0.0.1", "/missing", "session=s3cret"),
+            ("127.0.0.1", "/ok", "scoped=1; session=s3cret"),
+            # Another host than the cookies' domain gets none of them
+            ("localhost", "/ok", None),
+        ]
+
+    def test_nothing_to_check(self):
+        assert link_checker.check_links([]) == []
@@ -0,0 +1,57 @@
+import pytest
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
+
+from pages import BasePageClass
+from tests.framework.conftest import FIXTURE_URL
+
+
+class TestPollUntil:
+    def test_backs_off_on_the_virtual_clock(self, page, clock):
+        polls = []
+        assert not page._poll_until(lambda: polls.append(clock.now), "never", timeout=2)
+        assert clock.now == pytest.approx(2)
+        assert len(polls) < 2 / BasePageClass._POLL_INTERVAL
+        assert polls[2] - polls[1] > polls[1] - polls[0]
+        assert page.wait_timings[-1] == ("never", pytest.approx(2), False)
+
+    def test_returns_as_soon_as_the_condition_holds(self, page, clock):
+        polls = []
+        assert page._poll_until(lambda: polls.append(clock.now) or len(polls) == 3, "third poll", timeout=2)
+        assert len(polls) == 3
+        assert page.last_wait_seconds == clock.now < 1
+
+    def test_transient_errors_mean_not_yet(self, page):
+        errors = [StaleElementReferenceException("re-rendered")]
+
+        def condition():
+            if errors:
+                raise errors.pop()
+            return True
+
+        assert page._poll_until(condition, "after a re-render", timeout=2)
+
+    def test_other_errors_are_raised(self, page):
+        def condition():
+            raise ValueError("broken condition")
+
+        with pytest.raises(ValueError):
+            page._poll_until(condition, "broken", timeout=2)
+
+
+class TestWaitForNavigation:
+    def test_url_and_ready_state(self, page, fake_driver):
+        fake_driver.get(FIXTURE_URL + "table?rows=3")
+        assert page.wait_for_navigation(url_contains="/table", ready_state="complete")
+        assert page.check_for_new_url("rows=3")
+
+    def test_gives_up_after_the_timeout(self, page, fake_driver, clock):
+        fake_driver.get(FIXTURE_URL + "table?rows=3")
+        assert not page.wait_for_navigation(url_contains="/form", timeout=3)
+        assert clock.now == pytest.approx(3)
+
+    def test_window_count(self, page, fake_driver):
+        fake_driver.get(FIXTURE_URL + "links")
+        assert not page.wait_for_navigation(window_count=2, timeout=1)
+        fake_driver.find_element(By.CSS_SELECTOR, ".new-tab-link").click()
+        assert page.wait_for_navigation(window_count=2, timeout=1)
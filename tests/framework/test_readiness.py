@@ -0,0 +1,50 @@
+import pytest
+from selenium.common.exceptions import JavascriptException
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.select import Select
+
+from pages import BasePageClass
+from tests.framework.conftest import FIXTURE_URL
+
+LOCALES = (By.ID, "locale-select")
+
+
+class TestWaitForPageQuiet:
+    def test_quiet_page_is_counted(self, page):
+        page.go_to_page(FIXTURE_URL + "table?rows=3")
+        assert page.wait_for_page_quiet(legacy_sleep=0.5)
+        assert BasePageClass.readiness_stats == {
+            "waits": 1, "timeouts": 0, "fixed_sleep_seconds": 0.5, "waited_seconds": 0.0
+        }
+
+    def test_busy_page_gives_up_after_twice_the_sleep(self, page, fake_driver, clock, monkeypatch):
+        monkeypatch.setattr(fake_driver, "execute_script", lambda script, *args: {"quiet": False})
+        assert not page.wait_for_page_quiet(legacy_sleep=0.5)
+        assert clock.now == pytest.approx(1.0)
+        assert BasePageClass.readiness_stats["timeouts"] == 1
+        assert BasePageClass.readiness_stats["waited_seconds"] == pytest.approx(1.0)
+
+    def test_without_scripts_it_sleeps_as_before(self, page, fake_driver, clock, monkeypatch):
+        def execute_script(script, *args):
+            raise JavascriptException("scripts disabled")
+
+        monkeypatch.setattr(fake_driver, "execute_script", execute_script)
+        assert page.wait_for_page_quiet(legacy_sleep=0.8)
+        assert clock.now == pytest.approx(0.8)
+
+    @pytest.mark.parametrize("legacy_sleep, timeout", [(0, 5), (0.5, 1.0), (1, 2), (10, 5)])
+    def test_quiet_timeout(self, legacy_sleep, timeout):
+        assert BasePageClass.quiet_timeout(legacy_sleep) == timeout
+
+
+class TestSelectValueFromList:
+    def test_selects_the_option(self, page, fake_driver):
+        page.go_to_page(FIXTURE_URL + "select")
+        assert page.select_value_from_list(LOCALES, index=2)
+        assert Select(fake_driver.find_element(*LOCALES)).first_selected_option.get_attribute("value") == "ta"
+
+    def test_missing_option_times_out(self, page):
+        page.go_to_page(FIXTURE_URL + "select")
+        with pytest.raises(TimeoutException, match="Option 99 not available"):
+            page.select_value_from_list(LOCALES, index=99)
@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+import urllib3
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+
+from utils import fake_webdriver
+from utils import remote_driver
+from utils import stand_in_grid
+
+# selenium 4.0 reads response headers through the accessor urllib3 1.26 deprecates
+pytestmark = pytest.mark.filterwarnings("ignore:HTTPResponse.getheader:DeprecationWarning")
+
+PAGE = "<html><head><title>Grid page</title></head><body><p id='hello'>Hello</p></body></html>"
+
+
+@pytest.fixture
+def grid(tmp_path):
+    (tmp_path / "index.html").write_text(PAGE)
+    grid = stand_in_grid.StandInGrid(lambda: fake_webdriver.directory_site(tmp_path), max_sessions=2)
+    server, url = stand_in_grid.serve_in_thread(grid)
+    grid.url = url
+    yield grid
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def factory(grid, monkeypatch):
+    monkeypatch.setattr(remote_driver, "backoff_delay", lambda attempt: 0.05)
+    factory = remote_driver.RemoteBrowserFactory(grid.url, pool_size=4, session_timeout=5)
+    yield factory
+    factory.close()
+
+
+class TestRetries:
+    @pytest.mark.parametrize("error, expected", [
+        (urllib3.exceptions.MaxRetryError(None, "/session"), True),
+        (ConnectionRefusedError(), True),
+        (SessionNotCreatedException("all 4 slots of the stand-in grid are in use"), True),
+        (SessionNotCreatedException("No nodes support the capabilities in the request"), False),
+        (SessionNotCreatedException("invalid argument: unknown browser"), False),
+        (WebDriverException("no such window"), False),
+        (ValueError(), False),
+    ])
+    def test_is_retryable(self, error, expected):
+        assert remote_driver.is_retryable(error) is expected
+
+    def test_backoff_grows_up_to_the_cap(self, monkeypatch):
+        monkeypatch.setattr(remote_driver.random, "uniform", lambda low, high: (low, high))
+        bounds = [remote_driver.backoff_delay(attempt) for attempt in range(6)]
+        assert bounds == [(0.5, 0.5), (0.5, 1.0), (0.5, 2.0), (0.5, 4.0), (0.5, 8.0), (0.5, 8.0)]
+
+    def test_backoff_is_jittered(self):
+        delays = {remote_driver.backoff_delay(4) for _ in range(20)}
+        assert len(delays) > 1
+        assert all(remote_driver.BACKOFF_START <= delay <= remote_driver.BACKOFF_MAX for delay in delays)
+
+
+class TestStandInGrid:
+    def test_commands_run_on_a_fake_browser(self, factory):
+        driver = factory.create(Options())
+        try:
+            driver.get("/")
+            assert driver.title == "Grid page"
+            assert driver.find_element(By.ID, "hello").text == "Hello"
+            assert driver.capabilities["standIn"] is True
+        finally:
+            driver.quit()
+        assert factory.summary()["sessions"] == 1
+
+    def test_status_reports_the_slots(self, grid, factory):
+        assert factory.grid_slots() == (2, 2)
+        driver = factory.create(Options())
+        assert factory.grid_slots() == (1, 2)
+        driver.quit()
+        assert factory.grid_slots() == (2, 2)
+        assert remote_driver.capacity_header(factory, workers=2, sessions=2).endswith(
+            "requests beyond that wait for a free slot"
+        )
+
+    def test_saturated_grid_is_waited_out(self, grid, factory):
+        drivers = factory.create_many(Options(), 2)
+        releaser = threading.Timer(0.3, drivers[0].quit)
+        releaser.start()
+        try:
+            drivers.append(factory.create(Options()))
+        finally:
+            releaser.join()
+            for driver in drivers[1:]:
+                driver.quit()
+        assert grid.stats["refused"] >= 1
+        assert factory.summary()["session_retries"] == grid.stats["refused"]
+        assert factory.summary()["sessions"] == 3
+
+    def test_gives_up_after_the_session_timeout(self, grid, factory):
+        factory.session_timeout = 0.2
+        drivers = factory.create_many(Options(), 2)
+        try:
+            with pytest.raises(SessionNotCreatedException):
+                factory.create(Options())
+        finally:
+            for driver in drivers:
+                driver.quit()
+        assert factory.summary()["failed_sessions"] == 1
+
+    def test_create_many_quits_the_started_sessions_on_failure(self, grid, factory):
+        factory.session_timeout = 0
+        with pytest.raises(SessionNotCreatedException):
+            factory.create_many(Options(), 3)
+        assert grid.sessions == {}
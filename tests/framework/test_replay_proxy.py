@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils import replay_proxy
+
+
+class Upstream(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        request_body = self.rfile.read(length) if length else b""
+        body = json.dumps({"path": self.path, "hit": len(self.server.hits), "body": request_body.decode()}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Set-Cookie", "a=1")
+        self.send_header("Set-Cookie", "b=2")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    server.hits = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def ca_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("ca")
+    replay_proxy.CertificateAuthority(str(directory)).close()
+    return directory
+
+
+@pytest.fixture
+def start_proxy(ca_dir):
+    proxies = []
+
+    def start(archive, mode):
+        proxy = replay_proxy.RecordReplayProxy(archive, replay_proxy.CertificateAuthority(str(ca_dir))).start()
+        proxy.mode = mode
+        proxies.append(proxy)
+        return proxy
+
+    yield start
+    for proxy in proxies:
+        proxy.stop()
+
+
+def through(proxy):
+    session = requests.Session()
+    session.trust_env = False
+    session.proxies = {"http": "http://" + proxy.address, "https": "http://" + proxy.address}
+    return session
+
+
+def archive(directory, rules=None):
+    return replay_proxy.ReplayArchive(str(directory), "levelup", "qa", rules or replay_proxy.MatchRules())
+
+
+class TestMatchRules:
+    def test_query_order_does_not_matter(self):
+        rules = replay_proxy.MatchRules()
+        assert rules.key("get", "http://a.test/x?b=2&a=1") == rules.key("GET", "http://a.test/x?a=1&b=2")
+        assert rules.key("GET", "http://a.test/x?a=1") != rules.key("GET", "http://a.test/x?a=2")
+
+    def test_ignored_query_parameters(self):
+        rules = replay_proxy.MatchRules(ignore_query=["ts"])
+        assert rules.key("GET", "http://a.test/x?a=1&ts=1") == rules.key("GET", "http://a.test/x?ts=2&a=1")
+        everything = replay_proxy.MatchRules(ignore_query=["*"])
+        assert everything.key("GET", "http://a.test/x?a=1") == everything.key("GET", "http://a.test/x")
+
+    def test_json_and_form_bodies_match_by_field(self):
+        rules = replay_proxy.MatchRules(ignore_body=["nonce"])
+        assert rules.key("POST", "http://a.test/", b'{"a": 1, "nonce": 5}') == rules.key(
+            "POST", "http://a.test/", b'{"nonce": 6,"a":1}'
+        )
+        assert rules.key("POST", "http://a.test/", b"a=1&nonce=5") == rules.key("POST", "http://a.test/", b"nonce=6&a=1")
+        assert rules.key("POST", "http://a.test/", b'{"a": 1}') != rules.key("POST", "http://a.test/", b'{"a": 2}')
+
+
+class TestRecordReplay:
+    def test_round_trip(self, upstream, start_proxy, tmp_path):
+        url = "http://127.0.0.1:%s" % upstream.server_port
+        rules = replay_proxy.MatchRules(ignore_query=["ts"])
+        recording = archive(tmp_path, rules)
+        proxy = start_proxy(recording, replay_proxy.RECORD)
+        with through(proxy) as session:
+            recorded = session.get(url + "/api?ts=1", headers={"Cookie": "session=secret"})
+            posted = session.post(url + "/form", data={"name": "x"})
+        assert proxy.stats["recorded"] == 2
+        recording.save()
+
+        saved = json.loads((tmp_path / "levelup-qa.har").read_text())["log"]["entries"]
+        assert len(saved) == 2
+        # Credentials the browser sent are never written to disk
+        assert all(header["name"].lower() != "cookie" for entry in saved for header in entry["request"]["headers"])
+
+        upstream.hits.clear()
+        proxy = start_proxy(archive(tmp_path, rules).load(), replay_proxy.REPLAY)
+        with through(proxy) as session:
+            replayed = session.get(url + "/api?ts=2")
+            replayed_post = session.post(url + "/form", data={"name": "x"})
+        assert replayed.status_code == 200
+        assert replayed.json() == recorded.json()
+        assert replayed_post.json() == posted.json()
+        # Repeated headers survive the archive
+        assert replayed.raw.headers.getlist("Set-Cookie") == ["a=1", "b=2"]
+        assert upstream.hits == []
+        assert proxy.stats["replayed"] == 2
+
+    def test_miss_in_replay_mode(self, upstream, start_proxy, tmp_path):
+        url = "http://127.0.0.1:%s" % upstream.server_port
+        proxy = start_proxy(archive(tmp_path).load(), replay_proxy.REPLAY)
+        with through(proxy) as session:
+            response = session.get(url + "/never-recorded")
+        assert response.status_code == 504
+        assert proxy.stats["misses"] == 1
+        assert proxy.misses == [replay_proxy.MatchRules().key("GET", url + "/never-recorded")]
+        assert upstream.hits == []
+
+    def test_live_mode_records_nothing(self, upstream, start_proxy, tmp_path):
+        url = "http://127.0.0.1:%s" % upstream.server_port
+        live = archive(tmp_path)
+        proxy = start_proxy(live, replay_proxy.LIVE)
+        with through(proxy) as session:
+            assert session.get(url + "/live").status_code == 200
+        assert (proxy.stats["live"], proxy.stats["recorded"]) == (1, 0)
+        live.save()
+        assert not (tmp_path / "levelup-qa.har").exists()
+
+    def test_unreachable_upstream(self, start_proxy, tmp_path):
+        proxy = start_proxy(archive(tmp_path), replay_proxy.RECORD)
+        with through(proxy) as session:
+            # Nothing listens on port 9 (discard) here
+            response = session.get("http://127.0.0.1:9/")
+        assert response.status_code == 502
+        assert (proxy.stats["errors"], proxy.stats["recorded"]) == (1, 0)
+
+    def test_https_is_served_with_a_certificate_of_the_ca(self, start_proxy, ca_dir, tmp_path):
+        rules = replay_proxy.MatchRules()
+        replay = archive(tmp_path, rules)
+        key = rules.key("GET", "https://shop.test/cart")
+        replay.add(key, replay_proxy.make_entry(
+            "GET", "https://shop.test/cart", [], b"", 200, "OK", [("Content-Type", "text/plain")], b"cart", 0.01
+        ))
+        proxy = start_proxy(replay, replay_proxy.REPLAY)
+        with through(proxy) as session:
+            response = session.get("https://shop.test/cart", verify=str(ca_dir / "ca.pem"))
+        assert response.text == "cart"
+        assert proxy.stats["replayed"] == 1
+
+
+class TestArchive:
+    def test_save_merges_with_other_workers(self, tmp_path):
+        rules = replay_proxy.MatchRules()
+        workers = [archive(tmp_path, rules) for _ in range(4)]
+        for number, worker in enumerate(workers):
+            url = "http://a.test/%s" % number
+            worker.add(rules.key("GET", url), replay_proxy.make_entry("GET", url, [], b"", 200, "OK", [], b"", 0))
+        threads = [threading.Thread(target=worker.save) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        loaded = archive(tmp_path, rules).load()
+        assert sorted(loaded.entries) == sorted(rules.key("GET", "http://a.test/%s" % n) for n in range(4))
+
+    def test_newer_recording_wins(self, tmp_path):
+        rules = replay_proxy.MatchRules()
+        key = rules.key("GET", "http://a.test/")
+        for content in (b"old", b"new"):
+            worker = archive(tmp_path, rules)
+            worker.add(key, replay_proxy.make_entry("GET", "http://a.test/", [], b"", 200, "OK", [], content, 0))
+            worker.save()
+        entry = archive(tmp_path, rules).load().lookup(key)
+        assert entry["response"]["content"]["text"] == "bmV3"
+
+    def test_missing_or_broken_archive_is_empty(self, tmp_path):
+        assert archive(tmp_path).load().entries == {}
+        (tmp_path / "levelup-qa.har").write_text("{not json")
+        assert archive(tmp_path).load().entries == {}
+
+
+class TestCertificateAuthority:
+    def test_created_once_and_shared(self, tmp_path):
+        directory = str(tmp_path / "ca")
+        authorities = []
+        threads = [
+            threading.Thread(target=lambda: authorities.append(replay_proxy.CertificateAuthority(directory)))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Workers starting together end up with the one CA the browser is told to trust
+        assert len({authority.certificate.serial_number for authority in authorities}) == 1
+        assert (tmp_path / "ca" / "ca.lock").exists()
+        for authority in authorities:
+            authority.close()
+
+    def test_host_contexts_are_cached_and_cleaned_up(self, ca_dir):
+        authority = replay_proxy.CertificateAuthority(str(ca_dir))
+        assert authority.context_for("shop.test") is authority.context_for("shop.test")
+        assert authority.context_for("127.0.0.1") is not authority.context_for("shop.test")
+        authority.close()
+        assert not os.path.exists(authority.host_dir)
+
+
+class Config:
+    def __init__(self, **options):
+        self.options = dict(replay_ignore_query="", replay_ignore_body="", replay_dir="recordings", **options)
+
+    def getoption(self, name):
+        return self.options[name]
+
+
+class Item:
+    def __init__(self, args):
+        self.marker = pytest.mark.replayable(*args).mark if args is not None else None
+
+    def get_closest_marker(self, name):
+        return self.marker
+
+
+@pytest.mark.parametrize("groups, marker, expected", [
+    ("all", ("search",), replay_proxy.REPLAY),
+    ("search,cart", ("cart",), replay_proxy.REPLAY),
+    ("search", ("cart",), replay_proxy.LIVE),
+    ("default", (), replay_proxy.REPLAY),
+    ("all", None, replay_proxy.LIVE),
+])
+def test_only_picked_groups_are_replayed(groups, marker, expected):
+    plugin = replay_proxy.ReplayPlugin(Config(replay=replay_proxy.REPLAY, replay_groups=groups))
+    assert plugin.mode_for(Item(marker)) == expected
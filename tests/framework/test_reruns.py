@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import pytest
+from _pytest.reports import TestReport
+
+from utils import reruns
+from utils.reruns import RerunPlugin
+
+OPTIONS = {
+    "reruns": 2, "rerun_budget": 300, "quarantine_flake_rate": 0.2,
+    "client": "levelup", "env": "production", "browser": "fake",
+}
+
+
+def report(nodeid, when, outcome, wasxfail=None):
+    report = TestReport(nodeid, ("t.py", 0, nodeid), {}, outcome, None, when)
+    if wasxfail is not None:
+        report.wasxfail = wasxfail
+    return report
+
+
+def run(plugin, nodeid, *outcomes):
+    """Feed the reports of one run; each of `outcomes` is the call outcome of an attempt"""
+    for outcome in outcomes:
+        plugin.record_outcome(report(nodeid, "setup", "passed"))
+        plugin.record_outcome(report(nodeid, "call", outcome))
+        plugin.record_outcome(report(nodeid, "teardown", "passed"))
+
+
+@pytest.fixture
+def plugin():
+    config = SimpleNamespace(getoption=OPTIONS.__getitem__, cache=None)
+    return RerunPlugin(config, fresh_browser=lambda: None)
+
+
+class TestRecordOutcome:
+    def test_passed(self, plugin):
+        run(plugin, "t.py::a", "passed")
+        assert plugin.outcomes == {"t.py::a": reruns.PASSED}
+
+    def test_passed_on_rerun_is_flaky(self, plugin):
+        run(plugin, "t.py::a", "rerun", "passed")
+        assert plugin.outcomes == {"t.py::a": reruns.FLAKY}
+        assert plugin.summary()["flaky"] == ["t.py::a"]
+
+    def test_failed_after_reruns(self, plugin):
+        run(plugin, "t.py::a", "rerun", "rerun", "failed")
+        assert plugin.outcomes == {"t.py::a": reruns.FAILED}
+        assert plugin.summary()["failed_after_rerun"] == ["t.py::a"]
+
+    def test_failed_setup(self, plugin):
+        plugin.record_outcome(report("t.py::a", "setup", "failed"))
+        assert plugin.outcomes == {"t.py::a": reruns.FAILED}
+
+    def test_failed_teardown_keeps_the_call_outcome(self, plugin):
+        plugin.record_outcome(report("t.py::a", "call", "passed"))
+        plugin.record_outcome(report("t.py::a", "teardown", "failed"))
+        assert plugin.outcomes == {"t.py::a": reruns.PASSED}
+
+    def test_quarantined(self, plugin):
+        plugin.record_outcome(report("t.py::a", "call", "skipped", wasxfail="quarantined: flaky"))
+        plugin.record_outcome(report("t.py::b", "call", "passed", wasxfail="quarantined: flaky"))
+        assert plugin.outcomes == {"t.py::a": reruns.FAILED, "t.py::b": reruns.PASSED}
+        assert plugin.summary()["quarantined"] == ["t.py::a", "t.py::b"]
+
+
+class TestQuarantine:
+    @pytest.mark.parametrize("history, streak", [("", 0), ("PPF", 0), ("PFX", 1), ("FXXX", 3), ("XXX", 3)])
+    def test_failure_streak(self, history, streak):
+        assert reruns.failure_streak(history) == streak
+
+    @pytest.mark.parametrize("history, flaky, released", [
+        ("PPPF", False, False),  # too few runs
+        ("PPPPF", True, False),
+        ("PPPPPPPPPF", False, False),  # below the flake rate
+        ("PFPFXX", True, False),
+        ("PFPFXXX", True, True),
+    ])
+    def test_is_flaky_and_is_released(self, plugin, history, flaky, released):
+        plugin.history = {"t.py::a": history}
+        assert plugin.is_flaky("t.py::a") is flaky
+        assert plugin.is_released("t.py::a") is released
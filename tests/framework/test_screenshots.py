@@ -0,0 +1,93 @@
+import io
+import time
+import types
+
+import pytest
+from allure_commons.types import AttachmentType
+
+from utils import screenshots
+
+PNG = b"\x89PNG\r\n\x1a\nfake image"
+
+
+def driver(png=PNG):
+    return types.SimpleNamespace(get_screenshot_as_png=lambda: png)
+
+
+@pytest.fixture
+def make_writer(tmp_path):
+    writers = []
+
+    def make(**options):
+        writer = screenshots.ScreenshotWriter(str(tmp_path), **options)
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        if writer._thread.is_alive():
+            writer.close()
+
+
+@pytest.fixture
+def attached(monkeypatch):
+    """The allure.attach calls, made as if allure were reporting this test"""
+    calls = []
+    monkeypatch.setattr(screenshots, "allure_reporter", lambda: object())
+    monkeypatch.setattr(screenshots.allure, "attach", lambda body, **kwargs: calls.append((body, kwargs)))
+    return calls
+
+
+def test_screenshot_name():
+    taken_at = time.mktime((2026, 3, 1, 12, 30, 5, 0, 0, -1))
+    assert screenshots.screenshot_name("tests/test_a.py::TestA::test_b[x y]", "gw1", 2, taken_at) == (
+        "tests_test_a.py__TestA__test_b_x_y-gw1-attempt2-20260301-123005"
+    )
+    assert screenshots.screenshot_name("test_a.py::test_b", taken_at=taken_at) == (
+        "test_a.py__test_b-attempt1-20260301-123005"
+    )
+
+
+class TestScreenshotWriter:
+    def test_each_attempt_gets_its_own_file(self, make_writer):
+        writer = make_writer()
+        first = writer.capture(driver(), "test_a.py::test_b", "gw0")
+        rerun = writer.capture(driver(b"\x89PNG\r\n\x1a\nother"), "test_a.py::test_b", "gw0")
+        writer.close()
+        assert "-gw0-attempt1-" in first and "-gw0-attempt2-" in rerun
+        assert open(first, "rb").read() == PNG
+        assert writer.counts == {"captured": 2, "written": 2, "duplicates": 0}
+
+    def test_identical_screenshots_are_saved_once(self, make_writer, tmp_path):
+        writer = make_writer()
+        writer.capture(driver(), "test_a.py::test_b")
+        writer.capture(driver(), "test_a.py::test_c")
+        writer.close()
+        assert writer.counts == {"captured": 2, "written": 1, "duplicates": 1}
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_attached_with_the_public_allure_api(self, make_writer, attached):
+        writer = make_writer()
+        writer.capture(driver(), "test_a.py::test_b")
+        writer.close()
+        assert attached == [(PNG, {"name": "Screenshot", "attachment_type": AttachmentType.PNG})]
+
+    def test_nothing_attached_without_allure(self, make_writer, monkeypatch):
+        calls = []
+        monkeypatch.setattr(screenshots.allure, "attach", lambda *args, **kwargs: calls.append(args))
+        writer = make_writer()
+        writer.capture(driver(), "test_a.py::test_b")
+        writer.close()
+        assert calls == []
+
+    def test_report_gets_the_processed_image(self, make_writer, attached):
+        Image = pytest.importorskip("PIL.Image")
+        png = io.BytesIO()
+        Image.new("RGB", (400, 200)).save(png, "PNG")
+        writer = make_writer(max_width=100, jpeg_quality=70)
+        path = writer.capture(driver(png.getvalue()), "test_a.py::test_b")
+        writer.close()
+        body, options = attached[0]
+        assert options["attachment_type"] == AttachmentType.JPG and path.endswith(".jpg")
+        assert Image.open(io.BytesIO(body)).size == (100, 50)
+        assert open(path, "rb").read() == body
@@ -0,0 +1,87 @@
+import pytest
+
+from utils import step_timing
+
+
+@pytest.fixture
+def pages():
+    """A fresh page hierarchy per test, since instrumenting patches the classes in place"""
+
+    class Page:
+        def __init__(self, driver):
+            self.driver = driver
+
+        @staticmethod
+        def wait_it_out(seconds):
+            pass
+
+        def _poll_until(self, condition):
+            return condition()
+
+        def click(self):
+            return "clicked"
+
+        def open(self):
+            self.wait_it_out(1)
+            return self.click()
+
+    class LoginPage(Page):
+        def click(self):
+            return "login " + super().click()
+
+        def login(self):
+            return self._poll_until(self.is_ready)
+
+        def is_ready(self):
+            return True
+
+    recorder = step_timing.StepRecorder()
+    step_timing.instrument_page_class(Page, recorder)
+    return recorder, Page, LoginPage
+
+
+def steps(recorder):
+    return [(record["step"], record["depth"]) for record in recorder.records]
+
+
+class TestInstrumentation:
+    def test_base_methods(self, pages):
+        recorder, Page, _ = pages
+        assert Page(None).open() == "clicked"
+        assert steps(recorder) == [("Page.wait_it_out", 1), ("Page.click", 1), ("Page.open", 0)]
+        assert recorder.records[-1]["slept"] > 0
+
+    def test_methods_of_a_subclass_are_timed(self, pages):
+        recorder, _, LoginPage = pages
+        page = LoginPage(None)
+        assert page.click() == "login clicked"
+        # The override and the base method it calls are both steps
+        assert steps(recorder) == [("Page.click", 1), ("LoginPage.click", 0)]
+
+    def test_inherited_method_calls_the_override(self, pages):
+        recorder, _, LoginPage = pages
+        LoginPage(None).open()
+        assert steps(recorder) == [
+            ("Page.wait_it_out", 1), ("Page.click", 2), ("LoginPage.click", 1), ("Page.open", 0)
+        ]
+
+    def test_calls_while_polling_are_folded_into_the_wait(self, pages):
+        recorder, _, LoginPage = pages
+        assert LoginPage(None).login() is True
+        assert steps(recorder) == [("LoginPage.login", 0)]
+        assert recorder.records[0]["waited"] > 0
+
+    def test_a_subclass_is_wrapped_once(self, pages):
+        recorder, _, LoginPage = pages
+        LoginPage(None)
+        LoginPage(None).click()
+        assert len(recorder.records) == 2
+
+    def test_summary(self, pages):
+        recorder, Page, _ = pages
+        Page(None).open()
+        Page(None).click()
+        summary = recorder.summary()
+        assert summary["methods"]["Page.click"]["calls"] == 2
+        assert summary["methods"]["Page.open"]["calls"] == 1
+        assert len(summary["slowest"]) == 4
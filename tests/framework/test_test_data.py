@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from utils.test_data import DataPool
+from utils.test_data import partition_of
+from utils.test_data import prune_seeds
+
+
+@pytest.mark.parametrize("worker_id, partition", [(None, 0), ("master", 0), ("gw0", 0), ("gw7", 7), ("gw12", 12)])
+def test_partition_of(worker_id, partition):
+    assert partition_of(worker_id) == partition
+
+
+class TestDataPool:
+    def test_workers_never_share_values(self, tmp_path):
+        pools = [DataPool(str(tmp_path), 42, worker_id, batch_size=10) for worker_id in ("gw0", "gw1")]
+        takes = (DataPool.email, DataPool.phone, lambda pool: pool.string(12), lambda pool: pool.user()["username"])
+        for take in takes:
+            values = [[take(pool) for _ in range(25)] for pool in pools]
+            assert len(set(values[0]) | set(values[1])) == 50
+
+    def test_same_seed_same_values(self, tmp_path):
+        first = DataPool(str(tmp_path / "a"), 7, "gw1", batch_size=10)
+        second = DataPool(str(tmp_path / "b"), 7, "gw1", batch_size=10)
+        assert [first.user() for _ in range(12)] == [second.user() for _ in range(12)]
+        assert [first.string(8) for _ in range(12)] == [second.string(8) for _ in range(12)]
+        assert DataPool(str(tmp_path / "c"), 8, "gw1", batch_size=10).string(8) != first.string(8)
+
+    def test_runs_with_other_seeds_never_share_values(self, tmp_path):
+        pools = [DataPool(str(tmp_path), seed, "gw0", batch_size=10) for seed in range(20)]
+        for take in (DataPool.email, DataPool.phone, lambda pool: pool.user()["username"]):
+            values = [take(pool) for pool in pools]
+            assert len(set(values)) == len(pools)
+
+    def test_user_phones_never_match_phone_records(self, tmp_path):
+        pool = DataPool(str(tmp_path), 3, "gw2", batch_size=10)
+        phones = {pool.phone() for _ in range(30)}
+        assert len(phones) == 30
+        assert not phones & {pool.user()["phone"] for _ in range(30)}
+
+    def test_batches_are_read_back_from_disk(self, tmp_path):
+        first = DataPool(str(tmp_path), 42, batch_size=10)
+        emails = [first.email() for _ in range(15)]
+        assert first.stats == {"taken": 15, "generated_batches": 2, "loaded_batches": 0}
+        second = DataPool(str(tmp_path), 42, batch_size=10)
+        assert [second.email() for _ in range(15)] == emails
+        assert second.stats == {"taken": 15, "generated_batches": 0, "loaded_batches": 2}
+
+    def test_short_strings_still_have_the_requested_length(self, tmp_path):
+        pool = DataPool(str(tmp_path), 42, "gw3", batch_size=10)
+        assert [len(pool.string(length)) for length in (1, 4, 5, 6, 30)] == [1, 4, 5, 6, 30]
+
+    def test_unknown_kind(self, tmp_path):
+        with pytest.raises(ValueError):
+            DataPool(str(tmp_path), 42).take("address")
+
+
+def test_prune_seeds(tmp_path):
+    for age, seed in enumerate(["11", "12", "13", "14", "15"]):
+        (tmp_path / seed / "0").mkdir(parents=True)
+        os.utime(tmp_path / seed, (1000 - age, 1000 - age))
+    # The run's own seed is the oldest, but stays
+    assert sorted(prune_seeds(str(tmp_path), 15, keep=3)) == ["13", "14"]
+    assert sorted(os.listdir(tmp_path)) == ["11", "12", "15"]
+    assert prune_seeds(str(tmp_path / "missing"), 1) == []
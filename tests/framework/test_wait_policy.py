@@ -0,0 +1,77 @@
+import types
+
+import pytest
+
+from pages import BasePageClass
+from tests.framework.conftest import FIXTURE_URL
+from utils import wait_policy
+from utils.wait_policy import WaitPolicy
+
+
+class TestWaitPolicy:
+    @pytest.mark.parametrize("strategy, readiness", [
+        ("normal", "complete"), ("eager", "interactive"), ("none", "none"),
+    ])
+    def test_readiness_follows_the_page_load_strategy(self, strategy, readiness):
+        assert WaitPolicy(strategy).readiness == readiness
+
+    def test_unknown_readiness(self):
+        with pytest.raises(ValueError, match="Readiness can only be one of none, interactive, complete, quiet"):
+            WaitPolicy(readiness="loaded")
+
+    @pytest.mark.parametrize("strategy, readiness, check", [
+        # driver.get() already waited for it
+        ("normal", "complete", None),
+        ("normal", "interactive", None),
+        ("eager", "interactive", None),
+        ("normal", "quiet", None),
+        # ... or the page layer polls readyState for it
+        ("eager", "complete", "complete"),
+        ("none", "interactive", "interactive"),
+        ("none", "quiet", "interactive"),
+        ("none", "none", None),
+    ])
+    def test_readiness_check(self, strategy, readiness, check):
+        assert WaitPolicy(strategy, readiness).readiness_check() == check
+
+    def test_apply(self):
+        calls = []
+        driver = types.SimpleNamespace(implicitly_wait=calls.append)
+        policy = WaitPolicy(implicit_wait=2)
+        assert policy.apply(driver) is driver
+        assert calls == [2] and driver.wait_policy is policy
+        assert wait_policy.policy_of(driver) is policy
+
+    def test_drivers_without_a_policy_get_the_defaults(self):
+        policy = wait_policy.policy_of(types.SimpleNamespace())
+        assert (policy.implicit_wait, policy.timeout, policy.readiness) == (0, wait_policy.DEFAULT_TIMEOUT, "complete")
+
+
+class TestNavigation:
+    def go(self, fake_driver, policy):
+        page = BasePageClass(policy.apply(fake_driver))
+        page.go_to_page(FIXTURE_URL + "table?rows=3")
+        return page
+
+    def test_nothing_is_polled_when_get_waited(self, page, fake_driver):
+        page = self.go(fake_driver, WaitPolicy("normal"))
+        assert page.wait_timings == []
+
+    def test_ready_state_is_polled_under_a_lighter_strategy(self, page, fake_driver):
+        page = self.go(fake_driver, WaitPolicy("eager", "complete"))
+        assert [label for label, seconds, matched in page.wait_timings] == [
+            "url=None ready_state=complete window_count=None"
+        ]
+
+    def test_quiet_readiness_waits_for_a_quiet_page(self, page, fake_driver):
+        page = self.go(fake_driver, WaitPolicy("none", "quiet"))
+        assert [label for label, seconds, matched in page.wait_timings] == [
+            "url=None ready_state=interactive window_count=None", "page quiet for 150ms"
+        ]
+        assert page.readiness_stats["waits"] == 1
+
+    def test_waits_use_the_policy_timeout(self, page, fake_driver, clock):
+        page = BasePageClass(WaitPolicy(timeout=3).apply(fake_driver))
+        start = clock.now
+        assert page.wait_for_navigation(url_contains="never") is False
+        assert clock.now - start == pytest.approx(3)
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import psutil
+import pytest
+
+from utils import worker_sizing
+from utils.fake_webdriver import VirtualClock
+from utils.worker_sizing import DEFAULT_RSS_MB_PER_WORKER
+from utils.worker_sizing import SAMPLE_INTERVAL
+from utils.worker_sizing import UsageSampler
+from utils.worker_sizing import WorkerSizingPlugin
+from utils.worker_sizing import plan_workers
+from utils.worker_sizing import write_terminal_summary
+
+
+class Reporter:
+    def __init__(self):
+        self.lines = []
+
+    def write_sep(self, sep, title):
+        self.lines.append(title)
+
+    def write_line(self, line):
+        self.lines.append(line)
+
+
+class TestPlanWorkers:
+    def test_defaults_before_the_first_run(self):
+        plan = plan_workers(8, 4 * DEFAULT_RSS_MB_PER_WORKER, {})
+        assert plan["limits"] == {"cpu": 8, "memory": 4}
+        assert (plan["workers"], plan["limited_by"], plan["runs"]) == (4, "memory", 0)
+
+    def test_limited_by_cpu(self):
+        plan = plan_workers(8, 64000, {"cpu_per_worker": 1.5, "rss_mb": 500, "runs": 3})
+        assert (plan["workers"], plan["limited_by"]) == (5, "cpu")
+
+    def test_idle_workers_still_count_half_a_core(self):
+        assert plan_workers(4, None, {"cpu_per_worker": 0.1})["limits"] == {"cpu": 8}
+
+    def test_limited_by_grid_slots(self):
+        plan = plan_workers(16, 64000, {"cpu_per_worker": 0.5, "rss_mb": 100}, free_slots=9, sessions_per_worker=2)
+        assert plan["limits"]["grid"] == 4
+        assert (plan["workers"], plan["limited_by"]) == (4, "grid")
+
+    def test_at_least_one_worker(self):
+        plan = plan_workers(1, 10, {"cpu_per_worker": 4, "rss_mb": 800}, free_slots=0)
+        assert plan["workers"] == 1
+        assert set(plan["limits"].values()) == {1}
+
+
+class TestUsageSampler:
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = VirtualClock()
+        monkeypatch.setattr(worker_sizing, "time", clock)
+        return clock
+
+    def test_samples_without_browsers_are_dropped(self, clock):
+        sampler = UsageSampler(lambda: [])
+        for _ in range(3):
+            sampler.sample()
+            clock.sleep(SAMPLE_INTERVAL)
+        assert (sampler.samples, sampler.wall_seconds, sampler.peak_rss_mb) == (0, 0.0, 0.0)
+        # Not asked for the processes again before the interval is up
+        assert sampler.due()
+        sampler.sample()
+        assert not sampler.due()
+
+    def test_browser_processes_are_measured(self, clock):
+        browser = psutil.Process()
+        sampler = UsageSampler(lambda: [browser])
+        sampler.sample()
+        clock.sleep(SAMPLE_INTERVAL)
+        sampler.sample()
+        assert sampler.samples == 2
+        assert sampler.wall_seconds == SAMPLE_INTERVAL
+        assert sampler.peak_rss_mb > 0
+
+    def test_remote_browsers_measure_the_worker_alone(self, clock):
+        sampler = UsageSampler(lambda: [], require_browsers=False)
+        sampler.sample()
+        clock.sleep(SAMPLE_INTERVAL)
+        sampler.sample()
+        assert sampler.samples == 2
+
+
+class TestWorkerSizingPlugin:
+    def test_a_run_without_browsers_reports_nothing(self):
+        config = SimpleNamespace(getoption={"memory_pressure": 0, "browser_url": None}.get)
+        plugin = WorkerSizingPlugin(config, lambda: [])
+        plugin.sampler.sample()
+        plugin.sampler.sample()
+        usage = plugin.summary()
+        assert "workers" not in usage
+        reporter = Reporter()
+        write_terminal_summary(reporter, None, usage)
+        assert reporter.lines == []
@@ -0,0 +1,5 @@
+"""
+__________________________________________________
+Run-level helpers shared by the pytest plugins in tests/conftest.py
+__________________________________________________
+"""
@@ -0,0 +1,325 @@
+"""
+Concurrent `async def` tests.
+
+An `async def` test that asks for `async_page` (an AsyncBasePageClass) or `async_driver`
+gets a browser session of its own from the worker's AsyncBrowserPool. Consecutive async
+tests of the same class or module that are already queued on the worker run as one batch:
+their coroutines are gathered on the worker's event loop, so while one test waits on the
+browser the others keep theirs busy, with up to --async-sessions sessions per worker.
+Their reports are then handed to pytest one test at a time, in order, so reporting,
+xdist, reruns and allure see the usual setup/call/teardown sequence.
+
+Async tests may use the two fixtures above, their own parametrize arguments and
+fixtures of class scope or wider. Function-scoped fixtures of their own are not
+supported (the tests of a batch share one pytest setup stack), and neither are
+function-scoped autouse fixtures, other than the ones the plugin is told it replaces: such
+a test errors in setup instead of running without them.
+"""
+import asyncio
+import inspect
+import logging
+import time
+import types
+
+import pytest
+from _pytest import skipping
+from _pytest._code import ExceptionInfo
+from _pytest.runner import CallInfo
+
+from utils import reruns
+
+ASYNC_FIXTURES = ("async_driver", "async_page")
+MAX_BATCH = 32
+CALL_INFO_KWARGS = {"_ispytest": True} if "_ispytest" in inspect.signature(CallInfo).parameters else {}
+# Reports a skip mark at the test, not at the line below that raises it
+SKIP_KWARGS = (
+    {"_use_item_location": True} if "_use_item_location" in inspect.signature(pytest.skip.Exception).parameters else {}
+)
+
+
+def check_internals(item, worker):
+    """The pytest and pytest-xdist internals a batch relies on, checked before the first one"""
+    reruns.require_internal(item.session, "_setupstate", "pytest.Session")
+    reruns.require_internal(skipping, "xfailed_key", "_pytest.skipping")
+    reruns.require_internal(item, "_request", "pytest.Function")
+    reruns.require_internal(item, "_fixtureinfo", "pytest.Function")
+    if worker is not None:
+        reruns.require_internal(worker, "torun", "xdist.remote.WorkerInteractor")
+        reruns.require_internal(worker, "nextitem_index", "xdist.remote.WorkerInteractor")
+
+
+def is_async_test(item):
+    return isinstance(item, pytest.Function) and inspect.iscoroutinefunction(item.obj)
+
+
+def is_direct_param(fixturedef):
+    # pytest's stand-in fixture for an argument of @pytest.mark.parametrize (not indirect)
+    return getattr(fixturedef.func, "__name__", "") == "get_direct_param_fixture_func"
+
+
+def setup_parents(item):
+    """Set up the class/module/session nodes of `item`, as pytest does before its first test"""
+    state = item.session._setupstate
+    if hasattr(state, "prepare"):  # pytest < 7
+        state.prepare(item.parent)
+    else:
+        state.setup(item.parent)
+
+
+def teardown_towards(item, nextitem):
+    state = item.session._setupstate
+    if hasattr(state, "prepare"):  # pytest < 7
+        state.teardown_exact(item, nextitem)
+    else:
+        state.teardown_exact(nextitem)
+
+
+def evaluate_marks(item):
+    """The skip and xfail marks, as pytest's skipping plugin applies them in pytest_runtest_setup"""
+    skipped = skipping.evaluate_skip_marks(item)
+    if skipped:
+        raise pytest.skip.Exception(skipped.reason, **SKIP_KWARGS)
+    store = item.stash if hasattr(item, "stash") else item._store
+    store[skipping.xfailed_key] = xfailed = skipping.evaluate_xfail_marks(item)
+    if xfailed and not item.config.option.runxfail and not xfailed.run:
+        pytest.xfail("[NOTRUN] " + xfailed.reason)
+
+
+class Phase:
+    """Times the setup, call or teardown of one test and keeps its first error.
+    Entered more than once (sync and async parts), it adds the time up."""
+
+    def __init__(self, when):
+        self.when = when
+        self.excinfo = None
+        self.start = None
+        self.stop = None
+        self.duration = 0.0
+        self._entered = 0.0
+
+    def __enter__(self):
+        if self.start is None:
+            self.start = time.time()
+        self._entered = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration += time.perf_counter() - self._entered
+        self.stop = time.time()
+        if exc_type is None or issubclass(exc_type, (KeyboardInterrupt, pytest.exit.Exception)):
+            return False
+        if self.excinfo is None:
+            self.excinfo = ExceptionInfo.from_exc_info((exc_type, exc, tb))
+        return True
+
+    def call_info(self):
+        if self.start is None:
+            self.start = self.stop = time.time()
+        return CallInfo(None, self.excinfo, self.start, self.stop, self.duration, self.when, **CALL_INFO_KWARGS)
+
+
+class AsyncTestRun:
+    def __init__(self, item):
+        self.item = item
+        self.setup = Phase("setup")
+        self.call = None
+        self.teardown = Phase("teardown")
+        self.kwargs = {}
+        self.screenshot = None
+
+
+class AsyncTestPlugin:
+    name = "async_tests"
+
+    def __init__(self, config, create_browsers, take_screenshot, replaced_fixtures=()):
+        """`create_browsers(request)` returns the worker's (AsyncBrowserPool, stop) on first use;
+        `take_screenshot(driver, nodeid)` stores the screenshot of a failed test.
+        `replaced_fixtures` are function-scoped autouse fixtures whose job the plugin does
+        itself for async tests, so they are skipped instead of failing the test."""
+        self.config = config
+        self.create_browsers = create_browsers
+        self.take_screenshot = take_screenshot
+        self.replaced_fixtures = set(replaced_fixtures)
+        self.browsers = None
+        self._stop_browsers = None
+        self.loop = None
+        self.runs = {}
+        self.stats = {"tests": 0, "batches": 0, "test_seconds": 0.0, "batch_seconds": 0.0}
+
+    # ---- fixtures of async tests (resolved by run_batch; only their names are registered here)
+
+    @pytest.fixture
+    def async_driver(self):
+        raise Exception("async_driver is only available to async def tests")
+
+    @pytest.fixture
+    def async_page(self):
+        raise Exception("async_page is only available to async def tests")
+
+    # ---- protocol
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        if not is_async_test(item):
+            return None
+        if item.nodeid not in self.runs:
+            if not self.stats["batches"]:
+                check_internals(item, reruns.xdist_worker(self.config))
+            self.run_batch(self.batch_for(item, nextitem))
+        self.report(self.runs.pop(item.nodeid), nextitem)
+        return True
+
+    def batch_for(self, item, nextitem):
+        """`item` and the async tests of the same parent queued right after it"""
+        batch = [item]
+        rerun_stage = self.config.pluginmanager.get_plugin(reruns.RerunPlugin.name)
+        if nextitem is None or rerun_stage is not None and rerun_stage.rerunning:
+            return batch
+        for upcoming in self.queued_after(item, nextitem):
+            if len(batch) >= MAX_BATCH or upcoming.parent is not item.parent or not is_async_test(upcoming):
+                break
+            batch.append(upcoming)
+        return batch
+
+    def queued_after(self, item, nextitem):
+        """The items this process will run after `item`, as far as it knows them"""
+        items = item.session.items
+        worker = reruns.xdist_worker(self.config)
+        if worker is None:
+            following = items[items.index(item) + 1:]
+        else:
+            torun = worker.torun
+            if hasattr(torun, "lock"):
+                with torun.lock() as queued:
+                    indices = [worker.nextitem_index, *queued]
+            else:
+                indices = [getattr(worker, "nextitem_index", None), *list(torun.queue)]
+            following = []
+            for index in indices:
+                if not isinstance(index, int):
+                    break
+                following.append(items[index])
+        if not following or following[0] is not nextitem:
+            return []
+        return following
+
+    def run_batch(self, batch):
+        for item in batch:
+            run = self.runs[item.nodeid] = AsyncTestRun(item)
+            with run.setup:
+                self.prepare(run)
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        start = time.perf_counter()
+        self.loop.run_until_complete(self.run_tests([self.runs[item.nodeid] for item in batch]))
+        self.stats["tests"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["batch_seconds"] += time.perf_counter() - start
+
+    def prepare(self, run):
+        """The synchronous part of setup: parent nodes, marks and the test's own arguments"""
+        item = run.item
+        setup_parents(item)
+        evaluate_marks(item)
+        params = item.callspec.params if hasattr(item, "callspec") else {}
+        argnames = item._fixtureinfo.argnames
+        for name in item.fixturenames:
+            fixturedefs = item._fixtureinfo.name2fixturedefs.get(name)
+            if name in ASYNC_FIXTURES or not fixturedefs:
+                continue
+            if name in params and is_direct_param(fixturedefs[-1]):
+                run.kwargs[name] = params[name]
+            elif fixturedefs[-1].scope != "function":
+                value = item._request.getfixturevalue(name)
+                if name in argnames:
+                    run.kwargs[name] = value
+            elif name in argnames:
+                raise Exception(f"Function-scoped fixture {name!r} is not supported by async tests")
+            elif name not in self.replaced_fixtures:
+                # Rather than running the test without it
+                raise Exception(f"Function-scoped autouse fixture {name!r} is not supported by async tests")
+        if any(name in argnames for name in ASYNC_FIXTURES) and self.browsers is None:
+            self.browsers, self._stop_browsers = self.create_browsers(item._request)
+
+    async def run_tests(self, runs):
+        await asyncio.gather(*(self.run_test(run) for run in runs))
+
+    async def run_test(self, run):
+        from pages.async_base import AsyncBasePageClass
+
+        argnames = run.item._fixtureinfo.argnames
+        driver = None
+        if run.setup.excinfo is None and any(name in argnames for name in ASYNC_FIXTURES):
+            with run.setup:
+                driver = await self.browsers.acquire()
+                if "async_driver" in argnames:
+                    run.kwargs["async_driver"] = driver
+                if "async_page" in argnames:
+                    run.kwargs["async_page"] = AsyncBasePageClass(driver)
+        if run.setup.excinfo is None:
+            run.call = Phase("call")
+            with run.call:
+                await run.item.obj(**{name: run.kwargs[name] for name in argnames})
+            self.stats["test_seconds"] += run.call.duration
+            if run.call.excinfo is not None and driver is not None:
+                try:
+                    run.screenshot = await driver.get_screenshot_as_png()
+                except Exception as e:
+                    logging.debug("No screenshot of %s: %s", run.item.nodeid, e)
+        if driver is not None:
+            with run.teardown:
+                await self.browsers.release(driver)
+
+    def report(self, run, nextitem):
+        """Hand the outcome of one test to pytest as if it had just run"""
+        item = run.item
+        item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+        self.log(item, run.setup)
+        if run.call is not None:
+            report = self.log(item, run.call)
+            # A failure that will be rerun still gets its screenshot
+            if run.screenshot is not None and (report.failed or report.outcome == "rerun"):
+                png = run.screenshot
+                self.take_screenshot(types.SimpleNamespace(get_screenshot_as_png=lambda: png), item.nodeid)
+        with run.teardown:
+            teardown_towards(item, None if item.session.shouldfail or item.session.shouldstop else nextitem)
+        self.log(item, run.teardown)
+        item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+
+    @staticmethod
+    def log(item, phase):
+        report = item.ihook.pytest_runtest_makereport(item=item, call=phase.call_info())
+        item.ihook.pytest_runtest_logreport(report=report)
+        return report
+
+    def pytest_sessionfinish(self, session):
+        if self.loop is None:
+            return
+        if self.browsers is not None:
+            self.loop.run_until_complete(self.browsers.close())
+            self._stop_browsers()
+        self.loop.close()
+        self.loop = None
+
+    def summary(self):
+        summary = dict(self.stats)
+        if self.browsers is not None:
+            summary.update(self.browsers.summary())
+        return summary
+
+
+def write_terminal_summary(terminalreporter, summary):
+    if not summary or not summary.get("tests"):
+        return
+    terminalreporter.write_sep("-", "async tests")
+    overlap = summary["test_seconds"] / summary["batch_seconds"] if summary["batch_seconds"] else 0.0
+    terminalreporter.write_line(
+        f"{summary['tests']} async tests in {summary['batches']} batches: "
+        f"{summary['test_seconds']:.1f}s of test time in {summary['batch_seconds']:.1f}s ({overlap:.1f}x overlap)"
+    )
+    if summary.get("acquired"):
+        terminalreporter.write_line(
+            f"{summary['sessions']} sessions started for {summary['acquired']} tests, "
+            f"at most {summary['max_in_use']} in use at once, "
+            f"{summary['session_retries']} refused session requests retried"
+        )
@@ -0,0 +1,423 @@
+"""
+Non-blocking W3C WebDriver client for asyncio.
+
+Speaks the WebDriver protocol over HTTP/1.1 keep-alive connections opened with asyncio
+streams, so one process can keep many browser sessions busy while it waits on the
+network. AsyncWebDriver and AsyncWebElement mirror the parts of selenium's WebDriver and
+WebElement the page layer uses, with awaitable methods in place of properties
+(`await driver.current_url()`). Errors are raised as the usual selenium exceptions.
+
+AsyncBrowserPool hands out up to `max_sessions` sessions of one endpoint to concurrent
+tasks. Released sessions are reset and reused; a session request the endpoint refuses is
+retried with the backoff of utils.remote_driver.
+"""
+import asyncio
+import base64
+import json
+import logging
+import ssl
+import time
+import urllib.parse
+
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote import webelement
+from selenium.webdriver.remote.errorhandler import ErrorCode
+from selenium.webdriver.remote.errorhandler import ErrorHandler
+
+from utils import remote_driver
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+GET_ATTRIBUTE_SCRIPT = "return (%s).apply(null, arguments);" % webelement.getAttribute_js
+IS_DISPLAYED_SCRIPT = "return (%s).apply(null, arguments);" % webelement.isDisplayed_js
+RESET_STORAGE_SCRIPT = "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+
+
+def w3c_locator(by, value):
+    """The locator selenium sends for (by, value): ids, names, classes and tags become CSS"""
+    if by == By.ID:
+        return By.CSS_SELECTOR, '[id="%s"]' % value
+    if by == By.NAME:
+        return By.CSS_SELECTOR, '[name="%s"]' % value
+    if by == By.CLASS_NAME:
+        return By.CSS_SELECTOR, ".%s" % value
+    if by == By.TAG_NAME:
+        return By.CSS_SELECTOR, value
+    return by, value
+
+
+class AsyncConnectionPool:
+    """At most `size` keep-alive HTTP connections to one WebDriver endpoint"""
+
+    def __init__(self, url, size):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.base_path = parts.path.rstrip("/")
+        self.size = size
+        self.headers = {
+            "Host": parts.netloc.rsplit("@", 1)[-1],
+            "Accept": "application/json",
+            "Content-Type": "application/json;charset=UTF-8",
+            "Connection": "keep-alive",
+        }
+        if parts.username:
+            credentials = f"{urllib.parse.unquote(parts.username)}:{urllib.parse.unquote(parts.password or '')}"
+            self.headers["Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode()
+        self._idle = []
+        # Created on first use, inside the event loop that will wait on it
+        self._slots = None
+
+    async def command(self, method, path, payload=None):
+        """Send one command and return the `value` of its response; raises selenium exceptions"""
+        if payload is None and method == "POST":
+            payload = {}
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        status, data = await self.request(method, self.base_path + path, body)
+        text = data.decode("utf-8")
+        if 399 < status <= 500:
+            response = {"status": status, "value": text}
+        else:
+            try:
+                response = json.loads(text)
+            except ValueError:
+                response = {"status": ErrorCode.SUCCESS if 199 < status < 300 else ErrorCode.UNKNOWN_ERROR,
+                            "value": text}
+        ErrorHandler().check_response(response)
+        return response.get("value")
+
+    async def request(self, method, path, body):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        headers = dict(self.headers, **{"Content-Length": str(len(body))})
+        head = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        message = head.encode("latin-1") + b"\r\n" + body
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                if reused:
+                    reader, writer = self._idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+                returned = False
+                try:
+                    writer.write(message)
+                    await writer.drain()
+                    status, response_headers, data = await self._read_response(reader)
+                    if response_headers.get("connection", "").lower() != "close":
+                        self._idle.append((reader, writer))
+                        returned = True
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if reused:
+                        # The endpoint closed the idle connection; try the next one
+                        continue
+                    raise
+                finally:
+                    # Closed unless it is back in the pool: after an error, a cancellation (the
+                    # response may be half read) or a response that ends the connection
+                    if not returned:
+                        writer.close()
+                return status, data
+
+    @staticmethod
+    async def _read_response(reader):
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            return status, headers, await reader.readexactly(int(headers["content-length"]))
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if not size:
+                    await reader.readuntil(b"\r\n")
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            return status, headers, b"".join(chunks)
+        # Neither length nor chunks: the body ends with the connection
+        headers["connection"] = "close"
+        return status, headers, await reader.read()
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class AsyncWebElement:
+    def __init__(self, driver, element_id):
+        self.parent = driver
+        self.id = element_id
+
+    def __eq__(self, other):
+        return isinstance(other, AsyncWebElement) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"<AsyncWebElement {self.id}>"
+
+    async def _execute(self, method, path, payload=None):
+        return await self.parent.execute(method, f"/element/{self.id}{path}", payload)
+
+    async def click(self):
+        await self._execute("POST", "/click")
+
+    async def clear(self):
+        await self._execute("POST", "/clear")
+
+    async def send_keys(self, *values):
+        text = "".join(str(value) for value in values)
+        await self._execute("POST", "/value", {"text": text, "value": list(text)})
+
+    async def text(self):
+        return await self._execute("GET", "/text")
+
+    async def tag_name(self):
+        return await self._execute("GET", "/name")
+
+    async def rect(self):
+        return await self._execute("GET", "/rect")
+
+    async def get_property(self, name):
+        return await self._execute("GET", f"/property/{name}")
+
+    async def get_attribute(self, name):
+        return await self.parent.execute_script(GET_ATTRIBUTE_SCRIPT, self, name)
+
+    async def is_displayed(self):
+        return await self.parent.execute_script(IS_DISPLAYED_SCRIPT, self)
+
+    async def is_enabled(self):
+        return await self._execute("GET", "/enabled")
+
+    async def is_selected(self):
+        return await self._execute("GET", "/selected")
+
+    async def find_element(self, by=By.ID, value=None):
+        using, value = w3c_locator(by, value)
+        return await self._execute("POST", "/element", {"using": using, "value": value})
+
+    async def find_elements(self, by=By.ID, value=None):
+        using, value = w3c_locator(by, value)
+        return await self._execute("POST", "/elements", {"using": using, "value": value})
+
+
+class AsyncWebDriver:
+    def __init__(self, pool, session_id, capabilities, wait_policy=None):
+        self.pool = pool
+        self.session_id = session_id
+        self.capabilities = capabilities
+        self.wait_policy = wait_policy
+
+    def __repr__(self):
+        return f"<AsyncWebDriver (session={self.session_id!r})>"
+
+    # ---- protocol
+
+    async def execute(self, method, path, payload=None):
+        value = await self.pool.command(method, f"/session/{self.session_id}{path}", self._wrap(payload))
+        return self._unwrap(value)
+
+    def _wrap(self, value):
+        if isinstance(value, AsyncWebElement):
+            return {ELEMENT_KEY: value.id}
+        if isinstance(value, (list, tuple)):
+            return [self._wrap(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self._wrap(item) for key, item in value.items()}
+        return value
+
+    def _unwrap(self, value):
+        if isinstance(value, dict):
+            if ELEMENT_KEY in value:
+                return AsyncWebElement(self, value[ELEMENT_KEY])
+            return {key: self._unwrap(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._unwrap(item) for item in value]
+        return value
+
+    # ---- navigation
+
+    async def get(self, url):
+        await self.execute("POST", "/url", {"url": url})
+
+    async def current_url(self):
+        return await self.execute("GET", "/url")
+
+    async def title(self):
+        return await self.execute("GET", "/title")
+
+    async def page_source(self):
+        return await self.execute("GET", "/source")
+
+    async def refresh(self):
+        await self.execute("POST", "/refresh")
+
+    async def back(self):
+        await self.execute("POST", "/back")
+
+    async def forward(self):
+        await self.execute("POST", "/forward")
+
+    # ---- windows
+
+    async def current_window_handle(self):
+        return await self.execute("GET", "/window")
+
+    async def window_handles(self):
+        return await self.execute("GET", "/window/handles")
+
+    async def switch_to_window(self, handle):
+        await self.execute("POST", "/window", {"handle": handle})
+
+    async def close(self):
+        return await self.execute("DELETE", "/window")
+
+    async def maximize_window(self):
+        await self.execute("POST", "/window/maximize")
+
+    async def set_timeouts(self, implicit=None, page_load=None, script=None):
+        timeouts = {"implicit": implicit, "pageLoad": page_load, "script": script}
+        await self.execute("POST", "/timeouts", {
+            name: int(seconds * 1000) for name, seconds in timeouts.items() if seconds is not None
+        })
+
+    # ---- elements and scripts
+
+    async def find_element(self, by=By.ID, value=None):
+        using, value = w3c_locator(by, value)
+        return await self.execute("POST", "/element", {"using": using, "value": value})
+
+    async def find_elements(self, by=By.ID, value=None):
+        using, value = w3c_locator(by, value)
+        return await self.execute("POST", "/elements", {"using": using, "value": value})
+
+    async def execute_script(self, script, *args):
+        return await self.execute("POST", "/execute/sync", {"script": script, "args": list(args)})
+
+    # ---- cookies, screenshots, logs
+
+    async def get_cookies(self):
+        return await self.execute("GET", "/cookie")
+
+    async def add_cookie(self, cookie_dict):
+        await self.execute("POST", "/cookie", {"cookie": cookie_dict})
+
+    async def delete_all_cookies(self):
+        await self.execute("DELETE", "/cookie")
+
+    async def get_screenshot_as_png(self):
+        return base64.b64decode((await self.execute("GET", "/screenshot")).encode("ascii"))
+
+    async def get_log(self, log_type):
+        return await self.execute("POST", "/se/log", {"type": log_type})
+
+    async def quit(self):
+        await self.pool.command("DELETE", f"/session/{self.session_id}")
+
+    async def reset(self):
+        """Back to a blank state for the next test: one window, no cookies, no storage"""
+        handles = await self.window_handles()
+        for handle in handles[1:]:
+            await self.switch_to_window(handle)
+            await self.close()
+        await self.switch_to_window(handles[0])
+        await self.delete_all_cookies()
+        await self.execute_script(RESET_STORAGE_SCRIPT)
+        await self.get("about:blank")
+
+
+class AsyncBrowserPool:
+    def __init__(self, url, capabilities, max_sessions, wait_policy=None, session_timeout=300, pool_size=None):
+        """Up to `max_sessions` sessions of `url` started with `capabilities`, shared by
+        `pool_size` keep-alive connections (one per session by default)"""
+        self.url = url
+        self.capabilities = capabilities
+        self.max_sessions = max_sessions
+        self.wait_policy = wait_policy
+        self.session_timeout = session_timeout
+        self.connections = AsyncConnectionPool(url, pool_size or max_sessions)
+        self.stats = {"sessions": 0, "session_retries": 0, "acquired": 0, "max_in_use": 0}
+        self._idle = []
+        self._in_use = 0
+        self._slots = None
+
+    async def new_session(self):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                value = await self.connections.command(
+                    "POST", "/session", {"capabilities": {"alwaysMatch": self.capabilities, "firstMatch": [{}]}}
+                )
+                break
+            except (WebDriverException, OSError) as e:
+                delay = remote_driver.backoff_delay(attempt)
+                if not remote_driver.is_retryable(e) or time.monotonic() + delay - start > self.session_timeout:
+                    raise
+                logging.info("%s refused a session (%s), retrying in %.1fs", self.url, e, delay)
+                self.stats["session_retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+        if "sessionId" not in value:
+            raise SessionNotCreatedException(f"No session id in the new session response: {value}")
+        self.stats["sessions"] += 1
+        driver = AsyncWebDriver(self.connections, value["sessionId"], value.get("capabilities", {}), self.wait_policy)
+        if self.wait_policy is not None:
+            await driver.set_timeouts(implicit=self.wait_policy.implicit_wait)
+        await driver.maximize_window()
+        return driver
+
+    async def acquire(self):
+        """A session of its own for the calling task; waits while all `max_sessions` are in use"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_sessions)
+        await self._slots.acquire()
+        try:
+            driver = self._idle.pop() if self._idle else await self.new_session()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._in_use += 1
+        self.stats["acquired"] += 1
+        self.stats["max_in_use"] = max(self.stats["max_in_use"], self._in_use)
+        return driver
+
+    async def release(self, driver):
+        """Reset the session and keep it for the next task; a session that fails to reset is quit"""
+        try:
+            await driver.reset()
+            self._idle.append(driver)
+        except (WebDriverException, OSError) as e:
+            logging.info("Dropping session %s after a failed reset: %s", driver.session_id, e)
+            await self._quit(driver)
+        finally:
+            self._in_use -= 1
+            self._slots.release()
+
+    @staticmethod
+    async def _quit(driver):
+        try:
+            await driver.quit()
+        except Exception as e:
+            logging.debug("Ignoring error while quitting session %s: %s", driver.session_id, e)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self._quit(driver) for driver in idle))
+        self.connections.close()
+
+    def summary(self):
+        return dict(self.stats)
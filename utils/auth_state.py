@@ -0,0 +1,153 @@
+"""
+Authenticated-state cache.
+
+The first worker that needs a logged-in browser logs in through the UI, then snapshots
+the cookies, localStorage and sessionStorage of the site into
+`<directory>/<client>-<env>.json`. Every later browser session (fresh, recycled or reset
+between test classes, in any worker) gets that state injected instead of logging in
+again. The snapshot is read and refreshed under a file lock, so concurrent workers wait
+for a single login. A snapshot is considered expired once it is older than `max_age`
+seconds, once one of its session cookies has expired, or as soon as the site rejects it
+(the page does not show the user as logged in); any of these triggers a fresh login.
+Session cookies are the HttpOnly ones, which page scripts such as analytics cannot set,
+so a short-lived tracking cookie (_gat, ...) running out does not force a login.
+"""
+import json
+import logging
+import os
+import time
+import urllib.parse
+
+from pages import scripts
+from utils.driver_cache import file_lock
+
+DEFAULT_MAX_AGE = 3600
+# Cookie fields WebDriver accepts back in add_cookie
+COOKIE_FIELDS = ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")
+
+
+def origin_of(url):
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+def capture_state(driver):
+    """Cookies and web storage of the page the driver is on."""
+    storage = driver.execute_script(scripts.READ_STORAGE)
+    return {
+        "origin": origin_of(driver.current_url),
+        "saved_at": time.time(),
+        "cookies": driver.get_cookies(),
+        "local_storage": storage["local"],
+        "session_storage": storage["session"],
+    }
+
+
+def apply_state(driver, state):
+    """Load the snapshot's origin and inject its cookies and storage into it."""
+    driver.get(state["origin"])
+    for cookie in state["cookies"]:
+        driver.add_cookie({key: cookie[key] for key in COOKIE_FIELDS if key in cookie})
+    driver.execute_script(scripts.WRITE_STORAGE, state["local_storage"], state["session_storage"])
+    driver.refresh()
+
+
+def is_auth_cookie(cookie, names=None):
+    """A cookie the login depends on: one of `names`, or by default any HttpOnly cookie"""
+    if names is not None:
+        return cookie["name"] in names
+    return bool(cookie.get("httpOnly"))
+
+
+def is_expired(state, max_age=DEFAULT_MAX_AGE, now=None, auth_cookies=None):
+    now = time.time() if now is None else now
+    if max_age and now - state["saved_at"] > max_age:
+        return True
+    return any(
+        cookie.get("expiry") is not None and cookie["expiry"] <= now
+        for cookie in state["cookies"]
+        if is_auth_cookie(cookie, auth_cookies)
+    )
+
+
+class AuthStateStore:
+    """One JSON snapshot per client/env on disk, guarded by a lock file next to it."""
+
+    def __init__(self, directory, client, env):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{client}-{env}.json")
+        self.lock_path = self.path + ".lock"
+
+    def lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return file_lock(self.lock_path)
+
+    def load(self):
+        try:
+            with open(self.path) as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(temporary, self.path)
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class AuthSession:
+    """Keeps browsers logged in with at most one UI login per expired snapshot.
+
+    `login(driver)` performs the UI login and leaves the driver on the site;
+    `is_logged_in(driver)` tells, on a loaded page, whether the session was accepted.
+    `auth_cookies` names the cookies whose expiry ends the login (default: the HttpOnly ones)."""
+
+    def __init__(self, store, login, is_logged_in, max_age=DEFAULT_MAX_AGE, auth_cookies=None):
+        self.store = store
+        self.login = login
+        self.is_logged_in = is_logged_in
+        self.max_age = max_age
+        self.auth_cookies = auth_cookies
+        self.state = None
+        self.stats = {"logins": 0, "injections": 0, "rejected": 0}
+
+    def expired(self, state):
+        return is_expired(state, self.max_age, auth_cookies=self.auth_cookies)
+
+    def _inject(self, driver, state):
+        apply_state(driver, state)
+        if self.is_logged_in(driver):
+            self.stats["injections"] += 1
+            self.state = state
+            return True
+        self.stats["rejected"] += 1
+        logging.info("Stored auth state from %s was rejected", time.ctime(state["saved_at"]))
+        return False
+
+    def ensure(self, driver):
+        """Make `driver` logged in, reusing the stored state whenever the site accepts it."""
+        if self.state is not None and not self.expired(self.state) and self._inject(driver, self.state):
+            return driver
+        rejected_at = self.state["saved_at"] if self.state is not None else None
+        self.state = None
+        with self.store.lock():
+            state = self.store.load()
+            # Another worker may already have replaced the snapshot this worker saw rejected
+            if state is not None and state["saved_at"] != rejected_at and not self.expired(state):
+                if self._inject(driver, state):
+                    return driver
+            self.login(driver)
+            # A failed login must not be stored, or every worker would inject it
+            if not self.is_logged_in(driver):
+                raise Exception(f"UI login failed, still not logged in at {driver.current_url}")
+            self.stats["logins"] += 1
+            self.state = capture_state(driver)
+            self.store.save(self.state)
+        return driver
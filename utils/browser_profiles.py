@@ -0,0 +1,217 @@
+"""
+Lightweight browser profiles (--browser-profile, @pytest.mark.browser_profile("lean")).
+
+`full` loads everything. `lean` blocks analytics, ad and font requests and turns off
+extensions and background throttling. `text-only` also blocks images and media.
+
+Chromium browsers (Chrome, Edge) block URL patterns through DevTools
+(Network.setBlockedURLs). The patterns can change between tests, so a marker switches
+the profile of the running browser. Firefox has no DevTools blocking; it gets the
+closest preferences (tracking protection, no web fonts, no images) at launch, so only
+the --browser-profile chosen on the command line applies there.
+
+Requests refused by DevTools are read back from Chrome's performance log, which is only
+turned on when some test of the run blocks requests and is then drained after every test.
+Their count and an estimate of the bytes saved (typical sizes per resource type, not
+measured transfers) are recorded in the test's user_properties and totalled per profile
+in the terminal summary.
+"""
+import json
+import logging
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from config import BrowserEnum
+from config import BrowserProfileEnum
+
+ANALYTICS_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*", "*segment.io*", "*segment.com/analytics*",
+    "*clarity.ms*", "*mixpanel.com*", "*intercom.io*", "*hs-analytics.net*", "*hs-scripts.com*",
+]
+FONT_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*fonts.googleapis.com*", "*fonts.gstatic.com*"]
+IMAGE_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif"]
+MEDIA_PATTERNS = ["*.mp4", "*.webm", "*.mp3", "*.m4a", "*.ogg"]
+LEAN_CHROME_ARGUMENTS = [
+    "--disable-extensions",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+]
+
+PROFILES = {
+    BrowserProfileEnum.FULL.value[0]: {
+        "blocked_urls": [],
+        "chrome_arguments": [],
+        "chrome_prefs": {},
+        "firefox_prefs": {},
+    },
+    BrowserProfileEnum.LEAN.value[0]: {
+        "blocked_urls": ANALYTICS_PATTERNS + FONT_PATTERNS,
+        "chrome_arguments": LEAN_CHROME_ARGUMENTS,
+        "chrome_prefs": {},
+        "firefox_prefs": {
+            "privacy.trackingprotection.enabled": True,
+            "gfx.downloadable_fonts.enabled": False,
+            "extensions.enabledScopes": 0,
+        },
+    },
+    BrowserProfileEnum.TEXT_ONLY.value[0]: {
+        "blocked_urls": ANALYTICS_PATTERNS + FONT_PATTERNS + IMAGE_PATTERNS + MEDIA_PATTERNS,
+        "chrome_arguments": LEAN_CHROME_ARGUMENTS + ["--blink-settings=imagesEnabled=false", "--mute-audio"],
+        "chrome_prefs": {"profile.managed_default_content_settings.images": 2},
+        "firefox_prefs": {
+            "privacy.trackingprotection.enabled": True,
+            "gfx.downloadable_fonts.enabled": False,
+            "extensions.enabledScopes": 0,
+            "permissions.default.image": 2,
+            "media.autoplay.default": 5,
+        },
+    },
+}
+
+# Typical transfer sizes (bytes) per DevTools resource type, used to estimate savings
+ESTIMATED_BYTES = {
+    "Image": 40_000,
+    "Font": 35_000,
+    "Script": 60_000,
+    "Stylesheet": 20_000,
+    "Media": 500_000,
+    "XHR": 5_000,
+    "Fetch": 5_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+FULL = BrowserProfileEnum.FULL.value[0]
+# Browsers launched with configure_chrome_options
+CHROMIUM = (BrowserEnum.CHROME.value[0], BrowserEnum.EDGE.value[0])
+
+
+def profile_for(item, default):
+    marker = item.get_closest_marker("browser_profile")
+    return marker.args[0] if marker is not None and marker.args else default
+
+
+def logs_performance(browser_name, default, items):
+    """Whether sessions get the performance log: Chromium browsers, when some test blocks requests"""
+    return browser_name in CHROMIUM and (
+        default != FULL or any(item.get_closest_marker("browser_profile") for item in items)
+    )
+
+
+def configure_chrome_options(options, profile_name, track_blocked=True):
+    """Launch arguments of a Chromium profile; returns the prefs to merge into the options."""
+    profile = PROFILES[profile_name]
+    for argument in profile["chrome_arguments"]:
+        options.add_argument(argument)
+    if track_blocked:
+        # The performance log carries Network.loadingFailed events for blocked requests
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return dict(profile["chrome_prefs"])
+
+
+def configure_firefox_options(options, profile_name):
+    for name, value in PROFILES[profile_name]["firefox_prefs"].items():
+        options.set_preference(name, value)
+
+
+def supports_blocking(driver):
+    return hasattr(driver, "execute_cdp_cmd")
+
+
+def apply_profile(driver, profile_name):
+    """Switch the URL blocking of a running Chromium browser to `profile_name`."""
+    if not supports_blocking(driver):
+        return False
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": PROFILES[profile_name]["blocked_urls"]})
+    return True
+
+
+def read_blocked_requests(driver):
+    """Drain the performance log and count the requests DevTools refused, by resource type."""
+    blocked = {}
+    try:
+        entries = driver.get_log("performance")
+    except WebDriverException:
+        return blocked
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        if message["method"] != "Network.loadingFailed":
+            continue
+        params = message["params"]
+        if params.get("blockedReason") == "inspector":
+            resource_type = params.get("type", "Other")
+            blocked[resource_type] = blocked.get(resource_type, 0) + 1
+    return blocked
+
+
+def estimated_bytes(blocked):
+    return sum(ESTIMATED_BYTES.get(kind, DEFAULT_ESTIMATED_BYTES) * count for kind, count in blocked.items())
+
+
+class BrowserProfilePlugin:
+    name = "browser_profiles"
+
+    def __init__(self, config, get_driver):
+        self.config = config
+        self.get_driver = get_driver
+        self.default = config.getoption("browser_profile")
+        self.applied = None
+        self.drain_log = None
+        self.totals = {}
+        self._warned = False
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        driver = self.get_driver()
+        profile_name = profile_for(item, self.default)
+        if driver is None or profile_name not in PROFILES:
+            yield
+            return
+        # A browser (new or swapped in by the pool) starts without any blocking
+        current = self.applied[1] if self.applied is not None and self.applied[0] is driver else FULL
+        if current != profile_name:
+            if apply_profile(driver, profile_name):
+                self.applied = (driver, profile_name)
+            elif profile_name != self.default and not self._warned:
+                logging.warning("This browser cannot switch profiles per test; using --browser-profile=%s",
+                                self.default)
+                self._warned = True
+        yield
+        if self.drain_log is None:
+            self.drain_log = logs_performance(self.config.getoption("browser"), self.default, item.session.items)
+        if not self.drain_log:
+            return
+        # Once on, the log collects every request of the session; it is drained even when nothing is counted
+        blocked = read_blocked_requests(driver)
+        if not supports_blocking(driver) or (profile_name == FULL and current == FULL):
+            return
+        count = sum(blocked.values())
+        saved = estimated_bytes(blocked)
+        item.user_properties.append(("browser_profile", profile_name))
+        item.user_properties.append(("blocked_requests", count))
+        item.user_properties.append(("blocked_bytes_estimate", saved))
+        totals = self.totals.setdefault(
+            profile_name, {"tests": 0, "blocked": 0, "estimated_bytes": 0, "by_type": {}}
+        )
+        totals["tests"] += 1
+        totals["blocked"] += count
+        totals["estimated_bytes"] += saved
+        for kind, kind_count in blocked.items():
+            totals["by_type"][kind] = totals["by_type"].get(kind, 0) + kind_count
+
+    def summary(self):
+        return self.totals
+
+
+def write_terminal_summary(terminalreporter, summary):
+    if not summary or not any(totals["blocked"] for totals in summary.values()):
+        return
+    terminalreporter.write_sep("-", "browser profiles")
+    for profile_name, totals in sorted(summary.items()):
+        by_type = ", ".join(f"{kind}: {count}" for kind, count in sorted(totals["by_type"].items()))
+        terminalreporter.write_line(
+            f"{profile_name:10} {totals['tests']:5d} tests  {totals['blocked']:6d} requests blocked  "
+            f"~{totals['estimated_bytes'] / 1_000_000:.1f} MB estimated saved  {by_type}"
+        )
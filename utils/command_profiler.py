@@ -0,0 +1,233 @@
+"""
+WebDriver protocol profiler.
+
+Every command sent through a RemoteConnection is timed with its name and payload size.
+Latencies are aggregated into histograms per command type and per test, tests can
+declare a budget with the `webdriver_budget` marker, and with --webdriver-trace the
+traffic is exported as a Chrome trace-event file (chrome://tracing, Perfetto) with one
+process per xdist worker.
+"""
+import bisect
+import functools
+import glob
+import json
+import os
+import threading
+import time
+
+import pytest
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open ended
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+HISTOGRAM_LABELS = tuple(f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS) + (f">{HISTOGRAM_BUCKETS_MS[-1]}ms",)
+
+
+def empty_histogram():
+    # A dict rather than a list so worker_stats sums the buckets of every worker
+    return dict.fromkeys(HISTOGRAM_LABELS, 0)
+
+
+def histogram_label(duration):
+    return HISTOGRAM_LABELS[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, duration * 1000.0)]
+
+
+class CommandProfiler:
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.commands = []
+        self.by_command = {}
+        self.tests = {}
+        self.listeners = []
+        self.trace_events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._request_size = threading.local()
+
+    def install(self):
+        """Patch RemoteConnection so every driver in this process reports to the profiler."""
+        from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+        profiler = self
+        original_execute = RemoteConnection.execute
+        original_request = RemoteConnection._request
+
+        @functools.wraps(original_request)
+        def _request(connection, method, url, body=None):
+            profiler._request_size.value = len(body or "")
+            return original_request(connection, method, url, body=body)
+
+        @functools.wraps(original_execute)
+        def execute(connection, command, params):
+            start = time.perf_counter()
+            profiler._request_size.value = 0
+            try:
+                return original_execute(connection, command, params)
+            finally:
+                profiler.record(command, start, time.perf_counter() - start, profiler._request_size.value)
+
+        RemoteConnection._request = _request
+        RemoteConnection.execute = execute
+
+    def record(self, command, start, duration, request_bytes):
+        thread = threading.current_thread()
+        entry = (command, start, duration, request_bytes, thread.ident)
+        bucket = histogram_label(duration)
+        with self._lock:
+            stats = self.by_command.setdefault(
+                command, {"count": 0, "seconds": 0.0, "request_bytes": 0, "histogram": empty_histogram()}
+            )
+            stats["count"] += 1
+            stats["seconds"] += duration
+            stats["request_bytes"] += request_bytes
+            stats["histogram"][bucket] += 1
+            # Commands from helper threads (e.g. the standby browser) do not count towards a test
+            if thread is threading.main_thread():
+                self.commands.append(entry)
+            if self.trace:
+                self.trace_events.append({
+                    "name": command,
+                    "cat": "webdriver",
+                    "ph": "X",
+                    "ts": (start - self._origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": os.getpid(),
+                    "tid": thread.ident,
+                    "args": {"request_bytes": request_bytes},
+                })
+        for listener in self.listeners:
+            listener(entry)
+
+    def start_test(self):
+        """Forget the commands of the previous test so the list stays bounded."""
+        with self._lock:
+            self.commands = []
+
+    def test_stats(self):
+        """Command count, total latency and latency histogram of the current test."""
+        histogram = empty_histogram()
+        seconds = 0.0
+        slowest = 0.0
+        commands = self.commands
+        for command, start, duration, request_bytes, thread_id in commands:
+            seconds += duration
+            slowest = max(slowest, duration)
+            histogram[histogram_label(duration)] += 1
+        return {"commands": len(commands), "seconds": seconds, "slowest": slowest, "histogram": histogram}
+
+    def add_test_span(self, nodeid, start, duration):
+        if self.trace:
+            self.trace_events.append({
+                "name": nodeid,
+                "cat": "test",
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.main_thread().ident,
+            })
+
+
+def budget_violations(marker, stats):
+    """Human readable list of the limits of a `webdriver_budget` marker that `stats` exceeds."""
+    violations = []
+    max_commands = marker.kwargs.get("max_commands")
+    max_seconds = marker.kwargs.get("max_seconds")
+    max_command_seconds = marker.kwargs.get("max_command_seconds")
+    if max_commands is not None and stats["commands"] > max_commands:
+        violations.append(f"{stats['commands']} WebDriver commands (budget {max_commands})")
+    if max_seconds is not None and stats["seconds"] > max_seconds:
+        violations.append(f"{stats['seconds']:.2f}s spent in WebDriver commands (budget {max_seconds}s)")
+    if max_command_seconds is not None and stats["slowest"] > max_command_seconds:
+        violations.append(f"slowest command took {stats['slowest']:.2f}s (budget {max_command_seconds}s)")
+    return violations
+
+
+class CommandProfilerPlugin:
+    name = "command_profiler"
+
+    def __init__(self, config, trace_path=None, run_id=None):
+        self.config = config
+        self.trace_path = trace_path
+        self.run_id = run_id
+        self.profiler = CommandProfiler(trace=bool(trace_path))
+        self.profiler.install()
+        self._call_start = 0.0
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        self.profiler.start_test()
+        self._call_start = time.perf_counter()
+        yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        if call.when != "call":
+            return
+        report = outcome.get_result()
+        stats = self.profiler.test_stats()
+        self.profiler.tests[item.nodeid] = stats
+        self.profiler.add_test_span(item.nodeid, self._call_start, time.perf_counter() - self._call_start)
+        item.user_properties.append(("webdriver_commands", stats["commands"]))
+        item.user_properties.append(("webdriver_seconds", round(stats["seconds"], 3)))
+        marker = item.get_closest_marker("webdriver_budget")
+        if marker is None or not report.passed:
+            return
+        violations = budget_violations(marker, stats)
+        if violations:
+            report.outcome = "failed"
+            report.longrepr = "WebDriver budget exceeded: " + "; ".join(violations)
+
+    def summary(self):
+        return {"by_command": self.profiler.by_command}
+
+    def pytest_sessionfinish(self, session):
+        if self.trace_path:
+            write_trace(
+                self.trace_path, list(self.profiler.trace_events), self.run_id, os.environ.get("PYTEST_XDIST_WORKER")
+            )
+
+
+def worker_trace_path(trace_path, run_id, worker_id):
+    # Keyed on the run, so parts an interrupted run left behind never end up in a later trace
+    stem, extension = os.path.splitext(trace_path)
+    return f"{stem}-{run_id}-{worker_id}{extension or '.json'}"
+
+
+def write_trace(trace_path, events, run_id, worker_id=None):
+    """Write the trace events of this process: a part file on a worker, the whole trace otherwise.
+    The xdist controller calls this without events of its own to fold the parts of the workers
+    of run `run_id` together."""
+    process_name = {
+        "name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": worker_id or "main"}
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+    if worker_id:
+        with open(worker_trace_path(trace_path, run_id, worker_id), "w") as trace_file:
+            json.dump([process_name] + events, trace_file)
+        return
+    # Controller (or a run without xdist): fold the worker files into one trace
+    for part in sorted(glob.glob(worker_trace_path(trace_path, run_id, "gw*"))):
+        with open(part) as trace_file:
+            events.extend(json.load(trace_file))
+        os.remove(part)
+    with open(trace_path, "w") as trace_file:
+        json.dump({"traceEvents": [process_name] + events, "displayTimeUnit": "ms"}, trace_file)
+
+
+def write_terminal_summary(terminalreporter, summary, limit=15):
+    by_command = summary["by_command"] if summary else {}
+    if not by_command:
+        return
+    terminalreporter.write_sep("-", "webdriver commands")
+    terminalreporter.write_line(f"{'command':32} {'count':>7} {'total':>9} {'mean':>8}  latency histogram")
+    commands = sorted(by_command.items(), key=lambda item: item[1]["seconds"], reverse=True)
+    for command, stats in commands[:limit]:
+        buckets = ", ".join(
+            f"{label}: {stats['histogram'][label]}" for label in HISTOGRAM_LABELS if stats["histogram"].get(label)
+        )
+        terminalreporter.write_line(
+            f"{command:32} {stats['count']:7d} {stats['seconds']:8.2f}s "
+            f"{1000.0 * stats['seconds'] / stats['count']:6.1f}ms  {buckets}"
+        )
+
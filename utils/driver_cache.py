@@ -0,0 +1,169 @@
+"""
+Machine-wide WebDriver binary cache.
+
+Binaries are stored per browser and browser major version under one cache directory
+guarded by a file lock, so with `-n 16` only the first worker resolves (and maybe
+downloads) a driver and every other worker reuses it. In offline mode nothing is
+downloaded and a missing binary is an immediate error.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+from contextlib import contextmanager
+
+from config import BrowserEnum
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "levelup-webdrivers")
+MANIFEST_NAME = "manifest.json"
+
+BROWSER_VERSION_COMMANDS = {
+    BrowserEnum.CHROME.value[0]: [
+        ["google-chrome", "--version"],
+        ["google-chrome-stable", "--version"],
+        ["chromium", "--version"],
+        ["chromium-browser", "--version"],
+        ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome", "--version"],
+        ["reg", "query", r"HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon", "/v", "version"],
+    ],
+    BrowserEnum.FIREFOX.value[0]: [
+        ["firefox", "--version"],
+        ["/Applications/Firefox.app/Contents/MacOS/firefox", "--version"],
+        ["reg", "query", r"HKEY_LOCAL_MACHINE\Software\Mozilla\Mozilla Firefox", "/v", "CurrentVersion"],
+    ],
+    BrowserEnum.EDGE.value[0]: [
+        ["microsoft-edge", "--version"],
+        ["microsoft-edge-stable", "--version"],
+        ["/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge", "--version"],
+        ["reg", "query", r"HKEY_CURRENT_USER\Software\Microsoft\Edge\BLBeacon", "/v", "version"],
+    ],
+}
+
+
+class DriverCacheError(Exception):
+    pass
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive inter-process lock held for the duration of the block."""
+    with open(path, "a+") as lock_file:
+        if sys.platform == "win32":
+            import msvcrt
+
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def detect_browser_major_version(browser_name):
+    """Major version of the locally installed browser, read without any network access."""
+    for command in BROWSER_VERSION_COMMANDS.get(browser_name, []):
+        try:
+            output = subprocess.run(
+                command, capture_output=True, text=True, timeout=10
+            ).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r"(\d+)\.[\d.]+", output)
+        if match:
+            return match.group(1)
+    return None
+
+
+def download_driver(browser_name):
+    """Resolve a driver through webdriver_manager (network access) and return its path."""
+    if browser_name == BrowserEnum.CHROME.value[0]:
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        return ChromeDriverManager().install()
+    if browser_name == BrowserEnum.FIREFOX.value[0]:
+        from webdriver_manager.firefox import GeckoDriverManager
+
+        return GeckoDriverManager().install()
+    if browser_name == BrowserEnum.EDGE.value[0]:
+        from webdriver_manager.microsoft import EdgeChromiumDriverManager
+
+        return EdgeChromiumDriverManager().install()
+    raise DriverCacheError(f"No driver download available for {browser_name}")
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(cache_dir, manifest):
+    temp_path = os.path.join(cache_dir, MANIFEST_NAME + ".tmp")
+    with open(temp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(temp_path, os.path.join(cache_dir, MANIFEST_NAME))
+
+
+def _cached_path(manifest, browser_name, major_version):
+    versions = manifest.get(browser_name, {})
+    if major_version is None and versions:
+        # Browser version unknown: fall back to the newest driver we have.
+        major_version = max(versions, key=int)
+        logging.warning(
+            "Could not detect the %s version, using cached driver %s", browser_name, major_version
+        )
+    path = versions.get(major_version) if major_version is not None else None
+    if path and os.path.isfile(path):
+        return path
+    return None
+
+
+def resolve_driver_binary(browser_name, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """Return the path of a driver binary matching the installed browser.
+    The first caller on the machine populates the cache; everyone else reads it.
+    Returns None for browsers that do not need a separate driver binary."""
+    if browser_name not in BROWSER_VERSION_COMMANDS:
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    major_version = detect_browser_major_version(browser_name)
+    cached = _cached_path(_read_manifest(cache_dir), browser_name, major_version)
+    if cached:
+        return cached
+
+    with file_lock(os.path.join(cache_dir, ".lock")):
+        # Another worker may have filled the cache while we were waiting for the lock.
+        manifest = _read_manifest(cache_dir)
+        cached = _cached_path(manifest, browser_name, major_version)
+        if cached:
+            return cached
+        if offline:
+            raise DriverCacheError(
+                f"No cached {browser_name} driver for browser version {major_version} in {cache_dir}; "
+                f"run once with --offline-drivers=false on a connected machine to populate it"
+            )
+
+        downloaded = download_driver(browser_name)
+        major_version = major_version or "0"
+        target_dir = os.path.join(cache_dir, browser_name, major_version)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(downloaded))
+        shutil.copy2(downloaded, target)
+        os.chmod(target, 0o755)
+        manifest.setdefault(browser_name, {})[major_version] = target
+        _write_manifest(cache_dir, manifest)
+        logging.info("Cached %s driver for browser %s at %s", browser_name, major_version, target)
+        return target
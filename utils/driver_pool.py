@@ -0,0 +1,224 @@
+"""
+Warm browser pool for one pytest (xdist) worker.
+
+The pool owns the active driver handed to the tests plus an optional standby browser
+launched in the background, so replacing a crashed, bloated or worn-out browser costs
+a swap instead of a cold start.
+
+Between test classes the browser is reset to a blank state. The pool notes the origin the
+browser is on after every test. Chromium clears the cookies of every site and the storage
+of every noted origin through DevTools; other browsers can only clear the origin they are
+on, so they are swapped for the standby when the tests since the last reset were on more
+than one origin.
+
+With `lazy` nothing is launched until the driver is first asked for, so a worker that only
+runs tests with browsers of their own (async tests) never starts one.
+"""
+import logging
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium.common.exceptions import WebDriverException
+
+try:
+    import psutil
+except ImportError:  # RSS based recycling is simply unavailable without psutil
+    psutil = None
+
+
+class DriverPool:
+    def __init__(
+        self, factory, standby=True, recycle_after=0, max_rss_mb=0, on_swap=None, parallel_start=False, lazy=False
+    ):
+        """`factory` launches a ready-to-use driver. `recycle_after` (tests) and
+        `max_rss_mb` (browser memory) trigger a swap when non-zero. `on_swap(driver)`
+        is called whenever the active driver changes, including when the first one starts.
+        With `parallel_start` the standby is requested together with the first driver instead
+        of after it. With `lazy` the first driver starts on first use of `driver`."""
+        self.factory = factory
+        self.standby_enabled = standby
+        self.recycle_after = recycle_after
+        self.max_rss_mb = max_rss_mb
+        self.on_swap = on_swap
+        self.tests_served = 0
+        self.swaps = []
+        # Origins the active browser was on after a test, since its last reset
+        self.origins = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="driver-pool")
+        # Quits get their own thread, so an old browser is not kept running while the next standby starts
+        self._quitter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="driver-pool-quit")
+        self._standby = None
+        self._driver = None
+        self._parallel_start = parallel_start
+        if max_rss_mb and psutil is None:
+            logging.warning("psutil is not installed, --recycle-rss-mb is ignored")
+        if not lazy:
+            self.start()
+
+    @property
+    def started(self):
+        return self._driver is not None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self.start()
+        return self._driver
+
+    def start(self):
+        if self._parallel_start:
+            self._spawn_standby()
+            self._driver = self.factory()
+        else:
+            self._driver = self.factory()
+            self._spawn_standby()
+        if self.on_swap is not None:
+            self.on_swap(self._driver)
+
+    def _spawn_standby(self):
+        if self.standby_enabled:
+            self._standby = self._executor.submit(self.factory)
+
+    def _take_standby(self):
+        standby, self._standby = self._standby, None
+        if standby is not None:
+            try:
+                return standby.result()
+            except Exception as e:
+                logging.warning("Standby browser failed to start, launching a new one: %s", e)
+        return self.factory()
+
+    def is_healthy(self):
+        try:
+            self._note_origin(self.driver.current_url)
+            return True
+        except WebDriverException:
+            return False
+
+    def _note_origin(self, url):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme in ("http", "https"):
+            self.origins.add(f"{parts.scheme}://{parts.netloc}")
+
+    @staticmethod
+    def _processes(driver):
+        """The driver process of `driver` and every browser process it spawned."""
+        service = getattr(driver, "service", None)
+        process = getattr(service, "process", None)
+        if psutil is None or process is None:
+            return []
+        try:
+            root = psutil.Process(process.pid)
+            return [root] + root.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def browser_processes(self):
+        """Processes of the active browser and of the standby, once it is up."""
+        if not self.started:
+            return []
+        drivers = [self.driver]
+        standby = self._standby
+        if standby is not None and standby.done() and standby.exception() is None:
+            drivers.append(standby.result())
+        return [process for driver in drivers for process in self._processes(driver)]
+
+    def browser_rss_mb(self):
+        """Resident memory of the driver process and every browser process it spawned."""
+        if psutil is None:
+            return 0.0
+        try:
+            return sum(p.memory_info().rss for p in self._processes(self.driver)) / (1024.0 * 1024.0)
+        except psutil.Error:
+            return 0.0
+
+    def swap(self, reason):
+        """Replace the active driver with the standby and start warming the next one."""
+        logging.info("Swapping browser after %d tests: %s", self.tests_served, reason)
+        old_driver = self.driver
+        self._driver = self._take_standby()
+        self.tests_served = 0
+        self.origins = set()
+        self.swaps.append(reason)
+        self._spawn_standby()
+        self._quitter.submit(self._quit, old_driver)
+        if self.on_swap is not None:
+            self.on_swap(self.driver)
+        return self.driver
+
+    def reset(self):
+        """Bring the active browser back to a blank state: one window, no cookies, no storage.
+        Returns the driver, which is a fresh one when the old one could not be cleared."""
+        driver = self.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        self._note_origin(driver.current_url)
+        origins, self.origins = self.origins, set()
+        if hasattr(driver, "execute_cdp_cmd"):
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in sorted(origins):
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        elif len(origins) > 1:
+            return self.swap(f"tests left the base origin ({len(origins)} origins)")
+        else:
+            driver.delete_all_cookies()
+            driver.execute_script(
+                "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+            )
+        driver.get("about:blank")
+        return driver
+
+    def release(self, reset=True):
+        """Called after every test. Swaps a dead browser straight away; recycles or resets
+        a healthy one only when `reset` is true (i.e. between test classes)."""
+        self.tests_served += 1
+        if not self.is_healthy():
+            return self.swap("browser stopped responding")
+        if not reset:
+            return self.driver
+        if self.recycle_after and self.tests_served >= self.recycle_after:
+            return self.swap(f"served {self.tests_served} tests")
+        if self.max_rss_mb:
+            rss = self.browser_rss_mb()
+            if rss > self.max_rss_mb:
+                return self.swap(f"browser RSS {rss:.0f} MB over {self.max_rss_mb} MB")
+        try:
+            return self.reset()
+        except WebDriverException as e:
+            return self.swap(f"reset failed: {e.msg}")
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.debug("Ignoring error while quitting browser: %s", e)
+
+    def close(self):
+        if self._standby is not None:
+            self._standby.add_done_callback(lambda future: future.exception() or self._quit(future.result()))
+            self._standby = None
+        self._executor.shutdown(wait=True)
+        self._quitter.shutdown(wait=True)
+        if self.started:
+            self._quit(self._driver)
+
+
+class ActiveDriver:
+    """Stands for whichever driver is active in `pool`, so a reference taken once (the session
+    fixture's value) still reaches the current browser after a swap."""
+
+    def __init__(self, pool):
+        object.__setattr__(self, "_pool", pool)
+
+    def __getattr__(self, name):
+        return getattr(self._pool.driver, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._pool.driver, name, value)
+
+    def __repr__(self):
+        return f"<ActiveDriver {self._pool.driver!r}>"
@@ -0,0 +1,231 @@
+"""
+Duration-aware scheduling for xdist (--schedule-by-duration=true).
+
+Per-test durations are kept in the pytest cache per --client/--env/--browser combination.
+With `-n`/`--dist load` the LongestFirstScheduling below replaces xdist's chunked
+round-robin: `mandatory` tests go out first, then `high`, then the rest, and within a tier
+the longest known tests are handed out first, one unit at a time, to whichever worker runs
+dry. Tests carrying pytest-order markers stay together as a single unit in their collected
+order (one per --order-scope), so their constraints still hold. The terminal summary
+compares the makespan predicted from history with the one actually observed.
+"""
+import os
+import statistics
+import time
+
+import pytest
+from xdist.scheduler import LoadScheduling
+
+DURATIONS_KEY = "duration_scheduler/durations/{client}-{env}-{browser}"
+COLLECTION_KEY = "duration_scheduler/collection/{worker}"
+PRIORITY_MARKERS = ("mandatory", "high")
+ORDER_MARKER = "order"
+# Weight of the latest run in the stored (exponentially smoothed) duration
+SMOOTHING = 0.5
+
+
+def priority_tier(item):
+    for tier, marker in enumerate(PRIORITY_MARKERS):
+        if item.get_closest_marker(marker) is not None:
+            return tier
+    return len(PRIORITY_MARKERS)
+
+
+def order_group(item, order_scope):
+    """Key of the unit an ordered test must share with the tests it is ordered against."""
+    if item.get_closest_marker(ORDER_MARKER) is None:
+        return None
+    if order_scope == "module":
+        return item.nodeid.split("::")[0]
+    if order_scope == "class":
+        cls = item.getparent(pytest.Class)
+        return cls.nodeid if cls is not None else item.nodeid.split("::")[0]
+    return "session"
+
+
+def build_units(collection, tiers, groups):
+    """Split the collection (a list of node ids) into units of indices dispatched as a whole."""
+    units = []
+    grouped = {}
+    for index, nodeid in enumerate(collection):
+        group = groups.get(nodeid)
+        if group is None:
+            units.append([index])
+        elif group in grouped:
+            grouped[group].append(index)
+        else:
+            grouped[group] = [index]
+            units.append(grouped[group])
+    return [(min(tiers.get(collection[i], len(PRIORITY_MARKERS)) for i in unit), unit) for unit in units]
+
+
+def dispatch_order(collection, tiers, groups, durations):
+    """Units sorted by priority tier, then longest predicted duration first."""
+    default = statistics.median(durations.values()) if durations else 0.0
+    units = []
+    for tier, unit in build_units(collection, tiers, groups):
+        predicted = sum(durations.get(collection[index], default) for index in unit)
+        units.append((tier, -predicted, unit[0], unit, predicted))
+    units.sort(key=lambda entry: entry[:3])
+    return [(unit, predicted) for tier, negative, first, unit, predicted in units]
+
+
+def predict_makespan(units, workers):
+    """Greedy simulation of the dispatch: every unit goes to the least loaded worker."""
+    loads = [0.0] * max(1, workers)
+    for unit, predicted in units:
+        loads[loads.index(min(loads))] += predicted
+    return max(loads)
+
+
+class LongestFirstScheduling(LoadScheduling):
+    """LoadScheduling that hands out whole units in `dispatch_order` to idle workers."""
+
+    def __init__(self, config, log=None, plugin=None):
+        super().__init__(config, log)
+        self.plugin = plugin
+        self.unit_of = {}
+
+    def schedule(self):
+        assert self.collection_is_completed
+        if self.collection is not None:
+            for node in self.nodes:
+                self.check_schedule(node)
+            return
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+
+        node = next(iter(self.node2collection))
+        self.collection = self.node2collection[node]
+        tiers, groups = self.plugin.load_collection_info(node.gateway.id)
+        units = dispatch_order(self.collection, tiers, groups, self.plugin.durations)
+        self.plugin.predicted_makespan = predict_makespan(units, len(self.nodes))
+        self.plugin.workers = len(self.nodes)
+        for unit, predicted in units:
+            for index in unit:
+                self.unit_of[index] = unit
+        self.pending[:] = [index for unit, predicted in units for index in unit]
+        if not self.collection:
+            return
+        for node in self.nodes:
+            self.check_schedule(node)
+
+    def check_schedule(self, node, duration=0):
+        if node.shutting_down:
+            return
+        # A worker only starts a test once it knows the next one, so keep two queued
+        while self.pending and len(self.node2pending[node]) < 2:
+            self._send_unit(node)
+        if not self.pending:
+            node.shutdown()
+
+    def _send_unit(self, node):
+        unit = self.unit_of.get(self.pending[0], [self.pending[0]])
+        indices = [index for index in unit if index in self.pending]
+        for index in indices:
+            self.pending.remove(index)
+        self.node2pending[node].extend(indices)
+        node.send_runtest_some(indices)
+
+
+class DurationSchedulerPlugin:
+    name = "duration_scheduler"
+
+    def __init__(self, config):
+        self.config = config
+        self.cache = getattr(config, "cache", None)
+        self.key = DURATIONS_KEY.format(
+            client=config.getoption("client"), env=config.getoption("env"), browser=config.getoption("browser")
+        )
+        self.durations = self.cache.get(self.key, {}) if self.cache is not None else {}
+        self.measured = {}
+        self.skipped = set()
+        self.by_worker = {}
+        self.predicted_makespan = None
+        self.workers = 1
+        self._start = time.monotonic()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_make_scheduler(self, config, log):
+        if config.getvalue("dist") != "load":
+            return None
+        return LongestFirstScheduling(config, log, plugin=self)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection_finish(self, session):
+        # Workers hand priorities and order groups to the controller's scheduler through the
+        # cache; this runs before xdist reports the collection, so the entry is always there
+        worker_id = os.environ.get("PYTEST_XDIST_WORKER")
+        if worker_id:
+            if self.cache is not None:
+                self.cache.set(COLLECTION_KEY.format(worker=worker_id), self.collection_info(session.items))
+        elif self.predicted_makespan is None:
+            self.predicted_makespan = sum(self.durations.get(item.nodeid, 0.0) for item in session.items)
+
+    def collection_info(self, items):
+        order_scope = self.config.getoption("order_scope", None) or "session"
+        tiers = {}
+        groups = {}
+        for item in items:
+            tier = priority_tier(item)
+            if tier < len(PRIORITY_MARKERS):
+                tiers[item.nodeid] = tier
+            group = order_group(item, order_scope)
+            if group is not None:
+                groups[item.nodeid] = group
+        return {"tiers": tiers, "groups": groups}
+
+    def load_collection_info(self, worker_id):
+        info = self.cache.get(COLLECTION_KEY.format(worker=worker_id), None) if self.cache is not None else None
+        if info is None:
+            return {}, {}
+        return info["tiers"], info["groups"]
+
+    def pytest_runtest_logreport(self, report):
+        if hasattr(self.config, "workerinput"):
+            return
+        node = getattr(report, "node", None)
+        worker_id = node.gateway.id if node is not None else "main"
+        duration = report.duration
+        if worker_id not in self.by_worker and report.when == "setup":
+            # The first setup of a worker pays for the session fixtures (browser start-up)
+            duration = 0.0
+        self.by_worker[worker_id] = self.by_worker.get(worker_id, 0.0) + duration
+        if report.skipped:
+            # A skip says nothing about how long the test takes when it runs
+            self.skipped.add(report.nodeid)
+            self.measured.pop(report.nodeid, None)
+        elif report.nodeid not in self.skipped:
+            self.measured[report.nodeid] = self.measured.get(report.nodeid, 0.0) + duration
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(self.config, "workerinput") or self.cache is None or not self.measured:
+            return
+        durations = dict(self.durations)
+        for nodeid, measured in self.measured.items():
+            previous = durations.get(nodeid)
+            durations[nodeid] = measured if previous is None else SMOOTHING * measured + (1 - SMOOTHING) * previous
+        self.cache.set(self.key, durations)
+
+    def summary(self):
+        busiest = max(self.by_worker.items(), key=lambda entry: entry[1], default=("main", 0.0))
+        return {
+            "predicted": self.predicted_makespan,
+            "workers": self.workers,
+            "busiest_worker": busiest[0],
+            "actual": busiest[1],
+            "wall": time.monotonic() - self._start,
+            "known_tests": len(self.durations),
+        }
+
+
+def write_terminal_summary(terminalreporter, summary):
+    if summary["predicted"] is None or not summary["actual"]:
+        return
+    terminalreporter.write_sep("-", "duration scheduling")
+    terminalreporter.write_line(
+        f"predicted makespan {summary['predicted']:.1f}s over {summary['workers']} worker(s) "
+        f"from {summary['known_tests']} recorded durations; "
+        f"actual {summary['actual']:.1f}s on {summary['busiest_worker']} (wall {summary['wall']:.1f}s)"
+    )
@@ -0,0 +1,976 @@
+"""
+In-process fake WebDriver backend (--browser=fake).
+
+Implements the subset of the WebDriver API that BasePageClass relies on against an
+in-memory DOM parsed from HTML fixtures: find_element(s) with CSS, XPath, id, name, tag,
+class and link text locators, WebElement reads and clicks, send_keys, Select, windows
+and history, cookies and web storage, and execute_script for the scripts the page layer
+sends (unknown scripts raise JavascriptException so the per-element fallbacks run).
+Nothing executes page JavaScript; pages are served either by a Flask app's test client
+or from a directory of .html files.
+
+Time is virtual: VirtualClock.sleep advances the clock instantly, so wait_it_out and the
+polling waits of BasePageClass cost nothing when the fake is installed as its clock.
+"""
+import itertools
+import re
+import urllib.parse
+from html.parser import HTMLParser
+from pathlib import Path
+
+from selenium.common.exceptions import ElementNotInteractableException
+from selenium.common.exceptions import InvalidSelectorException
+from selenium.common.exceptions import JavascriptException
+from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchWindowException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+from pages import scripts
+
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+}
+NEVER_RENDERED_TAGS = {"head", "script", "style", "title", "meta", "link", "template", "noscript"}
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset", "figure", "footer",
+    "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section",
+    "table", "tbody", "thead", "tfoot", "tr", "ul",
+}
+BOOLEAN_ATTRIBUTES = {"checked", "selected", "disabled", "multiple", "hidden", "required", "readonly", "autofocus"}
+BLANK_PNG = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89"
+    b"\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+class VirtualClock:
+    """Drop-in for the `time` functions BasePageClass uses; sleeping only moves the clock."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.slept += seconds
+
+
+# ------------------------------------------------------------------ DOM model
+
+
+class Node:
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = dict(attrs or {})
+        self.parent = parent
+        self.children = []
+        self.value = self.attrs.get("value", "")
+        self.checked = "checked" in self.attrs
+        self.selected = "selected" in self.attrs
+
+    @property
+    def elements(self):
+        return [child for child in self.children if isinstance(child, Node)]
+
+    def iter_descendants(self):
+        for child in self.elements:
+            yield child
+            yield from child.iter_descendants()
+
+    def ancestors(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    @property
+    def classes(self):
+        return self.attrs.get("class", "").split()
+
+    def text_content(self):
+        parts = []
+        for child in self.children:
+            parts.append(child.text_content() if isinstance(child, Node) else child)
+        return "".join(parts)
+
+
+class Document:
+    def __init__(self, url, html):
+        self.url = url
+        self.alive = True
+        self.root = Node("#document")
+        self.hidden_classes = set()
+        self.title = ""
+        DocumentParser(self).feed(html)
+        for style in self.root.iter_descendants():
+            if style.tag == "style":
+                for selectors, body in re.findall(r"([^{}]+)\{([^}]*)\}", style.text_content()):
+                    if re.search(r"display\s*:\s*none", body):
+                        self.hidden_classes.update(re.findall(r"^\s*\.([\w-]+)\s*$", selectors, re.M))
+            if style.tag == "title" and not self.title:
+                self.title = style.text_content().strip()
+
+    def is_hidden(self, node):
+        style = node.attrs.get("style", "").replace(" ", "")
+        if node.tag in NEVER_RENDERED_TAGS or "hidden" in node.attrs:
+            return True
+        if node.tag == "input" and node.attrs.get("type") == "hidden":
+            return True
+        if "display:none" in style or "visibility:hidden" in style:
+            return True
+        return any(cls in self.hidden_classes for cls in node.classes)
+
+    def is_displayed(self, node):
+        return not any(self.is_hidden(n) for n in [node] + list(node.ancestors()) if n.tag != "#document")
+
+    def inner_text(self, node):
+        if not self.is_displayed(node):
+            return ""
+        parts = []
+        self._collect_text(node, parts)
+        text = "".join(parts)
+        lines = [re.sub(r"[ \t\r\f\v]+", " ", line).strip() for line in text.split("\n")]
+        return "\n".join(line for line in lines if line)
+
+    def _collect_text(self, node, parts):
+        for child in node.children:
+            if isinstance(child, Node):
+                if self.is_hidden(child):
+                    continue
+                block = child.tag in BLOCK_TAGS
+                if block:
+                    parts.append("\n")
+                self._collect_text(child, parts)
+                if block:
+                    parts.append("\n")
+            else:
+                parts.append(re.sub(r"\s+", " ", child))
+
+
+class DocumentParser(HTMLParser):
+    def __init__(self, document):
+        super().__init__(convert_charrefs=True)
+        self.current = document.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {name: value if value is not None else "" for name, value in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.current = self.current.parent
+
+    def handle_endtag(self, tag):
+        for node in [self.current] + list(self.current.ancestors()):
+            if node.tag == tag:
+                self.current = node.parent
+                return
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+# ------------------------------------------------------------------ CSS selectors
+
+CSS_SIMPLE = re.compile(
+    r"(?P<tag>\*|[a-zA-Z][\w-]*)"
+    r"|#(?P<id>[\w-]+)"
+    r"|\.(?P<cls>[\w-]+)"
+    r"|\[\s*(?P<attr>[\w-]+)\s*(?:(?P<op>[\^*$~|]?=)\s*(?P<val>\"[^\"]*\"|'[^']*'|[^\]\s]+))?\s*\]"
+    r"|:(?P<pseudo>[\w-]+)(?:\((?P<arg>[^)]*)\))?"
+)
+
+
+def _split_top_level(selector, separators):
+    """Split on `separators` outside brackets, parentheses and quotes, keeping the separators."""
+    parts, current, depth, quote = [], "", 0, None
+    for char in selector:
+        if quote:
+            current += char
+            if char == quote:
+                quote = None
+            continue
+        if char in "\"'":
+            quote = char
+        elif char in "[(":
+            depth += 1
+        elif char in "])":
+            depth -= 1
+        elif depth == 0 and char in separators:
+            parts.append(current)
+            parts.append(char)
+            current = ""
+            continue
+        current += char
+    parts.append(current)
+    return parts
+
+
+def parse_css(selector):
+    """Return a list of alternatives, each a list of (combinator, compound) pairs."""
+    alternatives = []
+    for group in _split_top_level(selector, ",")[::2]:
+        tokens = _split_top_level(group.strip(), " >+~")
+        steps, combinator = [], " "
+        for token in tokens:
+            if token in (" ", ">", "+", "~"):
+                if token != " " or combinator == " ":
+                    combinator = token
+                continue
+            if not token:
+                continue
+            compound, position = [], 0
+            while position < len(token):
+                match = CSS_SIMPLE.match(token, position)
+                if not match:
+                    raise InvalidSelectorException(f"Unsupported CSS selector: {selector}")
+                compound.append(match)
+                position = match.end()
+            steps.append((combinator if steps else None, compound))
+            combinator = " "
+        if not steps:
+            raise InvalidSelectorException(f"Empty CSS selector: {selector}")
+        alternatives.append(steps)
+    return alternatives
+
+
+def _nth_matches(expression, position):
+    expression = expression.strip().replace(" ", "")
+    if expression == "odd":
+        return position % 2 == 1
+    if expression == "even":
+        return position % 2 == 0
+    match = re.fullmatch(r"([+-]?\d*)n([+-]\d+)?", expression)
+    if match:
+        step = int(match.group(1)) if match.group(1) not in ("", "+", "-") else int(match.group(1) + "1")
+        offset = int(match.group(2) or 0)
+        return (position - offset) % step == 0 and (position - offset) // step >= 0 if step else position == offset
+    return position == int(expression)
+
+
+def _matches_simple(node, match):
+    if match.group("tag"):
+        return match.group("tag") == "*" or node.tag == match.group("tag").lower()
+    if match.group("id"):
+        return node.attrs.get("id") == match.group("id")
+    if match.group("cls"):
+        return match.group("cls") in node.classes
+    if match.group("attr"):
+        name, op = match.group("attr"), match.group("op")
+        if name not in node.attrs:
+            return False
+        if op is None:
+            return True
+        expected = match.group("val").strip("\"'")
+        actual = node.attrs[name]
+        return {
+            "=": actual == expected,
+            "^=": actual.startswith(expected),
+            "$=": actual.endswith(expected),
+            "*=": expected in actual,
+            "~=": expected in actual.split(),
+            "|=": actual == expected or actual.startswith(expected + "-"),
+        }[op]
+    pseudo, argument = match.group("pseudo"), match.group("arg")
+    siblings = node.parent.elements if node.parent is not None else [node]
+    if pseudo == "first-child":
+        return siblings[0] is node
+    if pseudo == "last-child":
+        return siblings[-1] is node
+    if pseudo == "nth-child":
+        return _nth_matches(argument, siblings.index(node) + 1)
+    if pseudo == "nth-of-type":
+        same_type = [sibling for sibling in siblings if sibling.tag == node.tag]
+        return _nth_matches(argument, same_type.index(node) + 1)
+    if pseudo == "not":
+        return not any(_matches_steps(node, steps) for steps in parse_css(argument))
+    if pseudo in ("checked", "selected"):
+        return node.checked or node.selected
+    if pseudo == "disabled":
+        return "disabled" in node.attrs
+    if pseudo == "enabled":
+        return "disabled" not in node.attrs
+    raise InvalidSelectorException(f"Unsupported CSS pseudo-class :{pseudo}")
+
+
+def _matches_compound(node, compound):
+    return node.tag != "#document" and all(_matches_simple(node, simple) for simple in compound)
+
+
+def _matches_steps(node, steps):
+    combinator, compound = steps[-1]
+    if not _matches_compound(node, compound):
+        return False
+    if len(steps) == 1:
+        return True
+    rest = steps[:-1]
+    if combinator == ">":
+        return node.parent is not None and _matches_steps(node.parent, rest)
+    if combinator in ("+", "~"):
+        siblings = node.parent.elements
+        previous = siblings[:siblings.index(node)]
+        if combinator == "+":
+            previous = previous[-1:]
+        return any(_matches_steps(sibling, rest) for sibling in previous)
+    return any(_matches_steps(ancestor, rest) for ancestor in node.ancestors())
+
+
+def select_css(context, selector):
+    alternatives = parse_css(selector)
+    return [node for node in context.iter_descendants() if any(_matches_steps(node, steps) for steps in alternatives)]
+
+
+# ------------------------------------------------------------------ XPath subset
+
+XPATH_STEP = re.compile(r"(?P<axis>//|/)?(?P<test>\.\.|\.|\*|text\(\)|[a-zA-Z][\w-]*)(?P<predicates>(\[[^\]]*\])*)")
+XPATH_PREDICATE = re.compile(r"\[([^\]]*)\]")
+
+
+def _xpath_string(node, expression):
+    expression = expression.strip()
+    if expression in ("text()", ".", "normalize-space()", "normalize-space(.)"):
+        text = node.text_content()
+        return " ".join(text.split()) if expression.startswith("normalize") or expression == "." else text
+    if expression.startswith("@"):
+        return node.attrs.get(expression[1:])
+    return expression.strip("\"'")
+
+
+def _xpath_predicate(node, expression):
+    expression = expression.strip()
+    for operator in (" and ", " or "):
+        if operator in expression:
+            results = [_xpath_predicate(node, part) for part in expression.split(operator)]
+            return all(results) if operator == " and " else any(results)
+    match = re.fullmatch(r"(contains|starts-with)\(\s*([^,]+?)\s*,\s*(['\"])(.*)\3\s*\)", expression)
+    if match:
+        actual = _xpath_string(node, match.group(2)) or ""
+        return match.group(4) in actual if match.group(1) == "contains" else actual.startswith(match.group(4))
+    match = re.fullmatch(r"(.+?)\s*(!=|=)\s*(['\"])(.*)\3", expression)
+    if match:
+        actual = _xpath_string(node, match.group(1))
+        equal = actual is not None and actual.strip() == match.group(4)
+        return equal if match.group(2) == "=" else not equal
+    if expression.startswith("@"):
+        return expression[1:] in node.attrs
+    raise InvalidSelectorException(f"Unsupported XPath predicate [{expression}]")
+
+
+def select_xpath(context, xpath, document_root):
+    xpath = xpath.strip()
+    if xpath.startswith("/"):
+        current = [document_root]
+    else:
+        current = [context]
+        if not xpath.startswith("."):
+            xpath = "./" + xpath
+    position = 0
+    while position < len(xpath):
+        match = XPATH_STEP.match(xpath, position)
+        if not match or match.end() == position:
+            raise InvalidSelectorException(f"Unsupported XPath: {xpath}")
+        position = match.end()
+        axis, test = match.group("axis") or "", match.group("test")
+        if test == ".":
+            continue
+        if test == "..":
+            current = [node.parent for node in current if node.parent is not None]
+            continue
+        if test == "text()":
+            raise InvalidSelectorException("XPath text() nodes are not elements")
+        next_nodes = []
+        for node in current:
+            candidates = list(node.iter_descendants()) if axis == "//" else node.elements
+            candidates = [candidate for candidate in candidates if test == "*" or candidate.tag == test.lower()]
+            for predicate in XPATH_PREDICATE.findall(match.group("predicates")):
+                if predicate.strip().isdigit():
+                    index = int(predicate) - 1
+                    candidates = candidates[index:index + 1]
+                elif predicate.strip() == "last()":
+                    candidates = candidates[-1:]
+                else:
+                    candidates = [candidate for candidate in candidates if _xpath_predicate(candidate, predicate)]
+            for candidate in candidates:
+                if candidate not in next_nodes:
+                    next_nodes.append(candidate)
+        current = next_nodes
+    return [node for node in current if node.tag != "#document"]
+
+
+# ------------------------------------------------------------------ locating
+
+
+def locate(document, context, by, value):
+    if by == By.CSS_SELECTOR:
+        return select_css(context, value)
+    if by == By.XPATH:
+        return select_xpath(context, value, document.root)
+    if by == By.ID:
+        return [node for node in context.iter_descendants() if node.attrs.get("id") == value]
+    if by == By.NAME:
+        return [node for node in context.iter_descendants() if node.attrs.get("name") == value]
+    if by == By.TAG_NAME:
+        return [node for node in context.iter_descendants() if node.tag == value.lower()]
+    if by == By.CLASS_NAME:
+        return [node for node in context.iter_descendants() if value in node.classes]
+    if by in (By.LINK_TEXT, By.PARTIAL_LINK_TEXT):
+        links = [node for node in context.iter_descendants() if node.tag == "a"]
+        if by == By.LINK_TEXT:
+            return [link for link in links if document.inner_text(link) == value]
+        return [link for link in links if value in document.inner_text(link)]
+    raise InvalidSelectorException(f"Unsupported locator strategy: {by}")
+
+
+class FakeElement:
+    _ids = itertools.count(1)
+
+    def __init__(self, driver, document, node):
+        self.parent = driver
+        self._document = document
+        self._node = node
+        self._id = f"fake-element-{next(self._ids)}"
+        self._select_all = False
+
+    def __eq__(self, other):
+        return isinstance(other, FakeElement) and other._node is self._node
+
+    def __hash__(self):
+        return hash(id(self._node))
+
+    @property
+    def id(self):
+        return self._id
+
+    def _live_node(self):
+        if not self._document.alive:
+            raise StaleElementReferenceException("stale element reference: element is not attached to the page document")
+        return self._node
+
+    @property
+    def tag_name(self):
+        return self._live_node().tag
+
+    @property
+    def text(self):
+        return self._document.inner_text(self._live_node())
+
+    def get_dom_attribute(self, name):
+        node = self._live_node()
+        if name in BOOLEAN_ATTRIBUTES:
+            return "true" if name in node.attrs else None
+        return node.attrs.get(name)
+
+    def get_property(self, name):
+        node = self._live_node()
+        if name == "value":
+            return self._value(node)
+        if name in ("checked", "selected"):
+            return node.checked or node.selected
+        if name in ("textContent", "innerText"):
+            return node.text_content() if name == "textContent" else self._document.inner_text(node)
+        if name in ("href", "src") and name in node.attrs:
+            return urllib.parse.urljoin(self._document.url, node.attrs[name])
+        if name == "index" and node.tag == "option":
+            return self._options_of(self._select_of(node)).index(node) if self._select_of(node) else 0
+        if name == "className":
+            return node.attrs.get("class", "")
+        return node.attrs.get(name)
+
+    def get_attribute(self, name):
+        node = self._live_node()
+        if name == "class":
+            return node.attrs.get("class")
+        if name in BOOLEAN_ATTRIBUTES:
+            if name in ("checked", "selected"):
+                return "true" if node.checked or node.selected else None
+            return "true" if name in node.attrs else None
+        value = self.get_property(name)
+        return None if value is None else str(value)
+
+    def _value(self, node):
+        if node.tag == "select":
+            selected = [option for option in self._options_of(node) if option.selected]
+            options = self._options_of(node)
+            option = selected[0] if selected else (options[0] if options else None)
+            return self._option_value(option) if option is not None else ""
+        if node.tag == "option":
+            return self._option_value(node)
+        if node.tag == "textarea" and not node.value:
+            return node.text_content()
+        return node.value
+
+    @staticmethod
+    def _option_value(option):
+        return option.attrs["value"] if "value" in option.attrs else " ".join(option.text_content().split())
+
+    @staticmethod
+    def _select_of(node):
+        return next((ancestor for ancestor in node.ancestors() if ancestor.tag == "select"), None)
+
+    @staticmethod
+    def _options_of(select):
+        return [node for node in select.iter_descendants() if node.tag == "option"]
+
+    def is_displayed(self):
+        return self._document.is_displayed(self._live_node())
+
+    def is_enabled(self):
+        node = self._live_node()
+        return "disabled" not in node.attrs and not any(
+            "disabled" in ancestor.attrs for ancestor in node.ancestors() if ancestor.tag == "fieldset"
+        )
+
+    def is_selected(self):
+        node = self._live_node()
+        return node.selected or node.checked
+
+    @property
+    def rect(self):
+        node = self._live_node()
+        nodes = list(self._document.root.iter_descendants())
+        displayed = self.is_displayed()
+        return {"x": 0, "y": nodes.index(node) * 20, "width": 100 if displayed else 0, "height": 20 if displayed else 0}
+
+    @property
+    def location(self):
+        return {"x": self.rect["x"], "y": self.rect["y"]}
+
+    @property
+    def size(self):
+        return {"width": self.rect["width"], "height": self.rect["height"]}
+
+    def _check_interactable(self):
+        if not self.is_displayed():
+            raise ElementNotInteractableException("element not interactable")
+
+    def click(self):
+        node = self._live_node()
+        self._check_interactable()
+        if node.tag == "option":
+            select = self._select_of(node)
+            if select is not None and "multiple" not in select.attrs:
+                for option in self._options_of(select):
+                    option.selected = False
+            node.selected = not node.selected if select is not None and "multiple" in select.attrs else True
+            return
+        if node.tag == "input" and node.attrs.get("type") in ("checkbox", "radio"):
+            node.checked = not node.checked if node.attrs.get("type") == "checkbox" else True
+            return
+        link = node if node.tag == "a" else next((a for a in node.ancestors() if a.tag == "a"), None)
+        if link is not None:
+            self.parent._follow_link(self._document, link)
+
+    def clear(self):
+        self._live_node().value = ""
+
+    def send_keys(self, *values):
+        node = self._live_node()
+        self._check_interactable()
+        keys = "".join(str(value) for value in values)
+        position = 0
+        while position < len(keys):
+            char = keys[position]
+            position += 1
+            if char == Keys.CONTROL and keys[position:position + 1] == "a":
+                self._select_all = True
+                position += 1
+            elif char == Keys.BACKSPACE:
+                node.value = "" if self._select_all else node.value[:-1]
+                self._select_all = False
+            elif char in (Keys.ENTER, Keys.RETURN):
+                if node.tag in ("a", "button"):
+                    self.click()
+            elif "\ue000" <= char <= "\uf8ff":
+                # Remaining special keys (modifiers, arrows, NULL) do not change the value
+                continue
+            else:
+                node.value = ("" if self._select_all else node.value) + char
+                self._select_all = False
+
+    def find_elements(self, by=By.ID, value=None):
+        node = self._live_node()
+        return [FakeElement(self.parent, self._document, found) for found in locate(self._document, node, by, value)]
+
+    def find_element(self, by=By.ID, value=None):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(f"Unable to locate element: {by}={value}")
+        return found[0]
+
+    def screenshot_as_png(self):
+        return BLANK_PNG
+
+
+# ------------------------------------------------------------------ sites
+
+
+def flask_site(app):
+    """Serve pages from a Flask app's test client (no sockets involved)."""
+    client = app.test_client()
+
+    def fetch(url):
+        parsed = urllib.parse.urlsplit(url)
+        response = client.get(parsed.path or "/", query_string=parsed.query)
+        return response.status_code, response.headers.get("Location"), response.get_data(as_text=True)
+
+    return fetch
+
+
+def directory_site(directory):
+    """Serve `<directory>/<path>` for any URL, defaulting to index.html."""
+    root = Path(directory)
+
+    def fetch(url):
+        path = urllib.parse.urlsplit(url).path.lstrip("/") or "index.html"
+        target = root / path
+        if target.is_dir():
+            target = target / "index.html"
+        if not target.is_file():
+            return 404, None, "<html><body>Not found</body></html>"
+        return 200, None, target.read_text()
+
+    return fetch
+
+
+class Window:
+    def __init__(self, handle):
+        self.handle = handle
+        self.history = []
+        self.position = -1
+        self.document = None
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def window(self, handle):
+        if handle not in self._driver._windows:
+            raise NoSuchWindowException(f"no such window: {handle}")
+        self._driver._current = handle
+
+    def default_content(self):
+        pass
+
+    @property
+    def active_element(self):
+        return self._driver.find_element(By.TAG_NAME, "body")
+
+
+class FakeDriver:
+    """WebDriver stand-in bound to a `site(url) -> (status, location, html)` callable."""
+
+    name = "fake"
+    w3c = True
+
+    def __init__(self, site, base_url="http://fake.local/", clock=None):
+        self.site = site
+        self.base_url = base_url
+        self.clock = clock or VirtualClock()
+        self.session_id = "fake-session"
+        self.service = None
+        self.switch_to = FakeSwitchTo(self)
+        self.cookies = {}
+        self.storage = {}
+        self.commands = 0
+        self._handles = itertools.count(1)
+        self._windows = {}
+        self._current = self._open_window()
+        self.get("about:blank")
+
+    # ---- windows and navigation
+
+    def _open_window(self):
+        handle = f"fake-window-{next(self._handles)}"
+        self._windows[handle] = Window(handle)
+        return handle
+
+    def _window(self):
+        if self._current not in self._windows:
+            raise NoSuchWindowException("no such window: target window already closed")
+        return self._windows[self._current]
+
+    def _load(self, window, url):
+        if window.document is not None:
+            window.document.alive = False
+        if url == "about:blank":
+            window.document = Document(url, "<html><head></head><body></body></html>")
+            return
+        for _ in range(10):
+            status, location, html = self.site(url)
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            break
+        window.document = Document(url, html)
+
+    def _navigate(self, window, url):
+        current = window.document.url if window.document else "about:blank"
+        url = urllib.parse.urljoin(self.base_url if current == "about:blank" else current, url)
+        window.history = window.history[:window.position + 1] + [url]
+        window.position += 1
+        self._load(window, url)
+
+    def _follow_link(self, document, link):
+        href = link.attrs.get("href", "")
+        popup = re.search(r"window\.open\(\s*['\"]([^'\"]+)['\"]", link.attrs.get("onclick", ""))
+        if popup:
+            href, target = popup.group(1), "_blank"
+        else:
+            target = link.attrs.get("target", "_self")
+        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+            return
+        url = urllib.parse.urljoin(document.url, href)
+        if target == "_blank":
+            window = self._windows[self._open_window()]
+            self._navigate(window, url)
+        else:
+            self._navigate(self._window(), url)
+
+    def execute(self, driver_command, params=None):
+        raise WebDriverException(f"Command {driver_command} is not supported by the fake driver")
+
+    def get(self, url):
+        self.commands += 1
+        self._navigate(self._window(), url)
+
+    def refresh(self):
+        self.commands += 1
+        window = self._window()
+        self._load(window, window.history[window.position])
+
+    def back(self):
+        self.commands += 1
+        window = self._window()
+        if window.position > 0:
+            window.position -= 1
+            self._load(window, window.history[window.position])
+
+    def forward(self):
+        self.commands += 1
+        window = self._window()
+        if window.position < len(window.history) - 1:
+            window.position += 1
+            self._load(window, window.history[window.position])
+
+    @property
+    def document(self):
+        return self._window().document
+
+    @property
+    def current_url(self):
+        self.commands += 1
+        return self.document.url
+
+    @property
+    def title(self):
+        self.commands += 1
+        return self.document.title
+
+    @property
+    def page_source(self):
+        self.commands += 1
+        return self.site(self.document.url)[2] if self.document.url != "about:blank" else ""
+
+    @property
+    def window_handles(self):
+        self.commands += 1
+        return list(self._windows)
+
+    @property
+    def current_window_handle(self):
+        self.commands += 1
+        return self._window().handle
+
+    def close(self):
+        self.commands += 1
+        window = self._window()
+        window.document.alive = False
+        del self._windows[window.handle]
+
+    def quit(self):
+        for window in self._windows.values():
+            window.document.alive = False
+        self._windows.clear()
+
+    def maximize_window(self):
+        self.commands += 1
+
+    def set_window_size(self, width, height, windowHandle="current"):
+        self.commands += 1
+
+    def implicitly_wait(self, time_to_wait):
+        self.commands += 1
+
+    def set_page_load_timeout(self, time_to_wait):
+        self.commands += 1
+
+    # ---- elements
+
+    def find_elements(self, by=By.ID, value=None):
+        self.commands += 1
+        document = self.document
+        return [FakeElement(self, document, node) for node in locate(document, document.root, by, value)]
+
+    def find_element(self, by=By.ID, value=None):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(f"Unable to locate element: {by}={value}")
+        return found[0]
+
+    # ---- cookies, storage, screenshots, logs
+
+    def _origin(self):
+        parts = urllib.parse.urlsplit(self.document.url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def get_cookies(self):
+        self.commands += 1
+        return [dict(cookie) for cookie in self.cookies.get(self._origin(), {}).values()]
+
+    def add_cookie(self, cookie_dict):
+        self.commands += 1
+        # Like a browser, a cookie without a domain or path belongs to the page's host and all its paths
+        cookie = {"domain": urllib.parse.urlsplit(self.document.url).hostname, "path": "/", **cookie_dict}
+        self.cookies.setdefault(self._origin(), {})[cookie["name"]] = cookie
+
+    def delete_all_cookies(self):
+        self.commands += 1
+        self.cookies.pop(self._origin(), None)
+
+    def get_screenshot_as_png(self):
+        self.commands += 1
+        return BLANK_PNG
+
+    def save_screenshot(self, filename):
+        with open(filename, "wb") as screenshot:
+            screenshot.write(self.get_screenshot_as_png())
+        return True
+
+    def get_log(self, log_type):
+        self.commands += 1
+        return []
+
+    # ---- scripts
+
+    def _element_args(self, args):
+        for arg in args:
+            if isinstance(arg, FakeElement):
+                arg._live_node()
+        return args
+
+    def execute_script(self, script, *args):
+        self.commands += 1
+        self._element_args(args)
+        handler = self.script_handlers().get(script.strip())
+        if handler is None:
+            if re.fullmatch(r"window\.scrollBy\([^)]*\);?", script.strip()):
+                return None
+            raise JavascriptException(f"The fake driver cannot run this script: {script.strip()[:60]}...")
+        return handler(self, *args)
+
+    @staticmethod
+    def script_handlers():
+        return {
+            scripts.SNAPSHOT_ELEMENTS.strip(): FakeDriver._snapshot_elements,
+            scripts.QUIET_MONITOR.strip(): FakeDriver._quiet_monitor,
+            "return document.readyState;": lambda driver: "complete",
+            "return arguments[0].scrollIntoView();": lambda driver, element: None,
+            "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}":
+                FakeDriver._clear_storage,
+            scripts.READ_STORAGE.strip(): FakeDriver._read_storage,
+            scripts.WRITE_STORAGE.strip(): FakeDriver._write_storage,
+            scripts.FILL_FORM.strip(): FakeDriver._fill_form,
+        }
+
+    def _snapshot_elements(self, by, value, fields, attributes):
+        snapshot = []
+        for element in self.find_elements(by, value):
+            entry = {}
+            if "text" in fields:
+                entry["text"] = element.text
+            if "visible" in fields:
+                entry["visible"] = element.is_displayed()
+            if "rect" in fields:
+                entry["rect"] = element.rect
+            if attributes:
+                entry["attributes"] = {name: element.get_attribute(name) for name in attributes}
+            snapshot.append(entry)
+        return snapshot
+
+    def _fill_form(self, fields, require_all):
+        targets = []
+        for field in fields:
+            found = self.find_elements(field["by"], field["value"])
+            index = field["index"] or 0
+            targets.append(found[index] if index < len(found) else None)
+        missing = [position for position, element in enumerate(targets) if element is None]
+        if require_all and missing:
+            return {"missing": missing}
+        return [self._fill_field(element, field) for element, field in zip(targets, fields)]
+
+    @staticmethod
+    def _fill_field(element, field):
+        if element is None:
+            return {"ok": False, "value": None, "error": "not found"}
+        node = element._live_node()
+        checkable = node.tag == "input" and node.attrs.get("type") in ("checkbox", "radio")
+        wanted = field["text"]
+        options = element._options_of(node) if node.tag == "select" else []
+
+        def option_index():
+            if isinstance(wanted, int) and not isinstance(wanted, bool):
+                return wanted if wanted < len(options) else -1
+            for position, option in enumerate(options):
+                label = " ".join(option.text_content().split())
+                if element._option_value(option) == str(wanted) or label == str(wanted):
+                    return position
+            return -1
+
+        def current():
+            return node.checked if checkable else element._value(node)
+
+        if not field["verify_only"]:
+            if not element.is_enabled() or "readonly" in node.attrs:
+                return {"ok": False, "value": current(), "error": "not editable"}
+            if node.tag == "select":
+                if option_index() == -1:
+                    return {"ok": False, "value": current(), "error": f"no option {wanted}"}
+                for position, option in enumerate(options):
+                    option.selected = position == option_index()
+            elif checkable:
+                node.checked = bool(wanted)
+            else:
+                node.value = str(wanted)
+        expected = bool(wanted) if checkable else str(wanted)
+        if node.tag == "select" and option_index() != -1:
+            expected = element._option_value(options[option_index()])
+        value = current()
+        return {"ok": value == expected, "value": value, "error": None if value == expected else f"value is {value}"}
+
+    def _quiet_monitor(self, quiet_ms):
+        return {"quiet": True, "idle_ms": quiet_ms, "pending": 0, "animations": 0}
+
+    def _clear_storage(self):
+        self.storage.pop(self._origin(), None)
+
+    def _read_storage(self):
+        storage = self.storage.get(self._origin(), {})
+        return {"local": dict(storage.get("local", {})), "session": dict(storage.get("session", {}))}
+
+    def _write_storage(self, local_items, session_items):
+        storage = self.storage.setdefault(self._origin(), {"local": {}, "session": {}})
+        storage["local"].update(local_items or {})
+        storage["session"].update(session_items or {})
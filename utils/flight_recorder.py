@@ -0,0 +1,232 @@
+"""
+Always-on flight recorder for failing tests.
+
+Bounded ring buffers keep the last WebDriver commands (fed by the command profiler's
+listeners), the last page object steps (BasePageClass method calls and allure steps) and
+the last browser console entries. Recording one is a single slot assignment in a
+preallocated list, so passing tests pay next to nothing. The browser's console log is
+drained into its buffer after every test, so it never piles up in the browser (which
+drops old entries) and a dump only reads what was logged since. Only when the call
+phase of a test fails are the buffers formatted, together with a DOM snapshot, into
+reports/flight-recorder/<test>.json and attached to the allure report.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+import allure
+import allure_commons
+import pytest
+from allure_commons.types import AttachmentType
+from selenium.common.exceptions import WebDriverException
+
+from utils.screenshots import screenshot_name
+
+DEFAULT_CAPACITY = 200
+MAX_REPR = 200
+
+
+class RingBuffer:
+    """Preallocated buffer that keeps the last `capacity` entries."""
+
+    __slots__ = ("capacity", "_slots", "_next", "_full")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._next = 0
+        self._full = False
+
+    def append(self, entry):
+        if not self.capacity:
+            return
+        index = self._next
+        self._next = (index + 1) % self.capacity
+        self._slots[index] = entry
+        if index == self.capacity - 1:
+            self._full = True
+
+    def items(self):
+        """Entries from oldest to newest"""
+        if not self._full:
+            return self._slots[:self._next]
+        return self._slots[self._next:] + self._slots[:self._next]
+
+    def clear(self):
+        self._slots = [None] * self.capacity
+        self._next = 0
+        self._full = False
+
+    def __len__(self):
+        return self.capacity if self._full else self._next
+
+
+def short_repr(value):
+    try:
+        text = repr(value)
+    except Exception as e:  # stale elements and half-torn-down objects can fail to repr
+        text = f"<{type(value).__name__}: {type(e).__name__}>"
+    return text if len(text) <= MAX_REPR else text[:MAX_REPR] + "..."
+
+
+class FlightRecorder:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.commands = RingBuffer(capacity)
+        self.steps = RingBuffer(capacity)
+        self.console = RingBuffer(capacity)
+        # Set once the browser turns out to have no console log (Firefox), so it is not asked again
+        self.console_unsupported = False
+        self.test_start = time.perf_counter()
+        self.test_wall_start = time.time()
+        self._open_steps = {}
+
+    def start_test(self):
+        self.test_start = time.perf_counter()
+        self.test_wall_start = time.time()
+
+    def on_command(self, entry):
+        self.commands.append(entry)
+
+    def recorded(self, name, func):
+        """Wrap `func` so every call leaves one entry in the step buffer"""
+        steps = self.steps
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                error = short_repr(e)
+                raise
+            finally:
+                # Arguments are kept as they are and only turned into text for a dump
+                steps.append((start, time.perf_counter() - start, name, args[1:], kwargs, error))
+
+        return wrapper
+
+    @allure_commons.hookimpl
+    def start_step(self, uuid, title, params):
+        self._open_steps[uuid] = (time.perf_counter(), title)
+
+    @allure_commons.hookimpl
+    def stop_step(self, uuid, exc_type, exc_val, exc_tb):
+        start, title = self._open_steps.pop(uuid, (None, None))
+        if start is not None:
+            error = short_repr(exc_val) if exc_val is not None else None
+            self.steps.append((start, time.perf_counter() - start, f"step: {title}", (), {}, error))
+
+    def drain_console(self, driver):
+        """Move the entries of the browser's console log into the console buffer (Chromium only)"""
+        if self.console_unsupported:
+            return
+        try:
+            entries = driver.get_log("browser")
+        except WebDriverException:
+            self.console_unsupported = True
+            return
+        for entry in entries:
+            self.console.append(entry)
+
+    def read_console(self, driver):
+        """The buffered browser console entries logged since the test started"""
+        self.drain_console(driver)
+        return [entry for entry in self.console.items() if entry.get("timestamp", 0) >= self.test_wall_start * 1000]
+
+    def snapshot(self, driver):
+        """Everything in the buffers plus the console, with times relative to the test start"""
+        main_thread = threading.main_thread().ident
+        commands = [
+            {
+                "at": round(start - self.test_start, 4),
+                "command": command,
+                "ms": round(duration * 1000, 2),
+                "request_bytes": request_bytes,
+                "thread": "main" if thread_id == main_thread else "helper",
+            }
+            for command, start, duration, request_bytes, thread_id in self.commands.items()
+        ]
+        steps = [
+            {
+                "at": round(start - self.test_start, 4),
+                "step": name,
+                "ms": round(duration * 1000, 2),
+                "args": [short_repr(arg) for arg in args],
+                "kwargs": {key: short_repr(value) for key, value in kwargs.items()},
+                "error": error,
+            }
+            for start, duration, name, args, kwargs, error in sorted(self.steps.items(), key=lambda step: step[0])
+        ]
+        try:
+            url = driver.current_url
+        except WebDriverException:
+            url = None
+        return {"url": url, "commands": commands, "steps": steps, "console": self.read_console(driver)}
+
+    def dump(self, driver, nodeid, directory, worker_id=None):
+        """Write the recorder's context and a DOM snapshot of a failed test; returns the JSON path"""
+        record = {"test": nodeid, **self.snapshot(driver)}
+        try:
+            dom = driver.page_source
+        except WebDriverException:
+            dom = None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, screenshot_name(nodeid, worker_id))
+        with open(path + ".json", "w") as record_file:
+            json.dump(record, record_file, indent=1)
+        allure.attach(json.dumps(record, indent=1), name="Flight recorder", attachment_type=AttachmentType.JSON)
+        if dom is not None:
+            with open(path + ".html", "w", encoding="utf-8") as dom_file:
+                dom_file.write(dom)
+            allure.attach(dom, name="DOM snapshot", attachment_type=AttachmentType.HTML)
+        return path + ".json"
+
+
+def record_page_class(page_class, recorder):
+    """Record every call of the public methods of `page_class`"""
+    for name, attribute in list(vars(page_class).items()):
+        if name.startswith("_"):
+            continue
+        if isinstance(attribute, classmethod):
+            func = recorder.recorded(f"{page_class.__name__}.{name}", attribute.__func__)
+            setattr(page_class, name, classmethod(func))
+        elif inspect.isfunction(attribute):
+            setattr(page_class, name, recorder.recorded(f"{page_class.__name__}.{name}", attribute))
+
+
+class FlightRecorderPlugin:
+    name = "flight_recorder"
+
+    def __init__(self, config, page_class, profiler, output_dir, get_driver, capacity=DEFAULT_CAPACITY):
+        self.config = config
+        self.output_dir = output_dir
+        self.get_driver = get_driver
+        self.recorder = FlightRecorder(capacity)
+        self.dumps = 0
+        record_page_class(page_class, self.recorder)
+        profiler.listeners.append(self.recorder.on_command)
+        allure_commons.plugin_manager.register(self.recorder)
+
+    def pytest_runtest_setup(self, item):
+        self.recorder.start_test()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        yield
+        driver = self.get_driver()
+        if driver is not None:
+            self.recorder.drain_console(driver)
+
+    def dump(self, driver, nodeid):
+        self.dumps += 1
+        return self.recorder.dump(driver, nodeid, self.output_dir, os.environ.get("PYTEST_XDIST_WORKER"))
+
+    def pytest_unconfigure(self, config):
+        allure_commons.plugin_manager.unregister(self.recorder)
+
+    def summary(self):
+        return {"dumps": self.dumps}
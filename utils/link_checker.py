@@ -0,0 +1,141 @@
+"""
+Bulk HTTP link checking for page objects.
+
+Links are requested concurrently through one pooled, keep-alive requests.Session shared
+by the whole worker. A thread pool bounds how many requests are in flight and a per-host
+limiter spaces requests to the same host. Each link costs a single HEAD that follows
+redirects, so no body is downloaded and the connection goes straight back to the pool.
+Servers that refuse HEAD (405, 501) get a GET instead, whose body is read to the end so
+the connection can be reused as well.
+
+The browser's cookies go along in a cookie jar that keeps their domain, path and secure
+flag, so each request only carries the cookies the browser itself would send to that URL
+and a session cookie never reaches another host.
+"""
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_HOST_RATE = 10.0
+DEFAULT_TIMEOUT = 10
+# Links that only do something when the browser runs their JavaScript
+JS_ONLY_PREFIXES = ("javascript:", "#")
+# Answers of servers that do not implement HEAD for a URL
+HEAD_REFUSED = (405, 501)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size=DEFAULT_CONCURRENCY):
+    """The worker-wide keep-alive session, created on first use."""
+    global _session
+    # requests is only imported by runs that actually check links
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def needs_browser(href, onclick=None, page_url=None):
+    """True when following the link needs the browser rather than a plain HTTP request."""
+    if not href or onclick:
+        return True
+    if page_url is not None and href.split("#")[0] == page_url.split("#")[0] and "#" in href:
+        return True
+    return href.strip().lower().startswith(JS_ONLY_PREFIXES)
+
+
+def cookie_jar(cookies):
+    """A jar of WebDriver cookies (driver.get_cookies()), scoped like the browser scopes them.
+    Cookies without a domain cannot be scoped and are left out."""
+    from requests.cookies import RequestsCookieJar
+
+    jar = RequestsCookieJar()
+    for cookie in cookies or ():
+        if not cookie.get("domain"):
+            continue
+        jar.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie["domain"],
+            path=cookie.get("path") or "/",
+            secure=bool(cookie.get("secure")),
+            expires=cookie.get("expiry"),
+        )
+    return jar
+
+
+class HostRateLimiter:
+    """Spaces requests to each host at least 1 / `per_host_rate` seconds apart."""
+
+    def __init__(self, per_host_rate=DEFAULT_HOST_RATE):
+        self.interval = 1.0 / per_host_rate if per_host_rate else 0.0
+        self.next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def check_link(url, session=None, limiter=None, cookies=None, timeout=DEFAULT_TIMEOUT):
+    """Status code and redirect chain of one link.
+    `cookies` are WebDriver cookies, or a jar made of them with cookie_jar."""
+    from http.cookiejar import CookieJar
+
+    import requests
+
+    session = session or get_session()
+    if not isinstance(cookies, CookieJar):
+        cookies = cookie_jar(cookies)
+    if limiter is not None:
+        limiter.wait(url)
+    result = {"url": url, "status": None, "final_url": None, "redirects": [], "seconds": 0.0, "error": None}
+    start = time.monotonic()
+    try:
+        response = session.head(url, cookies=cookies, timeout=timeout, allow_redirects=True)
+        if response.status_code in HEAD_REFUSED:
+            response = session.get(url, cookies=cookies, timeout=timeout, allow_redirects=True)
+        result["status"] = response.status_code
+        result["final_url"] = response.url
+        result["redirects"] = [hop.headers.get("Location") for hop in response.history]
+    except requests.RequestException as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.monotonic() - start
+    result["ok"] = result["error"] is None and result["status"] < 400
+    return result
+
+
+def check_links(
+        urls,
+        concurrency=DEFAULT_CONCURRENCY,
+        per_host_rate=DEFAULT_HOST_RATE,
+        cookies=None,
+        timeout=DEFAULT_TIMEOUT,
+):
+    """Check every distinct URL concurrently; results come back in first-seen order."""
+    unique_urls = list(dict.fromkeys(urls))
+    if not unique_urls:
+        return []
+    session = get_session(concurrency)
+    cookies = cookie_jar(cookies)
+    limiter = HostRateLimiter(per_host_rate)
+    workers = max(1, min(concurrency, len(unique_urls)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="link-check") as executor:
+        return list(executor.map(lambda url: check_link(url, session, limiter, cookies, timeout), unique_urls))
@@ -0,0 +1,213 @@
+"""
+Remote WebDriver backend (--browser-url).
+
+Browsers run on a W3C endpoint (a Selenium Grid, a cloud provider, or the local stand-in
+grid) instead of on the runner, so the number of xdist workers is bounded by the grid's
+slots rather than by the runner's CPU and memory.
+
+Every session of a worker shares one keep-alive urllib3 pool, sized for the sessions the
+worker holds at once (the active browser, the standby and one spare for the background
+quit), instead of selenium's default of one pool per session. Sessions are requested
+concurrently (the driver pool asks for its active and standby browser at the same time)
+and a request the grid refuses because it is saturated or briefly unreachable is retried
+with jittered exponential backoff until --remote-session-timeout runs out.
+"""
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+from config import BASE_DIR
+
+CONNECT_TIMEOUT = 10.0
+BACKOFF_START = 0.5
+BACKOFF_MAX = 8.0
+# Refusals that waiting will not fix
+UNSATISFIABLE = ("No nodes support the capabilities", "does not match any", "invalid argument")
+
+
+class PooledRemoteConnection(RemoteConnection):
+    """RemoteConnection that sends its commands through a pool shared by every session"""
+
+    def __init__(self, remote_server_addr, pool):
+        self._shared_pool = pool
+        super().__init__(remote_server_addr, keep_alive=True, ignore_proxy=True)
+
+    def _get_connection_manager(self):
+        return self._shared_pool
+
+    def close(self):
+        # The pool outlives the session; RemoteBrowserFactory.close() clears it
+        pass
+
+
+def connection_pool(size):
+    return urllib3.PoolManager(
+        num_pools=2,
+        maxsize=size,
+        block=True,
+        timeout=urllib3.Timeout(connect=CONNECT_TIMEOUT, read=RemoteConnection.get_timeout()),
+    )
+
+
+def is_retryable(error):
+    if isinstance(error, (urllib3.exceptions.HTTPError, OSError)):
+        # Grid restarting or its connection queue full
+        return True
+    if isinstance(error, SessionNotCreatedException):
+        return not any(message in (error.msg or "") for message in UNSATISFIABLE)
+    return False
+
+
+def backoff_delay(attempt):
+    """Jittered exponential backoff before the `attempt`-th retry (counting from 0)"""
+    return random.uniform(BACKOFF_START, min(BACKOFF_MAX, BACKOFF_START * 2 ** attempt))
+
+
+class RemoteBrowserFactory:
+    def __init__(self, url, pool_size, session_timeout=300):
+        """`pool_size` is the number of keep-alive connections this process keeps to `url`;
+        `session_timeout` is how long a session request may wait for a free grid slot"""
+        self.url = url.rstrip("/")
+        self.pool_size = pool_size
+        self.session_timeout = session_timeout
+        self.pool = connection_pool(pool_size)
+        self.stats = {"sessions": 0, "session_retries": 0, "session_wait_seconds": 0.0, "failed_sessions": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def connect(self):
+        return PooledRemoteConnection(self.url, self.pool)
+
+    def create(self, options):
+        """Start one remote session, waiting out a saturated grid"""
+        from selenium import webdriver
+
+        start = time.monotonic()
+        deadline = start + self.session_timeout
+        attempt = 0
+        while True:
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", DeprecationWarning)
+                    driver = webdriver.Remote(command_executor=self.connect(), options=options)
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                if not is_retryable(e) or time.monotonic() + delay > deadline:
+                    self._count("failed_sessions")
+                    raise
+                logging.info("Grid at %s refused a session (%s), retrying in %.1fs", self.url, e, delay)
+                self._count("session_retries")
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._count("sessions")
+            self._count("session_wait_seconds", time.monotonic() - start)
+            return driver
+
+    def create_many(self, options, count):
+        """Start `count` sessions at once; if any of them fails, the others are quit again"""
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix="remote-session") as executor:
+            futures = [executor.submit(self.create, options) for _ in range(count)]
+        drivers, error = [], None
+        for future in futures:
+            try:
+                drivers.append(future.result())
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            for driver in drivers:
+                driver.quit()
+            raise error
+        return drivers
+
+    def grid_slots(self):
+        """(free, total) session slots reported by the grid's /status, or None if it does not say"""
+        try:
+            response = self.pool.request("GET", f"{self.url}/status")
+            nodes = json.loads(response.data.decode("utf-8"))["value"].get("nodes", [])
+        except (urllib3.exceptions.HTTPError, ValueError, KeyError, AttributeError):
+            return None
+        slots = [slot for node in nodes for slot in node.get("slots", [])]
+        if not slots:
+            return None
+        return sum(slot.get("session") is None for slot in slots), len(slots)
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self):
+        self.pool.clear()
+
+
+def sessions_per_worker(standby):
+    return 2 if standby else 1
+
+
+def capacity_header(factory, workers, sessions):
+    """Report header line comparing the grid's slots with what the run will ask for"""
+    slots = factory.grid_slots()
+    if slots is None:
+        return f"remote browsers: {factory.url}"
+    free, total = slots
+    header = (
+        f"remote browsers: {factory.url}, {free} of {total} slots free "
+        f"for {workers} worker(s) x {sessions} session(s)"
+    )
+    if workers * sessions > free:
+        header += "; requests beyond that wait for a free slot"
+    return header
+
+
+def start_stand_in_grid(max_sessions, latency_ms=0.0):
+    """Launch `python -m utils.stand_in_grid` on a free port; returns (process, url)"""
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "utils.stand_in_grid", "--port", "0",
+            "--max-sessions", str(max_sessions), "--latency-ms", str(latency_ms),
+        ],
+        cwd=BASE_DIR,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [BASE_DIR, os.environ.get("PYTHONPATH")]))},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline()
+    if "http://" not in line:
+        process.kill()
+        raise RuntimeError(f"The stand-in grid did not start: {line.strip() or 'no output'}")
+    return process, line.strip().rsplit(" ", 1)[-1]
+
+
+def stop_stand_in_grid(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    process.stdout.close()
+
+
+def write_terminal_summary(terminalreporter, url, summary):
+    if not summary or not summary.get("sessions") and not summary.get("failed_sessions"):
+        return
+    terminalreporter.write_sep("-", "remote browsers")
+    sessions = summary["sessions"]
+    terminalreporter.write_line(
+        f"{sessions} sessions on {url}, {summary['session_retries']} refused requests retried, "
+        f"{summary['session_wait_seconds'] / max(sessions, 1):.1f}s average wait for a session, "
+        f"{summary['failed_sessions']} sessions never started"
+    )
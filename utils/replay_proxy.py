@@ -0,0 +1,502 @@
+"""
+Record/replay HTTP layer for UI tests (--replay=record|replay).
+
+Every worker starts a local intercepting proxy and launches its browser behind it. HTTPS
+is intercepted with per-host certificates signed by a local CA kept in `<replay-dir>/.ca`;
+the browser is told to accept them.
+
+Only tests marked `@pytest.mark.replayable(group)` whose group is picked by
+--replay-groups go through the archive; every other request is forwarded live. In record
+mode their responses are stored in a HAR-like archive per client/env
+(`<replay-dir>/<client>-<env>.har`). In replay mode they are served from that archive
+without touching the network; a request that was never recorded gets a 504 and is
+reported as a miss.
+
+Requests match on method, URL without the query, query string and body. Query parameters
+listed in --replay-ignore-query (cache busters, timestamps) and top-level JSON or form
+fields listed in --replay-ignore-body are left out of the match; `*` ignores the whole
+query string or body.
+"""
+import base64
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import ssl
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from utils.driver_cache import file_lock
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+MODES = (OFF, RECORD, REPLAY)
+LIVE = "live"
+ALL_GROUPS = "all"
+DEFAULT_GROUP = "default"
+UPSTREAM_TIMEOUT = 30
+# Hop-by-hop headers, and the ones that no longer hold once the body has been decoded
+SKIPPED_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "proxy-connection", "te",
+    "trailer", "transfer-encoding", "upgrade", "content-encoding", "content-length",
+}
+# Never written to the archive
+SECRET_REQUEST_HEADERS = {"cookie", "authorization"}
+
+
+def split_list(value):
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+class MatchRules:
+    """Turns a request into the key it is recorded and looked up under."""
+
+    def __init__(self, ignore_query=(), ignore_body=()):
+        self.ignore_query = set(ignore_query)
+        self.ignore_body = set(ignore_body)
+
+    def key(self, method, url, body=b""):
+        parts = urllib.parse.urlsplit(url)
+        query = ""
+        if "*" not in self.ignore_query:
+            pairs = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+            query = urllib.parse.urlencode(sorted(pair for pair in pairs if pair[0] not in self.ignore_query))
+        key = f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path or '/'}?{query}"
+        body = self.normalized_body(body)
+        return f"{key} {hashlib.sha1(body).hexdigest()}" if body else key
+
+    def normalized_body(self, body):
+        """JSON and form bodies compare by their fields rather than byte for byte"""
+        if not body or "*" in self.ignore_body:
+            return b""
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            fields = {name: value for name, value in data.items() if name not in self.ignore_body}
+            return json.dumps(fields, sort_keys=True).encode()
+        try:
+            pairs = urllib.parse.parse_qsl(body.decode(), keep_blank_values=True, strict_parsing=True)
+        except (UnicodeDecodeError, ValueError):
+            return body
+        return urllib.parse.urlencode(sorted(pair for pair in pairs if pair[0] not in self.ignore_body)).encode()
+
+
+def make_entry(method, url, headers, body, status, reason, response_headers, content, seconds):
+    """One HAR entry; bodies are stored base64-encoded"""
+    entry = {
+        "startedDateTime": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "time": round(seconds * 1000, 1),
+        "request": {
+            "method": method,
+            "url": url,
+            "headers": [
+                {"name": name, "value": value} for name, value in headers
+                if name.lower() not in SECRET_REQUEST_HEADERS
+            ],
+        },
+        "response": {
+            "status": status,
+            "statusText": reason or "",
+            "headers": [{"name": name, "value": value} for name, value in response_headers],
+            "content": {
+                "size": len(content),
+                "mimeType": dict((name.lower(), value) for name, value in response_headers).get("content-type", ""),
+                "text": base64.b64encode(content).decode(),
+                "encoding": "base64",
+            },
+        },
+    }
+    if body:
+        entry["request"]["postData"] = {
+            "mimeType": dict((name.lower(), value) for name, value in headers).get("content-type", ""),
+            "text": base64.b64encode(body).decode(),
+            "encoding": "base64",
+        }
+    return entry
+
+
+def entry_key(rules, entry):
+    request = entry["request"]
+    body = base64.b64decode(request["postData"]["text"]) if "postData" in request else b""
+    return rules.key(request["method"], request["url"], body)
+
+
+class ReplayArchive:
+    """The recordings of one client/env, keyed by the current match rules."""
+
+    def __init__(self, directory, client, env, rules):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{client}-{env}.har")
+        self.rules = rules
+        self.entries = {}
+        self.recorded = {}
+        self._lock = threading.Lock()
+
+    def read(self):
+        try:
+            with open(self.path) as archive_file:
+                return json.load(archive_file)["log"]["entries"]
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def load(self):
+        # Keys are worked out on load, so changed match rules apply to existing recordings
+        self.entries = {entry_key(self.rules, entry): entry for entry in self.read()}
+        return self
+
+    def lookup(self, key):
+        return self.entries.get(key)
+
+    def add(self, key, entry):
+        with self._lock:
+            self.entries[key] = entry
+            self.recorded[key] = entry
+
+    def save(self):
+        """Merge this worker's recordings into the archive on disk; newer responses win"""
+        if not self.recorded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(self.path + ".lock"):
+            merged = {entry_key(self.rules, entry): entry for entry in self.read()}
+            merged.update(self.recorded)
+            archive = {"log": {"version": "1.2", "creator": {"name": "replay_proxy", "version": "1"},
+                               "entries": list(merged.values())}}
+            temporary = self.path + ".tmp"
+            with open(temporary, "w") as archive_file:
+                json.dump(archive, archive_file, indent=1)
+            os.replace(temporary, self.path)
+
+
+class CertificateAuthority:
+    """Local CA that signs a certificate for every host the browser connects to."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.key_path = os.path.join(directory, "ca-key.pem")
+        self.cert_path = os.path.join(directory, "ca.pem")
+        self.host_dir = tempfile.mkdtemp(prefix="replay-certs-")
+        self._contexts = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with file_lock(os.path.join(directory, "ca.lock")):
+            if not os.path.exists(self.cert_path):
+                self._create()
+        self._load()
+
+    def _create(self):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = self._name("Test replay proxy CA")
+        certificate = self._build(name, name, key.public_key(), key, is_ca=True, days=3650)
+        with open(self.key_path, "wb") as key_file:
+            key_file.write(key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+            ))
+        with open(self.cert_path, "wb") as cert_file:
+            cert_file.write(certificate.public_bytes(serialization.Encoding.PEM))
+
+    def _load(self):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        with open(self.key_path, "rb") as key_file:
+            self.key = serialization.load_pem_private_key(key_file.read(), password=None)
+        with open(self.cert_path, "rb") as cert_file:
+            self.certificate = x509.load_pem_x509_certificate(cert_file.read())
+        # One key for every host certificate; generating RSA keys is the slow part
+        self.host_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.host_key_path = os.path.join(self.host_dir, "host-key.pem")
+        with open(self.host_key_path, "wb") as key_file:
+            key_file.write(self.host_key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+            ))
+
+    @staticmethod
+    def _name(common_name):
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+
+        return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+    @staticmethod
+    def _build(subject, issuer, public_key, signing_key, is_ca=False, host=None, days=365):
+        import ipaddress
+
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        builder = (
+            x509.CertificateBuilder()
+            .subject_name(subject)
+            .issuer_name(issuer)
+            .public_key(public_key)
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=days))
+            .add_extension(x509.BasicConstraints(ca=is_ca, path_length=None), critical=True)
+        )
+        if host is not None:
+            try:
+                alternative_name = x509.IPAddress(ipaddress.ip_address(host))
+            except ValueError:
+                alternative_name = x509.DNSName(host)
+            builder = builder.add_extension(x509.SubjectAlternativeName([alternative_name]), critical=False)
+        return builder.sign(signing_key, hashes.SHA256())
+
+    def context_for(self, host):
+        """Server-side TLS context presenting a certificate for `host`"""
+        from cryptography.hazmat.primitives import serialization
+
+        with self._lock:
+            context = self._contexts.get(host)
+            if context is None:
+                certificate = self._build(
+                    self._name(host), self.certificate.subject, self.host_key.public_key(), self.key, host=host
+                )
+                cert_path = os.path.join(self.host_dir, hashlib.sha1(host.encode()).hexdigest() + ".pem")
+                with open(cert_path, "wb") as cert_file:
+                    cert_file.write(certificate.public_bytes(serialization.Encoding.PEM))
+                context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+                context.load_cert_chain(cert_path, self.host_key_path)
+                self._contexts[host] = context
+            return context
+
+    def close(self):
+        shutil.rmtree(self.host_dir, ignore_errors=True)
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    tunnel = None
+
+    def log_message(self, format, *args):
+        logging.debug("replay proxy: " + format, *args)
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(":")
+        self.send_response(200, "Connection Established")
+        self.end_headers()
+        self.wfile.flush()
+        try:
+            self.connection = self.server.proxy.authority.context_for(host).wrap_socket(
+                self.connection, server_side=True
+            )
+        except (ssl.SSLError, OSError) as e:
+            logging.debug("replay proxy: TLS handshake for %s failed: %s", host, e)
+            self.close_connection = True
+            return
+        self.rfile = self.connection.makefile("rb", self.rbufsize)
+        self.wfile = self.connection.makefile("wb")
+        self.tunnel = f"https://{host}" if port == "443" else f"https://{self.path}"
+        # The requests inside the tunnel are read by the handler's own keep-alive loop
+        self.close_connection = False
+
+    def do_GET(self):
+        self.server.proxy.handle(self)
+
+    do_HEAD = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = do_GET
+
+
+class RecordReplayProxy:
+    """Intercepting proxy whose `mode` (live, record or replay) can change between tests."""
+
+    def __init__(self, archive, authority):
+        self.archive = archive
+        self.authority = authority
+        self.mode = LIVE
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0, "live": 0, "errors": 0}
+        self.misses = []
+        self._server = None
+        self._session = None
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        import requests
+
+        self._session = requests.Session()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ProxyHandler)
+        self._server.daemon_threads = True
+        self._server.proxy = self
+        threading.Thread(target=self._server.serve_forever, name="replay-proxy", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.authority.close()
+
+    def handle(self, handler):
+        url = handler.tunnel + handler.path if handler.tunnel else handler.path
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        mode = self.mode
+        key = self.archive.rules.key(handler.command, url, body)
+        if mode == REPLAY:
+            entry = self.archive.lookup(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                self.misses.append(key)
+                logging.warning("No recorded response for %s", key)
+                return self.write_error(handler, 504, f"No recorded response for {key}")
+            self.stats["replayed"] += 1
+            return self.write_entry(handler, entry)
+        entry = self.forward(handler, url, body)
+        if entry is None:
+            self.stats["errors"] += 1
+            return self.write_error(handler, 502, f"Upstream request to {url} failed")
+        if mode == RECORD:
+            self.archive.add(key, entry)
+            self.stats["recorded"] += 1
+        else:
+            self.stats["live"] += 1
+        return self.write_entry(handler, entry)
+
+    def forward(self, handler, url, body):
+        import requests
+
+        headers = [(name, value) for name, value in handler.headers.items() if name.lower() not in SKIPPED_HEADERS]
+        start = time.monotonic()
+        try:
+            response = self._session.request(
+                handler.command, url, headers=dict(headers), data=body or None,
+                allow_redirects=False, timeout=UPSTREAM_TIMEOUT,
+            )
+        except requests.RequestException as e:
+            logging.warning("Replay proxy could not reach %s: %s", url, e)
+            return None
+        # raw.headers keeps repeated headers (Set-Cookie) apart
+        response_headers = [
+            (name, value) for name, value in response.raw.headers.items() if name.lower() not in SKIPPED_HEADERS
+        ]
+        return make_entry(
+            handler.command, url, headers, body, response.status_code, response.reason,
+            response_headers, response.content, time.monotonic() - start,
+        )
+
+    @staticmethod
+    def write_entry(handler, entry):
+        response = entry["response"]
+        content = base64.b64decode(response["content"]["text"])
+        handler.send_response(response["status"], response["statusText"] or None)
+        for header in response["headers"]:
+            if header["name"].lower() not in SKIPPED_HEADERS:
+                handler.send_header(header["name"], header["value"])
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        if handler.command != "HEAD":
+            handler.wfile.write(content)
+
+    @staticmethod
+    def write_error(handler, status, message):
+        content = message.encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "text/plain; charset=utf-8")
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+
+def configure_chrome_options(options, address):
+    options.add_argument(f"--proxy-server={address}")
+    # Hosts are served certificates signed by the local replay CA
+    options.accept_insecure_certs = True
+
+
+def configure_firefox_options(options, address):
+    host, port = address.split(":")
+    options.set_preference("network.proxy.type", 1)
+    for scheme in ("http", "ssl"):
+        options.set_preference(f"network.proxy.{scheme}", host)
+        options.set_preference(f"network.proxy.{scheme}_port", int(port))
+    options.accept_insecure_certs = True
+
+
+class ReplayPlugin:
+    name = "replay"
+
+    def __init__(self, config):
+        self.config = config
+        self.mode = config.getoption("replay")
+        self.groups = set(split_list(config.getoption("replay_groups")))
+        self.rules = MatchRules(
+            split_list(config.getoption("replay_ignore_query")), split_list(config.getoption("replay_ignore_body"))
+        )
+        self.proxy = None
+        self._misses_before = 0
+
+    @property
+    def address(self):
+        return self.proxy.address if self.proxy is not None else None
+
+    def start(self, client, env):
+        """Start this worker's proxy; called before its first browser is launched"""
+        directory = self.config.getoption("replay_dir")
+        archive = ReplayArchive(directory, client, env, self.rules)
+        if self.mode == REPLAY:
+            archive.load()
+            if not archive.entries:
+                logging.warning("%s has no recordings; replayable tests will only get misses", archive.path)
+        self.proxy = RecordReplayProxy(archive, CertificateAuthority(os.path.join(directory, ".ca"))).start()
+        return self.proxy
+
+    def mode_for(self, item):
+        marker = item.get_closest_marker("replayable")
+        if marker is None:
+            return LIVE
+        group = marker.args[0] if marker.args else DEFAULT_GROUP
+        return self.mode if ALL_GROUPS in self.groups or group in self.groups else LIVE
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self, item):
+        if self.proxy is not None:
+            self.proxy.mode = self.mode_for(item)
+            self._misses_before = len(self.proxy.misses)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        yield
+        if self.proxy is not None and self.proxy.mode != LIVE:
+            item.user_properties.append(("replay_mode", self.proxy.mode))
+            item.user_properties.append(("replay_misses", len(self.proxy.misses) - self._misses_before))
+
+    def pytest_sessionfinish(self, session):
+        if self.proxy is None:
+            return
+        self.proxy.stop()
+        if self.mode == RECORD:
+            self.proxy.archive.save()
+
+    def summary(self):
+        return dict(self.proxy.stats) if self.proxy is not None else {}
+
+
+def write_terminal_summary(terminalreporter, summary):
+    if not summary or not any(summary.values()):
+        return
+    terminalreporter.write_sep("-", "record/replay")
+    terminalreporter.write_line(
+        f"{summary['recorded']} recorded  {summary['replayed']} served from disk  {summary['misses']} misses  "
+        f"{summary['live']} forwarded live  {summary['errors']} upstream errors"
+    )
@@ -0,0 +1,233 @@
+"""
+Rerun stage for failed tests (--reruns N) and automatic quarantine of flaky tests.
+
+A test whose setup or call fails is reported as `rerun` instead of failed and kept
+aside. Once a worker has run everything it was given, it runs those tests again, each on
+a fresh browser (the pool swaps in its standby), up to N attempts and within
+--rerun-budget seconds. Every worker reruns its own failures, so the stage runs in
+parallel. A test that passes on a rerun is flagged flaky in allure. A test that keeps
+failing, or is not rerun before the budget runs out, is reported as failed.
+
+The last outcomes of every test are kept in the pytest cache per client/env/browser
+(P passed, F flaky, X failed). A test that was flaky in at least --quarantine-flake-rate
+of its last runs (and has at least MIN_RUNS of them) is quarantined: it still runs, but
+as a non-strict xfail, so it no longer fails the build until it is stable again. A
+quarantined test that fails is recorded as failed; once it has failed its last
+MAX_QUARANTINED_FAILURES runs in a row it is broken rather than flaky and is taken out of
+quarantine, so it fails the build again.
+"""
+import copy
+import time
+
+import allure_commons
+import pytest
+from allure_commons.model2 import StatusDetails
+
+HISTORY_KEY = "reruns/history/{client}-{env}-{browser}"
+HISTORY_LENGTH = 20
+MIN_RUNS = 5
+MAX_QUARANTINED_FAILURES = 3
+PASSED, FLAKY, FAILED = "P", "F", "X"
+
+
+def flake_rate(history):
+    return history.count(FLAKY) / len(history) if history else 0.0
+
+
+def failure_streak(history):
+    """How many of the last runs in a row failed"""
+    return len(history) - len(history.rstrip(FAILED))
+
+
+def mark_allure_flaky(message):
+    """Flag the allure test result currently being reported as flaky"""
+    for plugin in allure_commons.plugin_manager.get_plugins():
+        reporter = getattr(plugin, "allure_logger", None)
+        if reporter is not None:
+            test_result = reporter.get_test(None)
+            if test_result is not None:
+                test_result.statusDetails = StatusDetails(flaky=True, message=message)
+
+
+def require_internal(obj, attribute, owner):
+    """Fail with a clear message when pytest or pytest-xdist no longer has an internal we use"""
+    if not hasattr(obj, attribute):
+        raise Exception(
+            f"{owner}.{attribute} is missing in this pytest/pytest-xdist version "
+            f"(pytest {pytest.__version__}); reruns and async tests rely on it"
+        )
+    return getattr(obj, attribute)
+
+
+def xdist_worker(config):
+    """xdist's plugin on a worker, which tags every report with the index of the running item"""
+    if not hasattr(config, "workerinput"):
+        return None
+    # xdist runs its remote module as __channelexec__, so the class can only be told by name
+    for plugin in config.pluginmanager.get_plugins():
+        if type(plugin).__name__ == "WorkerInteractor":
+            return plugin
+    raise Exception("Running as an xdist worker, but xdist's WorkerInteractor plugin is not registered")
+
+
+class RerunPlugin:
+    name = "reruns"
+
+    def __init__(self, config, fresh_browser):
+        """`fresh_browser()` replaces the worker's browser, if one is running, before a rerun"""
+        self.config = config
+        self.fresh_browser = fresh_browser
+        self.reruns = config.getoption("reruns")
+        self.budget = config.getoption("rerun_budget")
+        self.threshold = config.getoption("quarantine_flake_rate")
+        self.cache = getattr(config, "cache", None)
+        self.key = HISTORY_KEY.format(
+            client=config.getoption("client"), env=config.getoption("env"), browser=config.getoption("browser")
+        )
+        self.history = self.cache.get(self.key, {}) if self.cache is not None else {}
+        self.pending = {}
+        self.attempts = {}
+        self.first_failures = {}
+        self.retried = set()
+        self.outcomes = {}
+        self.quarantined = set()
+        self.rerunning = False
+
+    # ---- quarantine
+
+    def is_flaky(self, nodeid):
+        history = self.history.get(nodeid, "")
+        return bool(self.threshold) and len(history) >= MIN_RUNS and flake_rate(history) >= self.threshold
+
+    def is_released(self, nodeid):
+        """Flaky enough for quarantine, but failing every recent run: reported as failed again"""
+        return self.is_flaky(nodeid) and failure_streak(self.history[nodeid]) >= MAX_QUARANTINED_FAILURES
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        for item in items:
+            if self.is_flaky(item.nodeid) and not self.is_released(item.nodeid):
+                history = self.history[item.nodeid]
+                item.add_marker(pytest.mark.xfail(
+                    reason=f"quarantined: flaky in {flake_rate(history):.0%} of its last {len(history)} runs",
+                    strict=False,
+                ))
+
+    # ---- rerun stage (runs where the tests run: a worker, or the only process)
+
+    @pytest.hookimpl(hookwrapper=True, tryfirst=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        if not self.reruns or report.when == "teardown" or not report.failed or hasattr(report, "wasxfail"):
+            return
+        if self.attempts.get(item.nodeid, 0) >= self.reruns:
+            return
+        # Kept as it is, in case the rerun never happens
+        self.pending[item.nodeid] = (item, copy.copy(report))
+        self.first_failures.setdefault(item.nodeid, call.excinfo.exconly() if call.excinfo else report.longreprtext)
+        report.outcome = "rerun"
+
+    def pytest_runtest_logreport(self, report):
+        if self.rerunning and report.when == "call" and report.passed and report.nodeid in self.attempts:
+            attempts = self.attempts[report.nodeid]
+            mark_allure_flaky(
+                f"Passed on rerun {attempts} after failing with: {self.first_failures.get(report.nodeid, '')}"
+            )
+        self.record_outcome(report)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtestloop(self, session):
+        yield
+        if self.pending:
+            self.run_reruns(session)
+
+    def run_reruns(self, session):
+        deadline = time.monotonic() + self.budget if self.budget else None
+        worker = xdist_worker(self.config)
+
+        if worker is not None:
+            require_internal(worker, "item_index", "xdist.remote.WorkerInteractor")
+
+        def select(item):
+            if worker is not None:
+                worker.item_index = session.items.index(item)
+
+        self.rerunning = True
+        try:
+            while self.pending:
+                if session.shouldfail or session.shouldstop:
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+                nodeid, (item, failed_report) = next(iter(self.pending.items()))
+                del self.pending[nodeid]
+                self.attempts[nodeid] = self.attempts.get(nodeid, 0) + 1
+                self.fresh_browser()
+                # Fresh fixture request, as for a test that never ran
+                require_internal(item, "_initrequest", "pytest.Function")()
+                # Keeps the session fixtures (and their browser) alive until the last rerun
+                nextitem = next(iter(self.pending.values()))[0] if self.pending else None
+                select(item)
+                item.ihook.pytest_runtest_protocol(item=item, nextitem=nextitem)
+        finally:
+            self.rerunning = False
+        for item, failed_report in self.pending.values():
+            # Out of time: the original failure stands
+            select(item)
+            item.ihook.pytest_runtest_logreport(report=failed_report)
+        self.pending.clear()
+
+    # ---- flake history (where all reports arrive: the controller, or the only process)
+
+    def pytest_report_teststatus(self, report, config):
+        if report.outcome == "rerun":
+            return "rerun", "R", ("RERUN", {"yellow": True})
+
+    def record_outcome(self, report):
+        if report.outcome == "rerun":
+            self.retried.add(report.nodeid)
+        elif report.failed and report.when != "teardown":
+            self.outcomes[report.nodeid] = FAILED
+        elif report.when == "call":
+            if getattr(report, "wasxfail", "").startswith("quarantined"):
+                self.quarantined.add(report.nodeid)
+            if hasattr(report, "wasxfail"):
+                # A quarantined test: passing counts as stable, failing as failed (see MAX_QUARANTINED_FAILURES)
+                self.outcomes[report.nodeid] = PASSED if report.passed else FAILED
+            elif report.passed:
+                self.outcomes[report.nodeid] = FLAKY if report.nodeid in self.retried else PASSED
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(self.config, "workerinput") or self.cache is None or not self.outcomes:
+            return
+        history = dict(self.history)
+        for nodeid, outcome in self.outcomes.items():
+            history[nodeid] = (history.get(nodeid, "") + outcome)[-HISTORY_LENGTH:]
+        self.cache.set(self.key, history)
+
+    def summary(self):
+        flaky = sorted(nodeid for nodeid, outcome in self.outcomes.items() if outcome == FLAKY)
+        failed = sorted(nodeid for nodeid in self.retried if self.outcomes.get(nodeid) == FAILED)
+        released = sorted(nodeid for nodeid in self.outcomes if self.is_released(nodeid))
+        return {
+            "flaky": flaky,
+            "failed_after_rerun": failed,
+            "quarantined": sorted(self.quarantined),
+            "released": released,
+        }
+
+
+def write_terminal_summary(terminalreporter, summary):
+    if not any(summary.values()):
+        return
+    terminalreporter.write_sep("-", "reruns")
+    for nodeid in summary["flaky"]:
+        terminalreporter.write_line(f"FLAKY       {nodeid}")
+    for nodeid in summary["failed_after_rerun"]:
+        terminalreporter.write_line(f"FAILED      {nodeid} (also on rerun)")
+    for nodeid in summary["quarantined"]:
+        terminalreporter.write_line(f"QUARANTINED {nodeid}")
+    for nodeid in summary["released"]:
+        terminalreporter.write_line(
+            f"RELEASED    {nodeid} (failed {MAX_QUARANTINED_FAILURES}+ quarantined runs in a row, no longer xfail)"
+        )
@@ -0,0 +1,135 @@
+"""
+Failure screenshots captured once and written off the test's critical path.
+
+The test thread grabs the PNG bytes and attaches them to the allure report with
+allure.attach, which has to happen while the allure test item is current. A background
+thread then optionally downscales or recompresses the image and saves a copy under
+screenshots/, skipping copies whose content was already saved.
+
+Only when allure is active and --screenshot-max-width or --screenshot-jpeg-quality are
+given is the image processed on the test thread, so the report gets the smaller image too.
+"""
+import hashlib
+import io
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+import allure
+import allure_commons
+from allure_commons.types import AttachmentType
+
+try:
+    from PIL import Image
+except ImportError:  # downscaling and recompression need Pillow
+    Image = None
+
+
+def screenshot_name(nodeid, worker_id=None, attempt=1, taken_at=None):
+    """File system safe, nodeid based name. The worker id, the attempt (the first run of the
+    test, then its reruns) and the time keep the screenshots of reruns and earlier runs apart."""
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", nodeid.replace("::", "__")).strip("_")
+    if worker_id:
+        name = f"{name}-{worker_id}"
+    return f"{name}-attempt{attempt}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(taken_at))}"
+
+
+def allure_reporter():
+    """allure-pytest's reporter, or None when allure is not active"""
+    for plugin in allure_commons.plugin_manager.get_plugins():
+        reporter = getattr(plugin, "allure_logger", None)
+        if reporter is not None:
+            return reporter
+    return None
+
+
+
+class ScreenshotWriter:
+    def __init__(self, directory, max_width=0, jpeg_quality=0):
+        self.directory = directory
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self.saved = {}
+        self.counts = {"captured": 0, "written": 0, "duplicates": 0}
+        self._attempts = {}
+        self._queue = queue.Queue()
+        if (max_width or jpeg_quality) and Image is None:
+            logging.warning("Pillow is not installed, screenshots are stored unchanged")
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="screenshot-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def processes(self):
+        """True when screenshots are downscaled or recompressed before they are stored"""
+        return Image is not None and bool(self.max_width or self.jpeg_quality)
+
+    @property
+    def attachment_type(self):
+        if self.jpeg_quality and Image is not None:
+            return AttachmentType.JPG
+        return AttachmentType.PNG
+
+    def capture(self, driver, nodeid, worker_id=None):
+        """Take one screenshot, attach it to the allure report and queue it for writing.
+        Returns the path it will be saved to."""
+        png = driver.get_screenshot_as_png()
+        self.counts["captured"] += 1
+        processed = False
+        if allure_reporter() is not None:
+            attachment_type = AttachmentType.PNG
+            if self.processes:
+                png, processed, attachment_type = self._process(png), True, self.attachment_type
+            allure.attach(png, name="Screenshot", attachment_type=attachment_type)
+        # Each failure of the test in this process (the first run, then its reruns) is one attempt
+        attempt = self._attempts[nodeid] = self._attempts.get(nodeid, 0) + 1
+        name = screenshot_name(nodeid, worker_id, attempt)
+        path = os.path.join(self.directory, f"{name}.{self.attachment_type.extension}")
+        self._queue.put((png, path, processed))
+        return path
+
+    def _process(self, png):
+        if not self.processes:
+            return png
+        image = Image.open(io.BytesIO(png))
+        if self.max_width and image.width > self.max_width:
+            height = int(image.height * self.max_width / image.width)
+            image = image.resize((self.max_width, height), Image.LANCZOS)
+        output = io.BytesIO()
+        if self.jpeg_quality:
+            image.convert("RGB").save(output, "JPEG", quality=self.jpeg_quality, optimize=True)
+        else:
+            image.save(output, "PNG", optimize=True)
+        return output.getvalue()
+
+    def _write(self, png, path, processed):
+        data = png if processed else self._process(png)
+        digest = hashlib.sha1(data).hexdigest()
+        if digest in self.saved:
+            self.counts["duplicates"] += 1
+            logging.debug("Screenshot %s is identical to %s, not saved again", path, self.saved[digest])
+            return
+        with open(path, "wb") as screenshot_file:
+            screenshot_file.write(data)
+        self.saved[digest] = path
+        self.counts["written"] += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logging.warning("Could not write screenshot: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """Flush every queued screenshot and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,381 @@
+"""
+Local stand-in for a Selenium Grid.
+
+A W3C WebDriver endpoint whose sessions are fake browsers (utils.fake_webdriver) serving
+the benchmark fixture app or a directory of HTML files. It has a fixed number of session
+slots and refuses new sessions with `session not created` while they are all taken, as a
+saturated grid does, so --browser-url, the shared keep-alive connection pool and the
+session backoff can be exercised on one machine without any browser installed.
+
+    python -m utils.stand_in_grid --port 4444 --max-sessions 8 --latency-ms 20
+
+`--browser-url=stand-in` starts one for the test run. `--latency-ms` delays every command
+to model the network round trip to a remote node. Sessions idle for longer than
+`--session-timeout` seconds are reaped when a new session needs their slot.
+"""
+import argparse
+import base64
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from selenium.common.exceptions import ElementNotInteractableException
+from selenium.common.exceptions import InvalidSelectorException
+from selenium.common.exceptions import JavascriptException
+from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchWindowException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.remote import webelement
+
+from utils import fake_webdriver
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+WINDOW_RECT = {"x": 0, "y": 0, "width": 1920, "height": 1080}
+# The atoms selenium sends for WebElement.get_attribute and is_displayed
+GET_ATTRIBUTE_SCRIPT = "return (%s).apply(null, arguments);" % webelement.getAttribute_js
+IS_DISPLAYED_SCRIPT = "return (%s).apply(null, arguments);" % webelement.isDisplayed_js
+# W3C error code and HTTP status of the exceptions a fake session can raise
+ERRORS = (
+    (NoSuchElementException, "no such element", 404),
+    (StaleElementReferenceException, "stale element reference", 404),
+    (NoSuchWindowException, "no such window", 404),
+    (InvalidSelectorException, "invalid selector", 400),
+    (ElementNotInteractableException, "element not interactable", 400),
+    (JavascriptException, "javascript error", 500),
+)
+
+
+class W3CError(Exception):
+    def __init__(self, error, message, status=500):
+        super().__init__(message)
+        self.error = error
+        self.status = status
+
+
+class Session:
+    def __init__(self, session_id, driver, capabilities):
+        self.session_id = session_id
+        self.driver = driver
+        self.capabilities = capabilities
+        self.elements = {}
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    # ---- element references
+
+    def reference(self, element):
+        self.elements[element.id] = element
+        return {ELEMENT_KEY: element.id}
+
+    def element(self, element_id):
+        element = self.elements.get(element_id)
+        if element is None:
+            raise W3CError("no such element", f"Unknown element reference {element_id}", 404)
+        return element
+
+    def encode(self, value):
+        if isinstance(value, fake_webdriver.FakeElement):
+            return self.reference(value)
+        if isinstance(value, (list, tuple)):
+            return [self.encode(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.encode(item) for key, item in value.items()}
+        return value
+
+    def decode(self, value):
+        if isinstance(value, dict) and ELEMENT_KEY in value:
+            return self.element(value[ELEMENT_KEY])
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.decode(item) for key, item in value.items()}
+        return value
+
+    # ---- commands
+
+    def find(self, context, body, many):
+        found = context.find_elements(body["using"], body["value"])
+        if many:
+            return [self.reference(element) for element in found]
+        if not found:
+            raise NoSuchElementException(f"Unable to locate element: {body['using']}={body['value']}")
+        return self.reference(found[0])
+
+    def execute_script(self, body):
+        script, args = body["script"], self.decode(body.get("args", []))
+        if script == GET_ATTRIBUTE_SCRIPT:
+            return args[0].get_attribute(args[1])
+        if script == IS_DISPLAYED_SCRIPT:
+            return args[0].is_displayed()
+        return self.encode(self.driver.execute_script(script, *args))
+
+    def close_window(self):
+        self.driver.close()
+        return list(self.driver._windows)
+
+    def switch_window(self, body):
+        self.driver.switch_to.window(body["handle"])
+
+    def send_keys(self, element_id, body):
+        self.element(element_id).send_keys(body["text"])
+
+    def get_log(self, body):
+        return self.driver.get_log(body["type"])
+
+    def named_cookie(self, name):
+        for cookie in self.driver.get_cookies():
+            if cookie["name"] == name:
+                return cookie
+        raise W3CError("no such cookie", f"No cookie named {name}", 404)
+
+
+def session_routes():
+    """(method, path pattern, handler(session, body, *path groups)) of every supported command"""
+    element = r"/element/([^/]+)"
+    return [
+        ("POST", r"/url", lambda s, b: s.driver.get(b["url"])),
+        ("GET", r"/url", lambda s, b: s.driver.current_url),
+        ("POST", r"/back", lambda s, b: s.driver.back()),
+        ("POST", r"/forward", lambda s, b: s.driver.forward()),
+        ("POST", r"/refresh", lambda s, b: s.driver.refresh()),
+        ("GET", r"/title", lambda s, b: s.driver.title),
+        ("GET", r"/source", lambda s, b: s.driver.page_source),
+        ("POST", r"/timeouts", lambda s, b: None),
+        ("GET", r"/window", lambda s, b: s.driver.current_window_handle),
+        ("POST", r"/window", lambda s, b: s.switch_window(b)),
+        ("DELETE", r"/window", lambda s, b: s.close_window()),
+        ("GET", r"/window/handles", lambda s, b: s.driver.window_handles),
+        ("GET", r"/window/rect", lambda s, b: dict(WINDOW_RECT)),
+        ("POST", r"/window/rect", lambda s, b: dict(WINDOW_RECT)),
+        ("POST", r"/window/maximize", lambda s, b: dict(WINDOW_RECT)),
+        ("POST", r"/execute/sync", lambda s, b: s.execute_script(b)),
+        ("GET", r"/cookie", lambda s, b: s.driver.get_cookies()),
+        ("POST", r"/cookie", lambda s, b: s.driver.add_cookie(b["cookie"])),
+        ("DELETE", r"/cookie", lambda s, b: s.driver.delete_all_cookies()),
+        ("GET", r"/cookie/([^/]+)", lambda s, b, name: s.named_cookie(urllib.parse.unquote(name))),
+        ("GET", r"/screenshot", lambda s, b: base64.b64encode(s.driver.get_screenshot_as_png()).decode("ascii")),
+        ("POST", r"/se/log", lambda s, b: s.get_log(b)),
+        ("POST", r"/element", lambda s, b: s.find(s.driver, b, many=False)),
+        ("POST", r"/elements", lambda s, b: s.find(s.driver, b, many=True)),
+        ("GET", r"/element/active", lambda s, b: s.reference(s.driver.switch_to.active_element)),
+        ("POST", element + r"/element", lambda s, b, e: s.find(s.element(e), b, many=False)),
+        ("POST", element + r"/elements", lambda s, b, e: s.find(s.element(e), b, many=True)),
+        ("POST", element + r"/click", lambda s, b, e: s.element(e).click()),
+        ("POST", element + r"/clear", lambda s, b, e: s.element(e).clear()),
+        ("POST", element + r"/value", lambda s, b, e: s.send_keys(e, b)),
+        ("GET", element + r"/text", lambda s, b, e: s.element(e).text),
+        ("GET", element + r"/name", lambda s, b, e: s.element(e).tag_name),
+        ("GET", element + r"/rect", lambda s, b, e: s.element(e).rect),
+        ("GET", element + r"/enabled", lambda s, b, e: s.element(e).is_enabled()),
+        ("GET", element + r"/selected", lambda s, b, e: s.element(e).is_selected()),
+        ("GET", element + r"/property/([^/]+)", lambda s, b, e, name: s.element(e).get_property(name)),
+        ("GET", element + r"/attribute/([^/]+)", lambda s, b, e, name: s.element(e).get_dom_attribute(name)),
+        ("GET", element + r"/css/([^/]+)", lambda s, b, e, name: ""),
+        ("GET", element + r"/screenshot",
+         lambda s, b, e: base64.b64encode(s.element(e).screenshot_as_png()).decode("ascii")),
+    ]
+
+
+class StandInGrid:
+    def __init__(self, site_factory, max_sessions=8, latency=0.0, session_timeout=300):
+        """`site_factory()` returns the `site(url)` callable of one new fake browser"""
+        self.site_factory = site_factory
+        self.max_sessions = max_sessions
+        self.latency = latency
+        self.session_timeout = session_timeout
+        self.sessions = {}
+        self.stats = {"sessions": 0, "refused": 0, "reaped": 0}
+        self.routes = [
+            (method, re.compile(rf"/session/([^/]+){pattern}$"), handler)
+            for method, pattern, handler in session_routes()
+        ]
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def status(self):
+        with self._lock:
+            slots = [{"session": {"sessionId": session_id}} for session_id in self.sessions]
+        slots += [{"session": None}] * (self.max_sessions - len(slots))
+        free = sum(slot["session"] is None for slot in slots)
+        return {
+            "ready": free > 0,
+            "message": f"Stand-in grid: {free} of {self.max_sessions} slots free",
+            "nodes": [{"id": "stand-in", "availability": "UP", "slots": slots}],
+        }
+
+    def new_session(self, body):
+        requested = body.get("capabilities", {}).get("alwaysMatch", {})
+        with self._lock:
+            self._reap_idle()
+            if len(self.sessions) >= self.max_sessions:
+                self.stats["refused"] += 1
+                raise W3CError(
+                    "session not created",
+                    f"Could not start a new session: all {self.max_sessions} slots of the stand-in grid are in use",
+                )
+            session_id = f"stand-in-{next(self._ids)}"
+            # Reserved before the browser starts, so concurrent requests cannot overbook
+            self.sessions[session_id] = None
+        driver = fake_webdriver.FakeDriver(self.site_factory())
+        driver.session_id = session_id
+        capabilities = {
+            "browserName": requested.get("browserName", "fake"),
+            "pageLoadStrategy": requested.get("pageLoadStrategy", "normal"),
+            "standIn": True,
+        }
+        with self._lock:
+            self.sessions[session_id] = Session(session_id, driver, capabilities)
+            self.stats["sessions"] += 1
+        return {"sessionId": session_id, "capabilities": capabilities}
+
+    def delete_session(self, session_id):
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.driver.quit()
+
+    def _reap_idle(self):
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if session is not None and now - session.last_used > self.session_timeout:
+                del self.sessions[session_id]
+                session.driver.quit()
+                self.stats["reaped"] += 1
+
+    def session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise W3CError("invalid session id", f"No active session {session_id}", 404)
+        return session
+
+    def dispatch(self, method, path, body):
+        """The `value` of a W3C response; raises W3CError (or a selenium exception) on failure"""
+        if self.latency:
+            time.sleep(self.latency)
+        if path == "/status" and method == "GET":
+            return self.status()
+        if path == "/session" and method == "POST":
+            return self.new_session(body)
+        match = re.fullmatch(r"/session/([^/]+)", path)
+        if match and method == "DELETE":
+            return self.delete_session(match.group(1))
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                session = self.session(match.group(1))
+                with session.lock:
+                    session.last_used = time.monotonic()
+                    return handler(session, body, *match.groups()[1:])
+        raise W3CError("unknown command", f"{method} {path} is not supported by the stand-in grid", 404)
+
+
+class _GridHandler(BaseHTTPRequestHandler):
+    # Keep-alive, as a real grid: one connection serves every command of a client
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this every command waits for a delayed ACK
+    disable_nagle_algorithm = True
+    grid = None
+
+    def do_GET(self):
+        self.handle_command("GET")
+
+    def do_POST(self):
+        self.handle_command("POST")
+
+    def do_DELETE(self):
+        self.handle_command("DELETE")
+
+    def handle_command(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        path = urllib.parse.urlsplit(self.path).path.rstrip("/")
+        # Grid 3 style URLs still work
+        if path.startswith("/wd/hub"):
+            path = path[len("/wd/hub"):]
+        try:
+            body = json.loads(raw) if raw else {}
+            status, value = 200, self.grid.dispatch(method, path, body)
+        except W3CError as e:
+            status, value = e.status, {"error": e.error, "message": str(e), "stacktrace": ""}
+        except Exception as e:
+            status, error = 500, "unknown error"
+            for exception_class, code, code_status in ERRORS:
+                if isinstance(e, exception_class):
+                    status, error = code_status, code
+                    break
+            value = {"error": error, "message": getattr(e, "msg", None) or str(e), "stacktrace": ""}
+        payload = json.dumps({"value": value}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(grid, host="127.0.0.1", port=0):
+    handler = type("GridHandler", (_GridHandler,), {"grid": grid})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(grid, host="127.0.0.1", port=0):
+    """Serve `grid` from a daemon thread of this process; returns (server, url)"""
+    server = create_server(grid, host, port)
+    threading.Thread(target=server.serve_forever, name="stand-in-grid", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def site_factory(site_dir=None):
+    if site_dir:
+        return lambda: fake_webdriver.directory_site(site_dir)
+    from benchmarks.fixture_site import create_app
+
+    app = create_app()
+    return lambda: fake_webdriver.flask_site(app)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4444, help="0 picks a free port")
+    parser.add_argument("--max-sessions", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every command")
+    parser.add_argument("--session-timeout", type=float, default=300, help="Idle seconds before a session is reaped")
+    parser.add_argument("--site", default=None, help="Directory of HTML pages (default: the benchmark fixture app)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    grid = StandInGrid(
+        site_factory(args.site),
+        max_sessions=args.max_sessions,
+        latency=args.latency_ms / 1000.0,
+        session_timeout=args.session_timeout,
+    )
+    server = create_server(grid, args.host, args.port)
+    host, port = server.server_address[:2]
+    # Parsed by utils.remote_driver.start_stand_in_grid
+    print(f"Stand-in grid listening on http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Startup timing per worker: interpreter and plugin start-up, conftest imports, collection
+and the time until the first test starts. Published through worker_stats keyed by
+worker id so startup regressions show up in the terminal summary of every run.
+"""
+import os
+import time
+
+import pytest
+
+try:
+    import psutil
+except ImportError:  # without psutil the interpreter start-up column stays empty
+    psutil = None
+
+
+def process_age():
+    """Seconds since this process was created, or None when psutil is unavailable."""
+    if psutil is None:
+        return None
+    try:
+        return time.time() - psutil.Process().create_time()
+    except psutil.Error:
+        return None
+
+
+class StartupTimingPlugin:
+    name = "startup_timing"
+
+    def __init__(self, config, conftest_import_seconds):
+        self.config = config
+        self.worker_id = os.environ.get("PYTEST_XDIST_WORKER", "main")
+        self.timings = {
+            "process_start": process_age(),
+            "conftest_import": conftest_import_seconds,
+            "collection": 0.0,
+            "first_test": None,
+        }
+        self._configured_at = time.perf_counter()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_collection(self, session):
+        start = time.perf_counter()
+        yield
+        self.timings["collection"] = time.perf_counter() - start
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        if self.timings["first_test"] is None:
+            self.timings["first_test"] = time.perf_counter() - self._configured_at
+
+    def summary(self):
+        return {self.worker_id: dict(self.timings)}
+
+
+def write_terminal_summary(terminalreporter, summary):
+    if not summary:
+        return
+    terminalreporter.write_sep("-", "startup")
+    terminalreporter.write_line(
+        f"{'worker':8} {'process':>9} {'conftest':>9} {'collect':>9} {'1st test':>9}"
+    )
+
+    def seconds(value):
+        return f"{value:8.2f}s" if value is not None else f"{'-':>9}"
+
+    for worker_id, timings in sorted(summary.items()):
+        terminalreporter.write_line(
+            f"{worker_id:8} {seconds(timings['process_start'])} {seconds(timings['conftest_import'])} "
+            f"{seconds(timings['collection'])} {seconds(timings['first_test'])}"
+        )
@@ -0,0 +1,198 @@
+"""
+Opt-in step timing for page objects (--step-timing=true).
+
+Every public method of BasePageClass and of its page subclasses is wrapped to record, per
+call, its wall time, the time it spent in fixed sleeps (wait_it_out), the time it spent in
+explicit waits (_poll_until) and how many WebDriver commands it issued. Methods called by the
+polling loop of an explicit wait are folded into the wait instead of listed.
+Records are attached to each test in allure, written to
+reports/step-timings-<worker>.json and summarised across xdist workers in the
+terminal summary.
+"""
+import functools
+import inspect
+import json
+import os
+import time
+
+import allure
+import pytest
+from allure_commons.types import AttachmentType
+from selenium.webdriver.remote.webdriver import WebDriver
+
+SLOWEST_STEPS_KEPT = 15
+
+
+class StepRecorder:
+    def __init__(self):
+        self.records = []
+        self.test_records = []
+        self.current_test = None
+        self.commands = 0
+        self._stack = []
+        self._wait_depth = 0
+
+    def enter(self, name, kind):
+        frame = {
+            "name": name,
+            "kind": kind,
+            "start": time.perf_counter(),
+            "slept": 0.0,
+            "waited": 0.0,
+            "commands": self.commands,
+        }
+        if kind == "wait":
+            self._wait_depth += 1
+        self._stack.append(frame)
+        return frame
+
+    def exit(self, frame):
+        self._stack.pop()
+        wall = time.perf_counter() - frame["start"]
+        if frame["kind"] == "wait":
+            self._wait_depth -= 1
+            if not self._wait_depth:
+                frame["waited"] = wall
+                frame["slept"] = 0.0
+        elif frame["kind"] == "sleep" and not self._wait_depth:
+            # Backoff sleeps inside an explicit wait belong to the wait
+            frame["slept"] = wall
+        if self._stack:
+            self._stack[-1]["slept"] += frame["slept"]
+            self._stack[-1]["waited"] += frame["waited"]
+        if frame["kind"] == "method" and not self._wait_depth:
+            # Calls made while polling inside an explicit wait are folded into that wait
+            record = {
+                "test": self.current_test,
+                "step": frame["name"],
+                "depth": len(self._stack),
+                "wall": wall,
+                "slept": frame["slept"],
+                "waited": frame["waited"],
+                "commands": self.commands - frame["commands"],
+            }
+            self.records.append(record)
+            self.test_records.append(record)
+
+    def timed(self, name, kind, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            frame = self.enter(name, kind)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit(frame)
+
+        return wrapper
+
+    def summary(self):
+        """Per-method totals plus the slowest individual calls, in worker_stats mergeable form."""
+        methods = {}
+        for record in self.records:
+            totals = methods.setdefault(
+                record["step"], {"calls": 0, "wall": 0.0, "slept": 0.0, "waited": 0.0, "commands": 0}
+            )
+            totals["calls"] += 1
+            for key in ("wall", "slept", "waited", "commands"):
+                totals[key] += record[key]
+        slowest = sorted(self.records, key=lambda record: record["wall"], reverse=True)
+        return {"methods": methods, "slowest": slowest[:SLOWEST_STEPS_KEPT]}
+
+
+def instrument_methods(page_class, recorder):
+    """Wrap the methods defined on `page_class` itself: its public methods plus the sleep and
+    explicit wait primitives."""
+    for name, attribute in list(vars(page_class).items()):
+        if isinstance(attribute, (classmethod, staticmethod)):
+            func = attribute.__func__
+            if name == "wait_it_out":
+                func = recorder.timed(name, "sleep", func)
+            if not name.startswith("_"):
+                func = recorder.timed(f"{page_class.__name__}.{name}", "method", func)
+            setattr(page_class, name, type(attribute)(func))
+        elif inspect.isfunction(attribute):
+            if name == "_poll_until":
+                setattr(page_class, name, recorder.timed(name, "wait", attribute))
+            elif not name.startswith("_"):
+                setattr(page_class, name, recorder.timed(f"{page_class.__name__}.{name}", "method", attribute))
+
+
+def instrument_page_class(page_class, recorder):
+    """Wrap the methods of `page_class` now, and those each page subclass defines or overrides
+    the first time one of its pages is created (page modules are imported while tests run)."""
+    instrumented = {page_class}
+    instrument_methods(page_class, recorder)
+    original_init = page_class.__init__
+
+    @functools.wraps(original_init)
+    def __init__(self, *args, **kwargs):
+        for cls in type(self).__mro__:
+            if cls not in instrumented and issubclass(cls, page_class):
+                instrumented.add(cls)
+                instrument_methods(cls, recorder)
+        original_init(self, *args, **kwargs)
+
+    page_class.__init__ = __init__
+
+
+def count_webdriver_commands(recorder):
+    original_execute = WebDriver.execute
+
+    @functools.wraps(original_execute)
+    def execute(self, driver_command, params=None):
+        recorder.commands += 1
+        return original_execute(self, driver_command, params)
+
+    WebDriver.execute = execute
+
+
+class StepTimingPlugin:
+    name = "step_timing"
+
+    def __init__(self, config, page_class, output_dir):
+        self.config = config
+        self.recorder = StepRecorder()
+        self.output_dir = output_dir
+        instrument_page_class(page_class, self.recorder)
+        count_webdriver_commands(self.recorder)
+
+    def pytest_runtest_setup(self, item):
+        self.recorder.current_test = item.nodeid
+        self.recorder.test_records = []
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        yield
+        if self.recorder.test_records:
+            allure.attach(
+                json.dumps(self.recorder.test_records, indent=2),
+                name="Step timings",
+                attachment_type=AttachmentType.JSON,
+            )
+
+    def pytest_sessionfinish(self, session):
+        if not self.recorder.records:
+            return
+        worker_id = os.environ.get("PYTEST_XDIST_WORKER", "main")
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, f"step-timings-{worker_id}.json"), "w") as output:
+            json.dump(self.recorder.records, output, indent=2)
+
+
+def write_terminal_summary(terminalreporter, summary, limit=10):
+    if not summary or not summary["methods"]:
+        return
+    terminalreporter.write_sep("-", "slowest page object methods")
+    methods = sorted(summary["methods"].items(), key=lambda item: item[1]["wall"], reverse=True)
+    for name, totals in methods[:limit]:
+        terminalreporter.write_line(
+            f"{totals['wall']:8.2f}s {totals['calls']:5d} calls  slept {totals['slept']:6.2f}s  "
+            f"waited {totals['waited']:6.2f}s  {totals['commands']:6d} commands  {name}"
+        )
+    terminalreporter.write_sep("-", "slowest steps")
+    slowest = sorted(summary["slowest"], key=lambda record: record["wall"], reverse=True)
+    for record in slowest[:limit]:
+        terminalreporter.write_line(
+            f"{record['wall']:8.2f}s  slept {record['slept']:6.2f}s  waited {record['waited']:6.2f}s  "
+            f"{record['commands']:4d} commands  {record['step']}  ({record['test']})"
+        )
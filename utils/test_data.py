@@ -0,0 +1,191 @@
+"""
+Seeded, worker-partitioned test data pool.
+
+Records (users, emails, phone numbers, strings of a given length) are generated in
+batches from the run's seed and stored under `<directory>/<seed>/<partition>/` as one
+compact JSON file per kind and batch. Taking a record is a list lookup; the next batch is
+generated (or read back from disk) only when the current one is exhausted. Batches are
+seeded from (seed, partition, kind, batch), so the same --data-seed reproduces a run
+value for value, whatever order the tests take records in.
+
+Every xdist worker draws from its own partition and every unique value (e-mail address,
+username, phone number) embeds a tag of the seed, the partition and a sequence number, so
+parallel sign-up tests never collide, and neither do runs with different seeds against
+the same environment. Faker is only imported when user records are actually generated.
+
+Only the directories of the KEEP_SEEDS most recent seeds are kept; prune_seeds deletes
+the others once per run.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import string
+import threading
+
+DEFAULT_BATCH_SIZE = 200
+EMAIL_DOMAIN = "example.com"
+STRING_ALPHABET = string.ascii_uppercase + string.digits
+PASSWORD_ALPHABET = string.ascii_letters + string.digits
+BASE36 = string.digits + string.ascii_uppercase
+# Base36 digits of the sequence number appended to generated strings that are long enough
+SEQUENCE_WIDTH = 5
+# Base36 digits of the seed tag in e-mail addresses and usernames
+SEED_TAG_WIDTH = 4
+PHONE_SEQUENCES = 100000
+KEEP_SEEDS = 5
+
+
+def partition_of(worker_id):
+    """gw0, gw1, ... map to 0, 1, ...; a run without xdist uses partition 0"""
+    match = re.search(r"(\d+)$", worker_id or "")
+    return int(match.group(1)) if match else 0
+
+
+def to_base36(number, width=1):
+    digits = ""
+    while number or len(digits) < width:
+        number, remainder = divmod(number, 36)
+        digits = BASE36[remainder] + digits
+    return digits
+
+
+def seed_digest(seed):
+    """A number derived from the seed, the same on every worker and in every run with that seed"""
+    return int(hashlib.sha256(str(seed).encode()).hexdigest(), 16)
+
+
+def prune_seeds(directory, seed, keep=KEEP_SEEDS):
+    """Delete the batches of all but the `keep` most recently used seeds, never those of `seed`"""
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.is_dir()]
+    except OSError:
+        return []
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    others = [entry for entry in entries if entry.name != str(seed)]
+    pruned = []
+    for entry in others[max(keep - 1, 0):]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+        pruned.append(entry.name)
+    return pruned
+
+
+class DataPool:
+    def __init__(self, directory, seed, worker_id=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.directory = os.path.join(directory, str(seed), str(partition_of(worker_id)))
+        self.seed = seed
+        self.partition = partition_of(worker_id)
+        self.batch_size = batch_size
+        digest = seed_digest(seed)
+        self.seed_tag = to_base36(digest % 36 ** SEED_TAG_WIDTH, SEED_TAG_WIDTH).lower()
+        # Even, so phone and user records keep their even and odd sequence numbers apart
+        self.phone_offset = 2 * ((digest >> 32) % (PHONE_SEQUENCES // 2))
+        self.stats = {"taken": 0, "generated_batches": 0, "loaded_batches": 0}
+        self._records = {}
+        self._cursors = {}
+        self._batches = {}
+        self._faker = None
+        self._lock = threading.Lock()
+
+    # ---- public records
+
+    def user(self):
+        return dict(self.take("user"))
+
+    def email(self):
+        return self.take("email")
+
+    def phone(self):
+        return self.take("phone")
+
+    def string(self, length):
+        return self.take(f"string-{length}")
+
+    # ---- pool
+
+    def take(self, kind):
+        with self._lock:
+            records = self._records.get(kind)
+            cursor = self._cursors.get(kind, 0)
+            if records is None or cursor >= len(records):
+                batch = self._batches.get(kind, -1) + 1
+                records = self._records[kind] = self._load_batch(kind, batch)
+                self._batches[kind] = batch
+                cursor = 0
+            self._cursors[kind] = cursor + 1
+            self.stats["taken"] += 1
+            return records[cursor]
+
+    def _load_batch(self, kind, batch):
+        path = os.path.join(self.directory, f"{kind}-{batch}.json")
+        try:
+            with open(path) as batch_file:
+                records = json.load(batch_file)
+            self.stats["loaded_batches"] += 1
+            return records
+        except (OSError, ValueError):
+            pass
+        records = self.generate(kind, batch)
+        self.stats["generated_batches"] += 1
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as batch_file:
+            json.dump(records, batch_file, separators=(",", ":"))
+        os.replace(temporary, path)
+        return records
+
+    # ---- generation
+
+    def unique_suffix(self, batch, index):
+        """Seed tag, partition and sequence number, so values of different workers and seeds never collide"""
+        return f"{self.seed_tag}{self.partition}x{batch * self.batch_size + index}"
+
+    def generate(self, kind, batch):
+        rng = random.Random(f"{self.seed}:{self.partition}:{kind}:{batch}")
+        if kind == "user":
+            return self._generate_users(rng, batch)
+        if kind == "email":
+            return [f"user.{self.unique_suffix(batch, index)}@{EMAIL_DOMAIN}" for index in range(self.batch_size)]
+        if kind == "phone":
+            return [self._phone(2 * (batch * self.batch_size + index)) for index in range(self.batch_size)]
+        if kind.startswith("string-"):
+            length = int(kind.split("-", 1)[1])
+            return [self._string(rng, length, batch, index) for index in range(self.batch_size)]
+        raise ValueError(f"Unknown test data kind: {kind}")
+
+    def _phone(self, sequence):
+        # Ten digits in the 555 range reserved for fiction: partition, then sequence number
+        # shifted by the seed. Phone records use even and user records odd sequence numbers.
+        return f"555{self.partition % 100:02d}{(self.phone_offset + sequence) % PHONE_SEQUENCES:05d}"
+
+    def _string(self, rng, length, batch, index):
+        """Random characters ending in the partition and sequence number whenever they fit"""
+        sequence = to_base36((batch * self.batch_size + index) * 1000 + self.partition, SEQUENCE_WIDTH)
+        if len(sequence) >= length:
+            return "".join(rng.choices(STRING_ALPHABET, k=length))
+        return "".join(rng.choices(STRING_ALPHABET, k=length - len(sequence))) + sequence
+
+    def _generate_users(self, rng, batch):
+        if self._faker is None:
+            from faker import Faker
+
+            self._faker = Faker()
+        faker = self._faker
+        faker.seed_instance(rng.getrandbits(64))
+        users = []
+        for index in range(self.batch_size):
+            first_name = faker.first_name()
+            last_name = faker.last_name()
+            suffix = self.unique_suffix(batch, index)
+            username = re.sub(r"[^a-z0-9]", "", f"{first_name}{last_name}".lower()) + suffix
+            users.append({
+                "first_name": first_name,
+                "last_name": last_name,
+                "username": username,
+                "email": f"{username}@{EMAIL_DOMAIN}",
+                "phone": self._phone(2 * (batch * self.batch_size + index) + 1),
+                "password": "".join(rng.choices(PASSWORD_ALPHABET, k=12)) + "!1a",
+            })
+        return users
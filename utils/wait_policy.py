@@ -0,0 +1,72 @@
+"""
+One wait model per driver session.
+
+A WaitPolicy is attached to the driver as `driver.wait_policy` when the browser is created.
+It holds the page-load strategy the browser was started with, the implicit wait (0 by
+default, so lookups never block and every wait is an explicit, measured poll), the
+explicit timeout and poll frequencies BasePageClass uses, and the readiness condition
+that go_to_page/go_to wait for after a navigation:
+
+    none         return as soon as the driver hands back control
+    interactive  document.readyState is "interactive" or "complete" (DOM parsed)
+    complete     document.readyState is "complete" (every subresource loaded)
+    quiet        interactive, then no DOM mutations or network activity for the quiet window
+"""
+from config import PageLoadStrategyEnum
+
+READINESS_CONDITIONS = ("none", "interactive", "complete", "quiet")
+# Seconds before an explicit wait gives up, and milliseconds of idle page that count as quiet
+DEFAULT_TIMEOUT = 50
+DEFAULT_QUIET_WINDOW_MS = 150
+# Readiness reached by driver.get() itself under each page-load strategy
+STRATEGY_READINESS = {
+    PageLoadStrategyEnum.NORMAL.value[0]: "complete",
+    PageLoadStrategyEnum.EAGER.value[0]: "interactive",
+    PageLoadStrategyEnum.NONE.value[0]: "none",
+}
+
+
+class WaitPolicy:
+    def __init__(
+            self,
+            page_load_strategy=PageLoadStrategyEnum.NORMAL.value[0],
+            readiness=None,
+            implicit_wait=0,
+            timeout=DEFAULT_TIMEOUT,
+            poll_interval=0.05,
+            max_poll_interval=0.5,
+    ):
+        self.page_load_strategy = page_load_strategy
+        self.readiness = readiness or STRATEGY_READINESS[page_load_strategy]
+        if self.readiness not in READINESS_CONDITIONS:
+            raise ValueError(f"Readiness can only be one of {', '.join(READINESS_CONDITIONS)}")
+        self.implicit_wait = implicit_wait
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+
+    def __repr__(self):
+        return (
+            f"WaitPolicy(page_load_strategy={self.page_load_strategy!r}, readiness={self.readiness!r}, "
+            f"implicit_wait={self.implicit_wait}, timeout={self.timeout}, poll_interval={self.poll_interval})"
+        )
+
+    def readiness_check(self):
+        """The readyState to poll for after driver.get(), or None when get() already guarantees it."""
+        reached = READINESS_CONDITIONS.index(STRATEGY_READINESS[self.page_load_strategy])
+        wanted = "interactive" if self.readiness == "quiet" else self.readiness
+        if READINESS_CONDITIONS.index(wanted) <= reached:
+            return None
+        return wanted
+
+    def apply(self, driver):
+        """Configure the driver's own timeouts and attach the policy to it."""
+        driver.implicitly_wait(self.implicit_wait)
+        driver.wait_policy = self
+        return driver
+
+
+def policy_of(driver):
+    """The driver's policy, or the defaults for drivers created outside the setup fixture."""
+    policy = getattr(driver, "wait_policy", None)
+    return policy if policy is not None else WaitPolicy()
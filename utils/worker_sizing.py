@@ -0,0 +1,283 @@
+"""
+Resource-aware worker count for `-n auto`, and a memory-pressure brake during the run.
+
+Every worker samples what it costs the machine: the resident memory and CPU time of its
+own process, its driver and every browser process the driver pool holds (active and
+standby). Samples are taken after a test at most every SAMPLE_INTERVAL seconds, which
+costs a psutil call per process. A sample without any local browser process is dropped
+(unless the browsers are remote), so runs that start no browser never record a usage.
+At the end of the run the per-worker peak memory and average CPU use are kept in the
+pytest cache per --client/--env/--browser.
+
+With `-n auto` the controller divides the machine's cores and available memory by those
+figures (by defaults before the first run) and, for remote browsers, the grid's free
+slots by the sessions per worker, and starts the smallest of the three worker counts.
+`-n logical` and PYTEST_XDIST_AUTO_NUM_WORKERS keep xdist's own count.
+
+While the run is going, a worker waits before starting its next test as long as system
+memory use is above --memory-pressure percent, for at most PAUSE_MAX seconds. If memory
+has not freed up by then, the worker stops waiting until it has. gw0 never waits, so the
+run keeps moving while the others hold back.
+"""
+import inspect
+import logging
+import os
+import time
+
+import pytest
+
+from config import STAND_IN
+from utils import worker_stats
+
+try:
+    import psutil
+except ImportError:  # without psutil `-n auto` only counts CPUs and nothing is sampled or throttled
+    psutil = None
+
+# v2: usage recorded before samples required a browser process undercounts a worker
+USAGE_KEY = "worker_sizing/usage/v2/{client}-{env}-{browser}"
+SAMPLE_INTERVAL = 5.0
+# Per worker until a run has measured it: one busy core and a browser with its standby
+DEFAULT_CPU_PER_WORKER = 1.0
+DEFAULT_RSS_MB_PER_WORKER = 800.0
+# Workers waiting on the browser use little CPU, but never count one as less than this
+MIN_CPU_PER_WORKER = 0.5
+# Share of the machine's memory left to everything else
+MEMORY_RESERVE = 0.15
+PAUSE_MAX = 60.0
+PAUSE_POLL = 0.5
+# Weight of the latest run in the stored (exponentially smoothed) usage
+SMOOTHING = 0.5
+
+
+def usage_key(config):
+    browser = config.getoption("browser")
+    if config.getoption("browser_url"):
+        # Browsers on a grid cost this machine only the worker process
+        browser += "-remote"
+    return USAGE_KEY.format(client=config.getoption("client"), env=config.getoption("env"), browser=browser)
+
+
+def open_cache(config):
+    """The pytest cache, also before pytest_configure has attached it to the config"""
+    if getattr(config, "cache", None) is not None:
+        return config.cache
+    if not config.pluginmanager.has_plugin("cacheprovider"):
+        return None
+    from _pytest.cacheprovider import Cache
+
+    if "_ispytest" in inspect.signature(Cache.for_config).parameters:
+        return Cache.for_config(config, _ispytest=True)
+    return Cache.for_config(config)
+
+
+def grid_slots(config):
+    """Free session slots of the --browser-url grid, or None when it does not say"""
+    url = config.getoption("browser_url")
+    if url == STAND_IN:
+        return config.getoption("stand_in_sessions")
+    from utils import remote_driver
+
+    factory = remote_driver.RemoteBrowserFactory(url, pool_size=1)
+    try:
+        slots = factory.grid_slots()
+    finally:
+        factory.close()
+    return slots[0] if slots is not None else None
+
+
+def plan_workers(cores, available_mb, usage, free_slots=None, sessions_per_worker=1):
+    """The worker count that fits the CPU, memory and grid limits, with the figures behind it"""
+    cpu_per_worker = max(usage.get("cpu_per_worker", DEFAULT_CPU_PER_WORKER), MIN_CPU_PER_WORKER)
+    rss_mb = usage.get("rss_mb", DEFAULT_RSS_MB_PER_WORKER)
+    limits = {"cpu": max(1, int(cores / cpu_per_worker))}
+    if available_mb is not None:
+        limits["memory"] = max(1, int(available_mb / rss_mb))
+    if free_slots is not None:
+        limits["grid"] = max(1, free_slots // sessions_per_worker)
+    limited_by = min(limits, key=limits.get)
+    return {
+        "workers": limits[limited_by],
+        "limited_by": limited_by,
+        "limits": limits,
+        "cores": cores,
+        "cpu_per_worker": cpu_per_worker,
+        "available_mb": available_mb,
+        "rss_mb": rss_mb,
+        "free_slots": free_slots,
+        "sessions_per_worker": sessions_per_worker,
+        "runs": usage.get("runs", 0),
+    }
+
+
+def plan_for(config):
+    """Plan `-n auto` for this machine, from the usage earlier runs recorded in the cache"""
+    cache = open_cache(config)
+    usage = cache.get(usage_key(config), {}) if cache is not None else {}
+    if psutil is not None:
+        cores = psutil.cpu_count(logical=True) or 1
+        memory = psutil.virtual_memory()
+        available_mb = max(memory.available - MEMORY_RESERVE * memory.total, 0) / (1024.0 * 1024.0)
+    else:
+        cores = os.cpu_count() or 1
+        available_mb = None
+    free_slots = None
+    sessions_per_worker = 1
+    if config.getoption("browser_url"):
+        from utils import remote_driver
+
+        free_slots = grid_slots(config)
+        sessions_per_worker = remote_driver.sessions_per_worker(config.getoption("standby_browser") == "true")
+    return plan_workers(cores, available_mb, usage, free_slots=free_slots, sessions_per_worker=sessions_per_worker)
+
+
+class UsageSampler:
+    def __init__(self, processes, require_browsers=True):
+        """`processes()` returns the psutil processes of the worker's driver and browsers;
+        with `require_browsers`, a sample taken while there are none is dropped"""
+        self.processes = processes
+        self.require_browsers = require_browsers
+        self.samples = 0
+        self.peak_rss_mb = 0.0
+        self.cpu_seconds = 0.0
+        self.wall_seconds = 0.0
+        self._cpu = {}
+        self._sampled_at = None
+        self._checked_at = None
+
+    def due(self):
+        return self._checked_at is None or time.monotonic() - self._checked_at >= SAMPLE_INTERVAL
+
+    def sample(self):
+        now = self._checked_at = time.monotonic()
+        browsers = self.processes()
+        if self.require_browsers and not browsers:
+            # The worker alone says nothing about what a worker with its browsers costs
+            self._cpu = {}
+            self._sampled_at = None
+            return
+        rss = 0
+        cpu = {}
+        for process in [psutil.Process()] + browsers:
+            try:
+                with process.oneshot():
+                    rss += process.memory_info().rss
+                    times = process.cpu_times()
+            except psutil.Error:
+                continue
+            cpu[process.pid] = times.user + times.system
+        if self._sampled_at is not None:
+            # A process started since the last sample used all of its CPU time in between
+            self.cpu_seconds += sum(used - self._cpu.get(pid, 0.0) for pid, used in cpu.items())
+            self.wall_seconds += now - self._sampled_at
+        self._cpu = cpu
+        self._sampled_at = now
+        self.samples += 1
+        self.peak_rss_mb = max(self.peak_rss_mb, rss / (1024.0 * 1024.0))
+
+
+class WorkerSizingPlugin:
+    name = "worker_sizing"
+
+    def __init__(self, config, browser_processes):
+        """`browser_processes()` returns the psutil processes of the worker's browsers"""
+        self.config = config
+        self.threshold = config.getoption("memory_pressure") if psutil is not None else 0
+        # One process always keeps going, so waiting for memory can never stall the run
+        self.may_pause = os.environ.get("PYTEST_XDIST_WORKER", "gw0") != "gw0"
+        # Remote browsers cost this machine only the worker process
+        require_browsers = not config.getoption("browser_url")
+        self.sampler = UsageSampler(browser_processes, require_browsers) if psutil is not None else None
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        self.stuck = False
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        if self.threshold and self.may_pause:
+            self.wait_for_memory()
+        yield
+        if self.sampler is not None and self.sampler.due():
+            self.sampler.sample()
+
+    def wait_for_memory(self):
+        start = time.monotonic()
+        pressure = psutil.virtual_memory().percent > self.threshold
+        if not pressure:
+            self.stuck = False
+        if not pressure or self.stuck:
+            return
+        while pressure and time.monotonic() - start < PAUSE_MAX:
+            time.sleep(PAUSE_POLL)
+            pressure = psutil.virtual_memory().percent > self.threshold
+        # Memory that did not free up while this worker waited will not free up by waiting again
+        self.stuck = pressure
+        waited = time.monotonic() - start
+        logging.info("Held back the next test for %.1fs of memory pressure", waited)
+        self.pauses += 1
+        self.paused_seconds += waited
+
+    def summary(self):
+        summary = {"pauses": self.pauses, "paused_seconds": self.paused_seconds}
+        if self.sampler is not None and self.sampler.wall_seconds:
+            summary.update({
+                "workers": 1,
+                "samples": self.sampler.samples,
+                "peak_rss_mb": self.sampler.peak_rss_mb,
+                "cpu_seconds": self.sampler.cpu_seconds,
+                "wall_seconds": self.sampler.wall_seconds,
+            })
+        return summary
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(self.config, "workerinput"):
+            return
+        usage = worker_stats.get_plugin(self.config).get(self.name)
+        cache = getattr(self.config, "cache", None)
+        if cache is None or not usage.get("workers"):
+            return
+        key = usage_key(self.config)
+        measured = {
+            "cpu_per_worker": usage["cpu_seconds"] / usage["wall_seconds"],
+            "rss_mb": usage["peak_rss_mb"] / usage["workers"],
+        }
+        stored = cache.get(key, {})
+        for name, value in measured.items():
+            previous = stored.get(name)
+            stored[name] = value if previous is None else SMOOTHING * value + (1 - SMOOTHING) * previous
+        stored["runs"] = stored.get("runs", 0) + 1
+        cache.set(key, stored)
+
+
+def write_terminal_summary(terminalreporter, plan, usage):
+    pauses = usage.get("pauses")
+    if plan is None and not usage.get("workers") and not pauses:
+        return
+    terminalreporter.write_sep("-", "worker sizing")
+    if plan is not None:
+        limits = plan["limits"]
+        source = f"usage of {plan['runs']} earlier run(s)" if plan["runs"] else "defaults, no earlier run measured"
+        reasons = [f"cpu: {plan['cores']} cores / {plan['cpu_per_worker']:.1f} per worker = {limits['cpu']}"]
+        if "memory" in limits:
+            reasons.append(
+                f"memory: {plan['available_mb']:.0f} MB free / {plan['rss_mb']:.0f} MB per worker = {limits['memory']}"
+            )
+        if "grid" in limits:
+            reasons.append(
+                f"grid: {plan['free_slots']} free slots / {plan['sessions_per_worker']} per worker = {limits['grid']}"
+            )
+        terminalreporter.write_line(
+            f"-n auto started {plan['workers']} worker(s), limited by {plan['limited_by']} ({source})"
+        )
+        for reason in reasons:
+            terminalreporter.write_line(f"  {reason}")
+    if usage.get("workers"):
+        terminalreporter.write_line(
+            f"measured per worker: {usage['cpu_seconds'] / usage['wall_seconds']:.2f} cores, "
+            f"{usage['peak_rss_mb'] / usage['workers']:.0f} MB peak ({usage['samples']} samples)"
+        )
+    if pauses:
+        terminalreporter.write_line(
+            f"{pauses} test start(s) held back {usage['paused_seconds']:.1f}s for memory use above "
+            f"{terminalreporter.config.getoption('memory_pressure')}%"
+        )
@@ -0,0 +1,59 @@
+"""
+Collects counters produced inside each xdist worker and merges them on the controller,
+so the terminal summary reports the whole run rather than the controller's own (empty) share.
+"""
+import pytest
+
+
+def merge_values(total, value):
+    """Numbers are summed, lists concatenated and dicts merged key by key."""
+    if total is None:
+        return value
+    if isinstance(value, dict):
+        merged = dict(total)
+        for key, item in value.items():
+            merged[key] = merge_values(merged.get(key), item)
+        return merged
+    if isinstance(value, list):
+        return list(total) + list(value)
+    if isinstance(value, (int, float)):
+        return total + value
+    return value
+
+
+class WorkerStatsPlugin:
+    name = "worker_stats"
+
+    def __init__(self, config):
+        self.config = config
+        self.sources = {}
+        self.merged = {}
+
+    def add_source(self, key, getter):
+        """Register a callable returning JSON-like data to be published at session end."""
+        self.sources[key] = getter
+
+    def get(self, key):
+        """Merged value across workers, or the local value when running without xdist."""
+        if key in self.merged:
+            return self.merged[key]
+        return self.sources[key]()
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is None:
+            return
+        for key, getter in self.sources.items():
+            workeroutput[key] = getter()
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        workeroutput = getattr(node, "workeroutput", {})
+        for key in self.sources:
+            if key in workeroutput:
+                self.merged[key] = merge_values(self.merged.get(key), workeroutput[key])
+
+
+def get_plugin(config):
+    return config.pluginmanager.get_plugin(WorkerStatsPlugin.name)